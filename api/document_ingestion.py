@@ -0,0 +1,316 @@
+"""
+Document ingestion for batch extraction
+
+Batch uploads arrive as a ZIP archive, many multipart parts, or a mix of both.
+The request body is parsed as it streams in: each file part is spooled to a
+temporary file owned by the batch and handed over as soon as the part ends, so
+documents from early parts are extracted while later parts are still being
+uploaded. Documents are then read one at a time, so memory stays bounded by the
+documents being processed rather than the archive size.
+"""
+import logging
+import mimetypes
+import os
+import queue
+import zipfile
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator, List, NamedTuple, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff", ".gif", ".bmp", ".webp"}
+
+# Parts are kept in memory up to this size, then rolled over to disk
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+class SpooledUpload(NamedTuple):
+    """Spooled upload file owned by the batch"""
+    filename: str
+    content_type: Optional[str]
+    file: BinaryIO
+
+
+class IngestedDocument(NamedTuple):
+    """Single document taken from a batch upload"""
+    index: int
+    filename: str
+    mime_type: str
+    content: Optional[bytes]
+    error: Optional[str] = None
+
+
+class BatchUploads:
+    """
+    Uploads of one batch request, handed to the batch as each part is received
+
+    Iterating blocks until the next upload arrives or the request body ends,
+    so iterate from a worker thread.
+    """
+
+    def __init__(self):
+        self.received: List[SpooledUpload] = []
+        self._arrivals: queue.Queue = queue.Queue()
+
+    def add(self, upload: SpooledUpload):
+        """Hand a completely received upload to the batch"""
+        self.received.append(upload)
+        self._arrivals.put(upload)
+
+    def finish(self):
+        """Mark the request body as fully received"""
+        self._arrivals.put(None)
+
+    def close(self):
+        """End iteration and delete the spooled files"""
+        self.finish()
+        close_uploads(self.received)
+
+    def __iter__(self) -> Iterator[SpooledUpload]:
+        while True:
+            upload = self._arrivals.get()
+            if upload is None:
+                # Leave the marker for any other iteration
+                self._arrivals.put(None)
+                return
+            yield upload
+
+
+class _PartReader:
+    """python-multipart callbacks collecting file parts of one form field"""
+
+    def __init__(self, field: str, max_files: int):
+        self.field = field.encode("utf-8")
+        self.max_files = max_files
+        self.files = 0
+        self.header_name = b""
+        self.header_value = b""
+        self.headers = {}
+        self.current: Optional[SpooledUpload] = None
+        # Work for the async side after each chunk: data to write, parts that ended
+        self.writes: List[tuple] = []
+        self.ended: List[SpooledUpload] = []
+
+    def on_part_begin(self):
+        self.headers = {}
+        self.current = None
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_name.lower()] = self.header_value
+        self.header_name = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if options.get(b"name") != self.field or b"filename" not in options:
+            return
+        self.files += 1
+        if self.files > self.max_files:
+            return
+        content_type = self.headers.get(b"content-type")
+        self.current = SpooledUpload(
+            options[b"filename"].decode("utf-8", "replace") or "document",
+            content_type.decode("latin-1") if content_type else None,
+            SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        )
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.current is not None:
+            self.writes.append((self.current.file, data[start:end]))
+
+    def on_part_end(self):
+        if self.current is not None:
+            self.ended.append(self.current)
+            self.current = None
+
+    def callbacks(self) -> dict:
+        return {
+            name: getattr(self, name)
+            for name in (
+                "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+                "on_headers_finished", "on_part_data", "on_part_end"
+            )
+        }
+
+
+async def receive_uploads(
+    content_type: Optional[str],
+    stream: AsyncIterator[bytes],
+    uploads: BatchUploads,
+    field: str = "files",
+    max_files: int = Config.BATCH_MAX_DOCUMENTS
+):
+    """
+    Parse a multipart/form-data body as it arrives, spooling each file part
+
+    Each file part of the form field is spooled to its own temporary file and
+    added to uploads once the part ends. Other fields are ignored, as are file
+    parts past max_files (a batch never reads more documents than that).
+
+    Args:
+        content_type: Content-Type header of the request
+        stream: Request body chunks (Request.stream())
+        uploads: Batch the received uploads are added to
+        field: Form field holding the files
+        max_files: Max file parts to spool
+
+    Raises:
+        ValueError: The body is not valid multipart/form-data
+    """
+    media_type, params = parse_options_header(content_type or "")
+    if media_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("expected a multipart/form-data body")
+
+    reader = _PartReader(field, max_files)
+    parser = MultipartParser(params[b"boundary"], reader.callbacks())
+    try:
+        async for chunk in stream:
+            parser.write(chunk)
+            for file, data in reader.writes:
+                if getattr(file, "_rolled", True):
+                    # Don't block the event loop on disk writes
+                    await run_in_threadpool(file.write, data)
+                else:
+                    file.write(data)
+            reader.writes.clear()
+            for upload in reader.ended:
+                upload.file.seek(0)
+                uploads.add(upload)
+            reader.ended.clear()
+        parser.finalize()
+    except BaseException as e:
+        # Parts handed to uploads are closed with the batch; close the rest
+        for upload in reader.ended + ([reader.current] if reader.current else []):
+            upload.file.close()
+        if isinstance(e, ValueError):
+            raise ValueError(f"invalid multipart body: {str(e)}") from e
+        raise
+
+
+def close_uploads(spooled: List[SpooledUpload]):
+    """Delete spooled temporary files"""
+    for upload in spooled:
+        try:
+            upload.file.close()
+        except Exception:
+            pass
+
+
+def guess_mime_type(filename: str, content_type: Optional[str] = None) -> str:
+    """Get MIME type from the declared content type or the file extension"""
+    if content_type and content_type not in ("application/octet-stream", "application/zip"):
+        return content_type
+    guessed, _ = mimetypes.guess_type(filename)
+    return guessed or "application/pdf"
+
+
+def _is_zip(upload: SpooledUpload) -> bool:
+    if upload.filename.lower().endswith(".zip") or upload.content_type in (
+        "application/zip", "application/x-zip-compressed"
+    ):
+        return True
+    is_zip = zipfile.is_zipfile(upload.file)
+    upload.file.seek(0)
+    return is_zip
+
+
+def _skip_member(info: zipfile.ZipInfo) -> bool:
+    name = info.filename
+    base = os.path.basename(name)
+    return (
+        info.is_dir()
+        or name.startswith("__MACOSX/")
+        or base.startswith(".")
+        or os.path.splitext(base)[1].lower() not in SUPPORTED_EXTENSIONS
+    )
+
+
+def _read_limited(stream: BinaryIO, max_bytes: int) -> Optional[bytes]:
+    """Read at most max_bytes, returning None if the stream is larger"""
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        return None
+    return data
+
+
+def iter_documents(
+    spooled: Iterable[SpooledUpload],
+    max_bytes: int = Config.MAX_FILE_SIZE_MB * 1024 * 1024,
+    max_documents: int = Config.BATCH_MAX_DOCUMENTS
+) -> Iterator[IngestedDocument]:
+    """
+    Lazily yield documents from spooled uploads
+
+    ZIP members are decompressed only when the caller asks for the next
+    document. Problems with a single document are yielded as an error entry
+    instead of failing the batch.
+
+    Args:
+        spooled: Spooled uploads, e.g. a BatchUploads still being received
+        max_bytes: Max size of a single (decompressed) document
+        max_documents: Max documents per batch
+
+    Yields:
+        IngestedDocument in archive/part order
+    """
+    index = 0
+    too_large = f"document exceeds {max_bytes // (1024 * 1024)} MB limit"
+
+    for upload in spooled:
+        if index >= max_documents:
+            break
+
+        if not _is_zip(upload):
+            content = _read_limited(upload.file, max_bytes)
+            yield IngestedDocument(
+                index,
+                upload.filename,
+                guess_mime_type(upload.filename, upload.content_type),
+                content,
+                None if content is not None else too_large
+            )
+            index += 1
+            continue
+
+        try:
+            archive = zipfile.ZipFile(upload.file)
+        except zipfile.BadZipFile as e:
+            yield IngestedDocument(index, upload.filename, "application/zip", None, f"invalid ZIP archive: {str(e)}")
+            index += 1
+            continue
+
+        with archive:
+            for info in archive.infolist():
+                if index >= max_documents:
+                    logger.warning(f"Batch truncated at {max_documents} documents")
+                    break
+                if _skip_member(info):
+                    continue
+
+                error = None
+                content = None
+                if info.file_size > max_bytes:
+                    error = too_large
+                else:
+                    try:
+                        # Header sizes can lie (ZIP bombs) - cap the actual read too
+                        with archive.open(info) as member:
+                            content = _read_limited(member, max_bytes)
+                        if content is None:
+                            error = too_large
+                    except Exception as e:
+                        error = f"could not read archive member: {str(e)}"
+
+                yield IngestedDocument(index, info.filename, guess_mime_type(info.filename), content, error)
+                index += 1
@@ -0,0 +1,183 @@
+"""
+Dependency health monitoring for liveness and readiness checks
+
+Probes for PostgreSQL, Redis and object storage run in the background with
+client-level timeouts inside the probe timeout. Endpoints only read the cached
+results, so a dead dependency can never make a health check hang, and a probe
+still stuck in its thread is skipped rather than started again.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from config import Config
+from metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_UP = gauge(
+    "dependency_up",
+    "Whether the last health probe of a dependency succeeded",
+    ["dependency"]
+)
+DEPENDENCY_PROBE_SECONDS = gauge(
+    "dependency_probe_seconds",
+    "Latency of the last health probe of a dependency",
+    ["dependency"]
+)
+
+
+class HealthMonitor:
+    """
+    Background prober with cached dependency status
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Callable[[], None]],
+        required: Iterable[str],
+        interval: float = Config.HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout: float = Config.HEALTH_CHECK_TIMEOUT_SECONDS
+    ):
+        """
+        Initialize health monitor
+
+        Args:
+            probes: Dependency name -> blocking callable that raises when unhealthy
+            required: Dependencies that must be up for the replica to be ready
+            interval: Seconds between probe rounds
+            timeout: Max seconds to wait for a single probe
+        """
+        self.probes = probes
+        self.required = [name for name in required if name in probes]
+        self.interval = interval
+        self.timeout = timeout
+        # Results older than this are treated as unknown
+        self.stale_after = interval * 3 + timeout
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {"status": "unknown", "latency_ms": None, "error": None, "checked_at": None}
+            for name in probes
+        }
+        self._task: Optional[asyncio.Task] = None
+        # Probe threads keep running after a timeout - never start a second one
+        self._running: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        """Start background probing"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+            logger.info(f"Health monitor started for: {', '.join(self.probes)}")
+
+    async def stop(self):
+        """Stop background probing"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self):
+        """Run all probes once, concurrently"""
+        await asyncio.gather(*(self._probe(name, fn) for name, fn in self.probes.items()))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get cached dependency status
+
+        Returns:
+            Dependency name -> status, latency, last error and check age
+        """
+        now = time.time()
+        result = {}
+        for name, status in self._status.items():
+            entry = dict(status)
+            checked_at = entry.pop("checked_at")
+            if checked_at is None:
+                entry["age_seconds"] = None
+            else:
+                entry["age_seconds"] = round(now - checked_at, 3)
+                if now - checked_at > self.stale_after:
+                    entry["status"] = "unknown"
+            result[name] = entry
+        return result
+
+    def is_ready(self) -> bool:
+        """True if every required dependency is up"""
+        snapshot = self.snapshot()
+        return all(snapshot[name]["status"] == "up" for name in self.required)
+
+    async def _run(self):
+        """Probe loop"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def _probe(self, name: str, fn: Callable[[], None]):
+        """Run one probe in the threadpool with a timeout, unless the last one is still running"""
+        started = time.perf_counter()
+        running = self._running.get(name)
+        if running is not None and not running.done():
+            self._record(name, "down", "previous probe still running", started)
+            return
+
+        task = asyncio.ensure_future(run_in_threadpool(fn))
+        self._running[name] = task
+        # Retrieve the exception of a probe that finishes after we stopped waiting
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+            status, error = "up", None
+        except asyncio.TimeoutError:
+            status, error = "down", f"probe timed out after {self.timeout}s"
+        except Exception as e:
+            status, error = "down", str(e)
+        self._record(name, status, error, started)
+
+    def _record(self, name: str, status: str, error: Optional[str], started: float):
+        """Store a probe outcome and export it as metrics"""
+        latency = time.perf_counter() - started
+        if status != self._status[name]["status"]:
+            log = logger.info if status == "up" else logger.warning
+            log(f"Dependency {name} is {status}" + (f": {error}" if error else ""))
+
+        self._status[name] = {
+            "status": status,
+            "latency_ms": round(latency * 1000, 1),
+            "error": error,
+            "checked_at": time.time()
+        }
+        DEPENDENCY_UP.labels(name).set(1 if status == "up" else 0)
+        DEPENDENCY_PROBE_SECONDS.labels(name).set(latency)
+
+
+def _lazy_probe(module: str, function: str, timeout: float) -> Callable[[], None]:
+    """Import the storage client on first probe so a missing driver only fails that probe"""
+    def probe():
+        import importlib
+        getattr(importlib.import_module(module), function)(timeout=timeout)
+    return probe
+
+
+def create_health_monitor() -> HealthMonitor:
+    """Create monitor for the configured dependencies"""
+    # Connect and read are bounded separately, so each gets half the probe budget
+    timeout = Config.HEALTH_CHECK_TIMEOUT_SECONDS / 2
+    probes = {
+        "database": _lazy_probe("storage.database", "ping_database", timeout),
+        "redis": _lazy_probe("storage.redis_client", "ping_redis", timeout),
+        "storage": _lazy_probe("storage.object_storage", "ping_storage", timeout),
+    }
+    required = [
+        name.strip()
+        for name in Config.HEALTH_REQUIRED_DEPENDENCIES.split(",")
+        if name.strip()
+    ]
+    return HealthMonitor(probes, required)
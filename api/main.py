@@ -1,11 +1,22 @@
 """
 FastAPI application for Student Loan Document Extractor Platform
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import CONTENT_TYPE, counter, gauge, histogram, render
+from config import Config
+from api.health import create_health_monitor
+from api.rate_limiter import AdmissionMiddleware, admission_controller
 
 # Configure logging
 logging.basicConfig(
@@ -30,6 +41,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Backpressure for extraction routes
+if Config.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Background dependency probes
+health_monitor = create_health_monitor()
+
+
+@app.on_event("startup")
+async def start_health_monitor():
+    """Start probing dependencies"""
+    await health_monitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_health_monitor():
+    """Stop probing dependencies"""
+    await health_monitor.stop()
+
+
+# Request metrics
+REQUESTS_IN_FLIGHT = gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served"
+)
+REQUESTS_TOTAL = counter(
+    "http_requests_total",
+    "HTTP requests by method and status code",
+    ["method", "status"]
+)
+REQUEST_SECONDS = histogram(
+    "http_request_seconds",
+    "HTTP request latency"
+)
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Track in-flight requests, status codes and latency"""
+    started = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUESTS_IN_FLIGHT.dec()
+        REQUEST_SECONDS.observe(time.perf_counter() - started)
+        REQUESTS_TOTAL.labels(request.method, status).inc()
+
 
 @app.get("/")
 async def root():
@@ -50,13 +112,54 @@ async def health_check():
     }
 
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe - the process is up and serving requests"""
+    return {
+        "status": "alive",
+        "service": "api"
+    }
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe - required dependencies answered their last probe"""
+    ready = health_monitor.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "required": health_monitor.required,
+            "dependencies": health_monitor.snapshot()
+        }
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint, merged across worker processes"""
+    content = await run_in_threadpool(render)
+    return Response(content=content, media_type=CONTENT_TYPE)
+
+
+@app.get("/api/v1/admission")
+async def admission_status():
+    """Admission queue depth and rejections of the worker process serving this request"""
+    return {**admission_controller.stats(), "pid": os.getpid(), "workers": Config.API_WORKERS}
+
+
 @app.get("/api/v1/status")
 async def api_status():
-    """API status endpoint"""
+    """API status endpoint (cached probe results, never blocks on a dependency)"""
+    dependencies = health_monitor.snapshot()
+    labels = {"up": "connected", "down": "disconnected", "unknown": "unknown"}
     return {
         "api": "online",
-        "database": "connected",  # TODO: Add actual DB check
-        "storage": "connected"     # TODO: Add actual storage check
+        "database": labels[dependencies["database"]["status"]],
+        "redis": labels[dependencies["redis"]["status"]],
+        "storage": labels[dependencies["storage"]["status"]],
+        "ready": health_monitor.is_ready(),
+        "dependencies": dependencies
     }
 
 
@@ -70,6 +173,5 @@ except ImportError as e:
 
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("API_PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    from api.server import main
+    main()
@@ -0,0 +1,277 @@
+"""
+Progress events for long-running extractions
+
+Stages are published per job id and delivered to subscribers as server-sent
+events. With Redis available, events go to a short-lived Redis stream so a
+subscriber connected to any API worker or replica sees the full history; a
+process-local broker is used otherwise.
+
+Coalesced duplicate requests share one extraction, so their job ids join a
+group named after the coalescing key and the running extraction publishes its
+stages to every job id in the group.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from config import Config
+from storage.redis_client import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "progress:"
+GROUP_PREFIX = "progress:group:"
+
+# Stages in emission order; a job ends with "serialized" or "failed"
+STAGES = (
+    "uploaded",
+    "text_layer_done",
+    "form_parser_done",
+    "ocr_done",
+    "pages_built",
+    "accuracy_done",
+    "serialized",
+)
+TERMINAL_STAGES = {"serialized", "failed"}
+
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    """Job ids are client-chosen; keep them short and key-safe"""
+    return bool(job_id) and bool(JOB_ID_PATTERN.match(job_id))
+
+
+class ProgressBroker:
+    """
+    Publish/subscribe of extraction stage events keyed by job id
+    """
+
+    def __init__(self, ttl: float = Config.PROGRESS_TTL_SECONDS):
+        """
+        Initialize broker
+
+        Args:
+            ttl: Seconds events are kept after the last publish
+        """
+        self.ttl = ttl
+        self._redis_failed_at = 0.0
+        # Process-local fallback
+        self._lock = threading.Lock()
+        self._history: Dict[str, List[Dict[str, Any]]] = {}
+        self._expires: Dict[str, float] = {}
+        self._subscribers: Dict[str, Set[tuple]] = {}
+        self._groups: Dict[str, Dict[str, int]] = {}
+
+    def publish(self, job_id: Optional[str], stage: str, **data: Any):
+        """
+        Publish a stage event (safe to call from extraction threads)
+
+        Args:
+            job_id: Job id, or None to do nothing
+            stage: Stage name
+            **data: Extra event fields (e.g. page, total)
+        """
+        if not job_id:
+            return
+        event = {"job_id": job_id, "stage": stage, "timestamp": time.time(), **data}
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                key = STREAM_PREFIX + job_id
+                pipe = redis.pipeline(transaction=False)
+                pipe.xadd(key, {"event": json.dumps(event)}, maxlen=1000, approximate=True)
+                pipe.expire(key, int(self.ttl))
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Progress stream unavailable, using local broker: {str(e)}")
+                self._redis_failed_at = time.time()
+
+        self._publish_local(job_id, event)
+
+    def join(self, group: str, job_id: Optional[str]):
+        """
+        Add a job id to a group so it receives the group's stage events
+
+        Args:
+            group: Group name (the request coalescing key)
+            job_id: Job id, or None to do nothing
+        """
+        if not job_id:
+            return
+        with self._lock:
+            members = self._groups.setdefault(group, {})
+            members[job_id] = members.get(job_id, 0) + 1
+        redis = self._redis()
+        if redis is not None:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                pipe.sadd(GROUP_PREFIX + group, job_id)
+                pipe.expire(GROUP_PREFIX + group, int(self.ttl))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Progress group unavailable, using local broker: {str(e)}")
+                self._redis_failed_at = time.time()
+
+    def leave(self, group: str, job_id: Optional[str]):
+        """Remove a job id added with join"""
+        if not job_id:
+            return
+        with self._lock:
+            members = self._groups.get(group, {})
+            remaining = members.get(job_id, 0) - 1
+            if remaining > 0:
+                members[job_id] = remaining
+            else:
+                members.pop(job_id, None)
+                if not members:
+                    self._groups.pop(group, None)
+        redis = self._redis()
+        if redis is not None:
+            try:
+                redis.srem(GROUP_PREFIX + group, job_id)
+            except Exception as e:
+                logger.warning(f"Failed to leave progress group: {str(e)}")
+
+    def publish_group(self, group: str, stage: str, **data: Any):
+        """
+        Publish a stage event to every job id in a group (safe to call from extraction threads)
+
+        Args:
+            group: Group name
+            stage: Stage name
+            **data: Extra event fields
+        """
+        with self._lock:
+            members = set(self._groups.get(group, ()))
+        redis = self._redis()
+        if redis is not None:
+            try:
+                # Job ids of requests waiting on this extraction from other replicas
+                for member in redis.smembers(GROUP_PREFIX + group):
+                    members.add(member.decode("utf-8") if isinstance(member, bytes) else member)
+            except Exception as e:
+                logger.warning(f"Progress group unavailable: {str(e)}")
+        for job_id in members:
+            self.publish(job_id, stage, **data)
+
+    async def subscribe(self, job_id: str, timeout: float = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Iterate events for a job from the beginning until a terminal stage
+
+        Yields None as a keep-alive when no event arrived for a while.
+
+        Args:
+            job_id: Job id
+            timeout: Max seconds to follow the job
+        """
+        deadline = time.time() + (timeout or self.ttl)
+        redis = self._async_redis()
+        if redis is not None:
+            try:
+                async for event in self._subscribe_redis(redis, job_id, deadline):
+                    yield event
+                return
+            except Exception as e:
+                logger.warning(f"Progress stream read failed, using local broker: {str(e)}")
+
+        async for event in self._subscribe_local(job_id, deadline):
+            yield event
+
+    async def _subscribe_redis(self, redis, job_id: str, deadline: float):
+        key = STREAM_PREFIX + job_id
+        last_id = "0-0"
+        last_sent = time.time()
+        while time.time() < deadline:
+            # Block briefly (below the socket timeout) and send keep-alives in between
+            response = await redis.xread({key: last_id}, block=1000, count=100)
+            if not response:
+                if time.time() - last_sent >= Config.PROGRESS_KEEPALIVE_SECONDS:
+                    last_sent = time.time()
+                    yield None
+                continue
+            last_sent = time.time()
+            for _, entries in response:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    raw = fields.get(b"event") or fields.get("event")
+                    event = json.loads(raw)
+                    yield event
+                    if event["stage"] in TERMINAL_STAGES:
+                        return
+
+    async def _subscribe_local(self, job_id: str, deadline: float):
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            history = list(self._history.get(job_id, []))
+            self._subscribers.setdefault(job_id, set()).add((loop, queue))
+
+        try:
+            for event in history:
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+            while time.time() < deadline:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=Config.PROGRESS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(job_id)
+                if subscribers is not None:
+                    subscribers.discard((loop, queue))
+                    if not subscribers:
+                        del self._subscribers[job_id]
+
+    def _publish_local(self, job_id: str, event: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            self._history.setdefault(job_id, []).append(event)
+            self._expires[job_id] = now + self.ttl
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def _expire(self, now: float):
+        for job_id in [j for j, expires in self._expires.items() if expires < now]:
+            self._history.pop(job_id, None)
+            self._expires.pop(job_id, None)
+
+    def _redis(self):
+        if time.time() - self._redis_failed_at < 30:
+            return None
+        try:
+            return get_redis()
+        except Exception:
+            return None
+
+    def _async_redis(self):
+        if time.time() - self._redis_failed_at < 30:
+            return None
+        try:
+            return get_async_redis()
+        except Exception:
+            return None
+
+
+def format_sse(event: Optional[Dict[str, Any]]) -> bytes:
+    """Format an event (or keep-alive for None) as a server-sent event"""
+    if event is None:
+        return b": keep-alive\n\n"
+    return f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n".encode("utf-8")
+
+
+progress_broker = ProgressBroker()
@@ -0,0 +1,307 @@
+"""
+Admission control and backpressure for extraction routes
+
+Extraction requests are admitted up to a fixed in-flight limit. Further
+requests wait in a bounded queue that is served round-robin across clients,
+so one client's burst cannot starve the others. When the queue (or the
+client's fair share) is full the request is rejected immediately with 429 and
+a Retry-After computed from the observed service time.
+
+The configured limits are budgets for the whole API replica. Each gunicorn
+worker process runs its own controller, so the budgets are split evenly across
+Config.API_WORKERS with per_worker().
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from config import Config
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_IN_FLIGHT = gauge(
+    "admission_in_flight",
+    "Extraction requests currently admitted"
+)
+ADMISSION_QUEUE_DEPTH = gauge(
+    "admission_queue_depth",
+    "Extraction requests waiting for admission"
+)
+ADMISSION_REJECTIONS = counter(
+    "admission_rejections_total",
+    "Extraction requests rejected by admission control",
+    ["reason"]
+)
+
+
+def per_worker(total: int, workers: Optional[int] = None) -> int:
+    """
+    Split a replica-wide limit across API worker processes
+
+    Args:
+        total: Limit for the whole replica
+        workers: Worker processes (default: Config.API_WORKERS)
+
+    Returns:
+        This process's share, at least 1
+    """
+    workers = max(1, workers or Config.API_WORKERS)
+    return max(1, math.ceil(total / workers))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded, per-client fair wait queue
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_per_client: Optional[int] = None,
+        queue_timeout: float = Config.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        initial_service_time: float = 10.0
+    ):
+        """
+        Initialize admission controller
+
+        Args:
+            max_in_flight: Max requests running at once in this process
+                (default: this worker's share of ADMISSION_MAX_IN_FLIGHT)
+            max_queue: Max requests waiting for a slot
+                (default: this worker's share of ADMISSION_MAX_QUEUE)
+            max_per_client: Max requests (running + waiting) per client
+                (default: this worker's share of ADMISSION_MAX_PER_CLIENT)
+            queue_timeout: Max seconds a request waits for a slot
+            initial_service_time: Service time estimate before any request finishes
+        """
+        self.max_in_flight = max_in_flight or per_worker(Config.ADMISSION_MAX_IN_FLIGHT)
+        self.max_queue = max_queue if max_queue is not None else per_worker(Config.ADMISSION_MAX_QUEUE)
+        self.max_per_client = max_per_client or per_worker(Config.ADMISSION_MAX_PER_CLIENT)
+        self.queue_timeout = queue_timeout
+        self.service_time = initial_service_time
+
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {}
+        self._per_client: Dict[str, int] = {}
+        # client -> waiting futures; rotated for round-robin fairness
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    async def acquire(self, client_id: str):
+        """
+        Wait for an execution slot
+
+        Args:
+            client_id: Identity used for fair sharing
+
+        Raises:
+            AdmissionRejected: Client share or queue is full, or the wait timed out
+        """
+        if self._per_client.get(client_id, 0) >= self.max_per_client:
+            self._reject("client_limit")
+
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self._grant(client_id)
+            return
+
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client_id, deque()).append(future)
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        self.queued += 1
+        self._publish()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Slot was handed over just as we gave up - pass it on
+                self.release(client_id)
+            else:
+                future.cancel()
+                self._drop_waiter(client_id, future)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+
+    def release(self, client_id: str, service_time: Optional[float] = None):
+        """
+        Release a slot and hand it to the next waiting client
+
+        Args:
+            client_id: Identity passed to acquire
+            service_time: Seconds the request ran, used for Retry-After estimates
+        """
+        if service_time is not None:
+            self.service_time = 0.8 * self.service_time + 0.2 * service_time
+
+        self.in_flight -= 1
+        self._decrement_client(client_id)
+
+        while self._waiters and self.in_flight < self.max_in_flight:
+            next_client, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            if waiters:
+                self._waiters.move_to_end(next_client)
+            else:
+                del self._waiters[next_client]
+            self.queued -= 1
+            if future.done():
+                continue
+            # Waiter already counted against its client when it queued
+            self.in_flight += 1
+            future.set_result(True)
+
+        self._publish()
+
+    def retry_after(self) -> int:
+        """Seconds until a retried request is likely to be admitted"""
+        backlog = self.queued + max(self.in_flight - self.max_in_flight + 1, 1)
+        return max(1, math.ceil(self.service_time * backlog / self.max_in_flight))
+
+    def stats(self) -> Dict[str, Any]:
+        """Current admission state for monitoring and autoscaling"""
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queued,
+            "max_queue": self.max_queue,
+            "max_per_client": self.max_per_client,
+            "active_clients": len(self._per_client),
+            "service_time_seconds": round(self.service_time, 3),
+            "retry_after_seconds": self.retry_after(),
+            "rejected": dict(self.rejected)
+        }
+
+    def _grant(self, client_id: str):
+        self.in_flight += 1
+        self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+        self._publish()
+
+    def _drop_waiter(self, client_id: str, future: asyncio.Future):
+        waiters = self._waiters.get(client_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[client_id]
+            self.queued -= 1
+        self._decrement_client(client_id)
+        self._publish()
+
+    def _decrement_client(self, client_id: str):
+        remaining = self._per_client.get(client_id, 0) - 1
+        if remaining > 0:
+            self._per_client[client_id] = remaining
+        else:
+            self._per_client.pop(client_id, None)
+
+    def _reject(self, reason: str):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def _publish(self):
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        ADMISSION_QUEUE_DEPTH.set(self.queued)
+
+
+def client_id_from_headers(headers: Headers, fallback: str) -> str:
+    """
+    Identify the client for fair sharing
+
+    Prefers an explicit client header, then the first forwarded address.
+    """
+    client = headers.get("x-client-id") or headers.get("x-api-key")
+    if client:
+        return client
+    forwarded = headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return fallback
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission control before the body is read
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        path_prefixes: Iterable[str] = ("/api/v1/extract",),
+        exclude_paths: Iterable[str] = ("/api/v1/extract/batch",)
+    ):
+        """
+        Args:
+            app: Wrapped ASGI app
+            controller: Shared admission controller
+            path_prefixes: POST paths that require a slot
+            exclude_paths: Paths that acquire slots themselves (batch fans out per document)
+        """
+        self.app = app
+        self.controller = controller
+        self.path_prefixes = tuple(path_prefixes)
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].startswith(self.path_prefixes)
+            or scope["path"] in self.exclude_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        client_id = client_id_from_headers(
+            Headers(scope=scope),
+            client[0] if client else "unknown"
+        )
+
+        try:
+            await self.controller.acquire(client_id)
+        except AdmissionRejected as e:
+            logger.warning(f"Rejected extraction from {client_id}: {e.reason}")
+            response = JSONResponse(
+                status_code=429,
+                content={
+                    "detail": "Too many extraction requests, retry later",
+                    "reason": e.reason,
+                    "retry_after": e.retry_after
+                },
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client_id, time.perf_counter() - started)
+
+
+# Process-wide controller shared by the middleware and batch fan-out;
+# created at import, after api.server has set Config.API_WORKERS
+admission_controller = AdmissionController()
@@ -0,0 +1,329 @@
+"""
+Request coalescing (singleflight) for duplicate extraction requests
+
+Identical uploads that arrive while an extraction for the same content and
+options is still running share that single extraction instead of calling the
+Document AI processors again:
+
+- Within one process, followers await the leader's asyncio task
+- Across API replicas and workers, a Redis lock elects one leader and the
+  leader publishes its result for the replicas that were waiting on it
+
+Each leader publishes under its own lock token, so a request that arrives after
+the leader finished runs a fresh extraction instead of reading a stale result.
+A failed extraction is published as an error envelope with a shorter TTL and
+raised as LeaderFailed in the replicas that were waiting on it.
+Published envelopes are encrypted because results carry unmasked PII.
+"""
+import asyncio
+import base64
+import copy
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from config import Config
+from storage.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = "singleflight:lock:"
+RESULT_PREFIX = "singleflight:result:"
+
+# Back off from Redis for this long after a connection failure
+REDIS_RETRY_SECONDS = 30.0
+
+# Delete the lock only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Extend the lock only if we still own it
+_REFRESH_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _envelope_cipher(secret: str) -> Fernet:
+    """Derive the Fernet key for published envelopes from the app secret"""
+    digest = hashlib.sha256(b"singleflight\0" + secret.encode("utf-8")).digest()
+    return Fernet(base64.urlsafe_b64encode(digest))
+
+
+class LeaderFailed(Exception):
+    """The extraction a follower was waiting on failed on another replica"""
+
+
+def _is_failed(result: Any) -> bool:
+    """True for extraction results that are shared as an error"""
+    return isinstance(result, dict) and result.get("extraction_status") == "failed"
+
+
+def build_request_key(file_content: bytes, mime_type: str, **options: Any) -> str:
+    """
+    Build the coalescing key for an extraction request
+
+    Args:
+        file_content: Binary content
+        mime_type: MIME type
+        **options: Extraction options that change the result
+
+    Returns:
+        Hex digest of content hash plus options
+    """
+    digest = hashlib.sha256(file_content)
+    digest.update(b"\0" + mime_type.encode("utf-8"))
+    for name in sorted(options):
+        digest.update(f"\0{name}={options[name]!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _text(value) -> Optional[str]:
+    """Decode a Redis reply that may be bytes or str"""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def result_key(lock_key: str, token: str) -> str:
+    """Redis key a leader holding lock_key with token publishes its result under"""
+    return f"{RESULT_PREFIX}{lock_key[len(LOCK_PREFIX):]}:{token}"
+
+
+class RequestCoalescer:
+    """
+    Singleflight executor keyed by request hash
+    """
+
+    def __init__(
+        self,
+        redis_factory: Callable[[], Any] = get_async_redis,
+        lock_ttl: float = Config.COALESCE_LOCK_TTL_SECONDS,
+        result_ttl: float = Config.COALESCE_RESULT_TTL_SECONDS,
+        error_ttl: float = Config.COALESCE_ERROR_TTL_SECONDS,
+        wait_timeout: float = Config.COALESCE_WAIT_TIMEOUT_SECONDS,
+        poll_interval: float = 0.25,
+        secret: str = Config.ENCRYPTION_KEY
+    ):
+        """
+        Initialize coalescer
+
+        Args:
+            redis_factory: Returns the asyncio Redis client, or None for in-process only
+            lock_ttl: Leader lock TTL in seconds (refreshed while the leader runs)
+            result_ttl: How long a published result stays readable for followers
+            error_ttl: How long a published error stays readable for followers
+            wait_timeout: Max seconds a cross-replica follower waits before running itself
+            poll_interval: Seconds between follower polls of the shared result
+            secret: Secret the published envelopes are encrypted with
+        """
+        self._redis_factory = redis_factory
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.error_ttl = error_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._cipher = _envelope_cipher(secret)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._redis_retry_at = 0.0
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Request key from build_request_key
+            fn: Coroutine factory performing the actual extraction
+
+        Returns:
+            (result, shared) where shared is True if this caller did not run fn;
+            followers get their own copy of the result
+
+        Raises:
+            LeaderFailed: The remote leader this caller waited on failed
+        """
+        task = self._inflight.get(key)
+        follower = task is not None
+
+        if task is None:
+            # Run the leader as its own task so a disconnecting client does not
+            # cancel the extraction other callers are waiting on
+            task = asyncio.ensure_future(self._lead(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        result, shared = await asyncio.shield(task)
+        if follower:
+            # The leader's caller may still modify its result
+            return copy.deepcopy(result), True
+        return result, shared
+
+    def inflight_count(self) -> int:
+        """Number of distinct extractions currently running in this process"""
+        return len(self._inflight)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        """Remove finished task and mark its exception as retrieved"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def _lead(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Run fn, coordinating with other replicas through Redis when available"""
+        redis = self._get_redis()
+        if redis is None:
+            return await fn(), False
+
+        lock_key = LOCK_PREFIX + key
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+
+        while True:
+            try:
+                acquired = await redis.set(
+                    lock_key, token, nx=True, px=int(self.lock_ttl * 1000)
+                )
+                leader = None if acquired else await redis.get(lock_key)
+            except Exception as e:
+                logger.warning(f"Coalescing lock unavailable, running locally: {str(e)}")
+                self._redis_retry_at = loop.time() + REDIS_RETRY_SECONDS
+                return await fn(), False
+
+            if acquired:
+                return await self._run_as_leader(redis, lock_key, token, fn), False
+            if leader is None:
+                # Lock released between the two calls - try again
+                continue
+
+            envelope = await self._wait_for_leader(redis, lock_key, leader, deadline)
+            if envelope is not None:
+                outcome = self._unwrap(envelope)
+                if outcome is not None and "error" in outcome:
+                    raise LeaderFailed(outcome["error"])
+                if outcome is not None:
+                    return outcome["result"], True
+
+            if loop.time() >= deadline:
+                logger.warning(f"Timed out waiting for remote leader of {key[:12]}, running locally")
+                return await fn(), False
+            # Lock vanished without a result (leader crashed) - try to take over
+
+    async def _run_as_leader(
+        self,
+        redis,
+        lock_key: str,
+        token: str,
+        fn: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Hold the distributed lock while running fn and publish its result or error"""
+        keepalive = asyncio.ensure_future(self._keep_lock(redis, lock_key, token))
+        key = result_key(lock_key, token)
+        try:
+            try:
+                result = await fn()
+            except Exception as e:
+                await self._publish(redis, key, {"error": str(e)}, self.error_ttl)
+                raise
+            if _is_failed(result):
+                await self._publish(redis, key, {"error": result.get("error")}, self.error_ttl)
+            else:
+                await self._publish(redis, key, {"result": result}, self.result_ttl)
+            return result
+        finally:
+            keepalive.cancel()
+            try:
+                await redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning(f"Failed to release coalescing lock: {str(e)}")
+
+    async def _keep_lock(self, redis, lock_key: str, token: str):
+        """Refresh the lock TTL so it outlives long extractions but not a dead leader"""
+        interval = max(self.lock_ttl / 3, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await redis.eval(_REFRESH_SCRIPT, 1, lock_key, token, int(self.lock_ttl * 1000))
+            except Exception as e:
+                logger.warning(f"Failed to refresh coalescing lock: {str(e)}")
+
+    async def _wait_for_leader(
+        self,
+        redis,
+        lock_key: str,
+        leader: Any,
+        deadline: float
+    ) -> Optional[bytes]:
+        """Poll for this leader's result until it appears, the leader lets go of the lock, or timeout"""
+        leader = _text(leader)
+        key = result_key(lock_key, leader)
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                envelope = await redis.get(key)
+                if envelope is not None:
+                    return envelope
+                if _text(await redis.get(lock_key)) != leader:
+                    # Leader may have published between the two reads
+                    return await redis.get(key)
+            except Exception as e:
+                logger.warning(f"Lost Redis while waiting for leader: {str(e)}")
+                return None
+        return None
+
+    async def _publish(self, redis, key: str, outcome: Dict[str, Any], ttl: float):
+        """
+        Make the leader's outcome readable, encrypted, by waiting followers for a short time
+
+        Args:
+            redis: Asyncio Redis client
+            key: Result key from result_key
+            outcome: {"result": result} or {"error": message}
+            ttl: Seconds the envelope stays readable
+        """
+        try:
+            envelope = self._cipher.encrypt(json.dumps(outcome, ensure_ascii=False).encode("utf-8"))
+            await redis.set(key, envelope, px=int(ttl * 1000))
+        except Exception as e:
+            logger.warning(f"Failed to publish coalesced result: {str(e)}")
+
+    def _unwrap(self, envelope: bytes) -> Optional[Dict[str, Any]]:
+        """Decrypt a published envelope into {"result": ...} or {"error": ...}, or None if it can't be read"""
+        if isinstance(envelope, str):
+            envelope = envelope.encode("utf-8")
+        try:
+            return json.loads(self._cipher.decrypt(envelope))
+        except (InvalidToken, ValueError) as e:
+            logger.warning(f"Discarding unreadable coalesced result: {str(e)}")
+            return None
+
+    def _get_redis(self):
+        """Get Redis client, or None when coalescing is process-local"""
+        if self._redis_factory is None:
+            return None
+        if asyncio.get_running_loop().time() < self._redis_retry_at:
+            # Redis failed recently - don't pay a connect timeout on every request
+            return None
+        try:
+            return self._redis_factory()
+        except Exception as e:
+            logger.warning(f"Redis client unavailable for coalescing: {str(e)}")
+            return None
@@ -1,66 +1,268 @@
 """
 API routes for complete document extraction
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import List, Optional
+import asyncio
+import functools
 import logging
 import os
 import sys
 import json
+import time
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import Config
 from processing.complete_document_extractor import CompleteDocumentExtractor
+from api.request_coalescer import LeaderFailed, RequestCoalescer, build_request_key
+from api.rate_limiter import AdmissionRejected, admission_controller, client_id_from_headers
+from api.document_ingestion import BatchUploads, IngestedDocument, iter_documents, receive_uploads
+from api.progress import format_sse, is_valid_job_id, progress_broker
+from processing.page_selection import (
+    PageSelectionError,
+    check_page_selection,
+    count_pages,
+    format_page_ranges,
+    parse_page_ranges,
+)
+from metrics import CACHE_REQUESTS, EXTRACTION_STAGE_SECONDS, PAYLOAD_BYTES
 
 logger = logging.getLogger(__name__)
 
+_JSON_ENCODING_SECONDS = EXTRACTION_STAGE_SECONDS.labels("json_encoding")
+_REQUEST_BYTES = PAYLOAD_BYTES.labels("request")
+_RESPONSE_BYTES = PAYLOAD_BYTES.labels("response")
+_COALESCE_HIT = CACHE_REQUESTS.labels("coalescer", "hit")
+_COALESCE_MISS = CACHE_REQUESTS.labels("coalescer", "miss")
+
 router = APIRouter()
 
-# Initialize complete extractor
-extractor = CompleteDocumentExtractor()
+# Complete extractor, created lazily per process: Document AI gRPC clients
+# must not be created before the server forks its workers
+_extractor = None
+_extractor_pid = None
+
+
+def get_extractor() -> CompleteDocumentExtractor:
+    """Get this process's complete extractor"""
+    global _extractor, _extractor_pid
+    if _extractor is None or _extractor_pid != os.getpid():
+        _extractor = CompleteDocumentExtractor()
+        _extractor_pid = os.getpid()
+    return _extractor
+
+# Share one extraction between concurrent identical uploads
+coalescer = RequestCoalescer()
+
+
+async def _extract(
+    file_content: bytes,
+    mime_type: str,
+    filename: str,
+    job_id: Optional[str] = None,
+    pages: Optional[List[int]] = None
+) -> dict:
+    """
+    Run complete extraction off the event loop, coalescing duplicate requests
+
+    Args:
+        file_content: Binary content
+        mime_type: MIME type
+        filename: File name
+        job_id: Optional job id to publish stage progress under
+        pages: Optional sorted page numbers to extract (default: all)
+
+    Returns:
+        Complete extraction result
+    """
+    _REQUEST_BYTES.observe(len(file_content))
+
+    async def run(progress):
+        return await run_in_threadpool(
+            get_extractor().extract_complete_document,
+            file_content,
+            mime_type,
+            filename,
+            progress,
+            pages
+        )
+
+    if not Config.COALESCE_ENABLED:
+        return await run(functools.partial(progress_broker.publish, job_id) if job_id else None)
+
+    key = build_request_key(
+        file_content,
+        mime_type,
+        pages=format_page_ranges(pages) if pages else None
+    )
+    # Whoever ends up running the extraction reports stages to every job id
+    # waiting on it, including followers on other replicas
+    group_progress = functools.partial(progress_broker.publish_group, key)
+
+    await run_in_threadpool(progress_broker.join, key, job_id)
+    try:
+        result, shared = await coalescer.run(key, lambda: run(group_progress))
+    except LeaderFailed as e:
+        # Same failed result the leader's own caller got
+        _COALESCE_HIT.inc()
+        return {"document_name": filename, "error": str(e), "extraction_status": "failed"}
+    finally:
+        await run_in_threadpool(progress_broker.leave, key, job_id)
+
+    if not shared:
+        _COALESCE_MISS.inc()
+    else:
+        _COALESCE_HIT.inc()
+        logger.info(f"Coalesced duplicate extraction: {filename}")
+        if result.get("document_name") != filename:
+            result = {**result, "document_name": filename}
+
+    return result
+
+
+def _encode_json(result: dict, indent: int = None) -> str:
+    """Serialize result to JSON, recording encoding time"""
+    started = time.perf_counter()
+    if indent is None:
+        # Same compact encoding JSONResponse uses
+        encoded = json.dumps(result, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    else:
+        encoded = json.dumps(result, indent=indent, ensure_ascii=False)
+    _JSON_ENCODING_SECONDS.observe(time.perf_counter() - started)
+    return encoded
+
+
+def _json_response(result: dict) -> Response:
+    """Build JSON response from an already-encoded body"""
+    body = _encode_json(result).encode("utf-8")
+    _RESPONSE_BYTES.observe(len(body))
+    return Response(content=body, media_type="application/json")
+
+
+def _parse_pages(spec: Optional[str]) -> Optional[List[int]]:
+    """Parse the pages query parameter, rejecting malformed ranges with 400"""
+    try:
+        return parse_page_ranges(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pages: {str(e)}")
+
+
+async def _check_pages(file_content: bytes, mime_type: str, pages: Optional[List[int]]):
+    """Reject page selections past the end of the document with 400"""
+    error = await run_in_threadpool(_page_selection_error, file_content, mime_type, pages)
+    if error:
+        raise HTTPException(status_code=400, detail=f"Invalid pages: {error}")
+
+
+def _page_selection_error(file_content: bytes, mime_type: str, pages: Optional[List[int]]) -> Optional[str]:
+    """Why the page selection doesn't fit the document, or None"""
+    if not pages:
+        return None
+    total = count_pages(file_content, mime_type)
+    if total is None:
+        # Unreadable documents are reported by the extraction itself
+        return None
+    try:
+        check_page_selection(pages, total)
+    except PageSelectionError as e:
+        return str(e)
+    return None
+
+
+PAGES_QUERY = Query(None, description="Pages to extract, e.g. 1-3,7 (default: all)")
+
+
+async def _publish_progress(job_id: Optional[str], stage: str, **data):
+    """Publish a progress event without blocking the event loop on Redis"""
+    if job_id:
+        await run_in_threadpool(functools.partial(progress_broker.publish, job_id, stage, **data))
 
 
 @router.post("/extract")
-async def extract_document(file: UploadFile = File(...)):
+async def extract_document(
+    file: UploadFile = File(...),
+    job_id: Optional[str] = Query(None, description="Client-chosen id for /extract/progress/{job_id}"),
+    pages: Optional[str] = PAGES_QUERY
+):
     """
     Complete document extraction
     Extracts ALL text, data, numbers, tables, boxes, nested columns
     Uses both Form Parser and Document OCR
     Returns complete extraction with accuracy metrics
     """
+    if job_id is not None and not is_valid_job_id(job_id):
+        raise HTTPException(status_code=400, detail="job_id must be 1-64 letters, digits, '-' or '_'")
+    page_list = _parse_pages(pages)
+    
     try:
         logger.info(f"Starting complete extraction: {file.filename}")
         
         # Read file content
         file_content = await file.read()
+        await _publish_progress(job_id, "uploaded", bytes=len(file_content))
         
         # Determine MIME type
         mime_type = file.content_type or "application/pdf"
+        await _check_pages(file_content, mime_type, page_list)
         
         # Extract complete document
-        result = extractor.extract_complete_document(
-            file_content,
-            mime_type,
-            file.filename
-        )
+        result = await _extract(file_content, mime_type, file.filename, job_id, page_list)
         
         logger.info(f"Extraction complete: {file.filename}")
         logger.info(f"Accuracy: {result.get('accuracy_metrics', {}).get('overall_accuracy', 0):.2%}")
         
         # Return complete extraction
-        return JSONResponse(content=result)
+        response = _json_response(result)
+        if result.get("extraction_status") == "failed":
+            await _publish_progress(job_id, "failed", error=result.get("error"))
+        else:
+            await _publish_progress(job_id, "serialized", bytes=len(response.body))
+        return response
         
+    except HTTPException as e:
+        await _publish_progress(job_id, "failed", error=e.detail)
+        raise
     except Exception as e:
         logger.error(f"Extraction error: {str(e)}")
+        await _publish_progress(job_id, "failed", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/extract/progress/{job_id}")
+async def extraction_progress(job_id: str):
+    """
+    Server-sent events with extraction stages for a job:
+    uploaded, text_layer_done (pages/scanned), form_parser_done, ocr_done,
+    pages_built (page/total), accuracy_done, serialized (or failed)
+    Subscribe before or after starting POST /extract?job_id=...
+    """
+    if not is_valid_job_id(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job_id")
+
+    async def events():
+        async for event in progress_broker.subscribe(job_id):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/extract/formatted")
-async def extract_document_formatted(file: UploadFile = File(...)):
+async def extract_document_formatted(
+    file: UploadFile = File(...),
+    pages: Optional[str] = PAGES_QUERY
+):
     """
     Extract and return formatted JSON string
     """
+    page_list = _parse_pages(pages)
     try:
         logger.info(f"Formatted extraction: {file.filename}")
         
@@ -69,16 +271,13 @@ async def extract_document_formatted(file: UploadFile = File(...)):
         
         # Determine MIME type
         mime_type = file.content_type or "application/pdf"
+        await _check_pages(file_content, mime_type, page_list)
         
         # Extract complete document
-        result = extractor.extract_complete_document(
-            file_content,
-            mime_type,
-            file.filename
-        )
+        result = await _extract(file_content, mime_type, file.filename, pages=page_list)
         
         # Format as JSON string
-        json_output = json.dumps(result, indent=2, ensure_ascii=False)
+        json_output = _encode_json(result, indent=2)
         
         # Return formatted JSON
         return JSONResponse(
@@ -86,16 +285,22 @@ async def extract_document_formatted(file: UploadFile = File(...)):
             media_type="application/json"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Formatted extraction error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/extract/save")
-async def extract_and_save(file: UploadFile = File(...)):
+async def extract_and_save(
+    file: UploadFile = File(...),
+    pages: Optional[str] = PAGES_QUERY
+):
     """
     Extract and save complete extraction as JSON file
     """
+    page_list = _parse_pages(pages)
     try:
         logger.info(f"Extract and save: {file.filename}")
         
@@ -104,13 +309,10 @@ async def extract_and_save(file: UploadFile = File(...)):
         
         # Determine MIME type
         mime_type = file.content_type or "application/pdf"
+        await _check_pages(file_content, mime_type, page_list)
         
         # Extract complete document
-        result = extractor.extract_complete_document(
-            file_content,
-            mime_type,
-            file.filename
-        )
+        result = await _extract(file_content, mime_type, file.filename, pages=page_list)
         
         # Create output path
         output_filename = f"{os.path.splitext(file.filename)[0]}_complete_extraction.json"
@@ -120,8 +322,9 @@ async def extract_and_save(file: UploadFile = File(...)):
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
         # Save to file
+        json_output = _encode_json(result, indent=2)
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+            f.write(json_output)
         
         logger.info(f"Saved to: {output_path}")
         
@@ -133,11 +336,235 @@ async def extract_and_save(file: UploadFile = File(...)):
             "processors_used": result.get("processors_used", [])
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Save error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# The batch body is parsed while it streams in, so describe the form for the docs
+BATCH_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                    }
+                }
+            }
+        }
+    }
+}
+
+
+@router.post("/extract/batch", openapi_extra=BATCH_REQUEST_BODY)
+async def extract_batch(
+    request: Request,
+    pages: Optional[str] = PAGES_QUERY
+):
+    """
+    Batch extraction of a ZIP archive and/or many uploaded files (form field "files")
+    Documents are extracted concurrently (up to BATCH_CONCURRENCY) as soon as
+    their part has been received, and streamed back as NDJSON in completion
+    order, followed by a summary line. The response starts once the whole
+    request body has been read
+    The pages selection applies to every document
+    """
+    page_list = _parse_pages(pages)
+    client = request.client.host if request.client else "unknown"
+    client_id = client_id_from_headers(request.headers, client)
+
+    uploads = BatchUploads()
+    batch = _BatchRun(uploads, client_id, page_list)
+    try:
+        await receive_uploads(request.headers.get("content-type"), request.stream(), uploads)
+        if not uploads.received:
+            raise HTTPException(status_code=400, detail="No files uploaded")
+    except BaseException as e:
+        batch.close()
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=f"Invalid batch upload: {str(e)}")
+        raise
+    finally:
+        uploads.finish()
+
+    logger.info(f"Received batch: {len(uploads.received)} upload(s) from {client_id}")
+
+    return StreamingResponse(batch.lines(), media_type="application/x-ndjson")
+
+
+class _BatchRun:
+    """
+    Fan documents out to the extractor as their uploads arrive
+
+    A document slot is held until its result line has been sent, so at most
+    BATCH_CONCURRENCY documents (content plus result) are in memory at once.
+    """
+
+    def __init__(self, uploads: BatchUploads, client_id: str, pages: Optional[List[int]] = None):
+        """
+        Start feeding documents to the extractor
+
+        Args:
+            uploads: Uploads of the batch, possibly still being received
+            client_id: Client the documents are admitted for
+            pages: Optional page selection applied to every document
+        """
+        self.uploads = uploads
+        self.client_id = client_id
+        self.pages = pages
+        self._slots = asyncio.Semaphore(Config.BATCH_CONCURRENCY)
+        self._results: asyncio.Queue = asyncio.Queue()
+        self._pending = set()
+        # Documents scheduled but whose result line has not been sent yet
+        self._outstanding = 0
+        self._feed_done = object()
+        self._started = time.perf_counter()
+        self._feeder = asyncio.ensure_future(self._feed())
+
+    async def _run_one(self, document: IngestedDocument):
+        try:
+            line = await _extract_batch_document(document, self.client_id, self.pages)
+        except Exception as e:
+            line = _batch_line(document, "failed", error=str(e))
+        await self._results.put(line)
+
+    async def _feed(self):
+        documents = iter_documents(self.uploads)
+        try:
+            while True:
+                await self._slots.acquire()
+                # Blocks until the next part has been received
+                document = await run_in_threadpool(next, documents, None)
+                if document is None:
+                    self._slots.release()
+                    break
+                self._outstanding += 1
+                task = asyncio.ensure_future(self._run_one(document))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+        except Exception as e:
+            logger.error(f"Batch ingestion error: {str(e)}")
+            await self._results.put({"type": "error", "error": f"batch ingestion failed: {str(e)}"})
+            self._slots.release()
+        finally:
+            await self._results.put(self._feed_done)
+
+    async def lines(self):
+        """Yield NDJSON lines as documents finish, then the summary line"""
+        summary = {"type": "summary", "total": 0, "succeeded": 0, "failed": 0}
+        feeding = True
+        try:
+            while feeding or self._outstanding:
+                line = await self._results.get()
+                if line is self._feed_done:
+                    feeding = False
+                    continue
+
+                if line.get("type") == "document":
+                    summary["total"] += 1
+                    summary["succeeded" if line["status"] == "success" else "failed"] += 1
+
+                yield (_encode_json(line) + "\n").encode("utf-8")
+                if line.get("type") == "document":
+                    self._outstanding -= 1
+                    self._slots.release()
+
+            summary["elapsed_seconds"] = round(time.perf_counter() - self._started, 3)
+            logger.info(f"Batch extraction complete: {summary}")
+            yield (_encode_json(summary) + "\n").encode("utf-8")
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop feeding, cancel running documents and delete the spooled uploads"""
+        self._feeder.cancel()
+        for task in list(self._pending):
+            task.cancel()
+        self.uploads.close()
+
+
+async def _extract_batch_document(
+    document: IngestedDocument,
+    client_id: str,
+    pages: Optional[List[int]] = None
+) -> dict:
+    """Extract one batch document under admission control and a per-document timeout"""
+    if document.error:
+        return _batch_line(document, "failed", error=document.error)
+    page_error = await run_in_threadpool(_page_selection_error, document.content, document.mime_type, pages)
+    if page_error:
+        return _batch_line(document, "failed", error=f"Invalid pages: {page_error}")
+
+    # Batch documents share the per-client fair share with single uploads;
+    # instead of failing the document, wait out the suggested Retry-After
+    while True:
+        try:
+            await admission_controller.acquire(client_id)
+            break
+        except AdmissionRejected as e:
+            await asyncio.sleep(e.retry_after)
+
+    started = time.perf_counter()
+    extraction = asyncio.ensure_future(
+        _extract(document.content, document.mime_type, os.path.basename(document.filename), pages=pages)
+    )
+    # The extraction thread can't be interrupted, so the slot stays taken
+    # until it finishes even when we stop waiting for it
+    extraction.add_done_callback(lambda task: _release_batch_slot(task, client_id, started))
+    try:
+        result = await asyncio.wait_for(
+            asyncio.shield(extraction),
+            timeout=Config.BATCH_DOCUMENT_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        return _batch_line(
+            document, "failed",
+            error=f"extraction timed out after {Config.BATCH_DOCUMENT_TIMEOUT_SECONDS}s",
+            elapsed=time.perf_counter() - started
+        )
+
+    elapsed = time.perf_counter() - started
+    if result.get("extraction_status") == "failed":
+        return _batch_line(document, "failed", error=result.get("error"), elapsed=elapsed)
+    return _batch_line(document, "success", result=result, elapsed=elapsed)
+
+
+def _release_batch_slot(task: asyncio.Task, client_id: str, started: float):
+    """Give back a batch document's admission slot once its extraction is done"""
+    admission_controller.release(client_id, time.perf_counter() - started)
+    if not task.cancelled() and task.exception() is not None:
+        logger.debug(f"Batch extraction finished with error: {str(task.exception())}")
+
+
+def _batch_line(
+    document: IngestedDocument,
+    status: str,
+    result: dict = None,
+    error: str = None,
+    elapsed: float = None
+) -> dict:
+    """Build one NDJSON result line"""
+    line = {
+        "type": "document",
+        "index": document.index,
+        "filename": document.filename,
+        "status": status
+    }
+    if elapsed is not None:
+        line["elapsed_seconds"] = round(elapsed, 3)
+    if error is not None:
+        line["error"] = error
+    if result is not None:
+        line["result"] = result
+    return line
+
+
 @router.get("/health")
 async def health_check():
     """Health check for complete extraction service"""
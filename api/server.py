@@ -0,0 +1,196 @@
+"""
+Multi-process API server launcher
+
+Runs Config.API_WORKERS uvicorn worker processes under gunicorn. The app and
+its read-only state (config, compiled pattern tables) are imported once in
+the master before forking so workers share those pages copy-on-write. Each
+worker is gracefully recycled after a bounded number of requests.
+
+Workers share nothing at runtime, so the master prepares the per-worker view
+before forking: Config.API_WORKERS is set to the actual worker count (admission
+limits are split by it) and a metrics directory is set up so /metrics merges
+every worker's values.
+
+Usage:
+    python -m api.server [--workers N] [--host HOST] [--port PORT] [--app MODULE:ATTR]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_APP = "api.main:app"
+
+
+def preload_shared_state():
+    """
+    Import read-only state before forking
+
+    Network clients (Document AI, Redis, SQLAlchemy, boto3) are deliberately
+    not created here; they are created lazily inside each worker.
+    """
+    import processing.complete_document_extractor  # noqa: F401 - number patterns
+    import security.data_masking  # noqa: F401 - masking patterns
+
+
+def gunicorn_options(workers: int, host: str, port: int) -> dict:
+    """
+    Build gunicorn settings
+
+    Args:
+        workers: Number of worker processes
+        host: Bind host
+        port: Bind port
+
+    Returns:
+        gunicorn configuration dict
+    """
+    return {
+        "bind": f"{host}:{port}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "max_requests": Config.API_MAX_REQUESTS,
+        "max_requests_jitter": Config.API_MAX_REQUESTS_JITTER,
+        "graceful_timeout": Config.API_GRACEFUL_TIMEOUT_SECONDS,
+        "timeout": Config.API_WORKER_TIMEOUT_SECONDS,
+        "keepalive": 5,
+        "child_exit": _child_exit,
+        "loglevel": Config.LOG_LEVEL.lower(),
+        "accesslog": "-" if Config.DEBUG else None,
+    }
+
+
+def _configure_workers(workers: int):
+    """
+    Apply the worker count and shared metrics directory before the app is imported
+
+    Settings go into the environment too, for uvicorn workers that re-import config.
+    prometheus_client picks its multiprocess mode when it is first imported, so
+    this must run before anything imports metrics.
+    """
+    Config.API_WORKERS = workers
+    os.environ["API_WORKERS"] = str(workers)
+    if workers > 1 and not Config.PROMETHEUS_MULTIPROC_DIR:
+        Config.PROMETHEUS_MULTIPROC_DIR = tempfile.mkdtemp(prefix="api-metrics-")
+    if Config.PROMETHEUS_MULTIPROC_DIR:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = Config.PROMETHEUS_MULTIPROC_DIR
+        if "prometheus_client" in sys.modules:
+            logger.warning(
+                "prometheus_client was imported before the metrics directory was set; "
+                "/metrics will not merge workers"
+            )
+        from metrics import clear_multiprocess_dir
+        clear_multiprocess_dir(Config.PROMETHEUS_MULTIPROC_DIR)
+        logger.info(f"Merging worker metrics through {Config.PROMETHEUS_MULTIPROC_DIR}")
+
+
+def _child_exit(server, worker):
+    """gunicorn hook: stop reporting an exited worker's gauges"""
+    from metrics import mark_process_dead
+    mark_process_dead(worker.pid)
+
+
+def _load_app(app_path: str):
+    """Import 'module:attribute'"""
+    import importlib
+    module_name, _, attribute = app_path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "app")
+
+
+def _run_gunicorn(app_path: str, options: dict):
+    """Run under gunicorn with the app preloaded in the master"""
+    from gunicorn.app.base import BaseApplication
+
+    class APIServer(BaseApplication):
+        """gunicorn application wrapping the ASGI app"""
+
+        def __init__(self, application, settings):
+            self.application = application
+            self.settings = settings
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.settings.items():
+                if value is not None and key in self.cfg.settings:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    preload_shared_state()
+    application = _load_app(app_path)
+    logger.info(
+        f"Starting {options['workers']} API workers on {options['bind']} "
+        f"(max_requests={options['max_requests']})"
+    )
+    APIServer(application, options).run()
+
+
+def _run_uvicorn(app_path: str, workers: int, host: str, port: int):
+    """Fallback when gunicorn is unavailable (e.g. Windows): no preload or recycling"""
+    import uvicorn
+
+    logger.warning("gunicorn not installed, falling back to uvicorn multi-process mode")
+    uvicorn.run(
+        app_path,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=Config.API_GRACEFUL_TIMEOUT_SECONDS
+    )
+
+
+def run(
+    app_path: str = DEFAULT_APP,
+    workers: int = Config.API_WORKERS,
+    host: str = Config.API_HOST,
+    port: int = Config.API_PORT
+):
+    """
+    Start the API server
+
+    Args:
+        app_path: ASGI app as 'module:attribute'
+        workers: Number of worker processes
+        host: Bind host
+        port: Bind port
+    """
+    workers = max(1, workers)
+    _configure_workers(workers)
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        _run_uvicorn(app_path, workers, host, port)
+        return
+
+    _run_gunicorn(app_path, gunicorn_options(workers, host, port))
+
+
+def main():
+    """Command line entry point"""
+    logging.basicConfig(
+        level=Config.LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(description="Run the extraction API server")
+    parser.add_argument("--app", default=DEFAULT_APP, help="ASGI app as module:attribute")
+    parser.add_argument("--workers", type=int, default=Config.API_WORKERS)
+    parser.add_argument("--host", default=Config.API_HOST)
+    parser.add_argument("--port", type=int, default=Config.API_PORT)
+    args = parser.parse_args()
+
+    run(args.app, args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Python client for the Student Loan Document Extractor API
+"""
+import json
+import mimetypes
+import os
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import requests
+
+
+class DocumentExtractorError(Exception):
+    """Raised when the API returns an error"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class DocumentExtractorClient:
+    """
+    Client for document extraction, batch extraction and progress events
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        timeout: float = 600,
+        client_id: Optional[str] = None
+    ):
+        """
+        Initialize client
+
+        Args:
+            base_url: API base URL
+            timeout: Request timeout in seconds
+            client_id: Sent as X-Client-Id for fair-share admission
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        if client_id:
+            self.session.headers["X-Client-Id"] = client_id
+
+    def extract(
+        self,
+        path: str,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        job_id: Optional[str] = None,
+        pages: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract a document from disk
+
+        Args:
+            path: File path
+            on_progress: Called with each progress event while extracting
+            job_id: Job id for progress events (generated if omitted)
+            pages: Pages to extract, e.g. "1-3,7" (default: all)
+
+        Returns:
+            Complete extraction result
+        """
+        with open(path, "rb") as f:
+            content = f.read()
+        return self.extract_bytes(content, os.path.basename(path), on_progress=on_progress, job_id=job_id, pages=pages)
+
+    def extract_bytes(
+        self,
+        content: bytes,
+        filename: str,
+        mime_type: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        job_id: Optional[str] = None,
+        pages: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract a document from memory
+
+        Args:
+            content: File content
+            filename: File name
+            mime_type: MIME type (guessed from filename if omitted)
+            on_progress: Called with each progress event while extracting
+            job_id: Job id for progress events (generated if omitted)
+            pages: Pages to extract, e.g. "1-3,7" (default: all)
+
+        Returns:
+            Complete extraction result
+        """
+        mime_type = mime_type or mimetypes.guess_type(filename)[0] or "application/pdf"
+        params = {}
+        listener = None
+
+        if on_progress is not None:
+            job_id = job_id or uuid.uuid4().hex
+            listener = threading.Thread(
+                target=self._forward_progress,
+                args=(job_id, on_progress),
+                daemon=True
+            )
+            listener.start()
+        if job_id:
+            params["job_id"] = job_id
+        if pages:
+            params["pages"] = pages
+
+        response = self.session.post(
+            f"{self.base_url}/api/v1/extract",
+            params=params,
+            files={"file": (filename, content, mime_type)},
+            timeout=self.timeout
+        )
+        if listener is not None:
+            # The stream ends on the terminal event right after the response
+            listener.join(timeout=5)
+        return self._json(response)
+
+    def stream_progress(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Follow progress events of a job until it finishes
+
+        Args:
+            job_id: Job id passed to extract
+
+        Yields:
+            Events with "stage" and stage-specific fields (e.g. page/total)
+        """
+        with self.session.get(
+            f"{self.base_url}/api/v1/extract/progress/{job_id}",
+            stream=True,
+            timeout=(10, self.timeout)
+        ) as response:
+            if response.status_code != 200:
+                self._json(response)
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data:"):
+                    event = json.loads(line[5:].strip())
+                    yield event
+                    if event.get("stage") in ("serialized", "failed"):
+                        return
+
+    def extract_batch(self, paths: List[str], pages: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Extract many documents (files and/or ZIP archives) in one request
+
+        Args:
+            paths: File or ZIP paths
+            pages: Pages to extract from every document (default: all)
+
+        Yields:
+            One result line per document in completion order, then a summary line
+        """
+        handles = [open(path, "rb") for path in paths]
+        try:
+            files = [
+                ("files", (os.path.basename(path), handle, mimetypes.guess_type(path)[0] or "application/octet-stream"))
+                for path, handle in zip(paths, handles)
+            ]
+            with self.session.post(
+                f"{self.base_url}/api/v1/extract/batch",
+                files=files,
+                params={"pages": pages} if pages else None,
+                stream=True,
+                timeout=(30, self.timeout)
+            ) as response:
+                if response.status_code != 200:
+                    self._json(response)
+                for line in response.iter_lines(decode_unicode=True):
+                    if line:
+                        yield json.loads(line)
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def _forward_progress(self, job_id: str, on_progress: Callable[[Dict[str, Any]], None]):
+        try:
+            for event in self.stream_progress(job_id):
+                on_progress(event)
+        except Exception:
+            # Progress is best effort; the extraction result is authoritative
+            pass
+
+    def _json(self, response: requests.Response) -> Dict[str, Any]:
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            retry_after = response.headers.get("Retry-After")
+            raise DocumentExtractorError(
+                response.status_code,
+                str(detail),
+                int(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+        return response.json()
@@ -13,6 +13,9 @@ class Config:
         "DATABASE_URL",
         "postgresql://loanuser:loanpass123@db:5432/loanextractor"
     )
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_CONNECT_TIMEOUT_SECONDS: int = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "3"))
     
     # Object Storage (S3/MinIO)
     S3_ENDPOINT: str = os.getenv("S3_ENDPOINT", "http://minio:9000")
@@ -20,29 +23,131 @@ class Config:
     S3_SECRET_KEY: str = os.getenv("S3_SECRET_KEY", "minioadmin123")
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "loan-documents")
     S3_REGION: str = os.getenv("S3_REGION", "us-east-1")
+    S3_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", "3"))
+    S3_READ_TIMEOUT_SECONDS: float = float(os.getenv("S3_READ_TIMEOUT_SECONDS", "30"))
+    S3_MAX_POOL_CONNECTIONS: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "10"))
     
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379/0")
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "2"))
+    
+    # Request Coalescing (duplicate concurrent extractions)
+    COALESCE_ENABLED: bool = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+    COALESCE_LOCK_TTL_SECONDS: int = int(os.getenv("COALESCE_LOCK_TTL_SECONDS", "30"))
+    COALESCE_RESULT_TTL_SECONDS: int = int(os.getenv("COALESCE_RESULT_TTL_SECONDS", "15"))
+    # Failed extractions are shared with waiting replicas for a shorter time
+    COALESCE_ERROR_TTL_SECONDS: int = int(os.getenv("COALESCE_ERROR_TTL_SECONDS", "5"))
+    COALESCE_WAIT_TIMEOUT_SECONDS: int = int(os.getenv("COALESCE_WAIT_TIMEOUT_SECONDS", "300"))
     
     # API Configuration
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     API_WORKERS: int = int(os.getenv("API_WORKERS", "4"))
+    API_MAX_REQUESTS: int = int(os.getenv("API_MAX_REQUESTS", "1000"))
+    API_MAX_REQUESTS_JITTER: int = int(os.getenv("API_MAX_REQUESTS_JITTER", "100"))
+    API_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("API_GRACEFUL_TIMEOUT_SECONDS", "60"))
+    API_WORKER_TIMEOUT_SECONDS: int = int(os.getenv("API_WORKER_TIMEOUT_SECONDS", "180"))
+    # Shared prometheus_client multiprocess directory for merging /metrics across
+    # worker processes (default: temp dir when API_WORKERS > 1)
+    PROMETHEUS_MULTIPROC_DIR: str = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+    
+    # Dependency Health Checks
+    HEALTH_CHECK_INTERVAL_SECONDS: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "5"))
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+    HEALTH_REQUIRED_DEPENDENCIES: str = os.getenv("HEALTH_REQUIRED_DEPENDENCIES", "database,redis,storage")
+    
+    # Admission Control (per API replica, split evenly across API_WORKERS)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "128"))
+    ADMISSION_MAX_PER_CLIENT: int = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "32"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "60"))
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ENCRYPTION_KEY: str = os.getenv("ENCRYPTION_KEY", "your-encryption-key-change-in-production")
     
     # OCR Configuration
+    # Engine: documentai (remote processors) or tesseract (local)
+    OCR_BACKEND: str = os.getenv("OCR_BACKEND", "documentai")
     TESSERACT_CMD: str = os.getenv("TESSERACT_CMD", "/usr/bin/tesseract")
+    OCR_LANGUAGES: str = os.getenv("OCR_LANGUAGES", "eng")
+    OCR_DPI: int = int(os.getenv("OCR_DPI", "300"))
+    OCR_PROCESSES: int = int(os.getenv("OCR_PROCESSES", "0"))
+    OCR_MAX_IN_FLIGHT_PAGES: int = int(os.getenv("OCR_MAX_IN_FLIGHT_PAGES", "0"))
+    OCR_CACHE_PAGES: int = int(os.getenv("OCR_CACHE_PAGES", "256"))
+    # Detect ruled tables locally on OCR'd and text-layer pages
+    OCR_DETECT_TABLES: bool = os.getenv("OCR_DETECT_TABLES", "true").lower() == "true"
+    # Rendered page images: per-process memory tier and shared disk tier
+    PAGE_CACHE_ENABLED: bool = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+    PAGE_CACHE_MEMORY_MB: int = int(os.getenv("PAGE_CACHE_MEMORY_MB", "256"))
+    PAGE_CACHE_DIR: str = os.getenv("PAGE_CACHE_DIR", "/tmp/page-image-cache")
+    PAGE_CACHE_DISK_MB: int = int(os.getenv("PAGE_CACHE_DISK_MB", "2048"))
+    # Image preprocessing before OCR: downsample, deskew, crop, re-encode
+    OCR_PREPROCESS: bool = os.getenv("OCR_PREPROCESS", "true").lower() == "true"
+    OCR_TARGET_DPI: int = int(os.getenv("OCR_TARGET_DPI", "300"))
+    OCR_PREPROCESS_MODE: str = os.getenv("OCR_PREPROCESS_MODE", "gray")
+    OCR_JPEG_QUALITY: int = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+    OCR_PREPROCESS_MIN_CONFIDENCE: float = float(os.getenv("OCR_PREPROCESS_MIN_CONFIDENCE", "0.85"))
+    # Re-OCR low-confidence blocks from high-DPI crops (opt-in: renders pages
+    # at OCR_REFINE_DPI and runs the refine backend within the request)
+    OCR_REFINE_ENABLED: bool = os.getenv("OCR_REFINE_ENABLED", "false").lower() == "true"
+    OCR_REFINE_BACKEND: str = os.getenv("OCR_REFINE_BACKEND", "tesseract")
+    OCR_REFINE_THRESHOLD: float = float(os.getenv("OCR_REFINE_THRESHOLD", "0.85"))
+    OCR_REFINE_MIN_GAIN: float = float(os.getenv("OCR_REFINE_MIN_GAIN", "0.05"))
+    OCR_REFINE_DPI: int = int(os.getenv("OCR_REFINE_DPI", "450"))
+    OCR_REFINE_CONCURRENCY: int = int(os.getenv("OCR_REFINE_CONCURRENCY", "4"))
+    # Read PDF pages with a usable text layer directly instead of OCR (opt-in:
+    # every PDF is parsed and its text pages rendered for table detection first)
+    TEXT_LAYER_ENABLED: bool = os.getenv("TEXT_LAYER_ENABLED", "false").lower() == "true"
+    TEXT_LAYER_MIN_CHARS: int = int(os.getenv("TEXT_LAYER_MIN_CHARS", "100"))
+    # Route scanned PDF pages: blank pages skip OCR, clean prints go to the local
+    # engine (escalated when they read below the confidence), the rest remote.
+    # Off by default: it moves scans from Document AI to the local engine
+    OCR_ROUTING_ENABLED: bool = os.getenv("OCR_ROUTING_ENABLED", "false").lower() == "true"
+    OCR_ROUTE_LOCAL_BACKEND: str = os.getenv("OCR_ROUTE_LOCAL_BACKEND", "tesseract")
+    OCR_ROUTE_MAX_LOCAL_ENTROPY: float = float(os.getenv("OCR_ROUTE_MAX_LOCAL_ENTROPY", "5.0"))
+    OCR_ROUTE_MIN_LOCAL_CONFIDENCE: float = float(os.getenv("OCR_ROUTE_MIN_LOCAL_CONFIDENCE", "0.8"))
     
     # Processing Configuration
     MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB", "50"))
     MAX_PAGES: int = int(os.getenv("MAX_PAGES", "50"))
     
+    # Batch Extraction
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    BATCH_DOCUMENT_TIMEOUT_SECONDS: int = int(os.getenv("BATCH_DOCUMENT_TIMEOUT_SECONDS", "300"))
+    BATCH_MAX_DOCUMENTS: int = int(os.getenv("BATCH_MAX_DOCUMENTS", "10000"))
+    
+    # Extraction Progress Events
+    PROGRESS_TTL_SECONDS: int = int(os.getenv("PROGRESS_TTL_SECONDS", "900"))
+    PROGRESS_KEEPALIVE_SECONDS: int = int(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+    
     # Worker Configuration
     WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "2"))
+    WORKER_FETCH_THREADS: int = int(os.getenv("WORKER_FETCH_THREADS", "2"))
+    WORKER_PREFETCH: int = int(os.getenv("WORKER_PREFETCH", "4"))
+    WORKER_BUILD_PROCESSES: int = int(os.getenv("WORKER_BUILD_PROCESSES", "0"))
+    WORKER_UPLOAD_THREADS: int = int(os.getenv("WORKER_UPLOAD_THREADS", "2"))
+    WORKER_METRICS_PORT: int = int(os.getenv("WORKER_METRICS_PORT", "9100"))
     WORKER_QUEUE: str = os.getenv("WORKER_QUEUE", "document-processing")
+    # "redis", or "memory" for a process-local queue (development and tests only)
+    WORKER_QUEUE_BACKEND: str = os.getenv("WORKER_QUEUE_BACKEND", "redis")
+    # Startup pings before the worker gives up on Redis (backoff doubles up to 30s)
+    WORKER_REDIS_CONNECT_ATTEMPTS: int = int(os.getenv("WORKER_REDIS_CONNECT_ATTEMPTS", "10"))
+    WORKER_REDIS_CONNECT_BACKOFF_SECONDS: float = float(os.getenv("WORKER_REDIS_CONNECT_BACKOFF_SECONDS", "1"))
+    WORKER_POLL_TIMEOUT_SECONDS: float = float(os.getenv("WORKER_POLL_TIMEOUT_SECONDS", "1"))
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS: float = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT_SECONDS", "300"))
+    WORKER_VISIBILITY_TIMEOUT_SECONDS: float = float(os.getenv("WORKER_VISIBILITY_TIMEOUT_SECONDS", "30"))
+    WORKER_HEARTBEAT_SECONDS: float = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "10"))
+    WORKER_REAP_INTERVAL_SECONDS: float = float(os.getenv("WORKER_REAP_INTERVAL_SECONDS", "5"))
+    WORKER_MAX_ATTEMPTS: int = int(os.getenv("WORKER_MAX_ATTEMPTS", "3"))
+    WORKER_RETRY_BACKOFF_SECONDS: float = float(os.getenv("WORKER_RETRY_BACKOFF_SECONDS", "5"))
+    # Priority lanes: "lane:value" lists for interactive, standard and bulk
+    WORKER_LANE_WEIGHTS: str = os.getenv("WORKER_LANE_WEIGHTS", "interactive:8,standard:3,bulk:1")
+    WORKER_LANE_MAX_WAIT_SECONDS: str = os.getenv("WORKER_LANE_MAX_WAIT_SECONDS", "interactive:10,standard:120,bulk:1800")
+    WORKER_TENANT_WEIGHTS: str = os.getenv("WORKER_TENANT_WEIGHTS", "")
+    WORKER_INPUT_PREFIX: str = os.getenv("WORKER_INPUT_PREFIX", "documents/")
+    WORKER_OUTPUT_PREFIX: str = os.getenv("WORKER_OUTPUT_PREFIX", "extractions/")
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -9,6 +9,8 @@ from typing import Optional, Dict, Any
 import json
 from datetime import datetime
 import pandas as pd
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure page
 st.set_page_config(
@@ -21,6 +23,15 @@ st.set_page_config(
 # API Configuration
 API_BASE_URL = "http://api:8000"
 
+# Progress bar position and label per extraction stage
+PROGRESS_STAGES = {
+    "uploaded": (0.05, "🔄 Running Form Parser..."),
+    "text_layer_done": (0.15, "🔄 Running OCR on scanned pages..."),
+    "form_parser_done": (0.45, "🔄 Running OCR..."),
+    "ocr_done": (0.8, "📄 Building pages..."),
+    "accuracy_done": (0.97, "📊 Serializing results...")
+}
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -146,32 +157,75 @@ def show_upload_tab():
 def extract_document(uploaded_file):
     """Extract document and display results"""
     
-    with st.spinner("🔄 Extracting document with both processors..."):
-        try:
-            # Upload to API
-            files = {"file": uploaded_file.getvalue()}
-            response = requests.post(
+    job_id = uuid.uuid4().hex
+    progress_bar = st.progress(0.0, text="🔄 Uploading document...")
+    
+    try:
+        # Upload in the background so stage progress can be followed here
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                requests.post,
                 f"{API_BASE_URL}/api/v1/extract",
+                params={"job_id": job_id},
                 files={"file": (uploaded_file.name, uploaded_file.getvalue(), uploaded_file.type)}
             )
+            follow_progress(job_id, future, progress_bar)
+            response = future.result()
+        
+        if response.status_code == 200:
+            result = response.json()
+            progress_bar.progress(1.0, text="✓ Done")
             
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Store in session state
-                st.session_state.extraction_result = result
-                st.session_state.extracted_filename = uploaded_file.name
-                
-                st.success("✓ Extraction complete!")
-                
-                # Display summary
-                display_extraction_summary(result)
+            # Store in session state
+            st.session_state.extraction_result = result
+            st.session_state.extracted_filename = uploaded_file.name
+            
+            st.success("✓ Extraction complete!")
+            
+            # Display summary
+            display_extraction_summary(result)
+            
+        else:
+            progress_bar.empty()
+            st.error(f"❌ Extraction failed: {response.text}")
+            
+    except Exception as e:
+        progress_bar.empty()
+        st.error(f"❌ Error: {str(e)}")
+
+def follow_progress(job_id: str, future, progress_bar):
+    """Update the progress bar from the job's server-sent events until it finishes"""
+    
+    try:
+        with requests.get(
+            f"{API_BASE_URL}/api/v1/extract/progress/{job_id}",
+            stream=True,
+            timeout=(5, 30)
+        ) as response:
+            if response.status_code != 200:
+                return
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if future.done():
+                    return
+                if not line or not line.startswith("data:"):
+                    continue  # keep-alive
                 
-            else:
-                st.error(f"❌ Extraction failed: {response.text}")
+                event = json.loads(line[5:].strip())
+                stage = event.get("stage")
+                if stage in ("serialized", "failed"):
+                    return
                 
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
+                if stage == "pages_built" and event.get("total"):
+                    fraction = 0.8 + 0.15 * event["page"] / event["total"]
+                    label = f"📄 Building page {event['page']} of {event['total']}..."
+                else:
+                    fraction, label = PROGRESS_STAGES.get(stage, (None, None))
+                if fraction is not None:
+                    progress_bar.progress(fraction, text=label)
+    except Exception:
+        # Progress is best effort; the extraction request still completes
+        pass
 
 def display_extraction_summary(result: Dict[str, Any]):
     """Display extraction summary"""
@@ -0,0 +1,316 @@
+"""
+Fee and charge extraction from tables and form fields
+
+Fees are mostly listed in "Schedule of charges" tables or as form fields.
+Every table row and form field is materialized into one tab/newline
+separated string, so a document costs a single scan of the precompiled fee
+vocabulary (a keyword automaton) and a single pass of one tokenizer, and the
+matches and tokens are mapped back to rows with searchsorted. Each labelled
+row's tokens are then parsed into a normalized value: amount, percentage,
+basis ("of loan amount", "per month"), minimum, maximum and tax.
+"""
+import logging
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from extraction.field_extractor import KeywordAutomaton
+
+logger = logging.getLogger(__name__)
+
+# Label synonyms per fee type, lowercase with single spaces
+FEE_LABELS: Dict[str, List[str]] = {
+    "processing_fee": [
+        "processing fee", "processing fees", "processing charge", "processing charges", "loan processing fee",
+        "loan processing charges", "upfront fee", "origination fee", "login fee", "administrative fee",
+        "administration fee"
+    ],
+    "late_payment_penalty": [
+        "late payment penalty", "late payment charges", "late payment charge", "late payment fee", "late fee",
+        "late charges", "penal interest", "penal charges", "penal charge", "overdue interest", "overdue charges",
+        "default interest", "delayed payment charges", "delayed payment interest"
+    ],
+    "prepayment_penalty": [
+        "prepayment penalty", "prepayment charges", "prepayment charge", "pre-payment charges",
+        "pre-payment penalty", "part prepayment charges", "part-prepayment charges", "foreclosure charges",
+        "foreclosure charge", "foreclosure penalty", "pre-closure charges", "preclosure charges",
+        "prepayment/foreclosure charges"
+    ],
+    "bounce_charges": [
+        "bounce charges", "cheque bounce charges", "emi bounce charges", "ecs bounce charges",
+        "nach bounce charges", "cheque return charges", "dishonour charges", "cheque dishonour charges"
+    ],
+    "documentation_charges": [
+        "documentation charges", "documentation fee", "documentation fees", "document charges"
+    ],
+    "stamp_duty": ["stamp duty", "stamp duty charges"],
+    "legal_charges": ["legal charges", "legal fee", "legal fees", "valuation charges", "valuation fee"],
+    "insurance_premium": ["insurance premium", "insurance charges", "life insurance premium"],
+}
+
+# Tokens of fee values; one alternation so a document is tokenized in one pass
+_TOKEN = re.compile(
+    r"(?P<period>\d+\s*(?:days?|months?|years?)\b)"
+    r"|(?P<currency>\brs\b\.?|\binr\b|\busd\b|\beur\b|\bgbp\b|\$|₹|€|£)"
+    r"|(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+    r"|(?P<percent>%|\bper\s?cent\b)"
+    r"|(?P<scale>(?<![a-z])(?:lakhs?|lacs?|crores?|million|k)\b)"
+    r"|(?P<minimum>\bmin(?:imum)?\b\.?)"
+    r"|(?P<maximum>\bmax(?:imum)?\b\.?|\bup\s?to\b|\bcapped\s+at\b)"
+    r"|(?P<tax>\bgst\b|\bservice\s+tax\b|\btax(?:es)?\b)"
+    r"|(?P<basis>\bper\s+(?:month|annum|instance|cheque|bounce|occurrence|presentation)\b"
+    r"|\bp\.\s?[ma]\.|\bpm\b|\bpa\b|\bmonthly\b|\bannually\b"
+    r"|\bof\s+(?:the\s+)?(?:loan\s+amount|sanctioned\s+amount|disbursed\s+amount|amount\s+financed"
+    r"|principal\s+outstanding|outstanding\s+principal|outstanding(?:\s+amount|\s+balance)?|principal"
+    r"|overdue(?:\s+amount|\s+emi)?|emi|prepaid\s+amount|amount\s+prepaid)\b)"
+    r"|(?P<nil>\bnil\b|\bnone\b|\bwaived\b|\bnot\s+applicable\b|\bfree\b|\bn\.?a\.?(?![a-z]))",
+    re.IGNORECASE
+)
+
+_SCALES = {"lakh": 1e5, "lac": 1e5, "crore": 1e7, "million": 1e6, "k": 1e3}
+_CURRENCIES = {"rs": "INR", "inr": "INR", "₹": "INR", "usd": "USD", "$": "USD", "eur": "EUR", "€": "EUR",
+               "gbp": "GBP", "£": "GBP"}
+_BASES = [
+    (re.compile(r"per\s+month|p\.\s?m\.|\bpm\b|monthly", re.IGNORECASE), "per_month"),
+    (re.compile(r"per\s+annum|p\.\s?a\.|\bpa\b|annually", re.IGNORECASE), "per_annum"),
+    (re.compile(r"per\s+", re.IGNORECASE), "per_instance"),
+    (re.compile(r"loan|sanctioned|disbursed|financed", re.IGNORECASE), "loan_amount"),
+    (re.compile(r"overdue", re.IGNORECASE), "overdue_amount"),
+    (re.compile(r"prepaid", re.IGNORECASE), "prepaid_amount"),
+    (re.compile(r"emi", re.IGNORECASE), "emi"),
+    (re.compile(r"outstanding|principal", re.IGNORECASE), "outstanding_principal"),
+]
+# Cell confidence assumed when a source reports none
+DEFAULT_CONFIDENCE = 0.9
+
+
+class FeeRow(NamedTuple):
+    """A materialized table row or form field"""
+    cells: List[str]
+    confidence: float
+    source: str
+    page: Optional[int]
+    table_id: Optional[int]
+
+
+def _cell_confidence(cells: List[Dict[str, Any]]) -> float:
+    values = [cell.get("confidence", 0.0) for cell in cells if cell.get("confidence", 0.0) > 0]
+    return sum(values) / len(values) if values else DEFAULT_CONFIDENCE
+
+
+def materialize_rows(
+    tables: Optional[List[Dict[str, Any]]] = None,
+    form_fields: Optional[List[Dict[str, Any]]] = None
+) -> List[FeeRow]:
+    """
+    Flatten extraction result tables and form fields into rows of cell texts
+
+    Args:
+        tables: Result "all_tables" entries (header_rows/body_rows of cells)
+        form_fields: Result "all_form_fields" entries (a two-cell row each)
+    """
+    rows = []
+    for table in tables or []:
+        for row in table.get("header_rows", []) + table.get("body_rows", []):
+            cells = [cell.get("text", "") if isinstance(cell, dict) else str(cell) for cell in row]
+            if any(cells):
+                rows.append(FeeRow(
+                    cells,
+                    _cell_confidence([cell for cell in row if isinstance(cell, dict)]),
+                    "table",
+                    table.get("page"),
+                    table.get("table_id")
+                ))
+    for field in form_fields or []:
+        rows.append(FeeRow(
+            [field.get("field_name", ""), field.get("field_value", "")],
+            field.get("value_confidence") or DEFAULT_CONFIDENCE,
+            "form_field",
+            field.get("page"),
+            None
+        ))
+    return rows
+
+
+def parse_fee_value(text: str, tokens: List[re.Match]) -> Dict[str, Any]:
+    """
+    Normalize a fee value from its tokens
+
+    Args:
+        text: String the tokens were found in
+        tokens: _TOKEN matches of the value, in order
+
+    Returns:
+        {"amount", "currency", "percent", "basis", "minimum", "maximum",
+        "plus_tax", "waived"}; unknown parts are None
+    """
+    value: Dict[str, Any] = {
+        "amount": None, "currency": None, "percent": None, "basis": None,
+        "minimum": None, "maximum": None, "plus_tax": False, "waived": False
+    }
+    qualifier = None
+    for index, token in enumerate(tokens):
+        kind = token.lastgroup
+        if kind == "currency":
+            value["currency"] = value["currency"] or _CURRENCIES.get(token.group(0).lower().rstrip("."))
+        elif kind == "minimum" or kind == "maximum":
+            qualifier = kind
+        elif kind == "tax":
+            value["plus_tax"] = True
+        elif kind == "nil":
+            value["waived"] = True
+        elif kind == "basis" and value["basis"] is None:
+            phrase = token.group(0)
+            value["basis"] = next(basis for pattern, basis in _BASES if pattern.search(phrase))
+        elif kind == "number":
+            number = float(token.group(0).replace(",", ""))
+            following = tokens[index + 1] if index + 1 < len(tokens) else None
+            # Only whitespace between a number and its unit
+            adjacent = following is not None and not text[token.end():following.start()].strip()
+            if adjacent and following.lastgroup == "percent":
+                if qualifier is None and value["percent"] is None:
+                    value["percent"] = number
+                    continue
+            elif adjacent and following.lastgroup == "scale":
+                number *= _SCALES.get(following.group(0).lower().rstrip("s"), 1)
+            if qualifier is not None:
+                value[qualifier] = number
+                qualifier = None
+            elif value["amount"] is None and not (adjacent and following.lastgroup == "percent"):
+                value["amount"] = number
+
+    if value["waived"] and value["amount"] is None and value["percent"] is None:
+        value["amount"] = 0.0
+    return value
+
+
+class FeeExtractor:
+    """
+    Classify table rows and form fields by fee type and parse their values
+    """
+
+    def __init__(self, labels: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize extractor
+
+        Args:
+            labels: fee type -> label synonyms (default: FEE_LABELS)
+        """
+        self.labels = labels or FEE_LABELS
+        self.automaton = KeywordAutomaton([
+            (synonym, fee_type)
+            for fee_type, synonyms in self.labels.items()
+            for synonym in synonyms
+        ])
+
+    def extract(self, rows: List[FeeRow]) -> Dict[str, Any]:
+        """
+        Extract fees from materialized rows
+
+        Args:
+            rows: Rows from materialize_rows
+
+        Returns:
+            {"fees": fee type -> best entry, "all_fees": every labelled row};
+            an entry holds the parse_fee_value fields plus "fee_type",
+            "label", "text", "source", "page", "table_id" and "confidence"
+        """
+        if not rows:
+            return {"fees": {}, "all_fees": []}
+
+        # One string for the whole document: cells by tabs, rows by newlines
+        lines = ["\t".join(cell.replace("\t", " ").replace("\n", " ") for cell in row.cells) for row in rows]
+        text = "\n".join(lines)
+        row_starts = np.cumsum([0] + [len(line) + 1 for line in lines[:-1]])
+        row_ends = row_starts + np.array([len(line) for line in lines])
+
+        matches = self.automaton.find(text)
+        tokens = list(_TOKEN.finditer(text))
+        if not matches:
+            return {"fees": {}, "all_fees": []}
+        match_rows = np.searchsorted(row_starts, [match.start for match in matches], side="right") - 1
+        token_starts = np.array([token.start() for token in tokens], dtype=np.int64)
+
+        entries = []
+        for index, match in enumerate(matches):
+            row_index = int(match_rows[index])
+            # A value runs to the next label in the row, or the row's end
+            end = int(row_ends[row_index])
+            if index + 1 < len(matches) and match_rows[index + 1] == row_index:
+                end = matches[index + 1].start
+            first, last = np.searchsorted(token_starts, [match.end, end])
+            value_tokens = [token for token in tokens[first:last] if token.end() <= end]
+            value = parse_fee_value(text, value_tokens)
+            value_text = " ".join(text[match.end:end].replace("\t", " ").split()).strip(" :-–")
+
+            row = rows[row_index]
+            parsed = value["amount"] is not None or value["percent"] is not None
+            if not parsed and not value_text:
+                continue
+            entry = {
+                "fee_type": match.payload,
+                "label": match.label,
+                "text": value_text,
+                **value,
+                "source": row.source,
+                "page": row.page,
+                "table_id": row.table_id,
+                "confidence": round(row.confidence if parsed else row.confidence * 0.5, 4)
+            }
+            entries.append(entry)
+
+        fees: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            best = fees.get(entry["fee_type"])
+            if best is None or entry["confidence"] > best["confidence"]:
+                fees[entry["fee_type"]] = entry
+        return {"fees": fees, "all_fees": entries}
+
+
+def _describe(entry: Dict[str, Any]) -> str:
+    """Display form of a fee ("2% per month", "Rs. 500", ...)"""
+    return entry["text"] or (
+        f"{entry['percent']}%" if entry["percent"] is not None else f"{entry['amount']:,.2f}"
+    )
+
+
+def fee_summary(extracted: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flat fee keys read by the dashboard
+
+    Args:
+        extracted: Result of FeeExtractor.extract
+
+    Returns:
+        "processing_fee" (amount, when one is stated), "late_payment_penalty"
+        and "prepayment_penalty" (display text) for the fees found
+    """
+    fees = extracted["fees"]
+    summary: Dict[str, Any] = {}
+    # The best processing fee row may be a percentage; any stated amount will do
+    amounts = [
+        entry["amount"] for entry in [fees.get("processing_fee")] + extracted["all_fees"]
+        if entry is not None and entry["fee_type"] == "processing_fee" and entry["amount"] is not None
+    ]
+    if amounts:
+        summary["processing_fee"] = amounts[0]
+    for fee_type in ("late_payment_penalty", "prepayment_penalty"):
+        if fee_type in fees:
+            summary[fee_type] = _describe(fees[fee_type])
+    return summary
+
+
+# Compiled once at import (shared by forked workers)
+_extractor = FeeExtractor()
+
+
+def extract_fees(complete_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract fees from a complete extraction result's tables and form fields
+
+    Returns:
+        See FeeExtractor.extract
+    """
+    rows = materialize_rows(complete_data.get("all_tables"), complete_data.get("all_form_fields"))
+    return _extractor.extract(rows)
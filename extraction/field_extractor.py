@@ -0,0 +1,455 @@
+"""
+Rule-based loan field extraction
+
+Structured loan fields (principal, interest rate, tenure, EMI, ...) are
+found without a model call: every label synonym is compiled once into a
+single Aho-Corasick automaton, which scans the merged text and the form
+field names in one pass each. Each label is then paired with the nearest
+value of its field's kind (amount, percentage, duration, date, identifier
+or text) that follows it before the next label. The result is
+deterministic and costs milliseconds per document.
+"""
+import logging
+import re
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Label synonyms per field, lowercase with single spaces
+FIELD_LABELS: Dict[str, Tuple[str, List[str]]] = {
+    "principal_amount": ("amount", [
+        "loan amount", "principal", "principal amount", "sanctioned amount", "sanction amount",
+        "amount sanctioned", "amount financed", "amount of loan", "disbursed amount",
+        "disbursement amount", "finance amount", "loan amount sanctioned"
+    ]),
+    "interest_rate": ("percent", [
+        "interest rate", "rate of interest", "roi", "annual interest rate", "apr",
+        "annual percentage rate", "interest rate p.a.", "rate of interest p.a."
+    ]),
+    "tenure_months": ("duration", [
+        "tenure", "loan tenure", "loan term", "term of loan", "term of the loan", "repayment period",
+        "repayment tenure", "loan period", "tenor", "loan tenor"
+    ]),
+    "emi_amount": ("amount", [
+        "emi", "emi amount", "equated monthly instalment", "equated monthly installment",
+        "monthly instalment", "monthly installment", "monthly payment", "instalment amount",
+        "installment amount"
+    ]),
+    "moratorium_months": ("duration", [
+        "moratorium", "moratorium period", "grace period", "holiday period"
+    ]),
+    "loan_account_number": ("identifier", [
+        "loan account number", "loan account no", "loan a/c no", "loan a/c number", "account number",
+        "account no", "loan number", "loan no", "loan id", "agreement number", "agreement no"
+    ]),
+    "sanction_date": ("date", [
+        "sanction date", "date of sanction", "sanctioned on", "sanction letter date"
+    ]),
+    "first_emi_date": ("date", [
+        "first emi date", "first emi due date", "first installment date", "first instalment date",
+        "emi start date", "repayment start date"
+    ]),
+    "borrower_name": ("text", [
+        "borrower name", "name of borrower", "name of the borrower", "borrower", "applicant name",
+        "name of applicant", "name of the applicant", "applicant"
+    ]),
+    "lender_name": ("text", [
+        "lender", "lender name", "name of lender", "bank name", "name of bank", "name of the bank",
+        "financier"
+    ]),
+}
+
+# Characters after a label searched for its value
+VALUE_WINDOW = 80
+# Lines searched for a text value when the label ends its line
+TEXT_VALUE_MAX_LENGTH = 80
+
+_WHITESPACE = " \t\r\n\xa0\u2002\u2003\u2009"
+
+_AMOUNT = re.compile(
+    r"(?P<currency>rs\.?|inr|usd|eur|gbp|\$|₹|€|£)?\s*"
+    r"(?P<number>\d{1,3}(?:,\d{2,3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+    r"(?:\s*(?P<scale>lakhs?|lacs?|crores?|cr\b|million|mn\b|k\b))?",
+    re.IGNORECASE
+)
+_PERCENT = re.compile(r"(?P<number>\d{1,2}(?:\.\d+)?|100)\s*(?P<unit>%|percent|per cent)?", re.IGNORECASE)
+_DURATION = re.compile(
+    r"(?P<number>\d{1,3}(?:\.\d+)?)\s*(?P<unit>years?|yrs?|months?|mths?|mos?|days?)?\b",
+    re.IGNORECASE
+)
+_DATE = re.compile(
+    r"(?P<numeric>\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2})"
+    r"|(?P<day>\d{1,2})(?:st|nd|rd|th)?[\s-]+(?P<month>[a-z]{3,9})[\s,-]+(?P<year>\d{4})"
+    r"|(?P<month_first>[a-z]{3,9})\s+(?P<day_second>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<year_second>\d{4})",
+    re.IGNORECASE
+)
+_IDENTIFIER = re.compile(r"\b(?=[A-Z0-9/-]*\d)[A-Z0-9][A-Z0-9/-]{4,}\b", re.IGNORECASE)
+_TEXT = re.compile(r"[^\n]*[A-Za-z][^\n]*")
+# Separator between a label and its value (": ", " - ", "(p.a.) =", ...)
+_SEPARATOR = re.compile(r"[\s:=\-–—.#]*(?:\([^)\n]{0,20}\)[\s:=\-–—.#]*)?")
+# A text value needs an explicit separator (not "the borrower shall ...")
+_TEXT_SEPARATOR = re.compile(r"[:\-–—\n]")
+
+_CURRENCY = re.compile(r"rs\.?|inr|usd|eur|gbp|\$|₹|€|£", re.IGNORECASE)
+
+_SCALES = {"lakh": 1e5, "lac": 1e5, "crore": 1e7, "cr": 1e7, "million": 1e6, "mn": 1e6, "k": 1e3}
+_CURRENCIES = {"rs": "INR", "inr": "INR", "₹": "INR", "usd": "USD", "$": "USD", "eur": "EUR", "€": "EUR",
+               "gbp": "GBP", "£": "GBP"}
+_MONTHS = {
+    name: number
+    for number, names in enumerate((
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",),
+        ("jun", "june"), ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"),
+        ("oct", "october"), ("nov", "november"), ("dec", "december")
+    ), 1)
+    for name in names
+}
+
+
+class LabelMatch(NamedTuple):
+    """A label found in text; start/end index the scanned text"""
+    start: int
+    end: int
+    label: str
+    payload: Any
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed set of phrases
+
+    Matching ignores case, treats any run of whitespace as one space and only
+    reports whole-word matches, leftmost-longest first, so overlapping
+    labels ("emi" in "first emi date") resolve to the more specific one.
+    """
+
+    def __init__(self, phrases: List[Tuple[str, Any]]):
+        """
+        Compile the automaton
+
+        Args:
+            phrases: (phrase, payload) pairs; phrases are matched case-insensitively
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[Tuple[int, str, Any]]] = [[]]
+        for phrase, payload in phrases:
+            phrase = " ".join(phrase.lower().split())
+            if phrase:
+                self._insert(phrase, payload)
+        self._build()
+
+    def _insert(self, phrase: str, payload: Any):
+        state = 0
+        for char in phrase:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._output.append([])
+            state = following
+        self._output[state].append((len(phrase), phrase, payload))
+
+    def _build(self):
+        """Add failure transitions, turning the trie into a DFA over its alphabet"""
+        trie = [dict(edges) for edges in self._goto]
+        failure = [0] * len(trie)
+        queue = deque()
+        for state in trie[0].values():
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            self._output[state].extend(self._output[failure[state]])
+            # Complete the DFA: missing edges follow the failure state's edges
+            for char, following in self._goto[failure[state]].items():
+                self._goto[state].setdefault(char, following)
+            for char, following in trie[state].items():
+                queue.append(following)
+                failure[following] = self._goto[failure[state]].get(char, 0)
+        # Case and whitespace variants share the lowercase transitions
+        for edges in self._goto:
+            for char in list(edges):
+                upper = char.upper()
+                if len(upper) == 1 and upper not in edges:
+                    edges[upper] = edges[char]
+            if " " in edges:
+                for space in _WHITESPACE:
+                    edges.setdefault(space, edges[" "])
+
+    def iter_matches(self, text: str) -> Iterator[LabelMatch]:
+        """All whole-word matches in text, in end order (overlaps included)"""
+        goto, output = self._goto, self._output
+        state = 0
+        # Original index of each character the automaton consumed
+        consumed: List[int] = []
+        previous_space = False
+        for index, char in enumerate(text):
+            space = char in _WHITESPACE
+            if space and previous_space:
+                continue
+            previous_space = space
+            consumed.append(index)
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            end = index + 1
+            if end < len(text) and text[end].isalnum():
+                continue
+            for length, phrase, payload in output[state]:
+                start = consumed[-length]
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                yield LabelMatch(start, end, phrase, payload)
+
+    def find(self, text: str) -> List[LabelMatch]:
+        """Non-overlapping matches in text order, leftmost-longest"""
+        matches = sorted(self.iter_matches(text), key=lambda match: (match.start, -match.end))
+        selected: List[LabelMatch] = []
+        for match in matches:
+            if selected and match.start < selected[-1].end:
+                continue
+            selected.append(match)
+        return selected
+
+
+def _number(raw: str) -> float:
+    return float(raw.replace(",", ""))
+
+
+def parse_amount(text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """
+    First amount in text[pos:endpos]
+
+    Returns:
+        ({"value", "currency"}, start, end) or None
+    """
+    for match in _AMOUNT.finditer(text, pos, len(text) if endpos is None else endpos):
+        value = _number(match.group("number"))
+        scale = (match.group("scale") or "").lower().rstrip("s")
+        value *= _SCALES.get(scale, 1)
+        currency = _CURRENCIES.get((match.group("currency") or "").lower().rstrip("."))
+        return {"value": round(value, 2), "currency": currency}, match.start(), match.end()
+    return None
+
+
+def parse_percent(text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """First percentage in text[pos:endpos]; a bare number counts, flagged unitless"""
+    match = _PERCENT.search(text, pos, len(text) if endpos is None else endpos)
+    if match is None:
+        return None
+    return {"value": _number(match.group("number")), "unitless": not match.group("unit")}, match.start(), match.end()
+
+
+def parse_duration(text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """First duration in text[pos:endpos], in months (a bare number is months)"""
+    match = _DURATION.search(text, pos, len(text) if endpos is None else endpos)
+    if match is None:
+        return None
+    number = _number(match.group("number"))
+    unit = (match.group("unit") or "").lower()
+    if unit.startswith("y"):
+        months = number * 12
+    elif unit.startswith("d"):
+        months = number / 30
+    else:
+        months = number
+    return {"value": round(months, 2), "unitless": not unit}, match.start(), match.end()
+
+
+def parse_date(text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """First date in text[pos:endpos] as ISO 8601; numeric dates are read day first"""
+    for match in _DATE.finditer(text, pos, len(text) if endpos is None else endpos):
+        try:
+            if match.group("numeric"):
+                raw = match.group("numeric")
+                if re.fullmatch(r"\d{4}-\d{2}-\d{2}", raw):
+                    date = datetime.strptime(raw, "%Y-%m-%d")
+                else:
+                    day, month, year = (int(part) for part in re.split(r"[/.-]", raw))
+                    date = datetime(year + 2000 if year < 100 else year, month, day)
+            elif match.group("month"):
+                month = _MONTHS.get(match.group("month").lower())
+                if month is None:
+                    continue
+                date = datetime(int(match.group("year")), month, int(match.group("day")))
+            else:
+                month = _MONTHS.get(match.group("month_first").lower())
+                if month is None:
+                    continue
+                date = datetime(int(match.group("year_second")), month, int(match.group("day_second")))
+        except ValueError:
+            continue
+        return {"value": date.date().isoformat()}, match.start(), match.end()
+    return None
+
+
+def parse_identifier(text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """First identifier (letters, digits, / and -, with at least one digit) in text[pos:endpos]"""
+    match = _IDENTIFIER.search(text, pos, len(text) if endpos is None else endpos)
+    if match is None:
+        return None
+    return {"value": match.group(0).upper()}, match.start(), match.end()
+
+
+def parse_text(text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], int, int]]:
+    """Rest of the line in text[pos:endpos] (or the next line when it is empty)"""
+    match = _TEXT.search(text, pos, len(text) if endpos is None else endpos)
+    if match is None:
+        return None
+    value = match.group(0).strip(" \t:-–—")[:TEXT_VALUE_MAX_LENGTH].strip()
+    if not value:
+        return None
+    return {"value": value}, match.start(), match.end()
+
+
+VALUE_PARSERS: Dict[str, Callable[..., Optional[Tuple[Dict[str, Any], int, int]]]] = {
+    "amount": parse_amount,
+    "percent": parse_percent,
+    "duration": parse_duration,
+    "date": parse_date,
+    "identifier": parse_identifier,
+    "text": parse_text,
+}
+
+
+class FieldExtractor:
+    """
+    Extract loan fields from labels and nearby values
+    """
+
+    def __init__(self, labels: Optional[Dict[str, Tuple[str, List[str]]]] = None):
+        """
+        Initialize extractor
+
+        Args:
+            labels: field -> (value kind, label synonyms) (default: FIELD_LABELS)
+        """
+        self.labels = labels or FIELD_LABELS
+        self.automaton = KeywordAutomaton([
+            (synonym, field)
+            for field, (_, synonyms) in self.labels.items()
+            for synonym in synonyms
+        ])
+
+    def extract(
+        self,
+        text: str,
+        form_fields: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract fields from text and form fields
+
+        Args:
+            text: Document text (merged text of an extraction result)
+            form_fields: Extraction result form fields ({"field_name",
+                "field_value", "value_confidence", "page"}); a parsed form
+                field value wins over a value found in the text
+
+        Returns:
+            field -> {"value", "raw", "label", "source", "confidence", and
+            "position" (text offset) or "page" (form field)}, plus
+            "currency" for amounts
+        """
+        candidates: Dict[str, List[Dict[str, Any]]] = {}
+        for candidate in self._from_form_fields(form_fields or []):
+            candidates.setdefault(candidate["field"], []).append(candidate)
+        for candidate in self._from_text(text or ""):
+            candidates.setdefault(candidate["field"], []).append(candidate)
+
+        fields = {}
+        for field, found in candidates.items():
+            best = max(found, key=lambda candidate: (
+                candidate["source"] == "form_field", candidate["confidence"], -candidate["order"]
+            ))
+            fields[field] = {key: value for key, value in best.items() if key not in ("field", "order")}
+        return fields
+
+    def _from_text(self, text: str) -> Iterator[Dict[str, Any]]:
+        matches = self.automaton.find(text)
+        for index, match in enumerate(matches):
+            # A value belongs to the closest label before it
+            limit = min(match.end + VALUE_WINDOW, matches[index + 1].start if index + 1 < len(matches) else len(text))
+            candidate = self._pair(match.payload, match.label, text, match.end, limit)
+            if candidate is not None:
+                candidate.update(source="text", position=match.start, order=match.start)
+                yield candidate
+
+    def _from_form_fields(self, form_fields: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for order, form_field in enumerate(form_fields):
+            name = form_field.get("field_name") or ""
+            value = form_field.get("field_value") or ""
+            matches = self.automaton.find(name)
+            if not matches or not value:
+                continue
+            # The most specific label in the name decides the field
+            match = max(matches, key=lambda match: match.end - match.start)
+            candidate = self._pair(match.payload, match.label, value, 0, len(value), adjacent=True)
+            if candidate is None:
+                continue
+            candidate.update(
+                source="form_field",
+                page=form_field.get("page"),
+                confidence=round(candidate["confidence"] * (form_field.get("value_confidence") or 1.0), 4),
+                order=order
+            )
+            yield candidate
+
+    def _pair(
+        self,
+        field: str,
+        label: str,
+        text: str,
+        start: int,
+        limit: int,
+        adjacent: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Value of field's kind in text[start:limit], scored by its distance from the label"""
+        kind = self.labels[field][0]
+        separator = _SEPARATOR.match(text, start, limit)
+        pos = separator.end()
+        if kind == "text" and not adjacent and not _TEXT_SEPARATOR.search(separator.group(0)):
+            return None
+        parsed = VALUE_PARSERS[kind](text, pos, limit)
+        if parsed is None:
+            return None
+        value, value_start, value_end = parsed
+
+        gap = 0 if adjacent else max(0, value_start - pos)
+        confidence = 0.95 - 0.5 * gap / VALUE_WINDOW
+        if value.pop("unitless", False):
+            confidence -= 0.15
+        if kind == "text" and text.count("\n", start, value_start):
+            confidence -= 0.15
+        candidate = {
+            "field": field,
+            "value": value.pop("value"),
+            "raw": text[value_start:value_end].strip(),
+            "label": label,
+            "confidence": round(max(confidence, 0.05), 4)
+        }
+        if "currency" in value and value["currency"] is None:
+            # "Loan Amount (Rs.): 5,00,000"
+            currency = _CURRENCY.search(separator.group(0))
+            value["currency"] = _CURRENCIES.get(currency.group(0).lower().rstrip(".")) if currency else None
+        candidate.update(value)
+        return candidate
+
+
+# Compiled once at import (shared by forked workers)
+_extractor = FieldExtractor()
+
+
+def extract_fields(complete_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract loan fields from a complete extraction result
+
+    Args:
+        complete_data: Result of CompleteDocumentExtractor
+
+    Returns:
+        field -> value entry (see FieldExtractor.extract)
+    """
+    text = complete_data.get("complete_text", {}).get("merged_text", "")
+    return _extractor.extract(text, complete_data.get("all_form_fields"))
@@ -0,0 +1,391 @@
+"""
+Repayment schedule extraction
+
+Amortization schedules are the largest tables in loan documents, often
+hundreds of rows continued over many pages. Schedule tables are recognized
+by their header (period, date, EMI, principal, interest, balance columns
+matched with a keyword automaton), continuation tables on following pages
+are stitched on, and each column is parsed into one NumPy array rather than
+row dicts. The amortization identities are then checked over whole columns
+at once:
+
+    balance[t] = balance[t - 1] - principal[t]
+    emi[t] = principal[t] + interest[t]
+
+Rows breaking them point at OCR misreads, and a balance that breaks the
+first identity on two consecutive rows by opposite amounts is the misread
+cell itself.
+"""
+import logging
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from extraction.field_extractor import KeywordAutomaton, parse_date
+
+logger = logging.getLogger(__name__)
+
+# Header synonyms per schedule column, lowercase with single spaces
+COLUMN_LABELS: Dict[str, List[str]] = {
+    "period": [
+        "no", "no.", "sr no", "sr. no.", "s.no", "s. no.", "sl no", "sl. no.", "period", "installment no",
+        "instalment no", "installment number", "instalment number", "emi no", "emi no.", "payment no",
+        "month no", "#"
+    ],
+    "date": [
+        "date", "due date", "payment date", "emi date", "installment date", "instalment date", "month",
+        "due on", "repayment date"
+    ],
+    "opening_balance": [
+        "opening balance", "opening principal", "beginning balance", "opening outstanding",
+        "principal outstanding at start"
+    ],
+    "emi": [
+        "emi", "emi amount", "installment", "instalment", "installment amount", "instalment amount",
+        "payment", "monthly payment", "total payment", "emi payable", "amount"
+    ],
+    "principal": [
+        "principal", "principal component", "principal paid", "principal repaid", "principal amount",
+        "principal repayment"
+    ],
+    "interest": ["interest", "interest component", "interest paid", "interest amount", "interest charged"],
+    "balance": [
+        "balance", "closing balance", "outstanding", "outstanding balance", "outstanding principal",
+        "principal outstanding", "balance principal", "remaining balance", "closing principal",
+        "balance outstanding", "loan outstanding"
+    ],
+}
+# Amount columns a schedule header must name at least this many of
+MIN_AMOUNT_COLUMNS = 2
+# Data rows a table needs to count as a schedule (continuations need one)
+MIN_SCHEDULE_ROWS = 3
+# Absolute and relative tolerance of the consistency checks (rounding)
+ROUNDING_TOLERANCE = 1.0
+RELATIVE_TOLERANCE = 1e-4
+
+_NUMBER = re.compile(r"\(?-?\d[\d,]*(?:\.\d+)?\)?")
+_TOTAL = re.compile(r"\btotal\b", re.IGNORECASE)
+
+_automaton = KeywordAutomaton([
+    (label, column)
+    for column, labels in COLUMN_LABELS.items()
+    for label in labels
+])
+
+
+class RepaymentSchedule(NamedTuple):
+    """
+    A schedule as columns: float64 arrays (NaN where unreadable) for the
+    numeric columns, datetime64[D] (NaT) for "date"; pages and tables hold
+    the source of each row
+    """
+    columns: Dict[str, np.ndarray]
+    pages: np.ndarray
+    tables: List[Any]
+    flags: np.ndarray
+    issues: List[Dict[str, Any]]
+    totals: Dict[str, float]
+
+    @property
+    def rows(self) -> int:
+        return len(self.pages)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON form: column lists (None for unreadable cells) and the check results"""
+        columns = {}
+        for name, values in self.columns.items():
+            if values.dtype.kind == "M":
+                columns[name] = [None if np.isnat(value) else str(value) for value in values]
+            else:
+                columns[name] = [None if np.isnan(value) else float(value) for value in values]
+        return {
+            "rows": self.rows,
+            "columns": columns,
+            "pages": sorted({int(page) for page in self.pages}),
+            "tables": self.tables,
+            "consistent": not self.issues,
+            "flagged_rows": np.flatnonzero(self.flags).tolist(),
+            "issues": self.issues,
+            "totals": self.totals
+        }
+
+    def to_arrow(self):
+        """pyarrow Table of the columns plus the source page of each row (needs pyarrow)"""
+        import pyarrow as pa
+
+        arrays = dict(self.columns)
+        arrays["page"] = self.pages
+        arrays["flagged"] = self.flags
+        return pa.table(arrays)
+
+
+def map_columns(cells: List[str]) -> Dict[str, int]:
+    """
+    Schedule columns named by a header row
+
+    Returns:
+        column -> cell index (the first cell naming each column)
+    """
+    mapping: Dict[str, int] = {}
+    for index, text in enumerate(cells):
+        matches = _automaton.find(text)
+        if not matches:
+            continue
+        # The most specific label decides ("principal outstanding" is a balance)
+        match = max(matches, key=lambda match: match.end - match.start)
+        mapping.setdefault(match.payload, index)
+    return mapping
+
+
+def _is_schedule_header(mapping: Dict[str, int]) -> bool:
+    amounts = sum(1 for column in ("emi", "principal", "interest", "balance") if column in mapping)
+    return amounts >= MIN_AMOUNT_COLUMNS and len(mapping) >= 3
+
+
+def _texts(row: List[Any]) -> List[str]:
+    return [cell.get("text", "") if isinstance(cell, dict) else str(cell) for cell in row]
+
+
+def parse_numbers(texts: np.ndarray) -> np.ndarray:
+    """
+    Parse a column of cell texts ("1,23,456.78", "Rs. 500", "(12.50)") as float64
+
+    Unreadable cells are NaN.
+    """
+    values = np.full(len(texts), np.nan)
+    for index, text in enumerate(texts):
+        match = _NUMBER.search(text)
+        if match is None:
+            continue
+        raw = match.group(0)
+        negative = raw.startswith("(") and raw.endswith(")")
+        try:
+            number = float(raw.strip("()").replace(",", ""))
+        except ValueError:
+            continue
+        values[index] = -number if negative else number
+    return values
+
+
+def parse_dates(texts: np.ndarray) -> np.ndarray:
+    """Parse a column of cell texts as datetime64[D] (NaT when unreadable)"""
+    values = np.full(len(texts), np.datetime64("NaT"), dtype="datetime64[D]")
+    for index, text in enumerate(texts):
+        parsed = parse_date(text)
+        if parsed is not None:
+            values[index] = np.datetime64(parsed[0]["value"])
+    return values
+
+
+class _Part(NamedTuple):
+    """Data rows of one table, as cell texts by schedule column"""
+    page: Optional[int]
+    table_id: Optional[int]
+    cells: Dict[str, List[str]]
+    totals: List[List[str]]
+    mapping: Dict[str, int]
+    width: int
+    headed: bool
+
+    @property
+    def rows(self) -> int:
+        return len(next(iter(self.cells.values())))
+
+
+def _table_part(table: Dict[str, Any], inherited: Optional[Dict[str, int]]) -> Optional[_Part]:
+    """
+    Schedule rows of a table: under its own schedule header, or under the
+    inherited mapping of the schedule it may continue (same column count)
+    """
+    header_rows = [_texts(row) for row in table.get("header_rows", [])]
+    body_rows = [_texts(row) for row in table.get("body_rows", [])]
+    width = max([len(row) for row in header_rows + body_rows] or [0])
+
+    mapping, start, headed = None, 0, True
+    for row in header_rows:
+        candidate = map_columns(row)
+        if _is_schedule_header(candidate) and len(candidate) > len(mapping or {}):
+            mapping = candidate
+    if mapping is None:
+        # Headers are often recognized as body rows (or repeated on each page)
+        for index, row in enumerate(body_rows[:2]):
+            candidate = map_columns(row)
+            if _is_schedule_header(candidate):
+                mapping, start = candidate, index + 1
+                break
+    if mapping is None:
+        if inherited is None or width != inherited.get("_width"):
+            return None
+        mapping = {column: index for column, index in inherited.items() if column != "_width"}
+        headed = False
+
+    rows, totals = [], []
+    for row in body_rows[start:]:
+        if any(_TOTAL.search(text) for text in row):
+            totals.append(row)
+            continue
+        # Repeated headers and notes have no numbers
+        if not any(any(char.isdigit() for char in text) for text in row):
+            continue
+        rows.append(row)
+    if not rows:
+        return None
+
+    cells = {
+        column: [row[index] if index < len(row) else "" for row in rows]
+        for column, index in mapping.items()
+    }
+    return _Part(table.get("page"), table.get("table_id"), cells, totals, mapping, width, headed)
+
+
+def _continues(previous: _Part, part: _Part, last_period: float, first_period: float) -> bool:
+    """Whether part continues the schedule ending with previous"""
+    if set(part.mapping) != set(previous.mapping):
+        return False
+    if previous.page is not None and part.page is not None and not 0 <= part.page - previous.page <= 1:
+        return False
+    if not np.isnan(last_period) and not np.isnan(first_period):
+        return first_period == last_period + 1
+    return True
+
+
+def check_consistency(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Check the amortization identities over whole columns
+
+    Returns:
+        (flags: bool per row, issues: [{"row", "check", "expected", "found",
+        "suspect"}])
+    """
+    rows = len(next(iter(columns.values()))) if columns else 0
+    flags = np.zeros(rows, dtype=bool)
+    issues: List[Dict[str, Any]] = []
+    if rows == 0:
+        return flags, issues
+
+    def tolerance(reference: np.ndarray) -> np.ndarray:
+        return np.maximum(ROUNDING_TOLERANCE, RELATIVE_TOLERANCE * np.abs(np.nan_to_num(reference)))
+
+    emi_bad = np.zeros(rows, dtype=bool)
+    principal_bad = np.zeros(rows, dtype=bool)
+    if all(column in columns for column in ("emi", "principal", "interest")):
+        emi_expected = columns["principal"] + columns["interest"]
+        # NaN comparisons are False: unreadable cells are not flagged
+        emi_bad = np.abs(columns["emi"] - emi_expected) > tolerance(columns["emi"])
+
+    if "balance" in columns and "principal" in columns:
+        balance, principal = columns["balance"], columns["principal"]
+        previous = np.concatenate(([np.nan], balance[:-1]))
+        if "opening_balance" in columns:
+            # An opening balance column also covers the first row
+            previous = np.where(np.isnan(columns["opening_balance"]), previous, columns["opening_balance"])
+        expected = previous - principal
+        residual = balance - expected
+        bad = np.abs(residual) > tolerance(balance)
+        # A misread balance breaks its own row and the next by opposite amounts
+        following_bad = np.concatenate((bad[1:], [False]))
+        following_residual = np.concatenate((residual[1:], [np.nan]))
+        balance_misread = bad & following_bad & (np.abs(residual + following_residual) <= tolerance(balance))
+        for row in np.flatnonzero(bad):
+            if row > 0 and balance_misread[row - 1]:
+                continue
+            if balance_misread[row]:
+                suspect = "balance"
+            elif emi_bad[row]:
+                # Both identities share the principal
+                suspect = "principal"
+                principal_bad[row] = True
+            else:
+                suspect = "balance_or_principal"
+            issues.append({
+                "row": int(row), "check": "balance", "expected": float(expected[row]),
+                "found": float(balance[row]), "suspect": suspect
+            })
+        flags |= bad & ~np.concatenate(([False], balance_misread[:-1]))
+
+    for row in np.flatnonzero(emi_bad):
+        issues.append({
+            "row": int(row), "check": "emi", "expected": float(emi_expected[row]),
+            "found": float(columns["emi"][row]), "suspect": "principal" if principal_bad[row] else "emi_or_interest"
+        })
+    flags |= emi_bad
+    issues.sort(key=lambda issue: issue["row"])
+    return flags, issues
+
+
+def _build(parts: List[_Part]) -> RepaymentSchedule:
+    """Stitch the parts of one schedule into columns and check them"""
+    names = list(parts[0].mapping)
+    texts = {name: np.array([text for part in parts for text in part.cells[name]], dtype=object) for name in names}
+    columns = {
+        name: parse_dates(texts[name]) if name == "date" else parse_numbers(texts[name])
+        for name in COLUMN_LABELS if name in texts
+    }
+    if "date" in columns and "period" not in columns and np.isnat(columns["date"]).all():
+        # A "Month" column numbering the installments
+        columns = {("period" if name == "date" else name): values for name, values in columns.items()}
+        columns["period"] = parse_numbers(texts["date"])
+        columns = {name: columns[name] for name in COLUMN_LABELS if name in columns}
+    pages = np.array(
+        [part.page if part.page is not None else -1 for part in parts for _ in part.cells[names[0]]],
+        dtype=np.int64
+    )
+
+    totals: Dict[str, float] = {}
+    for part in parts:
+        for row in part.totals:
+            for name, index in part.mapping.items():
+                if name in ("emi", "principal", "interest") and index < len(row):
+                    value = parse_numbers(np.array([row[index]], dtype=object))[0]
+                    if not np.isnan(value):
+                        totals[name] = float(value)
+
+    flags, issues = check_consistency({name: values for name, values in columns.items() if name != "date"})
+    if "period" in columns:
+        for issue in issues:
+            period = columns["period"][issue["row"]]
+            issue["period"] = None if np.isnan(period) else int(period)
+    for issue in issues:
+        issue["page"] = int(pages[issue["row"]]) if pages[issue["row"]] >= 0 else None
+    tables = [{"page": part.page, "table_id": part.table_id} for part in parts]
+    return RepaymentSchedule(columns, pages, tables, flags, issues, totals)
+
+
+def extract_schedules(tables: List[Dict[str, Any]]) -> List[RepaymentSchedule]:
+    """
+    Find repayment schedules among a document's tables
+
+    Args:
+        tables: Result "all_tables" entries, in page order
+
+    Returns:
+        Schedules, each stitched from a table with a schedule header and the
+        continuation tables that follow it
+    """
+    ordered = sorted(tables or [], key=lambda table: (table.get("page") or 0, table.get("table_id") or 0))
+    runs: List[List[_Part]] = []
+    last_period = np.nan
+    for table in ordered:
+        inherited = None
+        if runs:
+            inherited = dict(runs[-1][-1].mapping, _width=runs[-1][-1].width)
+        part = _table_part(table, inherited)
+        if part is None:
+            continue
+
+        periods = parse_numbers(np.array(part.cells.get("period", []), dtype=object))
+        first_period = periods[0] if len(periods) else np.nan
+        if runs and _continues(runs[-1][-1], part, last_period, first_period):
+            runs[-1].append(part)
+        elif part.headed and part.rows >= MIN_SCHEDULE_ROWS:
+            runs.append([part])
+        else:
+            continue
+        last_period = periods[-1] if len(periods) else np.nan
+
+    schedules = [_build(parts) for parts in runs]
+    for schedule in schedules:
+        if schedule.issues:
+            logger.info(f"Repayment schedule: {len(schedule.issues)} inconsistent row(s) of {schedule.rows}")
+    return schedules
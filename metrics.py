@@ -0,0 +1,151 @@
+"""
+Prometheus metrics for the API and worker processes
+
+Metric families are prometheus_client collectors registered on the default
+registry. Label children should be bound at import time by callers, so
+recording a value on the hot path doesn't look up labels.
+
+When several processes serve the same endpoint (gunicorn API workers),
+PROMETHEUS_MULTIPROC_DIR must point at a directory shared by all of them
+before prometheus_client is first imported. Each process then keeps its
+values in files there and render() merges them with MultiProcessCollector:
+counters and histograms are summed over all processes, including exited ones,
+and gauges are reported per live process with a pid label unless the gauge
+asks for another multiprocess mode.
+"""
+import glob
+import os
+from typing import Optional, Sequence
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Default histogram buckets
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+SIZE_BUCKETS = (
+    1024, 16 * 1024, 128 * 1024, 512 * 1024, 1024 ** 2, 4 * 1024 ** 2,
+    16 * 1024 ** 2, 64 * 1024 ** 2
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Families by name, so creating one twice returns the registered collector
+_families = {}
+
+
+def _register(name: str, factory):
+    family = _families.get(name)
+    if family is None:
+        family = _families[name] = factory()
+    return family
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Create or get a registered counter"""
+    return _register(name, lambda: Counter(name, documentation, labelnames))
+
+
+def gauge(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    multiprocess_mode: str = "liveall"
+) -> Gauge:
+    """
+    Create or get a registered gauge
+
+    Args:
+        name: Metric name
+        documentation: Help text
+        labelnames: Label names
+        multiprocess_mode: How values of several processes are merged
+            (prometheus_client modes, default: one series per live pid)
+    """
+    return _register(
+        name, lambda: Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+    )
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Optional[Sequence[float]] = None
+) -> Histogram:
+    """Create or get a registered histogram"""
+    return _register(
+        name, lambda: Histogram(name, documentation, labelnames, buckets=buckets or LATENCY_BUCKETS)
+    )
+
+
+def multiprocess_dir() -> Optional[str]:
+    """Shared directory of multiprocess mode, or None for a single process"""
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def render() -> bytes:
+    """Render metrics in the Prometheus text format, merged across processes in multiprocess mode"""
+    if multiprocess_dir() is None:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def clear_multiprocess_dir(directory: str):
+    """Remove values left by a previous server run; call in the master before forking"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+def mark_process_dead(pid: int):
+    """Drop the live gauges of an exited worker process (gunicorn child_exit hook)"""
+    if multiprocess_dir() is not None:
+        multiprocess.mark_process_dead(pid)
+
+
+# Shared metric families
+EXTRACTION_STAGE_SECONDS = histogram(
+    "extraction_stage_seconds",
+    "Time spent in each stage of complete document extraction",
+    ["stage"]
+)
+PROCESSOR_CALLS = counter(
+    "processor_calls_total",
+    "Document AI processor calls by processor and outcome (success or error code)",
+    ["processor", "outcome"]
+)
+CACHE_REQUESTS = counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"]
+)
+PAYLOAD_BYTES = histogram(
+    "payload_bytes",
+    "Request and response payload sizes in bytes",
+    ["direction"],
+    SIZE_BUCKETS
+)
+
+
+def error_code(error: BaseException) -> str:
+    """
+    Get a low-cardinality code for an exception
+
+    Uses the gRPC status name for Google API errors, else the exception class.
+    """
+    status = getattr(error, "grpc_status_code", None)
+    if status is not None and hasattr(status, "name"):
+        return status.name
+    return type(error).__name__
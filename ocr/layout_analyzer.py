@@ -0,0 +1,215 @@
+"""
+Layout analysis on token boxes
+
+Groups positioned words into columns, lines and blocks and puts them in
+reading order, giving locally extracted pages (PDF text layers, OCR words)
+the same block/paragraph/line hierarchy Document AI returns. Everything
+works on an (N, 4) array of [left, top, width, height] boxes with
+projection profiles and gap statistics, so a page costs a few vectorized
+passes rather than pairwise comparisons.
+"""
+import logging
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Gutter width, in median token heights, that separates two columns
+MIN_GUTTER_HEIGHTS = 1.5
+# Share of the page's lines that may cross a gutter (spanning headings)
+GUTTER_NOISE = 0.2
+# Narrowest column as a share of the text width; narrower gutter-separated
+# runs are table columns, and the page is then read as a single column
+MIN_COLUMN_FRACTION = 0.25
+# Vertical center distance, in median token heights, within one line
+LINE_TOLERANCE = 0.5
+# Share of rows on either side of a gap that, when they line up across it
+# and the left side holds short labels, make the gap a label/value gap
+# within lines rather than a column gutter
+ALIGNED_ROW_SHARE = 0.8
+# Median words per row of a label side (running text has more)
+LABEL_ROW_WORDS = 4
+# Line gap over the typical gap (and at least this many heights) starts a block
+BLOCK_GAP_FACTOR = 1.8
+MIN_BLOCK_GAP_HEIGHTS = 0.8
+
+
+class PageLayout(NamedTuple):
+    """Layout of one page; lines and blocks hold indices in reading order"""
+    lines: List[np.ndarray]
+    blocks: List[List[int]]
+    gutters: np.ndarray
+
+    @property
+    def order(self) -> np.ndarray:
+        """Token indices in reading order"""
+        if not self.lines:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([self.lines[line] for block in self.blocks for line in block])
+
+
+def text_rows(center_y: np.ndarray, height_unit: float) -> np.ndarray:
+    """Row number of each token, breaking where vertical centers jump"""
+    by_height = np.argsort(center_y, kind="stable")
+    rows = np.empty(len(center_y), dtype=np.int64)
+    rows[by_height] = np.concatenate(([0], np.cumsum(np.diff(center_y[by_height]) > LINE_TOLERANCE * height_unit)))
+    return rows
+
+
+def find_gutters(boxes: np.ndarray, width: float, height_unit: float) -> np.ndarray:
+    """
+    Column gutters from the horizontal projection profile of the tokens
+
+    A gap whose rows line up on both sides with a few words left of it
+    (labels left, values right) is a gap within lines, not a gutter.
+
+    Returns:
+        Sorted x positions (gutter centers) separating columns
+    """
+    if not len(boxes) or width <= 0:
+        return np.zeros(0)
+    size = int(np.ceil(width)) + 1
+    left = np.clip(boxes[:, 0].astype(np.int64), 0, size - 1)
+    right = np.clip((boxes[:, 0] + boxes[:, 2]).astype(np.int64), 0, size - 1)
+
+    # Number of tokens covering each x (difference array)
+    profile = np.zeros(size + 1)
+    np.add.at(profile, left, 1)
+    np.add.at(profile, right + 1, -1)
+    coverage = np.cumsum(profile)[:size]
+
+    occupied = np.flatnonzero(coverage > 0)
+    if not len(occupied):
+        return np.zeros(0)
+    # Text on either side; thin coverage (spanning headings) still counts as a gap
+    threshold = max(coverage.max() * GUTTER_NOISE, 0)
+    inner = coverage[occupied[0]:occupied[-1] + 1] <= threshold
+    edges = np.diff(np.concatenate(([0], inner.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    wide = (ends - starts) >= MIN_GUTTER_HEIGHTS * height_unit
+    candidates = occupied[0] + (starts[wide] + ends[wide]) / 2.0
+
+    columns = np.diff(np.concatenate(([occupied[0]], candidates, [occupied[-1]])))
+    if (columns < MIN_COLUMN_FRACTION * (occupied[-1] - occupied[0])).any():
+        return np.zeros(0)
+
+    rows = text_rows(boxes[:, 1] + boxes[:, 3] / 2, height_unit)
+    column = np.searchsorted(candidates, boxes[:, 0] + boxes[:, 2] / 2)
+    gutters = []
+    for index, candidate in enumerate(candidates):
+        left_rows = rows[column == index]
+        left, right = set(left_rows.tolist()), set(rows[column == index + 1].tolist())
+        aligned = len(left & right) >= ALIGNED_ROW_SHARE * len(left | right)
+        if not aligned or np.median(np.unique(left_rows, return_counts=True)[1]) > LABEL_ROW_WORDS:
+            gutters.append(candidate)
+    return np.array(gutters)
+
+
+def analyze_layout(boxes: Sequence[Sequence[float]], width: float) -> PageLayout:
+    """
+    Segment a page's tokens into lines and blocks in reading order
+
+    Args:
+        boxes: [left, top, width, height] per token
+        width: Page width in the boxes' units
+
+    Returns:
+        PageLayout; tokens crossing a gutter (headings over several columns)
+        form their own blocks and split the page into bands read top down,
+        columns left to right within a band
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(boxes):
+        return PageLayout([], [], np.zeros(0))
+
+    heights = np.maximum(boxes[:, 3], 1.0)
+    unit = float(np.median(heights))
+    gutters = find_gutters(boxes, width, unit)
+
+    left = boxes[:, 0]
+    right = boxes[:, 0] + boxes[:, 2]
+    center_y = boxes[:, 1] + boxes[:, 3] / 2
+    column = np.searchsorted(gutters, left + boxes[:, 2] / 2)
+    # Tokens crossing a gutter span columns, and so do their whole lines when
+    # the words on either side of a gutter are closer than a gutter is wide
+    spanning = ((left[:, None] < gutters[None, :]) & (right[:, None] > gutters[None, :])).any(axis=1)
+    if len(gutters):
+        rows = text_rows(center_y, unit)
+        by_row = np.lexsort((left, rows))
+        first, second = by_row[:-1], by_row[1:]
+        bridged = (
+            (rows[first] == rows[second])
+            & (column[first] != column[second])
+            & (left[second] - right[first] < MIN_GUTTER_HEIGHTS * unit)
+        )
+        spanning |= np.isin(rows, rows[first[bridged]])
+    column = np.where(spanning, -1, column)
+
+    # Lines: sort by column then vertical center and break on center jumps
+    order = np.lexsort((center_y, column))
+    new_line = np.concatenate((
+        [True],
+        (np.diff(column[order]) != 0) | (np.diff(center_y[order]) > LINE_TOLERANCE * unit)
+    ))
+    line_starts = np.flatnonzero(new_line)
+    lines = [
+        tokens[np.argsort(left[tokens], kind="stable")]
+        for tokens in np.split(order, line_starts[1:])
+    ]
+
+    line_column = column[order][line_starts]
+    line_top = np.minimum.reduceat(boxes[order, 1], line_starts)
+    line_bottom = np.maximum.reduceat(boxes[order, 1] + boxes[order, 3], line_starts)
+
+    # Blocks: a line gap well over the column's typical gap starts a block
+    same_column = line_column[1:] == line_column[:-1]
+    gaps = line_top[1:] - line_bottom[:-1]
+    typical = float(np.median(gaps[same_column])) if same_column.any() else 0.0
+    threshold = max(typical * BLOCK_GAP_FACTOR, MIN_BLOCK_GAP_HEIGHTS * unit)
+    new_block = np.concatenate(([True], ~same_column | (gaps > threshold)))
+    block_starts = np.flatnonzero(new_block)
+    block_lines = np.split(np.arange(len(lines)), block_starts[1:])
+
+    # Reading order: bands between spanning blocks, then columns left to right
+    block_column = line_column[block_starts]
+    block_top = line_top[block_starts]
+    spanning_tops = np.sort(block_top[block_column == -1])
+    band = np.searchsorted(spanning_tops, block_top, side="right")
+    reading = np.lexsort((block_top, block_column, band))
+    return PageLayout(lines, [block_lines[index].tolist() for index in reading], gutters)
+
+
+def layout_words(words: List[Dict[str, Any]], width: float) -> List[Dict[str, Any]]:
+    """
+    Arrange words into recognize_page-style blocks
+
+    Args:
+        words: {"text", "confidence", "box"} words of one page
+        width: Page width in the boxes' units
+
+    Returns:
+        Blocks (one paragraph each) with lines of words in reading order
+    """
+    if not words:
+        return []
+    boxes = np.array([word["box"] for word in words], dtype=np.float64)
+    layout = analyze_layout(boxes, width)
+
+    def bounds(indices: np.ndarray) -> List[int]:
+        selected = boxes[indices]
+        left, top = selected[:, 0].min(), selected[:, 1].min()
+        right = (selected[:, 0] + selected[:, 2]).max()
+        bottom = (selected[:, 1] + selected[:, 3]).max()
+        return [int(left), int(top), int(right - left), int(bottom - top)]
+
+    blocks = []
+    for block in layout.blocks:
+        lines = [
+            {"box": bounds(layout.lines[line]), "words": [words[index] for index in layout.lines[line]]}
+            for line in block
+        ]
+        box = bounds(np.concatenate([layout.lines[line] for line in block]))
+        blocks.append({"box": box, "paragraphs": [{"box": box, "lines": lines}]})
+    return blocks
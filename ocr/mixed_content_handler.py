@@ -0,0 +1,617 @@
+"""
+Per-page routing of mixed digital/scanned/handwritten PDFs
+
+Digitally born pages carry an exact text layer that costs nothing to read;
+scanned pages only hold images. split_pages() checks each page's text layer
+with PyPDF2 and turns the digital pages into a Document AI document (blocks,
+paragraphs, lines and tokens with positions and confidence 1.0) that result
+building treats like processor output. Form Parser never sees these pages, so
+their ruled tables are found on a render (detect_tables) and label/value
+lines become form fields, which fee and field extraction depend on.
+
+PageRouter sends every other page to the cheapest adequate engine, judged
+from a low-resolution render: blank pages are not OCR'd, clean prints go to
+the local engine and noisy or photographic pages to the remote one. Local
+pages that read with low confidence (typically handwriting) are escalated to
+the remote engine, whose style info marks handwritten pages in the report.
+merge_documents() puts all parts back in page order.
+"""
+import io
+import logging
+import math
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from google.cloud import documentai_v1 as documentai
+
+from config import Config
+from metrics import EXTRACTION_STAGE_SECONDS, counter
+from ocr.layout_analyzer import MIN_GUTTER_HEIGHTS, layout_words
+from ocr.ocr_engine import OCREngine, build_document
+from ocr.table_extractor import detect_tables, scale_table
+from processing.page_selection import PageSelectionError, check_page_selection
+
+logger = logging.getLogger(__name__)
+
+PAGE_ROUTES = counter(
+    "ocr_page_routes_total",
+    "Pages by extraction route (text_layer, blank, local, escalated, remote, handwritten)",
+    ["route"]
+)
+
+ROUTE_TEXT_LAYER = "text_layer"
+ROUTE_BLANK = "blank"
+ROUTE_LOCAL = "local"
+ROUTE_ESCALATED = "escalated"
+ROUTE_REMOTE = "remote"
+ROUTE_HANDWRITTEN = "handwritten"
+ROUTES = (ROUTE_TEXT_LAYER, ROUTE_BLANK, ROUTE_LOCAL, ROUTE_ESCALATED, ROUTE_REMOTE, ROUTE_HANDWRITTEN)
+
+_ROUTE_COUNTERS = {route: PAGE_ROUTES.labels(route) for route in ROUTES}
+_TEXT_LAYER_SECONDS = EXTRACTION_STAGE_SECONDS.labels("text_layer")
+_PROFILE_SECONDS = EXTRACTION_STAGE_SECONDS.labels("page_profile")
+
+# Resolution of the renders pages are profiled on
+PROFILE_DPI = 50
+# Resolution of the renders text-layer tables are detected on
+TABLE_DPI = 100
+# Text-showing operators whose text matrix places a run
+SHOW_OPERATORS = (b"Tj", b"TJ")
+# Longest label, in words, of a "Label: value" line
+MAX_LABEL_WORDS = 6
+# Share of ink pixels below which a page is blank
+BLANK_INK_RATIO = 0.002
+# Share of handwritten tokens from which a remote page counts as handwritten
+HANDWRITTEN_RATIO = 0.5
+
+# Share of printable characters below which a text layer is treated as
+# garbage (broken font encodings) and the page is OCR'd instead
+MIN_PRINTABLE_RATIO = 0.9
+
+
+class TextLayerSplit(NamedTuple):
+    """Pages of a PDF split by how they are extracted"""
+    document: Optional[documentai.Document]
+    text_pages: List[int]
+    scan_pages: List[int]
+
+
+def _words(text: str, x: float, char_width: float) -> List[Tuple[str, float, float]]:
+    """Split a text run into (word, left, right) with estimated positions"""
+    words = []
+    start = None
+    for index, char in enumerate(text + " "):
+        if char.isspace():
+            if start is not None:
+                words.append((text[start:index], x + start * char_width, x + index * char_width))
+                start = None
+        elif start is None:
+            start = index
+    return words
+
+
+def read_text_layer(page) -> Dict[str, Any]:
+    """
+    Read a PyPDF2 page's text layer into a recognize_page-style page
+
+    Word boxes are estimated from run positions and font size (PDFs place
+    runs, not words); coordinates are converted to a top-left origin and
+    the words are grouped into lines and blocks by layout_words.
+
+    Returns:
+        {"width", "height", "blocks": [...]} with confidence 1.0 words, plus
+        "chars" and "printable" counts for classification
+    """
+    width = float(page.mediabox.width)
+    height = float(page.mediabox.height)
+    runs: List[Tuple[float, float, float, str]] = []
+    # PyPDF2 reports a run when it flushes it, by which time the text matrix
+    # has usually moved on (T*, Td, the next run); keep the matrices of the
+    # run's first show operator instead
+    matrices: Dict[str, Any] = {"show": None, "run": None}
+
+    def before(operator, operands, cm, tm):
+        if operator in SHOW_OPERATORS:
+            matrices["show"] = (list(cm), list(tm))
+            if matrices["run"] is None:
+                matrices["run"] = matrices["show"]
+
+    def after(operator, operands, cm, tm):
+        # The previous run was flushed while showing this one
+        if operator in SHOW_OPERATORS and matrices["run"] is None:
+            matrices["run"] = matrices["show"]
+
+    def visit(text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            return
+        if matrices["run"] is not None:
+            cm, tm = matrices["run"]
+            matrices["run"] = None
+        # Text space -> user space: tm x cm
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        size = abs(font_size * math.hypot(tm[2], tm[3]) * math.hypot(cm[2], cm[3])) or float(font_size or 10)
+        for line in text.splitlines():
+            if line.strip():
+                runs.append((height - y - size, x, size, line))
+
+    page.extract_text(visitor_operand_before=before, visitor_operand_after=after, visitor_text=visit)
+
+    chars = sum(len(text.strip()) for _, _, _, text in runs)
+    printable = sum(1 for _, _, _, text in runs for char in text if char.isprintable() and char != "�")
+
+    words = [
+        {"text": word, "confidence": 1.0, "box": [int(left), int(top), max(1, int(right - left)), int(size)]}
+        for top, x, size, text in runs
+        for word, left, right in _words(text, x, size * 0.5)
+    ]
+
+    return {
+        "width": int(width),
+        "height": int(height),
+        "blocks": layout_words(words, width),
+        "chars": chars,
+        "printable": printable
+    }
+
+
+def has_text_layer(page: Dict[str, Any], min_chars: Optional[int] = None) -> bool:
+    """Whether a read_text_layer page can be used instead of OCR"""
+    min_chars = Config.TEXT_LAYER_MIN_CHARS if min_chars is None else min_chars
+    if page["chars"] < max(1, min_chars):
+        return False
+    return page["printable"] / max(page["chars"], 1) >= MIN_PRINTABLE_RATIO
+
+
+def _inside(box: List[int], tables: List[Dict[str, Any]]) -> bool:
+    """Whether a box's center lies in one of the tables"""
+    x = box[0] + box[2] / 2
+    y = box[1] + box[3] / 2
+    return any(
+        left <= x < left + width and top <= y < top + height
+        for left, top, width, height in (table["box"] for table in tables)
+    )
+
+
+def key_value_fields(
+    blocks: List[Dict[str, Any]],
+    tables: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, List[Dict[str, Any]]]]:
+    """
+    Label/value pairs on the lines of a text-layer page
+
+    A line is a pair when one of its first words ends in a colon ("Processing
+    Fee: Rs. 5,000") or when its widest word gap is a column gap (labels on
+    the left, values on the right). Lines inside tables are left to the
+    tables.
+
+    Args:
+        blocks: layout_words blocks
+        tables: Tables on the page, in the blocks' coordinates
+
+    Returns:
+        {"name": [words], "value": [words]} per pair, in reading order
+    """
+    fields = []
+    for block in blocks:
+        for paragraph in block["paragraphs"]:
+            for line in paragraph["lines"]:
+                words = line["words"]
+                if len(words) < 2 or _inside(line["box"], tables or []):
+                    continue
+                split = next(
+                    (index + 1 for index, word in enumerate(words[:MAX_LABEL_WORDS]) if word["text"].endswith(":")),
+                    None
+                )
+                if split is None:
+                    gaps = [
+                        after["box"][0] - (before["box"][0] + before["box"][2])
+                        for before, after in zip(words, words[1:])
+                    ]
+                    widest = max(range(len(gaps)), key=gaps.__getitem__)
+                    if widest < MAX_LABEL_WORDS and gaps[widest] >= MIN_GUTTER_HEIGHTS * line["box"][3]:
+                        split = widest + 1
+                if split is None or split == len(words):
+                    continue
+                if any(char.isalpha() for word in words[:split] for char in word["text"]):
+                    fields.append({"name": words[:split], "value": words[split:]})
+    return fields
+
+
+def text_layer_tables(file_content: bytes, numbers: List[int], dpi: int = TABLE_DPI) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Ruled tables of PDF pages, from a render of each run of pages
+
+    Returns:
+        detect_tables tables per page number with boxes in PDF points
+    """
+    from pdf2image import convert_from_bytes
+
+    runs: List[List[int]] = []
+    for number in numbers:
+        if runs and number == runs[-1][-1] + 1:
+            runs[-1].append(number)
+        else:
+            runs.append([number])
+
+    tables: Dict[int, List[Dict[str, Any]]] = {}
+    for run in runs:
+        images = convert_from_bytes(file_content, dpi=dpi, first_page=run[0], last_page=run[-1], grayscale=True)
+        for number, image in zip(run, images):
+            tables[number] = [scale_table(table, 72 / dpi) for table in detect_tables(image)]
+    return tables
+
+
+def split_pages(
+    file_content: bytes,
+    pages: Optional[List[int]] = None,
+    text_layer: bool = True
+) -> TextLayerSplit:
+    """
+    Classify PDF pages into text-layer pages and pages that need OCR
+
+    Args:
+        file_content: PDF
+        pages: Optional sorted 1-based pages to consider (default: all)
+        text_layer: Use text layers (False sends every page to OCR)
+
+    Returns:
+        TextLayerSplit with a document of the text-layer pages (in order)
+
+    Raises:
+        PageSelectionError: A selected page does not exist in the document
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(io.BytesIO(file_content))
+    total = len(reader.pages)
+    check_page_selection(pages, total)
+    numbers = list(pages) if pages else list(range(1, total + 1))
+    if not text_layer:
+        return TextLayerSplit(None, [], numbers)
+
+    text_pages, scan_pages, layers = [], [], []
+    for number in numbers:
+        try:
+            layer = read_text_layer(reader.pages[number - 1])
+        except Exception as e:
+            logger.warning(f"Could not read text layer of page {number}: {str(e)}")
+            layer = None
+        if layer is not None and has_text_layer(layer):
+            text_pages.append(number)
+            layers.append(layer)
+        else:
+            scan_pages.append(number)
+
+    if layers and Config.OCR_DETECT_TABLES:
+        try:
+            tables = text_layer_tables(file_content, text_pages)
+        except Exception as e:
+            logger.warning(f"Text-layer table detection failed: {str(e)}")
+            tables = {}
+        for number, layer in zip(text_pages, layers):
+            layer["tables"] = tables.get(number, [])
+    for layer in layers:
+        layer["form_fields"] = key_value_fields(layer["blocks"], layer.get("tables"))
+
+    logger.info(f"Text layer: {len(text_pages)} digital, {len(scan_pages)} scanned pages")
+    return TextLayerSplit(build_document(layers) if layers else None, text_pages, scan_pages)
+
+
+def _segments(message, found: List[Any]):
+    """Collect TextAnchor segments anywhere below a raw protobuf message"""
+    for field, value in message.ListFields():
+        if field.type != field.TYPE_MESSAGE:
+            continue
+        # Repeated fields are containers, singular ones messages
+        for item in ([value] if hasattr(value, "ListFields") else value):
+            if item.DESCRIPTOR.name == "TextAnchor":
+                found.extend(item.text_segments)
+            else:
+                _segments(item, found)
+
+
+def merge_documents(
+    parts: List[Tuple[List[int], documentai.Document]],
+    original_numbers: bool = False
+) -> Tuple[documentai.Document, List[int]]:
+    """
+    Merge documents covering disjoint pages into one, in page order
+
+    Args:
+        parts: (original page number of each page, document) pairs
+        original_numbers: Number merged pages by their original page number
+            instead of 1..n, for a document holding some of the pages of
+            another merge (see original_page_numbers)
+
+    Returns:
+        (merged document, original page number of each merged page)
+    """
+    pages = [
+        (number, document, page)
+        for numbers, document in parts
+        for number, page in zip(numbers, document.pages)
+    ]
+    pages.sort(key=lambda item: item[0])
+
+    text: List[str] = []
+    offset = 0
+    merged_pages = []
+    for index, (number, document, page) in enumerate(pages, 1):
+        raw = documentai.Document.Page.pb(page).__class__()
+        raw.CopyFrom(documentai.Document.Page.pb(page))
+        segments: List[Any] = []
+        _segments(raw, segments)
+        start = min((int(segment.start_index) for segment in segments), default=0)
+        end = max((int(segment.end_index) for segment in segments), default=0)
+
+        for segment in segments:
+            segment.start_index = int(segment.start_index) - start + offset
+            segment.end_index = int(segment.end_index) - start + offset
+        raw.page_number = number if original_numbers else index
+        text.append(document.text[start:end])
+        offset += end - start
+        merged_pages.append(documentai.Document.Page.wrap(raw))
+
+    merged = documentai.Document(text="".join(text), pages=merged_pages)
+    return merged, [number for number, _, _ in pages]
+
+
+def _subset(document: documentai.Document, indices: List[int]) -> documentai.Document:
+    """Document with only the given pages (anchors still index the full text)"""
+    return documentai.Document(text=document.text, pages=[document.pages[index] for index in indices])
+
+
+def page_confidences(document: documentai.Document) -> List[float]:
+    """Mean token confidence of each page (0.0 for pages without tokens)"""
+    confidences = []
+    for page in document.pages:
+        values = [token.layout.confidence for token in page.tokens]
+        confidences.append(sum(values) / len(values) if values else 0.0)
+    return confidences
+
+
+def handwriting_ratio(page) -> float:
+    """Share of a Document AI page's tokens whose style info says handwritten"""
+    if not page.tokens:
+        return 0.0
+    return sum(1 for token in page.tokens if token.style_info.handwritten) / len(page.tokens)
+
+
+class PageProfile(NamedTuple):
+    """Cheap image statistics of a page"""
+    page: int
+    ink_ratio: float
+    entropy: float
+
+
+def profile_image(page: int, image) -> PageProfile:
+    """
+    Profile a page render: share of ink pixels (Otsu) and gray-level entropy
+
+    Clean prints are bimodal (paper and ink) and have low entropy; photos,
+    colored backgrounds and noisy scans spread over many gray levels.
+    """
+    import cv2
+
+    gray = np.asarray(image.convert("L"), dtype=np.uint8)
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    probabilities = histogram[histogram > 0] / gray.size
+    entropy = float(-(probabilities * np.log2(probabilities)).sum())
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    # Otsu splits any image in two; a blank page's "ink" is faint noise
+    ink = (binary > 0) & (gray < 128)
+    return PageProfile(page, float(ink.mean()), entropy)
+
+
+def choose_route(profile: PageProfile) -> str:
+    """Cheapest adequate route for a scanned page"""
+    if profile.ink_ratio < BLANK_INK_RATIO:
+        return ROUTE_BLANK
+    if profile.entropy > Config.OCR_ROUTE_MAX_LOCAL_ENTROPY:
+        return ROUTE_REMOTE
+    return ROUTE_LOCAL
+
+
+class PageRouter:
+    """
+    Route PDF pages to the text layer, no OCR, or a local or remote engine
+    """
+
+    def __init__(self, remote: OCREngine, local: Optional[OCREngine] = None):
+        """
+        Initialize router
+
+        Args:
+            remote: Engine for pages that need it (the extractor's engine)
+            local: Cheap engine for clean prints (default: the
+                OCR_ROUTE_LOCAL_BACKEND engine when OCR_ROUTING_ENABLED);
+                unused when it is the remote engine
+        """
+        self.remote = remote
+        if local is None and Config.OCR_ROUTING_ENABLED and Config.OCR_ROUTE_LOCAL_BACKEND != remote.name:
+            from ocr.ocr_service import get_engine
+
+            try:
+                local = get_engine(Config.OCR_ROUTE_LOCAL_BACKEND)
+            except Exception as e:
+                logger.warning(f"Local OCR engine unavailable, routing without it: {str(e)}")
+        self.local = local if local is not None and local.name != remote.name else None
+
+    @property
+    def active(self) -> bool:
+        """Whether routing can do better than sending every page to the remote engine"""
+        return Config.TEXT_LAYER_ENABLED or self.local is not None
+
+    def route(
+        self,
+        file_content: bytes,
+        pages: Optional[List[int]] = None,
+        notify=None
+    ) -> Tuple[Optional[documentai.Document], Optional[documentai.Document], Optional[List[int]], Dict[int, str]]:
+        """
+        Extract a PDF page by page over the cheapest adequate routes
+
+        Args:
+            file_content: PDF
+            pages: Optional sorted 1-based pages to process
+            notify: Progress callback
+
+        Returns:
+            (Form Parser document, OCR document, original page number of each
+            page, route of each page); with a Form Parser document, the OCR
+            document only holds the remote engine's pages, numbered as in the
+            original document
+        """
+        notify = notify or (lambda stage, **data: None)
+        stage_start = time.perf_counter()
+        try:
+            split = split_pages(file_content, pages, text_layer=Config.TEXT_LAYER_ENABLED)
+        except PageSelectionError:
+            raise
+        except Exception as e:
+            logger.warning(f"Text layer check failed, using {self.remote.name} for all pages: {str(e)}")
+            form_doc, ocr_doc, numbers = self.remote.process_document(
+                file_content, "application/pdf", pages, notify
+            )
+            return form_doc, ocr_doc, numbers, {}
+        finally:
+            _TEXT_LAYER_SECONDS.observe(time.perf_counter() - stage_start)
+        routes = {number: ROUTE_TEXT_LAYER for number in split.text_pages}
+        if split.text_pages:
+            notify("text_layer_done", pages=len(split.text_pages), scanned=len(split.scan_pages))
+        if not split.scan_pages:
+            self._count(routes)
+            return split.document, None, split.text_pages, routes
+
+        # Parts of the result: (page numbers, document) for either slot
+        shared: List[Tuple[List[int], documentai.Document]] = []
+        if split.text_pages:
+            shared.append((split.text_pages, split.document))
+
+        remote_pages = list(split.scan_pages)
+        if self.local is not None:
+            remote_pages = self._run_local(file_content, split.scan_pages, routes, shared, notify)
+
+        form_part, ocr_part, remote_ocr = None, None, None
+        if remote_pages:
+            form_doc, ocr_doc, numbers = self.remote.process_document(
+                file_content, "application/pdf", remote_pages, notify
+            )
+            numbers = numbers or remote_pages
+            for number in numbers:
+                if routes.get(number) != ROUTE_ESCALATED:
+                    routes[number] = ROUTE_REMOTE
+            if form_doc is not None:
+                form_part = (numbers, form_doc)
+                remote_ocr = (numbers, ocr_doc) if ocr_doc is not None else None
+            if ocr_doc is not None or form_doc is not None:
+                ocr_part = (numbers, ocr_doc if ocr_doc is not None else form_doc)
+                self._mark_handwritten(ocr_part, routes)
+            else:
+                logger.warning(f"Remote OCR failed for {len(remote_pages)} page(s)")
+                for number in remote_pages:
+                    routes.pop(number, None)
+
+        self._count(routes)
+        if not shared and ocr_part is None:
+            return None, None, None, routes
+        if ocr_part is None and len(shared) == 1 and split.text_pages:
+            # Only text-layer pages survived
+            return split.document, None, split.text_pages, routes
+
+        if form_part is None:
+            ocr_doc, page_numbers = merge_documents(shared + ([ocr_part] if ocr_part else []))
+            return None, ocr_doc, page_numbers, routes
+
+        # Result building takes every page from both documents: pages read
+        # here go with the Form Parser's only, so each is extracted once
+        form_doc, page_numbers = merge_documents(shared + [form_part])
+        ocr_doc = merge_documents([remote_ocr], original_numbers=True)[0] if remote_ocr else None
+        return form_doc, ocr_doc, page_numbers, routes
+
+    def _run_local(
+        self,
+        file_content: bytes,
+        scan_pages: List[int],
+        routes: Dict[int, str],
+        shared: List[Tuple[List[int], documentai.Document]],
+        notify
+    ) -> List[int]:
+        """
+        Handle blank and clean pages locally
+
+        Returns:
+            Pages left for the remote engine
+        """
+        from pdf2image import convert_from_bytes
+
+        stage_start = time.perf_counter()
+        try:
+            # One low-resolution render of the scanned range
+            images = convert_from_bytes(
+                file_content, dpi=PROFILE_DPI, first_page=scan_pages[0], last_page=scan_pages[-1], grayscale=True
+            )
+            profiles = {
+                number: profile_image(number, images[number - scan_pages[0]])
+                for number in scan_pages if number - scan_pages[0] < len(images)
+            }
+        except Exception as e:
+            logger.warning(f"Page profiling failed, sending all scanned pages to {self.remote.name}: {str(e)}")
+            return scan_pages
+        finally:
+            _PROFILE_SECONDS.observe(time.perf_counter() - stage_start)
+        chosen = {number: choose_route(profile) for number, profile in profiles.items()}
+
+        blank = [number for number in scan_pages if chosen.get(number) == ROUTE_BLANK]
+        if blank:
+            sizes = [images[number - scan_pages[0]].size for number in blank]
+            shared.append((blank, build_document([
+                {"width": width, "height": height, "blocks": []} for width, height in sizes
+            ])))
+            routes.update((number, ROUTE_BLANK) for number in blank)
+
+        local = [number for number in scan_pages if chosen.get(number) == ROUTE_LOCAL]
+        if local:
+            try:
+                form_doc, ocr_doc, numbers = self.local.process_document(
+                    file_content, "application/pdf", local, notify
+                )
+            except Exception as e:
+                logger.warning(f"Local OCR failed, escalating {len(local)} page(s): {str(e)}")
+                form_doc, ocr_doc, numbers = None, None, None
+            document = ocr_doc if ocr_doc is not None else form_doc
+            numbers = (numbers or local) if document is not None else []
+            # Low confidence on a clean print is mostly handwriting or odd fonts
+            kept = [
+                index for index, confidence in enumerate(page_confidences(document) if numbers else [])
+                if index < len(numbers) and confidence >= Config.OCR_ROUTE_MIN_LOCAL_CONFIDENCE
+            ]
+            if kept:
+                shared.append(([numbers[index] for index in kept], _subset(document, kept)))
+                routes.update((numbers[index], ROUTE_LOCAL) for index in kept)
+            kept_numbers = {numbers[index] for index in kept}
+            routes.update((number, ROUTE_ESCALATED) for number in local if number not in kept_numbers)
+
+        return [number for number in scan_pages if routes.get(number, ROUTE_ESCALATED) == ROUTE_ESCALATED]
+
+    def _mark_handwritten(self, part: Tuple[List[int], documentai.Document], routes: Dict[int, str]):
+        """Label remote pages that the engine's style info says are handwritten"""
+        numbers, document = part
+        for number, page in zip(numbers, document.pages):
+            if routes.get(number) in (ROUTE_REMOTE, ROUTE_ESCALATED) and handwriting_ratio(page) >= HANDWRITTEN_RATIO:
+                routes[number] = ROUTE_HANDWRITTEN
+
+    def _count(self, routes: Dict[int, str]):
+        """Record page routes in metrics and the log"""
+        for route in routes.values():
+            _ROUTE_COUNTERS[route].inc()
+        if routes:
+            counts = route_counts(routes)
+            logger.info(f"Page routes: {', '.join(f'{route}={count}' for route, count in counts.items() if count)}")
+
+
+def route_counts(routes: Dict[int, str]) -> Dict[str, int]:
+    """Number of pages per route"""
+    return {route: sum(1 for value in routes.values() if value == route) for route in ROUTES}
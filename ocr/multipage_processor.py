@@ -0,0 +1,268 @@
+"""
+Page-parallel rasterization and OCR of PDFs
+
+Pages are rasterized in ranges by pool processes and recognized by the same
+pool as soon as they are ready. Neither the PDF nor the page images travel
+through the pool's pipes: the PDF is placed in shared memory once, each
+rasterized page is written to its own shared memory block, and only block
+names and sizes are pickled. At most max_in_flight pages are rasterized and
+not yet recognized at any time, which bounds memory regardless of document
+length, and results are yielded in page order as soon as they are complete.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from config import Config
+from ocr.ocr_engine import process_pool, recognize_page
+from ocr.page_image_cache import decode_image, get_page_image_cache, page_key
+
+logger = logging.getLogger(__name__)
+
+# Pages per rasterization task (one pdftoppm run)
+RASTER_CHUNK_PAGES = 4
+
+# Page image cache profile of rasterized pages
+RASTER_PROFILE = "gray"
+
+# (page number, shared memory block name, (width, height), image mode)
+SharedPage = Tuple[int, str, Tuple[int, int], str]
+
+
+def rasterize_range(
+    pdf_block: str,
+    pdf_size: int,
+    first: int,
+    last: int,
+    dpi: int,
+    digest: Optional[str] = None
+) -> List[SharedPage]:
+    """
+    Rasterize pages first..last into shared memory (runs in pool processes)
+
+    Pages are rendered in grayscale, which is all Tesseract uses and a third
+    of the memory of RGB. With a document digest, pages are taken from and
+    added to the disk tier of the page image cache.
+
+    Returns:
+        One entry per rendered page; the caller owns (and unlinks) the blocks
+    """
+    from pdf2image import convert_from_bytes
+
+    cache = get_page_image_cache() if digest else None
+    images = {}
+    if cache is not None:
+        for number in range(first, last + 1):
+            data = cache.get_bytes(page_key(digest, number, dpi, RASTER_PROFILE), memory=False)
+            if data is not None:
+                images[number] = decode_image(data)
+
+    missing = [number for number in range(first, last + 1) if number not in images]
+    if missing:
+        shared_pdf = SharedMemory(name=pdf_block)
+        try:
+            content = bytes(shared_pdf.buf[:pdf_size])
+        finally:
+            shared_pdf.close()
+
+        rendered = convert_from_bytes(
+            content, dpi=dpi, first_page=missing[0], last_page=missing[-1], grayscale=True
+        )
+        for number, image in zip(range(missing[0], missing[-1] + 1), rendered):
+            if number in images:
+                continue
+            images[number] = image
+            if cache is not None:
+                cache.put(page_key(digest, number, dpi, RASTER_PROFILE), image, memory=False)
+
+    pages = []
+    for number in sorted(images):
+        image = images[number]
+        data = image.tobytes()
+        block = SharedMemory(create=True, size=max(1, len(data)))
+        block.buf[:len(data)] = data
+        pages.append((number, block.name, image.size, image.mode))
+        block.close()
+    return pages
+
+
+def recognize_shared_page(block_name: str, size: Tuple[int, int], mode: str, languages: str, tesseract_cmd: str) -> Dict[str, Any]:
+    """OCR a page image held in shared memory (runs in pool processes)"""
+    from PIL import Image
+
+    block = SharedMemory(name=block_name)
+    try:
+        image = Image.frombuffer(mode, size, block.buf, "raw", mode, 0, 1)
+        try:
+            return recognize_page(image, languages, tesseract_cmd)
+        finally:
+            # Drop the view on the block before closing it
+            image.close()
+            del image
+    finally:
+        block.close()
+
+
+def _release(block_name: str):
+    """Free a page's shared memory block"""
+    try:
+        block = SharedMemory(name=block_name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+class MultipageProcessor:
+    """
+    Rasterize and OCR PDF pages across a process pool
+    """
+
+    def __init__(
+        self,
+        pool: Optional[ProcessPoolExecutor] = None,
+        processes: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        dpi: Optional[int] = None,
+        languages: Optional[str] = None,
+        chunk_pages: int = RASTER_CHUNK_PAGES
+    ):
+        """
+        Initialize processor
+
+        Args:
+            pool: Process pool to run on (default: own pool of `processes`)
+            processes: Pool size when creating one, 0 for one per CPU (default: OCR_PROCESSES)
+            max_in_flight: Max rasterized pages awaiting OCR (default:
+                OCR_MAX_IN_FLIGHT_PAGES, 0 for two per process)
+            dpi: Rasterization resolution (default: OCR_DPI)
+            languages: Tesseract languages (default: OCR_LANGUAGES)
+            chunk_pages: Pages per rasterization task
+        """
+        processes = Config.OCR_PROCESSES if processes is None else processes
+        self._owns_pool = pool is None
+        self.pool = pool or process_pool(processes)
+        workers = getattr(self.pool, "_max_workers", None) or processes or os.cpu_count() or 1
+        max_in_flight = Config.OCR_MAX_IN_FLIGHT_PAGES if max_in_flight is None else max_in_flight
+        self.max_in_flight = max_in_flight or 2 * workers
+        self.dpi = dpi or Config.OCR_DPI
+        self.languages = languages or Config.OCR_LANGUAGES
+        self.chunk_pages = max(1, min(chunk_pages, self.max_in_flight))
+
+    def process(
+        self,
+        file_content: bytes,
+        page_numbers: List[int],
+        digest: Optional[str] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        OCR PDF pages
+
+        Args:
+            file_content: PDF
+            page_numbers: Sorted 1-based pages to process (must exist)
+            digest: SHA-256 hex digest of file_content, if already known
+
+        Yields:
+            (page number, recognize_page result) in page order
+        """
+        if not page_numbers:
+            return
+
+        ranges = self._ranges(page_numbers)
+        if Config.PAGE_CACHE_ENABLED:
+            digest = digest or hashlib.sha256(file_content).hexdigest()
+        else:
+            digest = None
+        shared_pdf = SharedMemory(create=True, size=max(1, len(file_content)))
+        shared_pdf.buf[:len(file_content)] = file_content
+
+        rasterizing: Dict[Future, Tuple[int, int]] = {}
+        recognizing: Dict[Future, Tuple[int, str]] = {}
+        # Blocks created by finished rasterizations and not yet released
+        blocks: Set[str] = set()
+        done: Dict[int, Dict[str, Any]] = {}
+        budget = self.max_in_flight
+        next_range = 0
+        next_index = 0
+
+        try:
+            while next_index < len(page_numbers):
+                # Start rasterizing ranges in page order while pages fit the budget
+                while next_range < len(ranges) and len(ranges[next_range]) <= budget:
+                    first, last = ranges[next_range][0], ranges[next_range][-1]
+                    future = self.pool.submit(
+                        rasterize_range, shared_pdf.name, len(file_content), first, last, self.dpi, digest
+                    )
+                    rasterizing[future] = (first, last)
+                    budget -= len(ranges[next_range])
+                    next_range += 1
+
+                finished, _ = wait(list(rasterizing) + list(recognizing), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future in rasterizing:
+                        first, last = rasterizing.pop(future)
+                        rendered = future.result()
+                        blocks.update(block_name for _, block_name, _, _ in rendered)
+                        # Pages past the end of the document are not rendered
+                        budget += (last - first + 1) - len(rendered)
+                        for number, block_name, size, mode in rendered:
+                            recognizing[self.pool.submit(
+                                recognize_shared_page,
+                                block_name,
+                                size,
+                                mode,
+                                self.languages,
+                                Config.TESSERACT_CMD
+                            )] = (number, block_name)
+                    else:
+                        number, block_name = recognizing.pop(future)
+                        _release(block_name)
+                        blocks.discard(block_name)
+                        budget += 1
+                        done[number] = future.result()
+
+                while next_index < len(page_numbers) and page_numbers[next_index] in done:
+                    number = page_numbers[next_index]
+                    yield number, done.pop(number)
+                    next_index += 1
+
+                if not rasterizing and not recognizing and next_range >= len(ranges):
+                    # Remaining pages were never rendered
+                    break
+        finally:
+            for future in list(rasterizing) + list(recognizing):
+                future.cancel()
+            # Rasterizations still running create blocks we must free too
+            for future in list(rasterizing):
+                try:
+                    blocks.update(block_name for _, block_name, _, _ in future.result())
+                except Exception:
+                    pass
+            for future in list(recognizing):
+                try:
+                    future.exception()
+                except Exception:
+                    pass
+            for block_name in blocks:
+                _release(block_name)
+            shared_pdf.close()
+            shared_pdf.unlink()
+
+    def close(self):
+        """Shut down the pool if this processor created it"""
+        if self._owns_pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _ranges(self, page_numbers: List[int]) -> List[List[int]]:
+        """Split pages into runs of consecutive pages of at most chunk_pages"""
+        ranges: List[List[int]] = []
+        for number in page_numbers:
+            if ranges and number == ranges[-1][-1] + 1 and len(ranges[-1]) < self.chunk_pages:
+                ranges[-1].append(number)
+            else:
+                ranges.append([number])
+        return ranges
@@ -0,0 +1,629 @@
+"""
+OCR engines behind CompleteDocumentExtractor
+
+An engine turns document bytes into Document AI documents: a Form Parser
+document (or None) and an OCR document. DocumentAIEngine calls the remote
+processors; TesseractEngine runs Tesseract locally and builds a document with
+the same pages/blocks/paragraphs/lines/tokens layout and confidences, so the
+result building code does not care which engine ran.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from google.cloud import documentai_v1 as documentai
+from google.oauth2 import service_account
+
+from config import Config
+from metrics import CACHE_REQUESTS, EXTRACTION_STAGE_SECONDS, PROCESSOR_CALLS, error_code
+from ocr.table_extractor import cell_words, detect_tables
+from processing.page_selection import check_page_selection, slice_pdf
+
+logger = logging.getLogger(__name__)
+
+# Document AI configuration
+PROJECT_ID = "rich-atom-476217-j9"
+LOCATION = "us"
+FORM_PARSER_ID = "337aa94aac26006"
+DOC_OCR_ID = "c0c01b0942616db6"
+SERVICE_ACCOUNT_FILE = "/app/service-account-key.json"
+
+# Metric series bound once so the hot path does not allocate
+_FORM_PARSER_SECONDS = EXTRACTION_STAGE_SECONDS.labels("form_parser")
+_OCR_SECONDS = EXTRACTION_STAGE_SECONDS.labels("ocr")
+_TESSERACT_SECONDS = EXTRACTION_STAGE_SECONDS.labels("tesseract")
+_FORM_PARSER_SUCCESS = PROCESSOR_CALLS.labels("form_parser", "success")
+_OCR_SUCCESS = PROCESSOR_CALLS.labels("ocr", "success")
+_TESSERACT_SUCCESS = PROCESSOR_CALLS.labels("tesseract", "success")
+_PAGE_CACHE_HIT = CACHE_REQUESTS.labels("ocr_page", "hit")
+_PAGE_CACHE_MISS = CACHE_REQUESTS.labels("ocr_page", "miss")
+
+# Server-side page selection (absent in older client libraries)
+_PAGE_SELECTOR = getattr(
+    getattr(documentai, "ProcessOptions", None), "IndividualPageSelector", None
+)
+
+# (Form Parser document, OCR document, original page number of each
+# processed page or None for all pages)
+EngineResult = Tuple[Optional[documentai.Document], Optional[documentai.Document], Optional[List[int]]]
+
+
+def _no_progress(stage: str, **data: Any):
+    """Default progress callback"""
+
+
+class OCREngine:
+    """
+    Base class of OCR engines
+    """
+
+    name = "base"
+    # Whether every call is billed (remote processors); callers then avoid
+    # speculative second passes
+    billed = False
+
+    def process_document(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]] = None,
+        notify: Callable[..., None] = _no_progress
+    ) -> EngineResult:
+        """
+        Recognize a document
+
+        Args:
+            file_content: Binary content
+            mime_type: MIME type
+            pages: Optional sorted 1-based pages to process
+            notify: Progress callback (form_parser_done, ocr_done)
+
+        Returns:
+            (Form Parser document, OCR document, original page number of each
+            processed page or None for all pages); a failed pass returns None
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release engine resources"""
+
+
+class DocumentAIEngine(OCREngine):
+    """
+    Google Document AI Form Parser and Document OCR processors
+    """
+
+    name = "documentai"
+    billed = True
+
+    def __init__(self):
+        """Initialize Document AI client"""
+        credentials = service_account.Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE,
+            scopes=["https://www.googleapis.com/auth/cloud-platform"]
+        )
+
+        self.client = documentai.DocumentProcessorServiceClient(
+            credentials=credentials
+        )
+
+        self.form_parser_name = self.client.processor_path(
+            PROJECT_ID, LOCATION, FORM_PARSER_ID
+        )
+        self.doc_ocr_name = self.client.processor_path(
+            PROJECT_ID, LOCATION, DOC_OCR_ID
+        )
+
+    def process_document(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]] = None,
+        notify: Callable[..., None] = _no_progress
+    ) -> EngineResult:
+        """Run both processors (see OCREngine.process_document)"""
+        # Send only the selected pages to the processors
+        file_content, process_options, page_numbers = self._select_pages(
+            file_content, mime_type, pages
+        )
+
+        # Process with BOTH processors
+        form_parser_result = self._process_with_form_parser(file_content, mime_type, process_options)
+        notify("form_parser_done", success=form_parser_result is not None)
+        ocr_result = self._process_with_ocr(file_content, mime_type, process_options)
+        notify("ocr_done", success=ocr_result is not None)
+
+        return form_parser_result, ocr_result, page_numbers
+
+    def _process_with_form_parser(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        process_options=None
+    ) -> Optional[documentai.Document]:
+        """Process with Form Parser"""
+        stage_start = time.perf_counter()
+        try:
+            request = documentai.ProcessRequest(
+                name=self.form_parser_name,
+                raw_document=documentai.RawDocument(
+                    content=file_content,
+                    mime_type=mime_type
+                ),
+                process_options=process_options
+            )
+
+            result = self.client.process_document(request=request)
+            _FORM_PARSER_SUCCESS.inc()
+            logger.info("Form Parser: SUCCESS")
+            return result.document
+
+        except Exception as e:
+            PROCESSOR_CALLS.labels("form_parser", error_code(e)).inc()
+            logger.warning(f"Form Parser error: {str(e)}")
+            return None
+        finally:
+            _FORM_PARSER_SECONDS.observe(time.perf_counter() - stage_start)
+
+    def _process_with_ocr(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        process_options=None
+    ) -> Optional[documentai.Document]:
+        """Process with Document OCR"""
+        stage_start = time.perf_counter()
+        try:
+            request = documentai.ProcessRequest(
+                name=self.doc_ocr_name,
+                raw_document=documentai.RawDocument(
+                    content=file_content,
+                    mime_type=mime_type
+                ),
+                process_options=process_options
+            )
+
+            result = self.client.process_document(request=request)
+            _OCR_SUCCESS.inc()
+            logger.info("Document OCR: SUCCESS")
+            return result.document
+
+        except Exception as e:
+            PROCESSOR_CALLS.labels("ocr", error_code(e)).inc()
+            logger.warning(f"Document OCR error: {str(e)}")
+            return None
+        finally:
+            _OCR_SECONDS.observe(time.perf_counter() - stage_start)
+
+    def _select_pages(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]]
+    ) -> Tuple[bytes, Any, Optional[List[int]]]:
+        """
+        Restrict processing to the selected pages
+
+        Uses Document AI's individual page selector when the client library
+        supports it, otherwise slices PDFs locally. Either way the processed
+        document holds the selected pages in order.
+
+        Returns:
+            (content to send, process options, original page number of each
+            processed page or None for all pages)
+        """
+        if not pages:
+            return file_content, None, None
+
+        if _PAGE_SELECTOR is not None:
+            options = documentai.ProcessOptions(
+                individual_page_selector=_PAGE_SELECTOR(pages=pages)
+            )
+            return file_content, options, pages
+
+        if mime_type == "application/pdf":
+            sliced, kept = slice_pdf(file_content, pages)
+            return sliced, None, kept
+
+        logger.warning(f"Page selection not supported for {mime_type}, processing all pages")
+        return file_content, None, None
+
+
+class PageCache:
+    """
+    Process-local LRU of per-page OCR results
+    """
+
+    def __init__(self, max_pages: int):
+        self.max_pages = max_pages
+        self._pages: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+        (_PAGE_CACHE_HIT if page is not None else _PAGE_CACHE_MISS).inc()
+        return page
+
+    def put(self, key: str, page: Dict[str, Any]):
+        if self.max_pages <= 0:
+            return
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+
+
+def _box(data: Dict[str, List[Any]], index: int) -> List[int]:
+    return [int(data["left"][index]), int(data["top"][index]), int(data["width"][index]), int(data["height"][index])]
+
+
+def recognize_page(image, languages: str, tesseract_cmd: str) -> Dict[str, Any]:
+    """
+    OCR one page image with Tesseract (runs in pool processes)
+
+    Returns:
+        {"width", "height", "blocks": [{"box", "paragraphs": [{"box",
+        "lines": [{"box", "words": [{"text", "confidence", "box"}]}]}]}],
+        "tables": [detect_tables table]} with boxes as [left, top, width,
+        height] in pixels
+    """
+    import pytesseract
+
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    data = pytesseract.image_to_data(image, lang=languages, output_type=pytesseract.Output.DICT)
+
+    # Tesseract reports one row per block, paragraph, line and word
+    blocks: Dict[int, Dict[str, Any]] = {}
+    for index, level in enumerate(data["level"]):
+        if level < 2:
+            continue
+        box = _box(data, index)
+        block = blocks.setdefault(data["block_num"][index], {"box": box, "paragraphs": {}})
+        if level == 2:
+            continue
+        paragraph = block["paragraphs"].setdefault(data["par_num"][index], {"box": box, "lines": {}})
+        if level == 3:
+            continue
+        line = paragraph["lines"].setdefault(data["line_num"][index], {"box": box, "words": []})
+        if level == 5:
+            text = str(data["text"][index]).strip()
+            confidence = float(data["conf"][index])
+            if text and confidence >= 0:
+                line["words"].append({
+                    "text": text,
+                    "confidence": confidence / 100.0,
+                    "box": _box(data, index)
+                })
+
+    page_blocks = []
+    for block in blocks.values():
+        paragraphs = []
+        for paragraph in block["paragraphs"].values():
+            lines = [line for line in paragraph["lines"].values() if line["words"]]
+            if lines:
+                paragraphs.append({"box": paragraph["box"], "lines": lines})
+        if paragraphs:
+            page_blocks.append({"box": block["box"], "paragraphs": paragraphs})
+
+    tables = []
+    if Config.OCR_DETECT_TABLES:
+        try:
+            tables = detect_tables(image)
+        except Exception as e:
+            logger.warning(f"Table detection failed: {str(e)}")
+
+    width, height = image.size
+    return {"width": width, "height": height, "blocks": page_blocks, "tables": tables}
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def _layout(start: int, end: int, confidence: float, box: List[int], width: int, height: int) -> Dict[str, Any]:
+    left, top, box_width, box_height = box
+    right, bottom = left + box_width, top + box_height
+    return {
+        "text_anchor": {"text_segments": [{"start_index": start, "end_index": end}]},
+        "confidence": confidence,
+        "bounding_poly": {
+            "normalized_vertices": [
+                {"x": x / max(width, 1), "y": y / max(height, 1)}
+                for x, y in ((left, top), (right, top), (right, bottom), (left, bottom))
+            ]
+        }
+    }
+
+
+def _table(table: Dict[str, Any], words: List[Tuple[Dict[str, Any], int, int]], width: int, height: int) -> Dict[str, Any]:
+    """Document AI table for a detect_tables table; cells anchor to their words"""
+    rows: Dict[int, List[Dict[str, Any]]] = {}
+    for cell, indices in zip(table["cells"], cell_words(table, [word for word, _, _ in words])):
+        segments: List[Dict[str, int]] = []
+        for position, index in enumerate(indices):
+            _, start, end = words[index]
+            if position < len(indices) - 1:
+                # Keep the space or newline after the word
+                end += 1
+            if segments and segments[-1]["end_index"] == start:
+                segments[-1]["end_index"] = end
+            else:
+                segments.append({"start_index": start, "end_index": end})
+        layout = _layout(0, 0, _mean([words[index][0]["confidence"] for index in indices]), cell["box"], width, height)
+        layout["text_anchor"] = {"text_segments": segments}
+        rows.setdefault(cell["row"], []).append({
+            "layout": layout,
+            "row_span": cell["row_span"],
+            "col_span": cell["col_span"]
+        })
+
+    ordered = [{"cells": rows[row]} for row in sorted(rows)]
+    header_rows = table["header_rows"]
+    return {
+        "layout": _layout(0, 0, 0.0, table["box"], width, height),
+        "header_rows": ordered[:header_rows],
+        "body_rows": ordered[header_rows:]
+    }
+
+
+def _form_field(field: Dict[str, List[Dict[str, Any]]], positions: Dict[int, Tuple[int, int]], width: int, height: int) -> Dict[str, Any]:
+    """Document AI form field for a {"name", "value"} pair of a line's words"""
+    def layout(words: List[Dict[str, Any]]) -> Dict[str, Any]:
+        boxes = [word["box"] for word in words]
+        left = min(box[0] for box in boxes)
+        top = min(box[1] for box in boxes)
+        right = max(box[0] + box[2] for box in boxes)
+        bottom = max(box[1] + box[3] for box in boxes)
+        return _layout(
+            positions[id(words[0])][0],
+            positions[id(words[-1])][1],
+            _mean([word["confidence"] for word in words]),
+            [left, top, right - left, bottom - top],
+            width,
+            height
+        )
+
+    return {"field_name": layout(field["name"]), "field_value": layout(field["value"])}
+
+
+def build_document(pages: List[Dict[str, Any]]) -> documentai.Document:
+    """
+    Build a Document AI document from recognize_page results
+
+    Lines end with a newline and paragraphs with a blank line; every layout
+    element anchors into the document text with its mean word confidence.
+    Detected tables become page tables whose cells anchor to their words,
+    and "form_fields" pairs ({"name", "value"} word lists of one line) page
+    form fields.
+    """
+    text: List[str] = []
+    offset = 0
+    document_pages = []
+
+    def append(piece: str) -> Tuple[int, int]:
+        nonlocal offset
+        start = offset
+        text.append(piece)
+        offset += len(piece)
+        return start, offset
+
+    for page_number, page in enumerate(pages, 1):
+        width, height = page["width"], page["height"]
+        page_start = offset
+        tokens, lines, paragraphs, blocks = [], [], [], []
+        words: List[Tuple[Dict[str, Any], int, int]] = []
+        page_confidences: List[float] = []
+
+        for block in page["blocks"]:
+            block_start = offset
+            block_confidences: List[float] = []
+            for paragraph in block["paragraphs"]:
+                paragraph_start = offset
+                paragraph_confidences: List[float] = []
+                for line in paragraph["lines"]:
+                    line_start = offset
+                    line_confidences = []
+                    for position, word in enumerate(line["words"]):
+                        if position:
+                            append(" ")
+                        start, end = append(word["text"])
+                        words.append((word, start, end))
+                        tokens.append({"layout": _layout(start, end, word["confidence"], word["box"], width, height)})
+                        line_confidences.append(word["confidence"])
+                    append("\n")
+                    lines.append({"layout": _layout(line_start, offset, _mean(line_confidences), line["box"], width, height)})
+                    paragraph_confidences.extend(line_confidences)
+                append("\n")
+                paragraphs.append({
+                    "layout": _layout(paragraph_start, offset, _mean(paragraph_confidences), paragraph["box"], width, height)
+                })
+                block_confidences.extend(paragraph_confidences)
+            blocks.append({"layout": _layout(block_start, offset, _mean(block_confidences), block["box"], width, height)})
+            page_confidences.extend(block_confidences)
+
+        positions = {id(word): (start, end) for word, start, end in words}
+        document_pages.append({
+            "page_number": page_number,
+            "dimension": {"width": width, "height": height, "unit": "pixels"},
+            "layout": _layout(page_start, offset, _mean(page_confidences), [0, 0, width, height], width, height),
+            "blocks": blocks,
+            "paragraphs": paragraphs,
+            "lines": lines,
+            "tokens": tokens,
+            "tables": [_table(table, words, width, height) for table in page.get("tables", [])],
+            "form_fields": [_form_field(field, positions, width, height) for field in page.get("form_fields", [])]
+        })
+
+    return documentai.Document(text="".join(text), pages=document_pages)
+
+
+def process_pool(processes: int) -> ProcessPoolExecutor:
+    """Process pool for OCR; forkserver keeps children free of parent threads"""
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count(), mp_context=context)
+
+
+class TesseractEngine(OCREngine):
+    """
+    Local Tesseract OCR
+
+    Pages are rasterized and recognized in a process pool (PDFs through
+    MultipageProcessor) and cached per page, so repeated or overlapping page
+    selections of a document are free. There is no Form Parser pass: the
+    result carries an OCR document only.
+    """
+
+    name = "tesseract"
+
+    def __init__(
+        self,
+        languages: Optional[str] = None,
+        dpi: Optional[int] = None,
+        processes: Optional[int] = None,
+        cache_pages: Optional[int] = None
+    ):
+        """
+        Initialize engine
+
+        Args:
+            languages: Tesseract languages, e.g. "eng+spa" (default: OCR_LANGUAGES)
+            dpi: Rasterization resolution for PDFs (default: OCR_DPI)
+            processes: OCR processes, 0 for one per CPU (default: OCR_PROCESSES)
+            cache_pages: Pages kept in the result cache (default: OCR_CACHE_PAGES)
+        """
+        self.languages = languages or Config.OCR_LANGUAGES
+        self.dpi = dpi or Config.OCR_DPI
+        self.processes = Config.OCR_PROCESSES if processes is None else processes
+        self.cache = PageCache(Config.OCR_CACHE_PAGES if cache_pages is None else cache_pages)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def process_document(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]] = None,
+        notify: Callable[..., None] = _no_progress
+    ) -> EngineResult:
+        """Run Tesseract on the document (see OCREngine.process_document)"""
+        stage_start = time.perf_counter()
+        document, page_numbers = None, None
+        try:
+            document, page_numbers = self.recognize(file_content, mime_type, pages)
+            _TESSERACT_SUCCESS.inc()
+            logger.info(f"Tesseract OCR: SUCCESS ({len(document.pages)} pages)")
+        except Exception as e:
+            PROCESSOR_CALLS.labels("tesseract", error_code(e)).inc()
+            logger.warning(f"Tesseract OCR error: {str(e)}")
+        finally:
+            _TESSERACT_SECONDS.observe(time.perf_counter() - stage_start)
+
+        notify("ocr_done", success=document is not None)
+        return None, document, page_numbers
+
+    def recognize(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]] = None
+    ) -> Tuple[documentai.Document, Optional[List[int]]]:
+        """
+        OCR the selected pages, using cached pages where possible
+
+        Returns:
+            (OCR document, original page numbers or None for all pages)
+
+        Raises:
+            ValueError: A selected page does not exist in the document
+        """
+        digest = hashlib.sha256(file_content).hexdigest()
+        numbers = self._page_numbers(file_content, mime_type, pages)
+
+        results: Dict[int, Dict[str, Any]] = {}
+        missing = []
+        for number in numbers:
+            cached = self.cache.get(self._cache_key(digest, number))
+            if cached is not None:
+                results[number] = cached
+            else:
+                missing.append(number)
+
+        if missing:
+            for number, page in self._recognize_pages(file_content, mime_type, missing, digest):
+                results[number] = page
+                self.cache.put(self._cache_key(digest, number), page)
+
+        document = build_document([results[number] for number in numbers])
+        return document, numbers if pages else None
+
+    def close(self):
+        """Shut down the OCR process pool"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = process_pool(self.processes)
+            return self._pool
+
+    def _cache_key(self, digest: str, page: int) -> str:
+        return f"{digest}:{page}:{self.dpi}:{self.languages}"
+
+    def _page_numbers(self, file_content: bytes, mime_type: str, pages: Optional[List[int]]) -> List[int]:
+        """Original page numbers to process, in order"""
+        if mime_type == "application/pdf":
+            from pdf2image import pdfinfo_from_bytes
+
+            total = int(pdfinfo_from_bytes(file_content)["Pages"])
+        else:
+            from PIL import Image
+
+            with Image.open(io.BytesIO(file_content)) as image:
+                total = getattr(image, "n_frames", 1)
+
+        if not pages:
+            return list(range(1, total + 1))
+        check_page_selection(pages, total)
+        return list(pages)
+
+    def _recognize_pages(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        numbers: List[int],
+        digest: Optional[str] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (page number, recognize_page result) in page order"""
+        pool = self._get_pool()
+        if mime_type == "application/pdf":
+            from ocr.multipage_processor import MultipageProcessor
+
+            processor = MultipageProcessor(pool=pool, dpi=self.dpi, languages=self.languages)
+            yield from processor.process(file_content, numbers, digest)
+            return
+
+        from PIL import Image
+
+        futures = []
+        with Image.open(io.BytesIO(file_content)) as image:
+            for number in numbers:
+                image.seek(number - 1)
+                frame = image.convert("RGB") if image.mode not in ("1", "L", "RGB") else image.copy()
+                futures.append((number, pool.submit(recognize_page, frame, self.languages, Config.TESSERACT_CMD)))
+        for number, future in futures:
+            yield number, future.result()
@@ -0,0 +1,70 @@
+"""
+OCR engine registry
+
+Engines are created lazily, once per process: gRPC clients and process pools
+must not be shared across a fork (API server workers, worker processes).
+"""
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from ocr.ocr_engine import DocumentAIEngine, OCREngine, TesseractEngine
+
+logger = logging.getLogger(__name__)
+
+_factories: Dict[str, Callable[[], OCREngine]] = {
+    DocumentAIEngine.name: DocumentAIEngine,
+    TesseractEngine.name: TesseractEngine
+}
+_engines: Dict[str, OCREngine] = {}
+_owner_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def register_engine(name: str, factory: Callable[[], OCREngine]):
+    """
+    Register an OCR engine
+
+    Args:
+        name: Backend name used in OCR_BACKEND
+        factory: Callable creating the engine
+    """
+    with _lock:
+        _factories[name.lower()] = factory
+        _engines.pop(name.lower(), None)
+
+
+def available_engines() -> List[str]:
+    """Names of registered engines"""
+    return sorted(_factories)
+
+
+def get_engine(name: Optional[str] = None) -> OCREngine:
+    """
+    Get this process's engine
+
+    Args:
+        name: Backend name (default: OCR_BACKEND)
+
+    Raises:
+        ValueError: Unknown backend
+    """
+    global _owner_pid
+    name = (name or Config.OCR_BACKEND).lower()
+    with _lock:
+        if _owner_pid != os.getpid():
+            # Inherited from a parent process: unusable here
+            _engines.clear()
+            _owner_pid = os.getpid()
+        engine = _engines.get(name)
+        if engine is None:
+            factory = _factories.get(name)
+            if factory is None:
+                raise ValueError(
+                    f"Unknown OCR backend '{name}' (available: {', '.join(sorted(_factories))})"
+                )
+            engine = _engines[name] = factory()
+            logger.info(f"OCR engine initialized: {name}")
+        return engine
@@ -0,0 +1,288 @@
+"""
+Cache of rendered page images
+
+Rasterizing a PDF page is the most expensive step of local OCR, and the
+same pages are needed again for table detection, selective re-OCR at a
+higher resolution and repeated requests. Pages are cached as PNG under
+(document hash, page, DPI, profile) in two tiers, both LRU and bounded in
+bytes:
+
+- Memory: per process, holding the encoded PNGs
+- Disk: a directory shared by every process on the host (API workers, OCR
+  pool processes); recency is the file mtime, so any process can evict
+
+Concurrent requests for the same page in one process render it once.
+"""
+import io
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from config import Config
+from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_MEMORY_HIT = CACHE_REQUESTS.labels("page_image_memory", "hit")
+_MEMORY_MISS = CACHE_REQUESTS.labels("page_image_memory", "miss")
+_DISK_HIT = CACHE_REQUESTS.labels("page_image_disk", "hit")
+_DISK_MISS = CACHE_REQUESTS.labels("page_image_disk", "miss")
+
+# PNG compression level: fast to write, still 3-10x smaller than raw pixels
+PNG_COMPRESS_LEVEL = 3
+
+
+def page_key(digest: str, page: int, dpi: int, profile: str) -> str:
+    """Cache key of a rendered page"""
+    return f"{digest}-{page}-{dpi}-{profile}"
+
+
+def encode_image(image) -> bytes:
+    """Compress a page image for caching"""
+    output = io.BytesIO()
+    image.save(output, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return output.getvalue()
+
+
+def decode_image(data: bytes):
+    """Load a cached page image"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+class PageImageCache:
+    """
+    Two-tier LRU cache of encoded page images
+    """
+
+    def __init__(
+        self,
+        memory_bytes: Optional[int] = None,
+        disk_dir: Optional[str] = None,
+        disk_bytes: Optional[int] = None
+    ):
+        """
+        Initialize cache
+
+        Args:
+            memory_bytes: Memory tier budget (default: PAGE_CACHE_MEMORY_MB)
+            disk_dir: Disk tier directory, "" to disable (default: PAGE_CACHE_DIR)
+            disk_bytes: Disk tier budget (default: PAGE_CACHE_DISK_MB)
+        """
+        self.memory_bytes = Config.PAGE_CACHE_MEMORY_MB * 1024 * 1024 if memory_bytes is None else memory_bytes
+        self.disk_dir = Config.PAGE_CACHE_DIR if disk_dir is None else disk_dir
+        self.disk_bytes = Config.PAGE_CACHE_DISK_MB * 1024 * 1024 if disk_bytes is None else disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._disk_used = 0
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        if self.disk_dir and self.disk_bytes > 0:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+                self._disk_used = sum(entry.stat().st_size for entry in self._disk_entries())
+            except OSError as e:
+                logger.warning(f"Page image disk cache disabled: {str(e)}")
+                self.disk_dir = ""
+
+    def get(self, key: str, memory: bool = True):
+        """Cached page image or None"""
+        data = self.get_bytes(key, memory)
+        return decode_image(data) if data is not None else None
+
+    def get_bytes(self, key: str, memory: bool = True) -> Optional[bytes]:
+        """
+        Encoded page image from the memory tier, then the disk tier
+
+        Args:
+            key: Key from page_key
+            memory: Use this process's memory tier (see put)
+        """
+        if not memory:
+            data = self._read_disk(key)
+            (_DISK_HIT if data is not None else _DISK_MISS).inc()
+            return data
+
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                _MEMORY_HIT.inc()
+                return data
+        _MEMORY_MISS.inc()
+
+        data = self._read_disk(key)
+        if data is None:
+            _DISK_MISS.inc()
+            return None
+        _DISK_HIT.inc()
+        self._put_memory(key, data)
+        return data
+
+    def put(self, key: str, image, memory: bool = True) -> bytes:
+        """
+        Cache a page image
+
+        Args:
+            key: Key from page_key
+            image: PIL image
+            memory: Also keep it in this process's memory tier (pool
+                processes only feed the shared disk tier)
+
+        Returns:
+            The encoded image
+        """
+        data = encode_image(image)
+        if memory:
+            self._put_memory(key, data)
+        self._write_disk(key, data)
+        return data
+
+    def get_or_render(self, key: str, render: Callable[[], object]):
+        """
+        Cached page image, rendering it at most once across concurrent callers
+
+        Args:
+            key: Key from page_key
+            render: Returns the PIL image on a miss
+
+        Returns:
+            PIL image
+        """
+        data = self.get_bytes(key)
+        if data is not None:
+            return decode_image(data)
+
+        with self._lock:
+            data = self._memory.get(key)
+            future = self._inflight.get(key)
+            leader = data is None and future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if data is not None:
+            # Rendered by a leader that finished after our lookup
+            return decode_image(data)
+        if not leader:
+            return decode_image(future.result())
+
+        try:
+            image = render()
+            future.set_result(self.put(key, image))
+            return image
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self):
+        """Drop the memory tier"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_used -= len(previous)
+            self._memory[key] = data
+            self._memory_used += len(data)
+            while self._memory_used > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + ".png")
+
+    def _disk_entries(self):
+        return [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".png")]
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # Recency for LRU eviction
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        if not self.disk_dir or len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Page image cache write failed: {str(e)}")
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            self._disk_used += len(data)
+            over = self._disk_used > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least recently used files until the directory fits the budget"""
+        try:
+            entries = []
+            for entry in self._disk_entries():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as e:
+            logger.warning(f"Page image cache eviction failed: {str(e)}")
+            return
+
+        # Other processes write here too: recount from the directory
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if used <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                used -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_used = used
+
+
+_cache: Optional[PageImageCache] = None
+_cache_pid: Optional[int] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_image_cache() -> PageImageCache:
+    """Get this process's page image cache"""
+    global _cache, _cache_pid
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = PageImageCache()
+            _cache_pid = os.getpid()
+        return _cache
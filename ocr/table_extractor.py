@@ -0,0 +1,213 @@
+"""
+Local table structure extraction for ruled tables
+
+Ruling lines are found with morphological opening (long thin kernels keep
+only horizontal or vertical strokes), each cluster of crossing rulings is a
+table, and the ruling positions give its row/column grid. Missing ruling
+segments between neighbouring grid cells mark merged cells. build_document
+fills the cells with OCR or text-layer words by position (cell_words) and
+emits them as Document AI page tables, so simple ruled tables (repayment
+schedules, fee tables) need no Form Parser.
+"""
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Minimum ruling length as a share of the page side
+RULING_FRACTION = 1 / 30
+# Share of a cell side a ruling must cover to separate two cells
+SEPARATOR_COVERAGE = 0.5
+# Pixels either side of a ruling position searched for the ruling
+RULING_TOLERANCE = 3
+# Smallest table, in pixels per side
+MIN_TABLE_SIZE = 40
+
+
+def _runs(profile: np.ndarray) -> np.ndarray:
+    """Centers of the runs of True in a 1-D profile"""
+    edges = np.diff(np.concatenate(([0], profile.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return (starts + ends - 1) // 2
+
+
+def ruling_masks(image) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Horizontal and vertical ruling lines of a page image
+
+    Args:
+        image: PIL image or 2-D grayscale array
+
+    Returns:
+        (horizontal, vertical) boolean masks of the page size
+    """
+    import cv2
+
+    gray = np.asarray(image.convert("L") if hasattr(image, "convert") else image, dtype=np.uint8)
+    # Ink is foreground; adaptive threshold copes with uneven scans
+    binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10)
+    height, width = binary.shape
+
+    def rulings(size) -> np.ndarray:
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, size)
+        lines = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel)
+        # Bridge small breaks from scanning
+        return cv2.dilate(lines, np.ones((3, 3), np.uint8)) > 0
+
+    horizontal = rulings((max(10, int(width * RULING_FRACTION)), 1))
+    vertical = rulings((1, max(10, int(height * RULING_FRACTION))))
+    return horizontal, vertical
+
+
+def _coverage(mask: np.ndarray, positions: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """
+    Share of each segment between consecutive bounds covered by each ruling
+
+    mask is indexed [along, across]: rulings run along axis 0 at `positions`
+    on axis 1. Returns an array of shape (len(bounds) - 1, len(positions)).
+    """
+    if not len(positions):
+        return np.zeros((len(bounds) - 1, 0))
+    across = mask.shape[1]
+    columns = np.stack([
+        mask[:, max(0, position - RULING_TOLERANCE):min(across, position + RULING_TOLERANCE + 1)].any(axis=1)
+        for position in positions
+    ], axis=1)
+    totals = np.vstack([np.zeros((1, len(positions))), np.cumsum(columns, axis=0)])
+    lengths = np.maximum(np.diff(bounds), 1)[:, None]
+    return (totals[bounds[1:]] - totals[bounds[:-1]]) / lengths
+
+
+def _grid_cells(open_right: np.ndarray, open_down: np.ndarray) -> List[Dict[str, int]]:
+    """Merge grid cells joined by missing separators into spanning cells"""
+    rows, columns = open_down.shape[0] + 1, open_right.shape[1] + 1
+    parent = list(range(rows * columns))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for row, column in zip(*np.nonzero(open_right)):
+        parent[find(row * columns + column)] = find(row * columns + column + 1)
+    for row, column in zip(*np.nonzero(open_down)):
+        parent[find(row * columns + column)] = find((row + 1) * columns + column)
+
+    spans: Dict[int, List[int]] = {}
+    for index in range(rows * columns):
+        row, column = divmod(index, columns)
+        span = spans.setdefault(find(index), [row, column, row, column])
+        span[0], span[1] = min(span[0], row), min(span[1], column)
+        span[2], span[3] = max(span[2], row), max(span[3], column)
+
+    cells = [
+        {"row": top, "col": left, "row_span": bottom - top + 1, "col_span": right - left + 1}
+        for top, left, bottom, right in spans.values()
+    ]
+    cells.sort(key=lambda cell: (cell["row"], cell["col"]))
+    return cells
+
+
+def detect_tables(image) -> List[Dict[str, Any]]:
+    """
+    Find ruled tables and their cell grids on a page image
+
+    Args:
+        image: PIL image or 2-D grayscale array
+
+    Returns:
+        Tables in reading order: {"box", "header_rows", "cells": [{"row",
+        "col", "row_span", "col_span", "box"}]} with boxes as [left, top,
+        width, height] in pixels and header_rows the number of header rows
+    """
+    import cv2
+
+    horizontal, vertical = ruling_masks(image)
+    count, _, stats, _ = cv2.connectedComponentsWithStats((horizontal | vertical).astype(np.uint8), connectivity=8)
+
+    tables = []
+    for left, top, width, height, _ in stats[1:count]:
+        if width < MIN_TABLE_SIZE or height < MIN_TABLE_SIZE:
+            continue
+        region_h = horizontal[top:top + height, left:left + width]
+        region_v = vertical[top:top + height, left:left + width]
+        row_lines = _runs(region_h.any(axis=1))
+        column_lines = _runs(region_v.any(axis=0))
+        if len(row_lines) < 2 or len(column_lines) < 2:
+            # A box or a lone rule, not a grid
+            continue
+
+        # Vertical separators per row band, horizontal separators per column band
+        vertical_coverage = _coverage(region_v, column_lines[1:-1], row_lines)
+        horizontal_coverage = _coverage(region_h.T, row_lines[1:-1], column_lines).T
+        cells = _grid_cells(vertical_coverage < SEPARATOR_COVERAGE, horizontal_coverage < SEPARATOR_COVERAGE)
+        if len(cells) < 2:
+            continue
+
+        for cell in cells:
+            x0 = column_lines[cell["col"]]
+            x1 = column_lines[cell["col"] + cell["col_span"]]
+            y0 = row_lines[cell["row"]]
+            y1 = row_lines[cell["row"] + cell["row_span"]]
+            cell["box"] = [int(left + x0), int(top + y0), int(x1 - x0), int(y1 - y0)]
+
+        # The first row (with any header cells spanning down) is the header
+        header_rows = max(cell["row_span"] for cell in cells if cell["row"] == 0)
+        tables.append({
+            "box": [int(left), int(top), int(width), int(height)],
+            "header_rows": header_rows if header_rows < len(row_lines) - 1 else 0,
+            "cells": cells
+        })
+
+    tables.sort(key=lambda table: (table["box"][1], table["box"][0]))
+    return tables
+
+
+def scale_table(table: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    """
+    A detect_tables table with its boxes scaled, e.g. from render pixels to
+    PDF points (factor 72 / dpi)
+    """
+    def scale(box: List[int]) -> List[int]:
+        return [int(round(value * factor)) for value in box]
+
+    return {
+        "box": scale(table["box"]),
+        "header_rows": table["header_rows"],
+        "cells": [dict(cell, box=scale(cell["box"])) for cell in table["cells"]]
+    }
+
+
+def cell_words(table: Dict[str, Any], words: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Assign words to the cells of a detect_tables table
+
+    Args:
+        table: Table from detect_tables
+        words: Words with "box" in the same pixel coordinates as the image
+
+    Returns:
+        Indices into words for each cell, in word order
+    """
+    assigned: List[List[int]] = [[] for _ in table["cells"]]
+    if not words or not table["cells"]:
+        return assigned
+
+    boxes = np.array([word["box"] for word in words], dtype=np.float64).reshape(-1, 4)
+    centers_x = boxes[:, 0] + boxes[:, 2] / 2
+    centers_y = boxes[:, 1] + boxes[:, 3] / 2
+    cells = np.array([cell["box"] for cell in table["cells"]], dtype=np.float64)
+    inside = (
+        (centers_x[:, None] >= cells[None, :, 0])
+        & (centers_x[:, None] < cells[None, :, 0] + cells[None, :, 2])
+        & (centers_y[:, None] >= cells[None, :, 1])
+        & (centers_y[:, None] < cells[None, :, 1] + cells[None, :, 3])
+    )
+    for word_index, cell_index in zip(*np.nonzero(inside)):
+        assigned[cell_index].append(int(word_index))
+    return assigned
+
@@ -2,23 +2,54 @@
 Complete Document Extractor using Google Document AI
 Extracts ALL text, data, numbers, tables, boxes, nested columns
 Uses both Form Parser and Document OCR for maximum accuracy
+OCR runs on a pluggable engine (ocr.ocr_engine): Document AI or local Tesseract
 """
 import os
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from google.cloud import documentai_v1 as documentai
-from google.oauth2 import service_account
 import json
 import re
+import time
+
+from config import Config
+from extraction.fee_extractor import extract_fees, fee_summary
+from extraction.field_extractor import extract_fields
+from extraction.schedule_extractor import extract_schedules
+from metrics import EXTRACTION_STAGE_SECONDS
+from ocr.image_preprocessor import IMAGE_TYPES, preprocess_document
+from ocr.mixed_content_handler import ROUTE_BLANK, ROUTE_LOCAL, ROUTE_TEXT_LAYER, PageRouter, route_counts
+from ocr.ocr_engine import OCREngine
+from ocr.region_refiner import RegionRefiner
+from ocr.ocr_service import get_engine
+from processing.page_selection import format_page_ranges, original_page_numbers
 
 logger = logging.getLogger(__name__)
 
-# Configuration
-PROJECT_ID = "rich-atom-476217-j9"
-LOCATION = "us"
-FORM_PARSER_ID = "337aa94aac26006"
-DOC_OCR_ID = "c0c01b0942616db6"
-SERVICE_ACCOUNT_FILE = "/app/service-account-key.json"
+# Pattern for various number formats (compiled once, shared by forked workers)
+NUMBER_PATTERNS = [
+    (re.compile(r'\d+\.\d+'), 'decimal'),
+    (re.compile(r'\d+,\d+'), 'comma_separated'),
+    (re.compile(r'\d+'), 'integer'),
+    (re.compile(r'\$\s*\d+(?:,\d{3})*(?:\.\d{2})?'), 'currency'),
+    (re.compile(r'\d+%'), 'percentage'),
+]
+
+# Metric series bound once so the hot path does not allocate
+_EXTRACT_EVERYTHING_SECONDS = EXTRACTION_STAGE_SECONDS.labels("extract_everything")
+_FIELDS_SECONDS = EXTRACTION_STAGE_SECONDS.labels("loan_fields")
+_FEES_SECONDS = EXTRACTION_STAGE_SECONDS.labels("fees")
+_SCHEDULE_SECONDS = EXTRACTION_STAGE_SECONDS.labels("repayment_schedule")
+_ACCURACY_SECONDS = EXTRACTION_STAGE_SECONDS.labels("calculate_accuracy")
+_TOTAL_SECONDS = EXTRACTION_STAGE_SECONDS.labels("total")
+
+# (page, block) -> (text field, start, end, text element index) of each page
+# block; start and end are None when the block is not one range of the text
+BlockSpans = Dict[Tuple[int, int], Tuple[str, Optional[int], Optional[int], int]]
+
+
+def _no_progress(stage: str, **data: Any):
+    """Default progress callback"""
 
 
 class CompleteDocumentExtractor:
@@ -27,26 +58,22 @@ class CompleteDocumentExtractor:
     Extracts everything from documents with accuracy validation
     """
     
-    def __init__(self):
-        """Initialize Document AI client"""
+    def __init__(self, engine: Optional[OCREngine] = None, build_only: bool = False):
+        """
+        Initialize OCR engine
+        
+        Args:
+            engine: OCR engine (default: OCR_BACKEND, Document AI)
+            build_only: Create no engine; only build_result can be used
+        """
+        self._refiner: Optional[RegionRefiner] = None
+        self._router: Optional[PageRouter] = None
+        if build_only:
+            self.engine = None
+            return
         try:
-            credentials = service_account.Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE,
-                scopes=["https://www.googleapis.com/auth/cloud-platform"]
-            )
-            
-            self.client = documentai.DocumentProcessorServiceClient(
-                credentials=credentials
-            )
-            
-            self.form_parser_name = self.client.processor_path(
-                PROJECT_ID, LOCATION, FORM_PARSER_ID
-            )
-            self.doc_ocr_name = self.client.processor_path(
-                PROJECT_ID, LOCATION, DOC_OCR_ID
-            )
-            
-            logger.info("Complete Document Extractor initialized")
+            self.engine = engine or get_engine()
+            logger.info(f"Complete Document Extractor initialized ({self.engine.name})")
             
         except Exception as e:
             logger.error(f"Failed to initialize: {str(e)}")
@@ -56,7 +83,9 @@ class CompleteDocumentExtractor:
         self, 
         file_content: bytes, 
         mime_type: str,
-        filename: str
+        filename: str,
+        progress: Optional[Callable[..., None]] = None,
+        pages: Optional[List[int]] = None
     ) -> Dict[str, Any]:
         """
         Extract EVERYTHING from document using both processors
@@ -65,36 +94,41 @@ class CompleteDocumentExtractor:
             file_content: Binary content
             mime_type: MIME type
             filename: File name
+            progress: Optional callback progress(stage, **data) for stage events
+            pages: Optional sorted 1-based pages to extract (default: all);
+                page numbers in the result refer to the original document
             
         Returns:
             Complete extraction with accuracy metrics
         """
+        notify = progress or _no_progress
         try:
             logger.info(f"Starting complete extraction: {filename}")
+            started = time.perf_counter()
             
-            # Process with BOTH processors
-            form_parser_result = self._process_with_form_parser(file_content, mime_type)
-            ocr_result = self._process_with_ocr(file_content, mime_type)
-            
-            # Extract everything from both
-            complete_data = self._extract_everything(
-                form_parser_result, 
-                ocr_result, 
-                filename
+            form_parser_result, ocr_result, page_numbers, page_routes, source = self.process_document(
+                file_content, mime_type, pages, notify
             )
-            
-            # Calculate real accuracy
-            accuracy_metrics = self._calculate_accuracy(
+            # Block boxes refer to the image the engine read (preprocessed or not)
+            read_content, read_type = source
+            refinements = self.refine_regions(
+                read_content, read_type, form_parser_result, ocr_result, page_numbers
+            )
+            complete_data = self.build_result(
                 form_parser_result,
                 ocr_result,
-                complete_data
+                filename,
+                page_numbers,
+                pages,
+                notify,
+                engine=self.engine.name,
+                page_routes=page_routes,
+                refinements=refinements
             )
-            
-            # Add accuracy to result
-            complete_data["accuracy_metrics"] = accuracy_metrics
+            _TOTAL_SECONDS.observe(time.perf_counter() - started)
             
             logger.info(f"Extraction complete: {filename}")
-            logger.info(f"Overall accuracy: {accuracy_metrics['overall_accuracy']:.2%}")
+            logger.info(f"Overall accuracy: {complete_data['accuracy_metrics']['overall_accuracy']:.2%}")
             
             return complete_data
             
@@ -106,59 +140,339 @@ class CompleteDocumentExtractor:
                 "extraction_status": "failed"
             }
     
-    def _process_with_form_parser(
-        self, 
-        file_content: bytes, 
-        mime_type: str
-    ) -> Optional[documentai.Document]:
-        """Process with Form Parser"""
-        try:
-            request = documentai.ProcessRequest(
-                name=self.form_parser_name,
-                raw_document=documentai.RawDocument(
-                    content=file_content,
-                    mime_type=mime_type
-                )
-            )
-            
-            result = self.client.process_document(request=request)
-            logger.info("Form Parser: SUCCESS")
-            return result.document
+    def process_document(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]] = None,
+        notify: Callable[..., None] = _no_progress
+    ) -> Tuple[Optional[documentai.Document], Optional[documentai.Document], Optional[List[int]], Dict[int, str], Tuple[bytes, str]]:
+        """
+        Run the OCR engine (the I/O-bound half of extraction)
+        
+        PDF pages are routed individually (see PageRouter): pages with a
+        usable text layer are read directly, blank pages skip OCR, clean
+        prints go to the local engine and only the rest to this extractor's
+        engine. Images are preprocessed first (see _process_image).
+        
+        Args:
+            file_content: Binary content
+            mime_type: MIME type
+            pages: Optional sorted 1-based pages to process
+            notify: Progress callback
             
-        except Exception as e:
-            logger.warning(f"Form Parser error: {str(e)}")
-            return None
+        Returns:
+            (Form Parser document, OCR document, original page number of each
+            processed page or None for all pages, route of each routed page,
+            (content, MIME type) the engine read), the last for refine_regions:
+            block boxes refer to the preprocessed image when one was read
+        """
+        source = (file_content, mime_type)
+        if mime_type in IMAGE_TYPES and Config.OCR_PREPROCESS:
+            result, source = self._process_image(file_content, mime_type, pages, notify)
+            return result + ({}, source)
+        
+        if mime_type == "application/pdf":
+            if self._router is None:
+                self._router = PageRouter(self.engine)
+            if self._router.active:
+                return self._router.route(file_content, pages, notify) + (source,)
+        return self.engine.process_document(file_content, mime_type, pages, notify) + ({}, source)
     
-    def _process_with_ocr(
-        self, 
-        file_content: bytes, 
-        mime_type: str
-    ) -> Optional[documentai.Document]:
-        """Process with Document OCR"""
+    def _process_image(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        pages: Optional[List[int]],
+        notify: Callable[..., None]
+    ) -> Tuple[Tuple[Optional[documentai.Document], Optional[documentai.Document], Optional[List[int]]], Tuple[bytes, str]]:
+        """
+        Run the engine on a preprocessed image
+
+        Local engines also read the original when the preprocessed image
+        OCRs below OCR_PREPROCESS_MIN_CONFIDENCE and keep the better
+        reading; billed engines are only sent the preprocessed image.
+
+        Returns:
+            (engine result, (content, MIME type) of the image it came from)
+        """
+        original_source = (file_content, mime_type)
+        prepared = preprocess_document(file_content, mime_type)
+        if not prepared.changed:
+            return self.engine.process_document(file_content, mime_type, pages, notify), original_source
+        
+        prepared_source = (prepared.content, prepared.mime_type)
+        result = self.engine.process_document(prepared.content, prepared.mime_type, pages, notify)
+        if self.engine.billed:
+            return result, prepared_source
+        confidence = self._ocr_confidence(result)
+        if confidence >= Config.OCR_PREPROCESS_MIN_CONFIDENCE:
+            return result, prepared_source
+        
+        original = self.engine.process_document(file_content, mime_type, pages, notify)
+        original_confidence = self._ocr_confidence(original)
+        logger.info(
+            f"Preprocessed confidence {confidence:.2%} vs original {original_confidence:.2%}, "
+            f"using {'original' if original_confidence > confidence else 'preprocessed'}"
+        )
+        if original_confidence > confidence:
+            return original, original_source
+        return result, prepared_source
+    
+    def _ocr_confidence(self, result) -> float:
+        """Mean token confidence of an engine result (0.0 without a document)"""
+        confidences = [
+            token.layout.confidence
+            for document in result[:2] if document is not None
+            for page in document.pages
+            for token in page.tokens
+        ]
+        return sum(confidences) / len(confidences) if confidences else 0.0
+    
+    def refine_regions(
+        self,
+        file_content: bytes,
+        mime_type: str,
+        form_doc: Optional[documentai.Document],
+        ocr_doc: Optional[documentai.Document],
+        page_numbers: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-OCR low-confidence blocks of the result pages (see RegionRefiner)
+        
+        file_content and mime_type must be the input the documents were
+        read from (the last item of process_document's result).
+        
+        Returns:
+            Improved block readings for build_result, [] when disabled or failed
+        """
+        document = form_doc if form_doc is not None else ocr_doc
+        if not Config.OCR_REFINE_ENABLED or document is None:
+            return []
         try:
-            request = documentai.ProcessRequest(
-                name=self.doc_ocr_name,
-                raw_document=documentai.RawDocument(
-                    content=file_content,
-                    mime_type=mime_type
-                )
-            )
+            if self._refiner is None:
+                self._refiner = RegionRefiner()
+            return self._refiner.refine(file_content, mime_type, document, page_numbers)
+        except Exception as e:
+            logger.warning(f"Region refinement failed: {str(e)}")
+            return []
+    
+    def build_result(
+        self,
+        form_parser_result: Optional[documentai.Document],
+        ocr_result: Optional[documentai.Document],
+        filename: str,
+        page_numbers: Optional[List[int]] = None,
+        pages: Optional[List[int]] = None,
+        notify: Callable[..., None] = _no_progress,
+        engine: Optional[str] = None,
+        page_routes: Optional[Dict[int, str]] = None,
+        refinements: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the complete result from processor output (the CPU-bound half
+        of extraction; needs no Document AI client, see result_builder)
+        
+        Args:
+            form_parser_result: Form Parser document
+            ocr_result: OCR document
+            filename: File name
+            page_numbers: Original page number of each processed page
+            pages: Requested page selection
+            notify: Progress callback
+            engine: Name of the OCR engine that produced the documents
+            page_routes: Route of each PDF page from process_document
+            refinements: Re-OCR'd blocks from refine_regions
             
-            result = self.client.process_document(request=request)
-            logger.info("Document OCR: SUCCESS")
-            return result.document
+        Returns:
+            Complete extraction with accuracy metrics
+        """
+        # Extract everything from both
+        stage_start = time.perf_counter()
+        block_spans = {} if refinements else None
+        complete_data = self._extract_everything(
+            form_parser_result, 
+            ocr_result, 
+            filename,
+            on_page=lambda page, total: notify("pages_built", page=page, total=total),
+            page_numbers=page_numbers,
+            block_spans=block_spans
+        )
+        if pages:
+            complete_data["page_selection"] = {
+                "requested": format_page_ranges(pages),
+                "pages": page_numbers or pages
+            }
+        if engine:
+            complete_data["ocr_engine"] = engine
+            if engine != "documentai":
+                complete_data["extraction_method"] = f"{engine}_ocr"
+        if page_routes:
+            self._apply_routes(complete_data, ocr_result, page_routes, engine)
+        if refinements:
+            self._apply_refinements(complete_data, refinements, block_spans)
+        _EXTRACT_EVERYTHING_SECONDS.observe(time.perf_counter() - stage_start)
+        
+        # Loan fields from labels and values (rule-based, see extraction.field_extractor)
+        stage_start = time.perf_counter()
+        complete_data["loan_fields"] = extract_fields(complete_data)
+        _FIELDS_SECONDS.observe(time.perf_counter() - stage_start)
+        
+        # Fees from every table and form field in one pass (see extraction.fee_extractor)
+        stage_start = time.perf_counter()
+        fees = extract_fees(complete_data)
+        complete_data["fees"] = fees["fees"]
+        complete_data["all_fees"] = fees["all_fees"]
+        complete_data.update(fee_summary(fees))
+        _FEES_SECONDS.observe(time.perf_counter() - stage_start)
+        
+        # Repayment schedules as columns, checked for OCR misreads (see extraction.schedule_extractor)
+        stage_start = time.perf_counter()
+        complete_data["repayment_schedules"] = [
+            schedule.to_dict() for schedule in extract_schedules(complete_data["all_tables"])
+        ]
+        _SCHEDULE_SECONDS.observe(time.perf_counter() - stage_start)
+        
+        # Calculate real accuracy
+        stage_start = time.perf_counter()
+        accuracy_metrics = self._calculate_accuracy(
+            form_parser_result,
+            ocr_result,
+            complete_data
+        )
+        _ACCURACY_SECONDS.observe(time.perf_counter() - stage_start)
+        notify(
+            "accuracy_done",
+            overall_accuracy=accuracy_metrics["overall_accuracy"]
+        )
+        
+        # Add accuracy to result
+        complete_data["accuracy_metrics"] = accuracy_metrics
+        return complete_data
+    
+    def _apply_routes(
+        self,
+        complete_data: Dict[str, Any],
+        ocr_result: Optional[documentai.Document],
+        page_routes: Dict[int, str],
+        engine: Optional[str] = None
+    ):
+        """Report page routes, the engine that read each page and the processors they stand for"""
+        routes = sorted(page_routes.items())
+        # Escalated, remote and handwritten pages went to the extractor's engine
+        engines = {
+            ROUTE_TEXT_LAYER: "text_layer",
+            ROUTE_BLANK: None,
+            ROUTE_LOCAL: Config.OCR_ROUTE_LOCAL_BACKEND
+        }
+        complete_data["extraction_method"] = "page_routed"
+        complete_data["page_routing"] = {
+            "routes": route_counts(page_routes),
+            "pages": {
+                str(page): {"route": route, "engine": engines.get(route, engine)}
+                for page, route in routes
+            }
+        }
+        text_layer_pages = [page for page, route in routes if route == ROUTE_TEXT_LAYER]
+        if text_layer_pages:
+            complete_data["text_layer_pages"] = text_layer_pages
+        
+        processors = []
+        if text_layer_pages:
+            processors.append("PDF Text Layer")
+        if ROUTE_LOCAL in page_routes.values():
+            processors.append("Local OCR")
+        if all(route in (ROUTE_TEXT_LAYER, ROUTE_BLANK, ROUTE_LOCAL) for route in page_routes.values()):
+            # No page went through the engine
+            complete_data["processors_used"] = processors
+        else:
+            complete_data["processors_used"].extend(processors)
+    
+    def _apply_refinements(
+        self,
+        complete_data: Dict[str, Any],
+        refinements: List[Dict[str, Any]],
+        block_spans: BlockSpans
+    ):
+        """
+        Splice re-OCR'd block readings into the result
+        
+        Blocks are replaced where they were read: in their page entry, their
+        text element and at their offsets in the processor text they came
+        from; merged text and numbers are then derived again.
+        """
+        pages = {page["page_number"]: page for page in complete_data["pages"]}
+        texts = complete_data["complete_text"]
+        splices: Dict[str, List[Tuple[int, int, str]]] = {"form_parser_text": [], "ocr_text": []}
+        applied = []
+        for refinement in refinements:
+            page = pages.get(refinement["page"])
+            if page is None or refinement["block"] >= len(page["blocks"]):
+                continue
+            block = page["blocks"][refinement["block"]]
+            block["previous_confidence"] = block["confidence"]
+            block["text"] = refinement["text"]
+            block["confidence"] = refinement["confidence"]
+            block["refined"] = True
             
-        except Exception as e:
-            logger.warning(f"Document OCR error: {str(e)}")
-            return None
+            span = block_spans.get((page["page_number"], refinement["block"]))
+            if span is not None:
+                field, start, end, element = span
+                complete_data["all_text_elements"][element]["text"] = refinement["text"]
+                if start is not None:
+                    splices[field].append((start, end, refinement["text"]))
+            applied.append(page["page_number"])
+        
+        if any(splices.values()):
+            for field, edits in splices.items():
+                texts[field] = self._splice(texts[field], edits)
+            texts["merged_text"] = self._merge_texts(texts["form_parser_text"], texts["ocr_text"])
+            complete_data["all_numbers"] = self._extract_all_numbers(texts["merged_text"])
+        
+        complete_data["refinement"] = {
+            "blocks_refined": len(applied),
+            "pages": sorted(set(applied))
+        }
+    
+    def _splice(self, text: str, edits: List[Tuple[int, int, str]]) -> str:
+        """Replace (start, end, new text) ranges, keeping the whitespace around each range"""
+        for start, end, new in sorted(edits, reverse=True):
+            old = text[start:end]
+            leading = old[:len(old) - len(old.lstrip())]
+            trailing = old[len(old.rstrip()):] if old.strip() else ""
+            text = text[:start] + leading + new.strip() + trailing + text[end:]
+        return text
+    
+    def _iter_pages(
+        self,
+        document: documentai.Document,
+        page_numbers: Optional[List[int]]
+    ):
+        """Yield (original page number, page) for each processed page, by Page.page_number"""
+        numbers = original_page_numbers([page.page_number for page in document.pages], page_numbers)
+        for number, page in zip(numbers, document.pages):
+            if number is None:
+                logger.warning(f"Skipping page {page.page_number}: not in the page selection")
+                continue
+            yield number, page
     
     def _extract_everything(
         self,
         form_doc: Optional[documentai.Document],
         ocr_doc: Optional[documentai.Document],
-        filename: str
+        filename: str,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        page_numbers: Optional[List[int]] = None,
+        block_spans: Optional[BlockSpans] = None
     ) -> Dict[str, Any]:
-        """Extract EVERYTHING from both processors"""
+        """
+        Extract EVERYTHING from both processors
+        
+        on_page(n, total) is called as each page entry is built; pages are
+        built by the Form Parser pass, or by the OCR pass without Form Parser.
+        page_numbers maps processed pages back to the original document.
+        block_spans, when given, is filled with where each page block was read.
+        """
         
         result = {
             "document_name": filename,
@@ -191,7 +505,7 @@ class CompleteDocumentExtractor:
             result["complete_text"]["form_parser_text"] = form_doc.text if hasattr(form_doc, 'text') else ""
             
             # Extract all elements from Form Parser
-            self._extract_from_form_parser(form_doc, result)
+            self._extract_from_form_parser(form_doc, result, on_page, page_numbers, block_spans)
         
         # Extract from OCR
         if ocr_doc:
@@ -199,7 +513,7 @@ class CompleteDocumentExtractor:
             result["complete_text"]["ocr_text"] = ocr_doc.text if hasattr(ocr_doc, 'text') else ""
             
             # Extract all elements from OCR
-            self._extract_from_ocr(ocr_doc, result)
+            self._extract_from_ocr(ocr_doc, result, None if form_doc else on_page, page_numbers, block_spans)
         
         # Merge texts
         result["complete_text"]["merged_text"] = self._merge_texts(
@@ -217,16 +531,19 @@ class CompleteDocumentExtractor:
     def _extract_from_form_parser(
         self,
         document: documentai.Document,
-        result: Dict[str, Any]
+        result: Dict[str, Any],
+        on_page: Optional[Callable[[int, int], None]] = None,
+        page_numbers: Optional[List[int]] = None,
+        block_spans: Optional[BlockSpans] = None
     ):
         """Extract everything from Form Parser"""
         
         if not hasattr(document, 'pages'):
             return
         
-        for page_num, page in enumerate(document.pages):
+        for built, (page_number, page) in enumerate(self._iter_pages(document, page_numbers), 1):
             page_data = {
-                "page_number": page_num + 1,
+                "page_number": page_number,
                 "source": "form_parser",
                 "dimensions": self._get_dimensions(page),
                 "blocks": [],
@@ -243,6 +560,11 @@ class CompleteDocumentExtractor:
                 for block in page.blocks:
                     text = self._get_text(block.layout, document)
                     if text:
+                        if block_spans is not None:
+                            self._record_span(
+                                block_spans, "form_parser_text", block.layout, text, document,
+                                (page_number, len(page_data["blocks"])), len(result["all_text_elements"])
+                            )
                         page_data["blocks"].append({
                             "text": text,
                             "confidence": block.layout.confidence if hasattr(block.layout, 'confidence') else 0.0
@@ -250,7 +572,7 @@ class CompleteDocumentExtractor:
                         result["all_text_elements"].append({
                             "type": "block",
                             "text": text,
-                            "page": page_num + 1,
+                            "page": page_number,
                             "source": "form_parser"
                         })
             
@@ -266,7 +588,7 @@ class CompleteDocumentExtractor:
                         result["all_text_elements"].append({
                             "type": "paragraph",
                             "text": text,
-                            "page": page_num + 1,
+                            "page": page_number,
                             "source": "form_parser"
                         })
             
@@ -282,7 +604,7 @@ class CompleteDocumentExtractor:
                         result["all_text_elements"].append({
                             "type": "line",
                             "text": text,
-                            "page": page_num + 1,
+                            "page": page_number,
                             "source": "form_parser"
                         })
             
@@ -303,7 +625,7 @@ class CompleteDocumentExtractor:
                     field_value = self._get_text(field.field_value, document)
                     
                     field_data = {
-                        "page": page_num + 1,
+                        "page": page_number,
                         "field_name": field_name if field_name else "",
                         "field_value": field_value if field_value else "",
                         "name_confidence": field.field_name.confidence if hasattr(field.field_name, 'confidence') else 0.0,
@@ -317,7 +639,7 @@ class CompleteDocumentExtractor:
                         "type": "form_field",
                         "name": field_name,
                         "value": field_value,
-                        "page": page_num + 1
+                        "page": page_number
                     })
             
             # Extract tables with nested columns
@@ -326,35 +648,40 @@ class CompleteDocumentExtractor:
                     table_data = self._extract_complete_table(
                         table, 
                         document, 
-                        page_num + 1,
+                        page_number,
                         table_idx + 1
                     )
                     page_data["tables"].append(table_data)
                     result["all_tables"].append(table_data)
             
             result["pages"].append(page_data)
+            if on_page:
+                on_page(built, len(document.pages))
     
     def _extract_from_ocr(
         self,
         document: documentai.Document,
-        result: Dict[str, Any]
+        result: Dict[str, Any],
+        on_page: Optional[Callable[[int, int], None]] = None,
+        page_numbers: Optional[List[int]] = None,
+        block_spans: Optional[BlockSpans] = None
     ):
         """Extract everything from OCR"""
         
         if not hasattr(document, 'pages'):
             return
         
-        for page_num, page in enumerate(document.pages):
+        for built, (page_number, page) in enumerate(self._iter_pages(document, page_numbers), 1):
             # Find existing page or create new
             existing_page = None
             for p in result["pages"]:
-                if p["page_number"] == page_num + 1:
+                if p["page_number"] == page_number:
                     existing_page = p
                     break
             
             if not existing_page:
                 existing_page = {
-                    "page_number": page_num + 1,
+                    "page_number": page_number,
                     "source": "ocr",
                     "dimensions": self._get_dimensions(page),
                     "blocks": [],
@@ -366,16 +693,28 @@ class CompleteDocumentExtractor:
                     "confidence": page.confidence if hasattr(page, 'confidence') else 0.0
                 }
                 result["pages"].append(existing_page)
+            # Pages without Form Parser output get their elements from OCR
+            owned = existing_page["source"] == "ocr"
             
             # Extract all text elements from OCR
             if hasattr(page, 'blocks'):
                 for block in page.blocks:
                     text = self._get_text(block.layout, document)
                     if text:
+                        if owned:
+                            if block_spans is not None:
+                                self._record_span(
+                                    block_spans, "ocr_text", block.layout, text, document,
+                                    (page_number, len(existing_page["blocks"])), len(result["all_text_elements"])
+                                )
+                            existing_page["blocks"].append({
+                                "text": text,
+                                "confidence": block.layout.confidence
+                            })
                         result["all_text_elements"].append({
                             "type": "block",
                             "text": text,
-                            "page": page_num + 1,
+                            "page": page_number,
                             "source": "ocr"
                         })
             
@@ -383,10 +722,15 @@ class CompleteDocumentExtractor:
                 for para in page.paragraphs:
                     text = self._get_text(para.layout, document)
                     if text:
+                        if owned:
+                            existing_page["paragraphs"].append({
+                                "text": text,
+                                "confidence": para.layout.confidence
+                            })
                         result["all_text_elements"].append({
                             "type": "paragraph",
                             "text": text,
-                            "page": page_num + 1,
+                            "page": page_number,
                             "source": "ocr"
                         })
             
@@ -394,24 +738,43 @@ class CompleteDocumentExtractor:
                 for line in page.lines:
                     text = self._get_text(line.layout, document)
                     if text:
+                        if owned:
+                            existing_page["lines"].append({
+                                "text": text,
+                                "confidence": line.layout.confidence
+                            })
                         result["all_text_elements"].append({
                             "type": "line",
                             "text": text,
-                            "page": page_num + 1,
+                            "page": page_number,
                             "source": "ocr"
                         })
             
+            if owned and hasattr(page, 'tokens'):
+                for token in page.tokens:
+                    text = self._get_text(token.layout, document)
+                    if text:
+                        existing_page["tokens"].append({
+                            "text": text,
+                            "confidence": token.layout.confidence
+                        })
+            
             # Extract tables from OCR
             if hasattr(page, 'tables'):
                 for table_idx, table in enumerate(page.tables):
                     table_data = self._extract_complete_table(
                         table,
                         document,
-                        page_num + 1,
+                        page_number,
                         table_idx + 1
                     )
                     table_data["source"] = "ocr"
                     result["all_tables"].append(table_data)
+                    if owned:
+                        existing_page["tables"].append(table_data)
+            
+            if on_page:
+                on_page(built, len(document.pages))
     
     def _extract_complete_table(
         self,
@@ -493,17 +856,8 @@ class CompleteDocumentExtractor:
         """Extract all numbers from text"""
         numbers = []
         
-        # Pattern for various number formats
-        patterns = [
-            (r'\d+\.\d+', 'decimal'),
-            (r'\d+,\d+', 'comma_separated'),
-            (r'\d+', 'integer'),
-            (r'\$\s*\d+(?:,\d{3})*(?:\.\d{2})?', 'currency'),
-            (r'\d+%', 'percentage'),
-        ]
-        
-        for pattern, num_type in patterns:
-            matches = re.finditer(pattern, text)
+        for pattern, num_type in NUMBER_PATTERNS:
+            matches = pattern.finditer(text)
             for match in matches:
                 numbers.append({
                     "value": match.group(),
@@ -704,6 +1058,23 @@ class CompleteDocumentExtractor:
         
         return text
     
+    def _record_span(
+        self,
+        block_spans: BlockSpans,
+        field: str,
+        layout,
+        text: str,
+        document: documentai.Document,
+        key: Tuple[int, int],
+        element: int
+    ):
+        """Remember a block's text element and its range of the document text"""
+        segments = layout.text_anchor.text_segments
+        start, end = int(segments[0].start_index), int(segments[-1].end_index)
+        if document.text[start:end] != text:
+            start, end = None, None
+        block_spans[key] = (field, start, end, element)
+    
     def _merge_texts(self, text1: str, text2: str) -> str:
         """Merge texts from both processors"""
         # Use the longer text as base
@@ -730,3 +1101,13 @@ def extract_complete_document(
     """
     extractor = CompleteDocumentExtractor()
     return extractor.extract_complete_document(file_content, mime_type, filename)
+
+
+def result_builder() -> CompleteDocumentExtractor:
+    """
+    Extractor for build_result only, without a Document AI client
+    
+    Lets worker processes build results from serialized documents without
+    creating an OCR engine.
+    """
+    return CompleteDocumentExtractor(build_only=True)
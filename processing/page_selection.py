@@ -0,0 +1,171 @@
+"""
+Page-range selection for partial document extraction
+Parses specs such as "1-3,7", checks them against the document's page count
+and slices PDFs locally when the processor cannot select pages itself
+"""
+import io
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_SELECTED_PAGES = 2000
+
+
+class PageSelectionError(ValueError):
+    """Raised when a page selection names pages the document does not have"""
+
+
+def parse_page_ranges(spec: Optional[str]) -> Optional[List[int]]:
+    """
+    Parse a page-range spec
+
+    Args:
+        spec: 1-based pages and inclusive ranges, e.g. "1-3,7"
+
+    Returns:
+        Sorted unique page numbers, or None when spec is empty (all pages)
+
+    Raises:
+        ValueError: Malformed spec
+    """
+    if spec is None or not spec.strip():
+        return None
+
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        try:
+            first = int(start)
+            last = int(end) if sep else first
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range '{part}'")
+        if last - first + 1 + len(pages) > MAX_SELECTED_PAGES:
+            raise ValueError(f"Page selection exceeds {MAX_SELECTED_PAGES} pages")
+        pages.update(range(first, last + 1))
+
+    if not pages:
+        raise ValueError("Empty page selection")
+    return sorted(pages)
+
+
+def format_page_ranges(pages: List[int]) -> str:
+    """Format sorted page numbers back to a compact spec ("1-3,7")"""
+    parts = []
+    start = prev = None
+    for page in pages:
+        if start is None:
+            start = prev = page
+        elif page == prev + 1:
+            prev = page
+        else:
+            parts.append(f"{start}-{prev}" if prev > start else str(start))
+            start = prev = page
+    if start is not None:
+        parts.append(f"{start}-{prev}" if prev > start else str(start))
+    return ",".join(parts)
+
+
+def count_pages(file_content: bytes, mime_type: str) -> Optional[int]:
+    """
+    Count the pages of a PDF or (multi-frame) image
+
+    Args:
+        file_content: Binary content
+        mime_type: MIME type
+
+    Returns:
+        Number of pages, or None if the document can't be read
+    """
+    try:
+        if mime_type == "application/pdf":
+            from PyPDF2 import PdfReader
+
+            return len(PdfReader(io.BytesIO(file_content)).pages)
+
+        from PIL import Image
+
+        with Image.open(io.BytesIO(file_content)) as image:
+            return getattr(image, "n_frames", 1)
+    except Exception as e:
+        logger.warning(f"Could not count pages: {str(e)}")
+        return None
+
+
+def check_page_selection(pages: Optional[List[int]], total: int):
+    """
+    Reject selections that name pages the document does not have
+
+    Args:
+        pages: Sorted 1-based page numbers, or None for all pages
+        total: Pages in the document
+
+    Raises:
+        PageSelectionError: A selected page is past the end of the document
+    """
+    if pages and pages[-1] > total:
+        outside = format_page_ranges([page for page in pages if page > total])
+        raise PageSelectionError(f"Pages {outside} are outside the document ({total} pages)")
+
+
+def original_page_numbers(
+    numbers: List[int],
+    selected: Optional[List[int]]
+) -> List[Optional[int]]:
+    """
+    Map the page numbers a processed document reports back to the original document
+
+    A processor given a page selector may keep the original numbering, while
+    sliced, merged or locally built documents number their pages 1..n. The
+    document uses original numbering when every number it reports was
+    selected; if the selection starts 1..k both readings agree.
+
+    Args:
+        numbers: Page.page_number of each processed page (0 if unset)
+        selected: Original page number of each processed page, or None for all pages
+
+    Returns:
+        Original page number of each processed page, None for pages outside the selection
+    """
+    numbers = [number or index + 1 for index, number in enumerate(numbers)]
+    if selected is None:
+        return numbers
+    chosen = set(selected)
+    if all(number in chosen for number in numbers):
+        return numbers
+    return [selected[number - 1] if 1 <= number <= len(selected) else None for number in numbers]
+
+
+def slice_pdf(file_content: bytes, pages: List[int]) -> Tuple[bytes, List[int]]:
+    """
+    Build a PDF containing only the selected pages
+
+    Args:
+        file_content: Original PDF
+        pages: Sorted 1-based page numbers
+
+    Returns:
+        (sliced PDF, page numbers actually present in it)
+
+    Raises:
+        ValueError: A selected page does not exist in the document
+    """
+    from PyPDF2 import PdfReader, PdfWriter
+
+    reader = PdfReader(io.BytesIO(file_content))
+    total = len(reader.pages)
+    check_page_selection(pages, total)
+
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(reader.pages[page - 1])
+
+    output = io.BytesIO()
+    writer.write(output)
+    logger.info(f"Sliced PDF to {len(pages)} of {total} pages")
+    return output.getvalue(), list(pages)
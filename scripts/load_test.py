@@ -0,0 +1,141 @@
+"""
+Load test: API throughput vs. number of worker processes
+
+Starts the multi-process server (api/server.py) with an increasing number of
+workers and drives it with concurrent clients. The endpoint under test runs
+the CPU-bound part of extraction (building the result from an OCR document
+and JSON encoding) so no Document AI credentials are needed.
+
+Usage:
+    python scripts/load_test.py [--workers 1 2 4] [--clients 16] [--duration 10]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Synthetic loan statement text, roughly a 10 page document
+SAMPLE_TEXT = (
+    "Loan Amount: $45,000.00 Interest Rate: 8.75% Tenure: 120 months "
+    "EMI $563.12 Processing fee 1.5% Installment 12 of 120 Balance 41,234.56 "
+) * 400
+
+
+def _build_app():
+    """ASGI app exercising the CPU-bound result building path"""
+    from fastapi import FastAPI
+    from fastapi.responses import Response
+    from google.cloud import documentai_v1 as documentai
+    from processing.complete_document_extractor import result_builder
+
+    app = FastAPI()
+    # Result building does not touch the Document AI client
+    builder = result_builder()
+    ocr_document = documentai.Document.serialize(documentai.Document(text=SAMPLE_TEXT))
+
+    @app.post("/api/v1/extract")
+    def extract():
+        # Deserialize per request, as the worker build stage does
+        result = builder.build_result(None, documentai.Document.deserialize(ocr_document), "sample.pdf")
+        body = json.dumps(result, separators=(",", ":"), ensure_ascii=False)
+        return Response(content=body, media_type="application/json")
+
+    return app
+
+
+if os.getenv("LOAD_TEST_APP") == "1":
+    app = _build_app()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def _drive(port: int, clients: int, duration: float) -> float:
+    """Send requests from concurrent clients, returning requests/second"""
+    url = f"http://127.0.0.1:{port}/api/v1/extract"
+    completed = [0] * clients
+    stop_at = time.time() + duration
+
+    def client(index: int):
+        while time.time() < stop_at:
+            request = urllib.request.Request(url, data=b"", method="POST")
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            completed[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(completed) / (time.time() - started)
+
+
+def run_load_test(worker_counts, clients: int, duration: float):
+    """Measure throughput for each worker count"""
+    results = []
+    for workers in worker_counts:
+        port = _free_port()
+        env = dict(os.environ, LOAD_TEST_APP="1", PYTHONPATH=ROOT, LOG_LEVEL="WARNING")
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "api.server",
+                "--app", "scripts.load_test:app",
+                "--workers", str(workers),
+                "--host", "127.0.0.1",
+                "--port", str(port)
+            ],
+            cwd=ROOT,
+            env=env
+        )
+        try:
+            _wait_until_up(port)
+            _drive(port, clients, 2.0)  # warm up
+            throughput = _drive(port, clients, duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        baseline = results[0][1] if results else throughput
+        results.append((workers, throughput))
+        print(f"workers={workers:<3} throughput={throughput:8.1f} req/s  speedup={throughput / baseline:.2f}x")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API throughput vs worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}, clients: {args.clients}, duration: {args.duration}s")
+    run_load_test(args.workers, args.clients, args.duration)
+
+
+if __name__ == "__main__":
+    main()
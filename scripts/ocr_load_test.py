@@ -0,0 +1,55 @@
+"""
+Load test: local OCR throughput vs. number of processes
+
+Rasterizes and OCRs a PDF with MultipageProcessor for each process count and
+prints pages/second. Needs Tesseract and poppler (pdftoppm) installed.
+
+Usage:
+    python scripts/ocr_load_test.py scan.pdf [--processes 1 2 4 8] [--in-flight 0] [--dpi 300]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ocr.multipage_processor import MultipageProcessor
+
+
+def run_once(content: bytes, pages: int, processes: int, in_flight: int, dpi: int) -> float:
+    """OCR all pages with `processes` processes, returning pages/second"""
+    processor = MultipageProcessor(processes=processes, max_in_flight=in_flight, dpi=dpi)
+    try:
+        started = time.perf_counter()
+        done = sum(1 for _ in processor.process(content, list(range(1, pages + 1))))
+        return done / (time.perf_counter() - started)
+    finally:
+        processor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OCR throughput vs process count")
+    parser.add_argument("pdf", help="PDF to OCR")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--in-flight", type=int, default=0, help="Max rasterized pages awaiting OCR (0 = 2 per process)")
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    from pdf2image import pdfinfo_from_bytes
+
+    with open(args.pdf, "rb") as f:
+        content = f.read()
+    pages = int(pdfinfo_from_bytes(content)["Pages"])
+
+    print(f"pages: {pages}, dpi: {args.dpi}")
+    baseline = None
+    for processes in args.processes:
+        throughput = run_once(content, pages, processes, args.in_flight, args.dpi)
+        baseline = baseline or throughput
+        print(f"processes={processes:<3} throughput={throughput:6.2f} pages/s  speedup={throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
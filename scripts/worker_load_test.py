@@ -0,0 +1,206 @@
+"""
+Load test: worker throughput vs. number of job slots
+
+Runs DocumentWorker against a queue pre-filled with jobs and a stand-in
+handler that simulates Document AI latency under a concurrency quota, so no
+credentials or storage are needed. Use --redis to go through the Redis queue
+(REDIS_URL) instead of the in-memory one.
+
+With --backfill N, the queue is pre-filled with N bulk jobs of one tenant
+while interactive jobs arrive at a steady rate, and the interactive queue
+wait (p50/p95) is reported with priority lanes and with a single FIFO lane.
+
+With --pipeline, jobs go through stand-in fetch/extract/build/persist stages
+(build burns CPU) and throughput of the staged pipeline, with build in a
+process pool, is compared with running all stages back to back in each slot.
+
+Usage:
+    python scripts/worker_load_test.py [--slots 1 2 4 8] [--jobs 200] [--latency 0.05] [--quota 8]
+    python scripts/worker_load_test.py --backfill 100000 [--slots 8] [--latency 0.01]
+    python scripts/worker_load_test.py --pipeline [--slots 4] [--io 0.02] [--cpu 0.02]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from worker.job_queue import InMemoryQueue, RedisQueue, make_job
+from worker.processor import DocumentWorker
+from worker.stages import JobStages
+
+
+def _stand_in_handler(latency: float, quota: int):
+    """Handler that holds one of `quota` processor slots for `latency` seconds"""
+    processor_quota = threading.BoundedSemaphore(quota)
+
+    def handle(job):
+        with processor_quota:
+            time.sleep(latency)
+
+    return handle
+
+
+class StandInStages(JobStages):
+    """Stages that sleep for storage and processor I/O and burn CPU in build"""
+
+    build_in_process = True
+
+    def __init__(self, io: float, latency: float, cpu: float):
+        self.io = io
+        self.latency = latency
+        self.cpu = cpu
+
+    def fetch(self, job):
+        time.sleep(self.io)
+
+    def extract(self, job, fetched):
+        time.sleep(self.latency)
+
+    def build(self, job, extracted):
+        stop_at = time.process_time() + self.cpu
+        total = 0
+        while time.process_time() < stop_at:
+            total += sum(range(1000))
+        return total
+
+    def persist(self, job, built):
+        time.sleep(self.io)
+
+
+def run_once(
+    slots: int,
+    jobs: int,
+    latency: float,
+    quota: int,
+    use_redis: bool,
+    handler=None,
+    stages=None
+) -> float:
+    """Process `jobs` jobs with `slots` slots, returning jobs/second"""
+    job_queue = RedisQueue(name=f"worker-load-test-{os.getpid()}") if use_redis else InMemoryQueue()
+    for index in range(jobs):
+        job_queue.push(make_job(f"load-test-{index}"))
+
+    if handler is None and stages is None:
+        handler = _stand_in_handler(latency, quota)
+    worker = DocumentWorker(
+        job_queue=job_queue,
+        handler=handler,
+        concurrency=slots,
+        stages=stages
+    )
+    runner = threading.Thread(target=worker.start, kwargs={"install_signal_handlers": False})
+    started = time.perf_counter()
+    runner.start()
+    while worker.stats["succeeded"] + worker.stats["failed"] < jobs:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    worker.stop()
+    runner.join()
+    return jobs / elapsed
+
+
+def _percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def run_backfill(
+    slots: int,
+    backfill: int,
+    latency: float,
+    quota: int,
+    interactive_rate: float,
+    duration: float,
+    lanes: bool
+):
+    """Interactive queue wait while a bulk backfill is draining"""
+    job_queue = InMemoryQueue()
+    for index in range(backfill):
+        if lanes:
+            job_queue.push(make_job(f"backfill-{index}", priority="bulk", tenant="backfill"))
+        else:
+            job_queue.push(make_job(f"backfill-{index}"))
+
+    waits = []
+    process = _stand_in_handler(latency, quota)
+
+    def handle(job):
+        if job["document_id"].startswith("upload-"):
+            waits.append(job["wait_seconds"])
+        process(job)
+
+    worker = DocumentWorker(job_queue=job_queue, handler=handle, concurrency=slots)
+    runner = threading.Thread(target=worker.start, kwargs={"install_signal_handlers": False})
+    runner.start()
+
+    submitted = 0
+    stop_at = time.time() + duration
+    while time.time() < stop_at:
+        if lanes:
+            job_queue.push(make_job(f"upload-{submitted}", priority="interactive", tenant="dashboard"))
+        else:
+            job_queue.push(make_job(f"upload-{submitted}"))
+        submitted += 1
+        time.sleep(1.0 / interactive_rate)
+    time.sleep(latency * 4)
+    worker.stop()
+    runner.join()
+
+    label = "priority lanes" if lanes else "single FIFO   "
+    if waits:
+        wait = f"wait p50={_percentile(waits, 0.5):.3f}s p95={_percentile(waits, 0.95):.3f}s"
+    else:
+        wait = "none served (stuck behind the backfill)"
+    print(f"{label} interactive served={len(waits)}/{submitted} {wait} queued={job_queue.size()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker throughput vs slot count")
+    parser.add_argument("--slots", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated processor seconds per job")
+    parser.add_argument("--quota", type=int, default=8, help="Simulated processor concurrency quota")
+    parser.add_argument("--redis", action="store_true", help="Use the Redis queue")
+    parser.add_argument("--backfill", type=int, default=0, help="Bulk jobs queued ahead of interactive ones")
+    parser.add_argument("--interactive-rate", type=float, default=20.0, help="Interactive jobs per second")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds interactive jobs keep arriving")
+    parser.add_argument("--pipeline", action="store_true", help="Compare staged and sequential job stages")
+    parser.add_argument("--io", type=float, default=0.02, help="Simulated download/upload seconds per job")
+    parser.add_argument("--cpu", type=float, default=0.02, help="Simulated result-building CPU seconds per job")
+    args = parser.parse_args()
+
+    if args.pipeline:
+        slots = args.slots[0] if len(args.slots) == 1 else 4
+        stages = StandInStages(args.io, args.latency, args.cpu)
+        print(
+            f"jobs: {args.jobs}, slots: {slots}, io: {args.io}s, "
+            f"latency: {args.latency}s, cpu: {args.cpu}s"
+        )
+        sequential = run_once(slots, args.jobs, args.latency, args.quota, args.redis, handler=stages.run)
+        print(f"sequential stages throughput={sequential:8.1f} jobs/s")
+        pipelined = run_once(slots, args.jobs, args.latency, args.quota, args.redis, stages=stages)
+        print(f"pipelined stages  throughput={pipelined:8.1f} jobs/s  speedup={pipelined / sequential:.2f}x")
+        return
+
+    if args.backfill:
+        slots = args.slots[0] if len(args.slots) == 1 else 8
+        print(f"backfill: {args.backfill}, slots: {slots}, latency: {args.latency}s, interactive: {args.interactive_rate}/s")
+        for lanes in (True, False):
+            run_backfill(slots, args.backfill, args.latency, args.quota, args.interactive_rate, args.duration, lanes)
+        return
+
+    print(f"jobs: {args.jobs}, latency: {args.latency}s, processor quota: {args.quota}")
+    baseline = None
+    for slots in args.slots:
+        throughput = run_once(slots, args.jobs, args.latency, args.quota, args.redis)
+        baseline = baseline or throughput
+        print(f"slots={slots:<3} throughput={throughput:8.1f} jobs/s  speedup={throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,23 @@ Data masking and anonymization for sensitive user information
 """
 import re
 import hashlib
+import time
 from typing import Dict, Any, List, Optional
 import logging
 
+from metrics import EXTRACTION_STAGE_SECONDS
+
 logger = logging.getLogger(__name__)
 
+_MASKING_SECONDS = EXTRACTION_STAGE_SECONDS.labels("masking")
+
+# Text patterns (compiled once, shared by forked workers)
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE_PATTERN = re.compile(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b')
+SSN_PATTERN = re.compile(r'\b\d{3}-\d{2}-\d{4}\b')
+EMAIL_EXACT_PATTERN = re.compile(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$')
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
 
 class DataMasker:
     """
@@ -34,6 +46,7 @@ class DataMasker:
         Returns:
             Data with sensitive information masked
         """
+        started = time.perf_counter()
         try:
             logger.info(f"Masking data with level: {self.mask_level}")
             
@@ -61,6 +74,8 @@ class DataMasker:
         except Exception as e:
             logger.error(f"Error masking data: {str(e)}")
             return data
+        finally:
+            _MASKING_SECONDS.observe(time.perf_counter() - started)
     
     def _mask_personal_info(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Mask personal information like names, addresses"""
@@ -181,22 +196,19 @@ class DataMasker:
                 masked_text = original_text
                 
                 # Mask emails in text
-                masked_text = re.sub(
-                    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+                masked_text = EMAIL_PATTERN.sub(
                     lambda m: self._mask_email(m.group()),
                     masked_text
                 )
                 
                 # Mask phone numbers in text
-                masked_text = re.sub(
-                    r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b',
+                masked_text = PHONE_PATTERN.sub(
                     lambda m: self._mask_phone(m.group()),
                     masked_text
                 )
                 
                 # Mask SSN patterns in text
-                masked_text = re.sub(
-                    r'\b\d{3}-\d{2}-\d{4}\b',
+                masked_text = SSN_PATTERN.sub(
                     'XXX-XX-XXXX',
                     masked_text
                 )
@@ -260,7 +272,7 @@ class DataMasker:
             return phone
         
         # Remove non-digits
-        digits = re.sub(r'\D', '', phone)
+        digits = NON_DIGIT_PATTERN.sub('', phone)
         
         if self.mask_level == "minimal":
             # Show last 4 digits
@@ -304,7 +316,7 @@ class DataMasker:
         if not account:
             return account
         
-        digits = re.sub(r'\D', '', str(account))
+        digits = NON_DIGIT_PATTERN.sub('', str(account))
         
         if self.mask_level == "minimal" and len(digits) >= 4:
             return f"****{digits[-4:]}"
@@ -325,11 +337,11 @@ class DataMasker:
     
     def _is_email(self, text: str) -> bool:
         """Check if text is an email"""
-        return bool(re.match(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$', text))
+        return bool(EMAIL_EXACT_PATTERN.match(text))
     
     def _is_phone(self, text: str) -> bool:
         """Check if text is a phone number"""
-        digits = re.sub(r'\D', '', text)
+        digits = NON_DIGIT_PATTERN.sub('', text)
         return len(digits) >= 10 and len(digits) <= 15
 
 
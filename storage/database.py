@@ -0,0 +1,86 @@
+"""
+PostgreSQL connection pool
+"""
+import os
+import math
+import logging
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_engine: Optional[Engine] = None
+_probe_engine: Optional[Engine] = None
+_owner_pid: Optional[int] = None
+
+
+def get_engine() -> Engine:
+    """
+    Get the process-wide SQLAlchemy engine
+
+    The engine is created lazily. After a fork the inherited pool is
+    discarded without closing the parent's sockets.
+
+    Returns:
+        Engine with a bounded connection pool
+    """
+    global _engine, _probe_engine, _owner_pid
+    if _owner_pid != os.getpid():
+        for engine in (_engine, _probe_engine):
+            if engine is not None:
+                engine.dispose(close=False)
+        _engine = None
+        _probe_engine = None
+
+    if _engine is None:
+        _engine = create_engine(
+            Config.DATABASE_URL,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+            pool_timeout=Config.DB_CONNECT_TIMEOUT_SECONDS,
+            connect_args={"connect_timeout": Config.DB_CONNECT_TIMEOUT_SECONDS}
+        )
+        _owner_pid = os.getpid()
+        logger.info("Database connection pool created")
+
+    return _engine
+
+
+def _get_probe_engine(timeout: float) -> Engine:
+    """Single-connection engine whose connect and statement timeouts fit the probe budget"""
+    global _probe_engine
+    get_engine()  # drops engines inherited across a fork
+    if _probe_engine is None:
+        _probe_engine = create_engine(
+            Config.DATABASE_URL,
+            pool_size=1,
+            max_overflow=0,
+            pool_pre_ping=False,
+            pool_recycle=1800,
+            pool_timeout=timeout,
+            connect_args={
+                # libpq only takes whole seconds here
+                "connect_timeout": max(1, math.ceil(timeout)),
+                "options": f"-c statement_timeout={int(timeout * 1000)}"
+            }
+        )
+    return _probe_engine
+
+
+def ping_database(timeout: Optional[float] = None):
+    """
+    Run a trivial query, raising on failure
+
+    Args:
+        timeout: Connect/statement timeout in seconds; uses a dedicated probe
+            connection so a hung database can't hold a probe thread longer than this
+    """
+    engine = get_engine() if timeout is None else _get_probe_engine(timeout)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
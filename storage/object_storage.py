@@ -0,0 +1,77 @@
+"""
+S3/MinIO object storage client
+"""
+import os
+import logging
+from typing import Optional
+
+import boto3
+from botocore.config import Config as BotoConfig
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_probe_client = None
+_owner_pid: Optional[int] = None
+
+
+def get_s3_client():
+    """
+    Get the process-wide S3 client
+
+    boto3 clients keep an internal urllib3 connection pool, so one client is
+    shared by all threads of a process and recreated after a fork.
+
+    Returns:
+        boto3 S3 client for Config.S3_ENDPOINT
+    """
+    global _client, _probe_client, _owner_pid
+    if _client is None or _owner_pid != os.getpid():
+        _probe_client = None
+        _client = boto3.client(
+            "s3",
+            endpoint_url=Config.S3_ENDPOINT,
+            aws_access_key_id=Config.S3_ACCESS_KEY,
+            aws_secret_access_key=Config.S3_SECRET_KEY,
+            region_name=Config.S3_REGION,
+            config=BotoConfig(
+                connect_timeout=Config.S3_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=Config.S3_READ_TIMEOUT_SECONDS,
+                retries={"max_attempts": 2},
+                max_pool_connections=Config.S3_MAX_POOL_CONNECTIONS
+            )
+        )
+        _owner_pid = os.getpid()
+        logger.info(f"S3 client created for {Config.S3_ENDPOINT}")
+    return _client
+
+
+def ping_storage(timeout: Optional[float] = None):
+    """
+    Check the configured bucket is reachable, raising on failure
+
+    Args:
+        timeout: Connect/read timeout in seconds; uses a dedicated probe client
+            without retries so a hung endpoint can't hold a probe thread longer than this
+    """
+    global _probe_client
+    client = get_s3_client()
+    if timeout is not None:
+        if _probe_client is None:
+            _probe_client = boto3.client(
+                "s3",
+                endpoint_url=Config.S3_ENDPOINT,
+                aws_access_key_id=Config.S3_ACCESS_KEY,
+                aws_secret_access_key=Config.S3_SECRET_KEY,
+                region_name=Config.S3_REGION,
+                config=BotoConfig(
+                    connect_timeout=timeout,
+                    read_timeout=timeout,
+                    retries={"total_max_attempts": 1},
+                    max_pool_connections=1
+                )
+            )
+        client = _probe_client
+    client.head_bucket(Bucket=Config.S3_BUCKET_NAME)
@@ -0,0 +1,101 @@
+"""
+Shared Redis connection pools for the API and worker processes
+"""
+import os
+import logging
+from typing import Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis is optional for local runs
+    redis = None
+    aioredis = None
+
+# Clients are created lazily and per process so that pooled sockets are never
+# shared across a fork (API worker processes, worker slots)
+_sync_client = None
+_async_client = None
+_probe_client = None
+_owner_pid: Optional[int] = None
+
+
+def _reset_after_fork():
+    """Drop clients inherited from a parent process"""
+    global _sync_client, _async_client, _probe_client, _owner_pid
+    if _owner_pid != os.getpid():
+        _sync_client = None
+        _async_client = None
+        _probe_client = None
+        _owner_pid = os.getpid()
+
+
+def get_redis():
+    """
+    Get the process-wide synchronous Redis client
+
+    Returns:
+        redis.Redis backed by a connection pool, or None if redis is not installed
+    """
+    global _sync_client
+    if redis is None:
+        return None
+    _reset_after_fork()
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(
+            Config.REDIS_URL,
+            socket_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+            health_check_interval=30
+        )
+    return _sync_client
+
+
+def ping_redis(timeout: Optional[float] = None):
+    """
+    Ping Redis, raising on failure
+
+    Args:
+        timeout: Socket timeout in seconds; uses a dedicated probe client so a
+            hung server can't hold a probe thread longer than this
+    """
+    global _probe_client
+    if redis is None:
+        raise RuntimeError("redis package is not installed")
+    if timeout is None:
+        client = get_redis()
+    else:
+        _reset_after_fork()
+        if _probe_client is None:
+            _probe_client = redis.Redis.from_url(
+                Config.REDIS_URL,
+                socket_timeout=timeout,
+                socket_connect_timeout=timeout
+            )
+        client = _probe_client
+    client.ping()
+
+
+def get_async_redis():
+    """
+    Get the process-wide asyncio Redis client
+
+    Returns:
+        redis.asyncio.Redis backed by a connection pool, or None if redis is not installed
+    """
+    global _async_client
+    if aioredis is None:
+        return None
+    _reset_after_fork()
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(
+            Config.REDIS_URL,
+            socket_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=Config.REDIS_SOCKET_TIMEOUT_SECONDS,
+            health_check_interval=30
+        )
+    return _async_client
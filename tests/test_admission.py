@@ -0,0 +1,69 @@
+"""
+Tests for admission control (api/rate_limiter.py)
+"""
+import asyncio
+
+import pytest
+
+from api.rate_limiter import AdmissionController, AdmissionRejected, per_worker
+
+
+def test_limits_are_split_across_workers():
+    assert per_worker(32, 4) == 8
+    assert per_worker(10, 4) == 3
+    assert per_worker(1, 4) == 1
+
+
+@pytest.mark.asyncio
+async def test_grants_up_to_limit_then_queues_and_hands_over():
+    controller = AdmissionController(max_in_flight=1, max_queue=2, max_per_client=2, queue_timeout=1)
+    await controller.acquire("a")
+
+    waiter = asyncio.ensure_future(controller.acquire("b"))
+    await asyncio.sleep(0)
+    assert controller.stats()["queue_depth"] == 1
+
+    controller.release("a", service_time=1.0)
+    await waiter
+    assert controller.in_flight == 1
+    assert controller.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_full_and_client_over_share():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_per_client=1, queue_timeout=1)
+    await controller.acquire("a")
+
+    with pytest.raises(AdmissionRejected) as client_limit:
+        await controller.acquire("a")
+    assert client_limit.value.reason == "client_limit"
+
+    waiter = asyncio.ensure_future(controller.acquire("b"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as queue_full:
+        await controller.acquire("c")
+    assert queue_full.value.reason == "queue_full"
+    assert queue_full.value.retry_after >= 1
+
+    controller.release("a")
+    await waiter
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_round_robin_across_clients():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, max_per_client=4, queue_timeout=1)
+    await controller.acquire("busy")
+    order = []
+
+    async def request(client):
+        await controller.acquire(client)
+        order.append(client)
+
+    tasks = [asyncio.ensure_future(request(c)) for c in ("a", "a", "b")]
+    await asyncio.sleep(0)
+    for client in ("busy", "a", "b"):
+        controller.release(client)
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+    assert order == ["a", "b", "a"]
@@ -0,0 +1,215 @@
+"""
+Tests for batch document ingestion (api/document_ingestion.py)
+"""
+import asyncio
+import io
+import json
+import threading
+import zipfile
+from tempfile import SpooledTemporaryFile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import routes
+from api.document_ingestion import (
+    BatchUploads,
+    IngestedDocument,
+    SpooledUpload,
+    close_uploads,
+    iter_documents,
+    receive_uploads,
+)
+from api.rate_limiter import AdmissionController
+
+BOUNDARY = "batch-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def _upload(name: str, content: bytes, content_type: str = None) -> SpooledUpload:
+    file = SpooledTemporaryFile()
+    file.write(content)
+    file.seek(0)
+    return SpooledUpload(name, content_type, file)
+
+
+def _zip(members) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _part(name: str, content: bytes, filename: str = None, content_type: str = None) -> bytes:
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    headers = f"Content-Disposition: {disposition}\r\n"
+    if content_type:
+        headers += f"Content-Type: {content_type}\r\n"
+    return f"--{BOUNDARY}\r\n{headers}\r\n".encode() + content + b"\r\n"
+
+
+def _end() -> bytes:
+    return f"--{BOUNDARY}--\r\n".encode()
+
+
+async def _chunks(*chunks, size: int = 7, before_last: asyncio.Event = None):
+    for index, chunk in enumerate(chunks):
+        if before_last is not None and index == len(chunks) - 1:
+            await before_last.wait()
+        # Arrive in pieces, as off the network
+        for start in range(0, len(chunk), size):
+            yield chunk[start:start + size]
+
+
+@pytest.mark.asyncio
+async def test_receive_uploads_spools_file_parts_of_the_files_field():
+    uploads = BatchUploads()
+    big = b"%PDF " + b"x" * (2 * 1024 * 1024)
+    body = (
+        _part("files", b"%PDF a", "a.pdf", "application/pdf")
+        + _part("note", b"not a file")
+        + _part("other", b"%PDF o", "o.pdf")
+        + _part("files", big, "big.pdf")
+        + _end()
+    )
+
+    await receive_uploads(CONTENT_TYPE, _chunks(body, size=4096), uploads)
+    uploads.finish()
+
+    try:
+        assert [(u.filename, u.content_type) for u in uploads] == [("a.pdf", "application/pdf"), ("big.pdf", None)]
+        assert uploads.received[0].file.read() == b"%PDF a"
+        assert uploads.received[1].file.read() == big
+    finally:
+        uploads.close()
+    assert all(upload.file.closed for upload in uploads.received)
+
+
+@pytest.mark.asyncio
+async def test_parts_reach_the_batch_before_the_body_ends():
+    uploads = BatchUploads()
+    first_read = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    seen = []
+
+    def read_batch():
+        for document in iter_documents(uploads, max_bytes=1024, max_documents=10):
+            seen.append(document.filename)
+            loop.call_soon_threadsafe(first_read.set)
+
+    reader = threading.Thread(target=read_batch)
+    reader.start()
+    # A part ends at the next boundary, so hold the body back just after it
+    body = _part("files", b"%PDF a", "a.pdf") + _part("files", b"%PDF b", "b.pdf") + _end()
+    split = body.index(b"--" + BOUNDARY.encode(), 1) + len(BOUNDARY) + 4
+    stream = _chunks(body[:split], body[split:], before_last=first_read)
+    try:
+        await asyncio.wait_for(receive_uploads(CONTENT_TYPE, stream, uploads), timeout=5)
+    finally:
+        uploads.finish()
+        reader.join(5)
+        uploads.close()
+
+    assert seen == ["a.pdf", "b.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_receive_uploads_rejects_other_bodies():
+    uploads = BatchUploads()
+
+    with pytest.raises(ValueError):
+        await receive_uploads("application/json", _chunks(b"{}"), uploads)
+    with pytest.raises(ValueError):
+        await receive_uploads(CONTENT_TYPE, _chunks(b"--other\r\ngarbage"), uploads)
+    assert uploads.received == []
+
+
+def test_iter_documents_reads_parts_and_zip_members():
+    archive = _zip({
+        "docs/b.pdf": b"%PDF b",
+        "__MACOSX/docs/._b.pdf": b"junk",
+        "notes.txt": b"skip",
+        "c.png": b"\x89PNG c",
+    })
+    spooled = [
+        _upload("a.pdf", b"%PDF a", "application/pdf"),
+        _upload("batch.zip", archive, "application/zip"),
+    ]
+    try:
+        documents = list(iter_documents(spooled, max_bytes=1024, max_documents=10))
+    finally:
+        close_uploads(spooled)
+
+    assert [(d.filename, d.mime_type, d.content) for d in documents] == [
+        ("a.pdf", "application/pdf", b"%PDF a"),
+        ("docs/b.pdf", "application/pdf", b"%PDF b"),
+        ("c.png", "image/png", b"\x89PNG c"),
+    ]
+
+
+def test_iter_documents_flags_oversized_documents():
+    spooled = [_upload("big.pdf", b"x" * 2048, "application/pdf")]
+    try:
+        (document,) = iter_documents(spooled, max_bytes=1024, max_documents=10)
+    finally:
+        close_uploads(spooled)
+
+    assert document.content is None
+    assert "exceeds" in document.error
+
+
+def test_batch_endpoint_streams_a_line_per_document(monkeypatch):
+    async def extract(content, mime_type, filename, job_id=None, pages=None):
+        if content == b"%PDF bad":
+            return {"extraction_status": "failed", "error": "unreadable"}
+        return {"extraction_status": "complete", "document_name": filename}
+
+    monkeypatch.setattr(routes, "_extract", extract)
+    monkeypatch.setattr(routes, "admission_controller", AdmissionController(max_in_flight=2, max_queue=2, max_per_client=2))
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/api/v1")
+    body = (
+        _part("files", b"%PDF a", "a.pdf", "application/pdf")
+        + _part("files", _zip({"b.pdf": b"%PDF b", "c.pdf": b"%PDF bad"}), "more.zip", "application/zip")
+        + _end()
+    )
+
+    with TestClient(app) as client:
+        response = client.post("/api/v1/extract/batch", content=body, headers={"content-type": CONTENT_TYPE})
+        missing = client.post("/api/v1/extract/batch", content=_end(), headers={"content-type": CONTENT_TYPE})
+        not_multipart = client.post("/api/v1/extract/batch", json={})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    documents = sorted((line["filename"], line["status"]) for line in lines if line["type"] == "document")
+    assert documents == [("a.pdf", "success"), ("b.pdf", "success"), ("c.pdf", "failed")]
+    assert lines[-1]["type"] == "summary"
+    assert (lines[-1]["total"], lines[-1]["succeeded"], lines[-1]["failed"]) == (3, 2, 1)
+    assert missing.status_code == 400
+    assert not_multipart.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_timed_out_batch_document_keeps_slot_until_extraction_finishes(monkeypatch):
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_per_client=2, queue_timeout=5)
+    release = asyncio.Event()
+
+    async def slow_extract(*args, **kwargs):
+        await release.wait()
+        return {"extraction_status": "complete"}
+
+    monkeypatch.setattr(routes, "admission_controller", controller)
+    monkeypatch.setattr(routes, "_extract", slow_extract)
+    monkeypatch.setattr(routes.Config, "BATCH_DOCUMENT_TIMEOUT_SECONDS", 0.05)
+
+    document = IngestedDocument(0, "a.pdf", "application/pdf", b"%PDF")
+    line = await routes._extract_batch_document(document, "client")
+
+    assert line["status"] == "failed"
+    assert "timed out" in line["error"]
+    assert controller.in_flight == 1
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert controller.in_flight == 0
@@ -0,0 +1,106 @@
+"""
+Tests for fee extraction from tables and form fields (extraction/fee_extractor.py)
+"""
+from extraction.fee_extractor import _TOKEN, extract_fees, fee_summary, materialize_rows, parse_fee_value
+
+
+def cells(*texts, confidence=0.9):
+    return [{"text": text, "confidence": confidence} for text in texts]
+
+
+SCHEDULE_OF_CHARGES = {
+    "page": 2,
+    "table_id": 1,
+    "header_rows": [cells("Charge", "Amount")],
+    "body_rows": [
+        cells("Processing Fee", "1% of loan amount, min Rs. 5,000, max Rs. 25,000 plus GST"),
+        cells("Late Payment Charges", "2% per month on overdue EMI"),
+        cells("Prepayment Charges", "Nil"),
+        cells("Cheque Bounce Charges", "Rs. 500 per instance"),
+    ],
+}
+
+
+def parse(text):
+    return parse_fee_value(text, list(_TOKEN.finditer(text)))
+
+
+def test_schedule_of_charges_table():
+    fees = extract_fees({"all_tables": [SCHEDULE_OF_CHARGES]})["fees"]
+
+    processing = fees["processing_fee"]
+    assert (processing["percent"], processing["basis"]) == (1.0, "loan_amount")
+    assert (processing["minimum"], processing["maximum"], processing["plus_tax"]) == (5000.0, 25000.0, True)
+    assert (processing["source"], processing["page"], processing["table_id"]) == ("table", 2, 1)
+    assert (fees["late_payment_penalty"]["percent"], fees["late_payment_penalty"]["basis"]) == (2.0, "per_month")
+    assert fees["prepayment_penalty"]["waived"] is True
+    assert fees["prepayment_penalty"]["amount"] == 0.0
+    assert (fees["bounce_charges"]["amount"], fees["bounce_charges"]["basis"]) == (500.0, "per_instance")
+
+
+def test_more_confident_form_field_wins_and_summary_uses_an_amount():
+    form_fields = [{"field_name": "Processing Fee:", "field_value": "Rs. 5,900", "value_confidence": 0.95, "page": 1}]
+
+    extracted = extract_fees({"all_tables": [SCHEDULE_OF_CHARGES], "all_form_fields": form_fields})
+    summary = fee_summary(extracted)
+
+    assert extracted["fees"]["processing_fee"]["source"] == "form_field"
+    assert len([entry for entry in extracted["all_fees"] if entry["fee_type"] == "processing_fee"]) == 2
+    assert summary == {
+        "processing_fee": 5900.0,
+        "late_payment_penalty": "2% per month on overdue EMI",
+        "prepayment_penalty": "Nil",
+    }
+
+
+def test_processing_fee_summary_skips_percentage_rows():
+    table = {"page": 1, "table_id": 1, "header_rows": [], "body_rows": [
+        cells("Processing Fee", "1.5% of loan amount", confidence=0.99),
+        cells("Processing Fee (flat)", "Rs. 2,500", confidence=0.8),
+    ]}
+
+    extracted = extract_fees({"all_tables": [table]})
+
+    assert extracted["fees"]["processing_fee"]["percent"] == 1.5
+    assert fee_summary(extracted)["processing_fee"] == 2500.0
+
+
+def test_two_fees_in_one_row_split_at_the_second_label():
+    table = {"page": 1, "table_id": 1, "header_rows": [], "body_rows": [
+        cells("Stamp Duty Rs. 1,000 Legal Charges Rs. 3,500"),
+    ]}
+
+    fees = extract_fees({"all_tables": [table]})["fees"]
+
+    assert fees["stamp_duty"]["amount"] == 1000.0
+    assert fees["legal_charges"]["amount"] == 3500.0
+
+
+def test_rows_without_fee_labels_or_values_are_ignored():
+    table = {"page": 1, "table_id": 1, "header_rows": [cells("Processing Fee", "")], "body_rows": [
+        cells("Loan Amount", "Rs. 5,00,000"),
+    ]}
+
+    assert extract_fees({"all_tables": [table]}) == {"fees": {}, "all_fees": []}
+    assert extract_fees({}) == {"fees": {}, "all_fees": []}
+
+
+def test_materialize_rows_flattens_tables_and_form_fields():
+    form_fields = [{"field_name": "Late fee", "field_value": "Rs. 750", "page": 3}]
+
+    rows = materialize_rows([SCHEDULE_OF_CHARGES], form_fields)
+
+    assert len(rows) == 6
+    assert rows[0].cells == ["Charge", "Amount"]
+    assert rows[-1].cells == ["Late fee", "Rs. 750"]
+    assert (rows[-1].source, rows[-1].page, rows[-1].confidence) == ("form_field", 3, 0.9)
+
+
+def test_parse_fee_value():
+    assert parse("Rs. 2 lakhs")["amount"] == 200000.0
+    assert parse("Rs. 2 lakhs")["currency"] == "INR"
+    assert parse("4% of principal outstanding, minimum Rs. 1,000") == {
+        "amount": None, "currency": "INR", "percent": 4.0, "basis": "outstanding_principal",
+        "minimum": 1000.0, "maximum": None, "plus_tax": False, "waived": False
+    }
+    assert parse("Waived")["amount"] == 0.0
@@ -0,0 +1,122 @@
+"""
+Tests for rule-based loan field extraction (extraction/field_extractor.py)
+"""
+import pytest
+
+from extraction.field_extractor import (
+    FieldExtractor,
+    KeywordAutomaton,
+    extract_fields,
+    parse_amount,
+    parse_date,
+    parse_duration,
+)
+
+LETTER = """SANCTION LETTER
+Loan Account No: HL/2023/00123
+Name of the Borrower: Ravi Kumar
+Loan Amount: Rs. 5,00,000
+Rate of Interest: 10.50% p.a.
+Tenure: 5 years
+EMI: Rs. 10,747
+First EMI Date: 05/02/2024
+Sanction Date: 15 January 2024
+Moratorium: 6 months
+"""
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return FieldExtractor()
+
+
+def test_sanction_letter_fields(extractor):
+    fields = extractor.extract(LETTER)
+
+    assert {name: field["value"] for name, field in fields.items()} == {
+        "loan_account_number": "HL/2023/00123",
+        "borrower_name": "Ravi Kumar",
+        "principal_amount": 500000.0,
+        "interest_rate": 10.5,
+        "tenure_months": 60.0,
+        "emi_amount": 10747.0,
+        "first_emi_date": "2024-02-05",
+        "sanction_date": "2024-01-15",
+        "moratorium_months": 6.0,
+    }
+    assert fields["principal_amount"]["currency"] == "INR"
+    assert fields["principal_amount"]["source"] == "text"
+    assert fields["principal_amount"]["raw"] == "Rs. 5,00,000"
+
+
+def test_specific_label_wins_over_the_label_it_contains(extractor):
+    fields = extractor.extract("First EMI Date: 05/02/2024\n")
+
+    assert "emi_amount" not in fields
+    assert fields["first_emi_date"]["value"] == "2024-02-05"
+
+
+def test_automaton_matches_whole_words_across_case_and_spacing():
+    automaton = KeywordAutomaton([("emi", "emi"), ("first emi date", "first")])
+
+    matches = automaton.find("First  EMI date, EMI and premium")
+
+    assert [(match.label, match.payload) for match in matches] == [("first emi date", "first"), ("emi", "emi")]
+    assert matches[0].start == 0 and matches[0].end == 15
+
+
+def test_form_field_value_wins_over_text(extractor):
+    form_fields = [{"field_name": "Interest Rate", "field_value": "8.75 %", "value_confidence": 0.9, "page": 2}]
+
+    fields = extractor.extract("Interest Rate: 9.5%", form_fields)
+
+    assert fields["interest_rate"]["value"] == 8.75
+    assert fields["interest_rate"]["source"] == "form_field"
+    assert fields["interest_rate"]["page"] == 2
+    assert fields["interest_rate"]["confidence"] == pytest.approx(0.855)
+
+
+def test_value_belongs_to_the_closest_label(extractor):
+    fields = extractor.extract("Loan Amount EMI: Rs. 10,747")
+
+    assert "principal_amount" not in fields
+    assert fields["emi_amount"]["value"] == 10747.0
+
+
+def test_unitless_values_are_less_confident(extractor):
+    fields = extractor.extract("Interest Rate: 9.5\nTenure: 60 months")
+
+    assert fields["interest_rate"]["value"] == 9.5
+    assert fields["interest_rate"]["confidence"] < fields["tenure_months"]["confidence"]
+
+
+@pytest.mark.parametrize("text, value, currency", [
+    ("Rs. 5,00,000", 500000.0, "INR"),
+    ("50 lakhs", 5000000.0, None),
+    ("INR 2.5 crore", 25000000.0, "INR"),
+])
+def test_parse_amount(text, value, currency):
+    parsed, start, end = parse_amount(text)
+
+    assert parsed == {"value": value, "currency": currency}
+    assert text[start:end] == text
+
+
+def test_parse_date_and_duration():
+    assert parse_date("on 2024-03-01")[0] == {"value": "2024-03-01"}
+    assert parse_date("31/02/2024") is None
+    assert parse_duration("3 yrs")[0] == {"value": 36.0, "unitless": False}
+    assert parse_duration("240")[0] == {"value": 240.0, "unitless": True}
+
+
+def test_extract_fields_reads_result_text_and_form_fields():
+    complete_data = {
+        "complete_text": {"merged_text": "Tenure: 5 years"},
+        "all_form_fields": [{"field_name": "Loan Amount:", "field_value": "Rs. 5,00,000", "page": 1}],
+    }
+
+    fields = extract_fields(complete_data)
+
+    assert fields["tenure_months"]["value"] == 60.0
+    assert fields["principal_amount"]["value"] == 500000.0
+    assert fields["principal_amount"]["source"] == "form_field"
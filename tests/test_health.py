@@ -0,0 +1,60 @@
+"""
+Tests for background dependency probing (api/health.py)
+"""
+import threading
+
+import pytest
+
+from api.health import HealthMonitor
+
+
+@pytest.mark.asyncio
+async def test_healthy_and_failing_probes():
+    def broken():
+        raise ConnectionError("refused")
+
+    monitor = HealthMonitor({"redis": lambda: None, "database": broken}, ["redis", "database"], timeout=1)
+    await monitor.refresh()
+    snapshot = monitor.snapshot()
+
+    assert snapshot["redis"]["status"] == "up"
+    assert snapshot["database"]["status"] == "down"
+    assert snapshot["database"]["error"] == "refused"
+    assert monitor.is_ready() is False
+
+
+@pytest.mark.asyncio
+async def test_hung_probe_is_not_started_again_while_running():
+    release = threading.Event()
+    calls = []
+
+    def hung():
+        calls.append(1)
+        release.wait(5)
+
+    monitor = HealthMonitor({"storage": hung}, ["storage"], timeout=0.05)
+    try:
+        await monitor.refresh()
+        assert monitor.snapshot()["storage"]["error"].startswith("probe timed out")
+
+        await monitor.refresh()
+        await monitor.refresh()
+        assert len(calls) == 1
+        assert monitor.snapshot()["storage"]["error"] == "previous probe still running"
+    finally:
+        release.set()
+
+    await monitor._running["storage"]
+    await monitor.refresh()
+    assert len(calls) == 2
+    assert monitor.snapshot()["storage"]["status"] == "up"
+
+
+def test_ping_functions_accept_client_timeout():
+    import inspect
+    from storage.database import ping_database
+    from storage.object_storage import ping_storage
+    from storage.redis_client import ping_redis
+
+    for ping in (ping_database, ping_redis, ping_storage):
+        assert "timeout" in inspect.signature(ping).parameters
@@ -0,0 +1,141 @@
+"""
+Tests for OCR of preprocessed images (processing/complete_document_extractor.py)
+"""
+import io
+
+import numpy as np
+import pytest
+from google.cloud import documentai_v1 as documentai
+from PIL import Image
+
+from config import Config
+from ocr.ocr_engine import OCREngine
+from ocr.region_refiner import RegionRefiner
+from processing.complete_document_extractor import CompleteDocumentExtractor
+
+
+class RecordingEngine(OCREngine):
+    """Reads preprocessed (JPEG) images at one confidence and originals at another"""
+
+    name = "recording"
+
+    def __init__(self, billed, preprocessed_confidence, original_confidence):
+        self.billed = billed
+        self.confidences = {"image/jpeg": preprocessed_confidence, "image/png": original_confidence}
+        self.calls = []
+
+    def process_document(self, file_content, mime_type, pages=None, notify=None):
+        self.calls.append((mime_type, notify))
+        confidence = self.confidences[mime_type]
+        page = {"tokens": [{"layout": {"confidence": confidence}}]}
+        return None, documentai.Document(text=mime_type, pages=[page]), None
+
+
+def noisy_scan() -> bytes:
+    """A 600 DPI color scan that preprocessing shrinks to a gray JPEG"""
+    pixels = (np.random.default_rng(0).random((1200, 900, 3)) * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG", dpi=(600, 600))
+    return buffer.getvalue()
+
+
+def notify(stage, **data):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def preprocessing(monkeypatch):
+    monkeypatch.setattr(Config, "OCR_PREPROCESS", True)
+    monkeypatch.setattr(Config, "OCR_PREPROCESS_MIN_CONFIDENCE", 0.85)
+
+
+def test_billed_engine_is_called_once_for_a_poor_scan():
+    engine = RecordingEngine(billed=True, preprocessed_confidence=0.5, original_confidence=0.9)
+
+    _, ocr_doc, _, _, _ = CompleteDocumentExtractor(engine).process_document(noisy_scan(), "image/png", notify=notify)
+
+    assert engine.calls == [("image/jpeg", notify)]
+    assert ocr_doc.text == "image/jpeg"
+
+
+def test_local_engine_falls_back_to_a_better_original():
+    engine = RecordingEngine(billed=False, preprocessed_confidence=0.5, original_confidence=0.9)
+
+    _, ocr_doc, _, _, _ = CompleteDocumentExtractor(engine).process_document(noisy_scan(), "image/png", notify=notify)
+
+    assert engine.calls == [("image/jpeg", notify), ("image/png", notify)]
+    assert ocr_doc.text == "image/png"
+
+
+def test_local_engine_keeps_a_confident_preprocessed_reading():
+    engine = RecordingEngine(billed=False, preprocessed_confidence=0.95, original_confidence=0.99)
+
+    _, ocr_doc, _, _, _ = CompleteDocumentExtractor(engine).process_document(noisy_scan(), "image/png", notify=notify)
+
+    assert engine.calls == [("image/jpeg", notify)]
+    assert ocr_doc.text == "image/jpeg"
+
+
+class BlockEngine(OCREngine):
+    """Local engine reading one low-confidence block around the ink it is sent"""
+
+    name = "blocks"
+
+    def __init__(self):
+        self.read = []
+
+    def process_document(self, file_content, mime_type, pages=None, notify=None):
+        self.read.append(mime_type)
+        gray = np.asarray(Image.open(io.BytesIO(file_content)).convert("L"))
+        height, width = gray.shape
+        ys, xs = np.nonzero(gray < 100)
+        left, top, right, bottom = xs.min() / width, ys.min() / height, (xs.max() + 1) / width, (ys.max() + 1) / height
+        layout = {
+            "text_anchor": {"text_segments": [{"start_index": 0, "end_index": 4}]},
+            "confidence": 0.5,
+            "bounding_poly": {"normalized_vertices": [
+                {"x": left, "y": top}, {"x": right, "y": top}, {"x": right, "y": bottom}, {"x": left, "y": bottom}
+            ]}
+        }
+        page = {
+            "page_number": 1,
+            "dimension": {"width": width, "height": height},
+            "blocks": [{"layout": layout}],
+            "tokens": [{"layout": {"confidence": 0.95}}]
+        }
+        return None, documentai.Document(text="blob", pages=[page]), None
+
+
+class CropEngine(OCREngine):
+    """Records the share of ink in each crop it is asked to read"""
+
+    name = "crops"
+
+    def __init__(self):
+        self.ink = []
+
+    def process_document(self, file_content, mime_type, pages=None, notify=None):
+        gray = np.asarray(Image.open(io.BytesIO(file_content)).convert("L"))
+        self.ink.append(float((gray < 100).mean()))
+        page = {"tokens": [{"layout": {"confidence": 0.99}}]}
+        return None, documentai.Document(text="refined", pages=[page]), None
+
+
+def test_refinement_crops_come_from_the_image_the_blocks_were_read_on(monkeypatch):
+    monkeypatch.setattr(Config, "OCR_REFINE_ENABLED", True)
+    # Light paper noise with a dark block off-center; preprocessing crops
+    # the margins, so block boxes only match the preprocessed image
+    pixels = (200 + np.random.default_rng(0).random((3000, 2400)) * 55).astype(np.uint8)
+    pixels[1800:2400, 1400:2000] = 0
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG", dpi=(600, 600))
+    extractor = CompleteDocumentExtractor(BlockEngine())
+    crops = CropEngine()
+    extractor._refiner = RegionRefiner(engine=crops, dpi=300, concurrency=1, threshold=0.85, min_gain=0.05)
+
+    result = extractor.extract_complete_document(buffer.getvalue(), "image/png", "scan.png")
+
+    assert extractor.engine.read == ["image/jpeg"]
+    assert len(crops.ink) == 1
+    assert crops.ink[0] > 0.5
+    assert result["refinement"]["blocks_refined"] == 1
@@ -0,0 +1,145 @@
+"""
+Tests for the worker job queues (worker/job_queue.py)
+
+Every behavior runs against InMemoryQueue and against RedisQueue's Lua
+scripts on fakeredis, so both implementations keep the same semantics.
+"""
+import time
+
+import fakeredis
+import pytest
+
+from worker.job_queue import InMemoryQueue, RedisQueue, make_job
+
+LANE_WEIGHTS = {"interactive": 1.0, "standard": 1.0, "bulk": 1.0}
+NO_WAIT_CAP = {"interactive": 3600.0, "standard": 3600.0, "bulk": 3600.0}
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_queue(request):
+    def factory(**kwargs):
+        kwargs.setdefault("visibility_timeout", 30)
+        kwargs.setdefault("max_attempts", 2)
+        kwargs.setdefault("lane_weights", LANE_WEIGHTS)
+        kwargs.setdefault("lane_max_wait", NO_WAIT_CAP)
+        kwargs.setdefault("tenant_weights", {})
+        if request.param == "memory":
+            return InMemoryQueue(**kwargs)
+        return RedisQueue(name="test-queue", client=fakeredis.FakeRedis(), **kwargs)
+    return factory
+
+
+def _drain(queue, count):
+    jobs = []
+    for _ in range(count):
+        job = queue.pop(0)
+        assert job is not None
+        queue.ack(job)
+        jobs.append(job)
+    return jobs
+
+
+def test_push_pop_ack(make_queue):
+    queue = make_queue()
+    queue.push(make_job("doc-1", pages="1-2"))
+
+    job = queue.pop(0)
+    assert job["document_id"] == "doc-1"
+    assert job["pages"] == "1-2"
+    assert job["attempt"] == 1
+    assert queue.ack(job) is True
+    assert queue.pop(0) is None
+    assert queue.stats()["leased"] == 0
+
+
+def test_failed_job_is_retried_then_dead_lettered(make_queue, monkeypatch):
+    monkeypatch.setattr("worker.job_queue.retry_delay", lambda attempt: 0.0)
+    queue = make_queue(max_attempts=2)
+    queue.push(make_job("doc-1"))
+
+    first = queue.pop(0)
+    assert queue.fail(first, "timeout") == "retry"
+    queue.reap()
+    second = queue.pop(0)
+    assert second["attempt"] == 2
+    assert queue.fail(second, "timeout") == "dead"
+
+    (dead,) = queue.dead_letters()
+    assert dead["job"]["document_id"] == "doc-1"
+    assert dead["attempts"] == 2
+    assert queue.pop(0) is None
+
+
+def test_permanent_failure_skips_retries(make_queue):
+    queue = make_queue(max_attempts=5)
+    queue.push(make_job("doc-1"))
+
+    assert queue.fail(queue.pop(0), "bad pages", permanent=True) == "dead"
+    assert queue.stats()["dead"] == 1
+
+
+def test_expired_lease_is_reaped_and_old_owner_loses_it(make_queue):
+    queue = make_queue(visibility_timeout=0.05)
+    queue.push(make_job("doc-1"))
+    stale = queue.pop(0)
+
+    time.sleep(0.1)
+    assert queue.reap()["expired"] == 1
+    fresh = queue.pop(0)
+
+    assert fresh["job_id"] == stale["job_id"]
+    assert queue.extend([stale]) == [stale["job_id"]]
+    assert queue.ack(stale) is False
+    assert queue.ack(fresh) is True
+
+
+def test_heartbeat_keeps_the_lease(make_queue):
+    queue = make_queue(visibility_timeout=0.2)
+    queue.push(make_job("doc-1"))
+    job = queue.pop(0)
+
+    for _ in range(3):
+        time.sleep(0.1)
+        assert queue.extend([job]) == []
+    assert queue.reap()["expired"] == 0
+    assert queue.ack(job) is True
+
+
+def test_lanes_share_workers_by_weight(make_queue):
+    queue = make_queue(lane_weights={"interactive": 3.0, "standard": 1.0, "bulk": 1.0})
+    for index in range(8):
+        queue.push(make_job(f"i{index}", priority="interactive"))
+        queue.push(make_job(f"b{index}", priority="bulk"))
+
+    lanes = [job["priority"] for job in _drain(queue, 8)]
+
+    assert lanes.count("interactive") == 6
+    assert lanes.count("bulk") == 2
+
+
+def test_tenants_in_a_lane_are_served_round_robin(make_queue):
+    queue = make_queue()
+    for index in range(3):
+        queue.push(make_job(f"a{index}", tenant="a"))
+    queue.push(make_job("b0", tenant="b"))
+
+    tenants = [job["tenant"] for job in _drain(queue, 4)]
+
+    assert tenants[:2] in (["a", "b"], ["b", "a"])
+    assert tenants.count("a") == 3
+
+
+def test_lane_over_its_wait_cap_is_promoted(make_queue):
+    queue = make_queue(
+        lane_weights={"interactive": 100.0, "standard": 1.0, "bulk": 0.01},
+        lane_max_wait={"interactive": 3600.0, "standard": 3600.0, "bulk": 0.05}
+    )
+    queue.push(make_job("old-bulk", priority="bulk"))
+    time.sleep(0.1)
+    for index in range(3):
+        queue.push(make_job(f"i{index}", priority="interactive"))
+
+    job = queue.pop(0)
+
+    assert job["document_id"] == "old-bulk"
+    assert job["promoted"] is True
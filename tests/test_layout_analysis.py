@@ -0,0 +1,110 @@
+"""
+Tests for grouping positioned words into lines, blocks and columns (ocr/layout_analyzer.py)
+"""
+from ocr.layout_analyzer import analyze_layout, layout_words
+
+CHAR_WIDTH = 6
+HEIGHT = 10
+
+
+def line(words, x, y, text):
+    """Append the words of a line of text starting at (x, y)"""
+    for item in text.split():
+        width = len(item) * CHAR_WIDTH
+        words.append({"text": item, "confidence": 1.0, "box": [x, y, width, HEIGHT]})
+        x += width + CHAR_WIDTH
+
+
+def lines_of(blocks):
+    return [
+        " ".join(word["text"] for word in text_line["words"])
+        for block in blocks
+        for paragraph in block["paragraphs"]
+        for text_line in paragraph["lines"]
+    ]
+
+
+def two_columns():
+    words = []
+    line(words, 50, 20, "LOAN AGREEMENT TITLE SPANNING BOTH COLUMNS OF THE PAGE HERE ACROSS")
+    for index in range(8):
+        line(words, 50, 50 + index * 14, f"left column line {index} some words")
+    # The right column starts lower and keeps its own line grid
+    for index in range(6):
+        line(words, 320, 57 + index * 14, f"right column line {index} other words")
+    return words
+
+
+def test_columns_are_read_one_after_the_other():
+    words = two_columns()
+
+    layout = analyze_layout([word["box"] for word in words], 600)
+    text = lines_of(layout_words(words, 600))
+
+    assert len(layout.gutters) == 1
+    assert text[0].startswith("LOAN AGREEMENT")
+    assert text[1:9] == [f"left column line {index} some words" for index in range(8)]
+    assert text[9:] == [f"right column line {index} other words" for index in range(6)]
+
+
+def test_key_value_rows_stay_on_one_line():
+    words = []
+    pairs = [
+        ("Loan Amount", "Rs. 5,00,000"),
+        ("Rate of Interest", "10.50% p.a."),
+        ("Tenure", "60 months"),
+        ("EMI", "Rs. 10,747"),
+        ("Processing Fee", "Rs. 5,000"),
+    ]
+    for index, (label, value) in enumerate(pairs):
+        line(words, 50, 40 + index * 20, label)
+        line(words, 300, 40 + index * 20, value)
+
+    layout = analyze_layout([word["box"] for word in words], 600)
+
+    assert len(layout.gutters) == 0
+    assert lines_of(layout_words(words, 600)) == [f"{label} {value}" for label, value in pairs]
+
+
+def test_aligned_columns_of_running_text_keep_their_gutter():
+    words = []
+    for index in range(10):
+        line(words, 50, 40 + index * 14, f"running text of the left column on line {index}")
+        line(words, 360, 40 + index * 14, f"running text of the right column on line {index}")
+
+    layout = analyze_layout([word["box"] for word in words], 700)
+    text = lines_of(layout_words(words, 700))
+
+    assert len(layout.gutters) == 1
+    assert text[0] == "running text of the left column on line 0"
+    assert text[10] == "running text of the right column on line 0"
+
+
+def test_narrow_table_columns_are_not_page_columns():
+    words = []
+    for row in range(5):
+        for column, x in enumerate([50, 150, 250, 350, 450]):
+            line(words, x, 20 + row * 14, f"r{row}c{column}")
+
+    layout = analyze_layout([word["box"] for word in words], 600)
+
+    assert len(layout.gutters) == 0
+    assert len(layout.lines) == 5
+
+
+def test_blocks_break_on_wide_line_gaps():
+    words = []
+    for index in range(3):
+        line(words, 50, 20 + index * 14, f"first paragraph line {index}")
+    for index in range(3):
+        line(words, 50, 100 + index * 14, f"second paragraph line {index}")
+
+    blocks = layout_words(words, 600)
+
+    assert len(blocks) == 2
+    assert lines_of(blocks[1:]) == [f"second paragraph line {index}" for index in range(3)]
+
+
+def test_empty_page():
+    assert layout_words([], 600) == []
+    assert analyze_layout([], 600).order.size == 0
@@ -0,0 +1,79 @@
+"""
+Tests for the metrics module (metrics.py)
+"""
+import os
+import subprocess
+import sys
+
+from metrics import clear_multiprocess_dir, counter, gauge, histogram, mark_process_dead, render
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One API worker process recording a request, an in-flight gauge and a latency
+WORKER_SCRIPT = """
+import sys
+from metrics import counter, gauge, histogram
+counter("test_requests_total", "Requests", ["status"]).labels("200").inc(int(sys.argv[1]))
+gauge("test_in_flight", "In flight").set(int(sys.argv[1]))
+histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0)).observe(float(sys.argv[2]))
+"""
+
+
+def _run_worker(directory, requests, latency) -> int:
+    """Record values in a separate process sharing directory, returning its pid"""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": directory, "PYTHONPATH": ROOT}
+    process = subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, str(requests), str(latency)], env=env)
+    assert process.wait(timeout=60) == 0
+    return process.pid
+
+
+def test_families_are_created_once():
+    assert counter("test_once_total", "Once") is counter("test_once_total", "Once")
+
+
+def test_render_histogram_is_cumulative():
+    latency = histogram("test_render_seconds", "Latency", buckets=(0.1, 1.0))
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = render().decode()
+
+    assert 'test_render_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'test_render_seconds_bucket{le="1.0"} 2.0' in text
+    assert 'test_render_seconds_bucket{le="+Inf"} 3.0' in text
+    assert "test_render_seconds_count 3.0" in text
+
+
+def test_label_values_are_escaped():
+    gauge("test_escaped", "Escaped", ["path"]).labels('a"b\\c\nd').set(1)
+
+    assert 'test_escaped{path="a\\"b\\\\c\\nd"} 1.0' in render().decode()
+
+
+def test_multiprocess_render_sums_counters_and_histograms_and_labels_live_gauges(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    clear_multiprocess_dir(directory)
+    exited = _run_worker(directory, 3, 0.5)
+    live = _run_worker(directory, 2, 0.05)
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", directory)
+
+    # gunicorn reports only the first worker as exited
+    mark_process_dead(exited)
+    text = render().decode()
+
+    assert 'test_requests_total{status="200"} 5.0' in text
+    assert f'test_in_flight{{pid="{live}"}} 2.0' in text
+    assert f'pid="{exited}"' not in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'test_latency_seconds_bucket{le="1.0"} 2.0' in text
+    assert "test_latency_seconds_count 2.0" in text
+
+
+def test_clear_multiprocess_dir_removes_previous_run(tmp_path):
+    directory = str(tmp_path)
+    _run_worker(directory, 1, 0.1)
+
+    clear_multiprocess_dir(directory)
+
+    assert os.listdir(directory) == []
@@ -0,0 +1,152 @@
+"""
+Tests for page-parallel rasterization and OCR (ocr/multipage_processor.py)
+"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import pdf2image
+import pytest
+from PIL import Image
+
+from config import Config
+from ocr import multipage_processor
+from ocr.multipage_processor import MultipageProcessor
+
+PAGES = 12
+
+
+class RecordingSharedMemory(SharedMemory):
+    """Shared memory that remembers the blocks it created"""
+
+    created = []
+
+    def __init__(self, name=None, create=False, size=0):
+        super().__init__(name=name, create=create, size=size)
+        if create:
+            RecordingSharedMemory.created.append(self.name)
+
+
+def exists(block_name: str) -> bool:
+    try:
+        SharedMemory(name=block_name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def render(content, dpi, first_page, last_page, grayscale):
+    """Stand-in for poppler: page n is a small gray image of value n"""
+    assert content.startswith(b"%PDF")
+    last_page = min(last_page, PAGES)
+    return [Image.new("L", (40, 20), number) for number in range(first_page, last_page + 1)]
+
+
+def recognize(image, languages, tesseract_cmd):
+    """Stand-in for Tesseract: later pages finish first"""
+    number = image.getpixel((0, 0))
+    time.sleep(0.002 * (PAGES - number))
+    return {"page": number, "size": image.size}
+
+
+@pytest.fixture(autouse=True)
+def fakes(monkeypatch):
+    RecordingSharedMemory.created = []
+    monkeypatch.setattr(Config, "PAGE_CACHE_ENABLED", False)
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", render)
+    monkeypatch.setattr(multipage_processor, "recognize_page", recognize)
+    monkeypatch.setattr(multipage_processor, "SharedMemory", RecordingSharedMemory)
+
+
+@pytest.fixture
+def pool():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown()
+
+
+def test_pages_come_back_in_order(pool):
+    processor = MultipageProcessor(pool=pool, max_in_flight=3, chunk_pages=2)
+    selected = [1, 2, 3, 5, 6, 9, 10, 11, 12]
+
+    results = list(processor.process(b"%PDF-1.4", selected))
+
+    assert [number for number, _ in results] == selected
+    assert [page["page"] for _, page in results] == selected
+    assert results[0][1]["size"] == (40, 20)
+    assert RecordingSharedMemory.created
+    assert not any(exists(name) for name in RecordingSharedMemory.created)
+
+
+def test_pages_past_the_end_are_skipped(pool):
+    processor = MultipageProcessor(pool=pool, max_in_flight=4, chunk_pages=4)
+
+    results = list(processor.process(b"%PDF-1.4", [11, 12, 13, 14]))
+
+    assert [number for number, _ in results] == [11, 12]
+
+
+def test_blocks_are_unlinked_when_ocr_fails(pool, monkeypatch):
+    def failing(image, languages, tesseract_cmd):
+        if image.getpixel((0, 0)) == 5:
+            raise RuntimeError("tesseract crashed")
+        return recognize(image, languages, tesseract_cmd)
+
+    monkeypatch.setattr(multipage_processor, "recognize_page", failing)
+    processor = MultipageProcessor(pool=pool, max_in_flight=4, chunk_pages=2)
+
+    with pytest.raises(RuntimeError, match="tesseract crashed"):
+        list(processor.process(b"%PDF-1.4", list(range(1, PAGES + 1))))
+
+    assert len(RecordingSharedMemory.created) > 1
+    assert not any(exists(name) for name in RecordingSharedMemory.created)
+
+
+def test_blocks_are_unlinked_when_rasterizing_fails(pool, monkeypatch):
+    def failing(content, dpi, first_page, last_page, grayscale):
+        if first_page > 4:
+            raise RuntimeError("pdftoppm failed")
+        return render(content, dpi, first_page, last_page, grayscale)
+
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", failing)
+    processor = MultipageProcessor(pool=pool, max_in_flight=8, chunk_pages=2)
+
+    with pytest.raises(RuntimeError, match="pdftoppm failed"):
+        list(processor.process(b"%PDF-1.4", list(range(1, PAGES + 1))))
+
+    assert not any(exists(name) for name in RecordingSharedMemory.created)
+
+
+def test_blocks_are_unlinked_when_the_caller_stops_early(pool, monkeypatch):
+    # Hold OCR of later pages so they are still in flight when the caller stops
+    gate = threading.Event()
+
+    def gated(image, languages, tesseract_cmd):
+        if image.getpixel((0, 0)) > 1:
+            gate.wait(5)
+        return recognize(image, languages, tesseract_cmd)
+
+    monkeypatch.setattr(multipage_processor, "recognize_page", gated)
+    processor = MultipageProcessor(pool=pool, max_in_flight=4, chunk_pages=2)
+
+    pages = processor.process(b"%PDF-1.4", list(range(1, PAGES + 1)))
+    assert next(pages)[0] == 1
+    threading.Timer(0.05, gate.set).start()
+    pages.close()
+
+    assert not any(exists(name) for name in RecordingSharedMemory.created)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_process_pool_reads_pages_from_shared_memory():
+    # Forked children inherit the fakes
+    pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("fork"))
+    try:
+        processor = MultipageProcessor(pool=pool, max_in_flight=4, chunk_pages=2)
+        results = list(processor.process(b"%PDF-1.4", [2, 3, 4, 8]))
+    finally:
+        pool.shutdown()
+
+    assert [(number, page["page"]) for number, page in results] == [(2, 2), (3, 3), (4, 4), (8, 8)]
@@ -0,0 +1,153 @@
+"""
+Tests for the local Tesseract OCR engine (ocr/ocr_engine.py)
+"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytesseract
+import pytest
+from PIL import Image
+
+from config import Config
+from ocr.ocr_engine import TesseractEngine, recognize_page
+
+WIDTH, HEIGHT = 1000, 500
+
+# One block of two paragraphs: "Loan Amount Rs. 5,00,000" / "Tenure 60 months"
+# Rows are (level, block, paragraph, line, left, top, width, height, conf, text)
+ROWS = [
+    (1, 0, 0, 0, 0, 0, WIDTH, HEIGHT, -1, ""),
+    (2, 1, 0, 0, 100, 100, 600, 200, -1, ""),
+    (3, 1, 1, 0, 100, 100, 600, 40, -1, ""),
+    (4, 1, 1, 1, 100, 100, 600, 40, -1, ""),
+    (5, 1, 1, 1, 100, 100, 100, 40, 96, "Loan"),
+    (5, 1, 1, 1, 210, 100, 150, 40, 90, "Amount"),
+    (5, 1, 1, 1, 370, 100, 80, 40, 84, "Rs."),
+    (5, 1, 1, 1, 460, 100, 240, 40, 70, "5,00,000"),
+    # Tesseract's empty and unrecognized word rows are dropped
+    (5, 1, 1, 1, 710, 100, 10, 40, 95, " "),
+    (5, 1, 1, 1, 730, 100, 10, 40, -1, "~"),
+    (3, 1, 2, 0, 100, 260, 400, 40, -1, ""),
+    (4, 1, 2, 1, 100, 260, 400, 40, -1, ""),
+    (5, 1, 2, 1, 100, 260, 150, 40, 80, "Tenure"),
+    (5, 1, 2, 1, 260, 260, 50, 40, 100, "60"),
+    (5, 1, 2, 1, 320, 260, 180, 40, 90, "months"),
+]
+
+
+class FakeTesseract:
+    """Stands in for pytesseract.image_to_data, counting calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, image, lang=None, output_type=None):
+        self.calls.append((image.size, lang))
+        columns = ["level", "block_num", "par_num", "line_num", "left", "top", "width", "height", "conf", "text"]
+        data = {column: [row[index] for row in ROWS] for index, column in enumerate(columns)}
+        data["page_num"] = [1] * len(ROWS)
+        data["word_num"] = [0] * len(ROWS)
+        return data
+
+
+@pytest.fixture
+def tesseract(monkeypatch):
+    fake = FakeTesseract()
+    monkeypatch.setattr(pytesseract, "image_to_data", fake)
+    monkeypatch.setattr(Config, "OCR_DETECT_TABLES", False)
+    return fake
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = TesseractEngine(languages="eng+hin", processes=1, cache_pages=8)
+    # The stubbed pytesseract only exists in this process
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(engine, "_get_pool", lambda: pool)
+    yield engine
+    pool.shutdown()
+
+
+def scan(frames: int = 1) -> bytes:
+    images = [Image.new("L", (WIDTH, HEIGHT), 255) for _ in range(frames)]
+    buffer = io.BytesIO()
+    images[0].save(buffer, "TIFF", save_all=True, append_images=images[1:])
+    return buffer.getvalue()
+
+
+def anchored(document, layout) -> str:
+    return "".join(document.text[segment.start_index:segment.end_index] for segment in layout.text_anchor.text_segments)
+
+
+def test_recognize_page_groups_words_into_blocks_paragraphs_and_lines(tesseract):
+    page = recognize_page(Image.new("L", (WIDTH, HEIGHT), 255), "eng", "tesseract")
+
+    assert (page["width"], page["height"]) == (WIDTH, HEIGHT)
+    assert len(page["blocks"]) == 1
+    paragraphs = page["blocks"][0]["paragraphs"]
+    assert [[word["text"] for word in paragraph["lines"][0]["words"]] for paragraph in paragraphs] == [
+        ["Loan", "Amount", "Rs.", "5,00,000"],
+        ["Tenure", "60", "months"],
+    ]
+    assert paragraphs[0]["lines"][0]["words"][0] == {"text": "Loan", "confidence": 0.96, "box": [100, 100, 100, 40]}
+    assert page["tables"] == []
+
+
+def test_engine_builds_a_document_with_dimensions_confidences_and_anchors(tesseract, engine):
+    notified = []
+
+    form_doc, document, page_numbers = engine.process_document(
+        scan(), "image/tiff", notify=lambda stage, **data: notified.append((stage, data))
+    )
+
+    assert form_doc is None and page_numbers is None
+    assert notified == [("ocr_done", {"success": True})]
+    assert tesseract.calls == [((WIDTH, HEIGHT), "eng+hin")]
+    assert document.text == "Loan Amount Rs. 5,00,000\n\nTenure 60 months\n\n"
+
+    (page,) = document.pages
+    assert page.page_number == 1
+    assert (page.dimension.width, page.dimension.height, page.dimension.unit) == (WIDTH, HEIGHT, "pixels")
+
+    assert [anchored(document, token.layout) for token in page.tokens] == [
+        "Loan", "Amount", "Rs.", "5,00,000", "Tenure", "60", "months"
+    ]
+    assert [round(token.layout.confidence, 2) for token in page.tokens] == [0.96, 0.9, 0.84, 0.7, 0.8, 1.0, 0.9]
+    assert [anchored(document, line.layout) for line in page.lines] == ["Loan Amount Rs. 5,00,000\n", "Tenure 60 months\n"]
+    assert [anchored(document, paragraph.layout) for paragraph in page.paragraphs] == [
+        "Loan Amount Rs. 5,00,000\n\n", "Tenure 60 months\n\n"
+    ]
+    (block,) = page.blocks
+    assert anchored(document, block.layout) == document.text
+    assert block.layout.confidence == pytest.approx((0.96 + 0.9 + 0.84 + 0.7 + 0.8 + 1.0 + 0.9) / 7)
+    assert page.layout.confidence == pytest.approx(block.layout.confidence)
+    assert page.lines[0].layout.confidence == pytest.approx((0.96 + 0.9 + 0.84 + 0.7) / 4)
+
+    vertices = page.tokens[0].layout.bounding_poly.normalized_vertices
+    assert [(round(v.x, 3), round(v.y, 3)) for v in vertices] == [(0.1, 0.2), (0.2, 0.2), (0.2, 0.28), (0.1, 0.28)]
+
+
+def test_selected_frames_keep_their_page_numbers_and_are_cached(tesseract, engine):
+    content = scan(frames=3)
+
+    _, document, page_numbers = engine.process_document(content, "image/tiff", pages=[2, 3])
+    engine.process_document(content, "image/tiff", pages=[3])
+
+    assert page_numbers == [2, 3]
+    assert [page.page_number for page in document.pages] == [1, 2]
+    assert document.text.count("Loan Amount") == 2
+    # Page 3 came from the cache the second time
+    assert len(tesseract.calls) == 2
+
+
+def test_engine_reports_failure_without_raising(monkeypatch, engine):
+    def broken(*args, **kwargs):
+        raise pytesseract.TesseractNotFoundError()
+
+    monkeypatch.setattr(pytesseract, "image_to_data", broken)
+    notified = []
+
+    result = engine.process_document(scan(), "image/tiff", notify=lambda stage, **data: notified.append(data))
+
+    assert result == (None, None, None)
+    assert notified == [{"success": False}]
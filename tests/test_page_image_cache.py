@@ -0,0 +1,147 @@
+"""
+Tests for the two-tier page image cache (ocr/page_image_cache.py)
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from ocr.page_image_cache import PageImageCache, encode_image, page_key
+
+
+def page(value: int):
+    """Noisy page image, so every page encodes to about the same size"""
+    return Image.frombytes("L", (64, 64), random.Random(value).randbytes(64 * 64))
+
+
+@pytest.fixture
+def size():
+    return len(encode_image(page(0)))
+
+
+def age(cache: PageImageCache, key: str, seconds: float):
+    """Make a disk entry look last used some seconds ago"""
+    stamp = time.time() - seconds
+    os.utime(cache._path(key), (stamp, stamp))
+
+
+def test_page_key_distinguishes_dpi_and_profile():
+    keys = {
+        page_key("abc", 1, 300, "ocr"),
+        page_key("abc", 1, 450, "ocr"),
+        page_key("abc", 1, 300, "table"),
+        page_key("abc", 2, 300, "ocr"),
+        page_key("abd", 1, 300, "ocr"),
+    }
+
+    assert len(keys) == 5
+    assert page_key("abc", 1, 300, "ocr") == page_key("abc", 1, 300, "ocr")
+
+
+def test_memory_tier_evicts_least_recently_used_within_budget(size):
+    cache = PageImageCache(memory_bytes=int(size * 2.5), disk_dir="")
+    for number in range(3):
+        cache.put(f"page-{number}", page(number))
+
+    assert cache.get_bytes("page-0") is None
+    assert cache.get_bytes("page-1") is not None
+    # page-1 is now more recent than page-2
+    cache.put("page-3", page(3))
+
+    assert list(cache._memory) == ["page-1", "page-3"]
+    assert cache._memory_used == sum(len(data) for data in cache._memory.values())
+    assert cache._memory_used <= cache.memory_bytes
+
+
+def test_images_larger_than_the_budget_are_not_kept(size, tmp_path):
+    cache = PageImageCache(memory_bytes=size // 2, disk_dir=str(tmp_path), disk_bytes=size // 2)
+
+    cache.put("page", page(0))
+
+    assert cache.get_bytes("page") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_tier_evicts_least_recently_used_within_budget(size, tmp_path):
+    cache = PageImageCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=int(size * 2.5))
+    cache.put("page-0", page(0))
+    cache.put("page-1", page(1))
+    age(cache, "page-0", 20)
+    age(cache, "page-1", 10)
+    # Reading page-0 makes it the most recent
+    assert cache.get_bytes("page-0", memory=False) is not None
+
+    cache.put("page-2", page(2))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["page-0.png", "page-2.png"]
+    assert cache._disk_used <= cache.disk_bytes
+
+
+def test_disk_hits_are_promoted_to_memory(size, tmp_path):
+    writer = PageImageCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=size * 4)
+    writer.put("page", page(7), memory=False)
+    reader = PageImageCache(memory_bytes=size * 4, disk_dir=str(tmp_path), disk_bytes=size * 4)
+    assert reader._disk_used == os.path.getsize(tmp_path / "page.png")
+
+    image = reader.get("page")
+    os.remove(tmp_path / "page.png")
+
+    assert image.tobytes() == page(7).tobytes()
+    assert "page" in reader._memory
+    assert reader.get("page").tobytes() == image.tobytes()
+    # Pool processes look at the shared disk tier only
+    assert reader.get("page", memory=False) is None
+
+
+def test_get_or_render_renders_once_per_key(size, tmp_path):
+    cache = PageImageCache(memory_bytes=size * 8, disk_dir=str(tmp_path), disk_bytes=size * 8)
+    renders = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def render(value):
+        def _render():
+            renders.append(value)
+            started.set()
+            release.wait(5)
+            return page(value)
+        return _render
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        first = pool.submit(cache.get_or_render, "page-1", render(1))
+        assert started.wait(5)
+        waiting = [pool.submit(cache.get_or_render, "page-1", render(1)) for _ in range(4)]
+        other = pool.submit(cache.get_or_render, "page-2", render(2))
+        time.sleep(0.05)
+        release.set()
+        images = [future.result(5) for future in [first] + waiting]
+        other.result(5)
+
+    assert sorted(renders) == [1, 2]
+    assert all(image.tobytes() == page(1).tobytes() for image in images)
+    assert cache.get_or_render("page-1", render(9)).tobytes() == page(1).tobytes()
+    assert sorted(renders) == [1, 2]
+
+
+def test_get_or_render_shares_a_failure_and_retries_later(tmp_path):
+    cache = PageImageCache(disk_dir="")
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("render failed")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(cache.get_or_render, "page", failing)
+        time.sleep(0.05)
+        second = pool.submit(cache.get_or_render, "page", lambda: page(0))
+        release.set()
+        for future in (first, second):
+            with pytest.raises(RuntimeError, match="render failed"):
+                future.result(5)
+
+    assert cache.get_or_render("page", lambda: page(3)).tobytes() == page(3).tobytes()
@@ -0,0 +1,83 @@
+"""
+Tests for page-range selection (processing/page_selection.py)
+"""
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import routes
+from processing.page_selection import (
+    PageSelectionError,
+    check_page_selection,
+    count_pages,
+    format_page_ranges,
+    original_page_numbers,
+    parse_page_ranges,
+    slice_pdf,
+)
+
+
+def _pdf(pages: int) -> bytes:
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_parse_and_format_round_trip():
+    assert parse_page_ranges("7, 1-3,2") == [1, 2, 3, 7]
+    assert format_page_ranges([1, 2, 3, 7]) == "1-3,7"
+    assert parse_page_ranges("") is None
+    with pytest.raises(ValueError):
+        parse_page_ranges("3-1")
+
+
+def test_selection_past_the_end_is_rejected():
+    pdf = _pdf(3)
+    assert count_pages(pdf, "application/pdf") == 3
+    check_page_selection([1, 3], 3)
+    with pytest.raises(PageSelectionError, match="4-5"):
+        check_page_selection([2, 4, 5], 3)
+    with pytest.raises(PageSelectionError):
+        slice_pdf(pdf, [2, 4])
+
+
+def test_slice_keeps_selected_pages():
+    sliced, kept = slice_pdf(_pdf(5), [2, 4])
+    assert kept == [2, 4]
+    assert count_pages(sliced, "application/pdf") == 2
+
+
+def test_original_page_numbers_by_page_number():
+    # Renumbered (sliced or merged) documents map through the selection
+    assert original_page_numbers([1, 2], [3, 7]) == [3, 7]
+    assert original_page_numbers([2, 1], [3, 7]) == [7, 3]
+    # Processors that keep the original numbering
+    assert original_page_numbers([3, 7], [3, 7]) == [3, 7]
+    assert original_page_numbers([7], [3, 7]) == [7]
+    # Unset numbers fall back to position; extra pages are outside the selection
+    assert original_page_numbers([0, 0, 0], [3, 7]) == [3, 7, None]
+    assert original_page_numbers([0, 0], None) == [1, 2]
+
+
+def test_extract_rejects_out_of_range_pages_with_400(monkeypatch):
+    async def never(*args, **kwargs):
+        raise AssertionError("extraction must not run")
+
+    monkeypatch.setattr(routes, "_extract", never)
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    response = TestClient(app).post(
+        "/extract?pages=2-4",
+        files={"file": ("a.pdf", _pdf(2), "application/pdf")}
+    )
+
+    assert response.status_code == 400
+    assert "3-4" in response.json()["detail"]
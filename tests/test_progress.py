@@ -0,0 +1,88 @@
+"""
+Tests for extraction progress events (api/progress.py, api/routes.py)
+"""
+import asyncio
+
+import pytest
+
+from api import routes
+from api.progress import ProgressBroker
+from api.request_coalescer import RequestCoalescer
+
+
+def _local_broker():
+    broker = ProgressBroker(ttl=60)
+    broker._redis_failed_at = float("inf")  # never use Redis
+    return broker
+
+
+def _stages(broker, job_id):
+    return [event["stage"] for event in broker._history.get(job_id, [])]
+
+
+def test_group_events_reach_every_member():
+    broker = _local_broker()
+    broker.join("key", "leader")
+    broker.join("key", "follower")
+
+    broker.publish_group("key", "ocr_done")
+    broker.leave("key", "follower")
+    broker.publish_group("key", "pages_built", page=1, total=1)
+
+    assert _stages(broker, "leader") == ["ocr_done", "pages_built"]
+    assert _stages(broker, "follower") == ["ocr_done"]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_followers_see_leader_stages(monkeypatch):
+    broker = _local_broker()
+    release = asyncio.Event()
+
+    class Extractor:
+        def extract_complete_document(self, content, mime_type, filename, progress, pages):
+            progress("form_parser_done")
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result()
+            progress("accuracy_done")
+            return {"extraction_status": "complete", "document_name": filename}
+
+    loop = asyncio.get_running_loop()
+    monkeypatch.setattr(routes, "progress_broker", broker)
+    monkeypatch.setattr(routes, "coalescer", RequestCoalescer(redis_factory=None))
+    monkeypatch.setattr(routes, "get_extractor", lambda: Extractor())
+    monkeypatch.setattr(routes.Config, "COALESCE_ENABLED", True)
+
+    leader = asyncio.ensure_future(routes._extract(b"pdf", "application/pdf", "a.pdf", "job-a"))
+    await asyncio.sleep(0.05)
+    follower = asyncio.ensure_future(routes._extract(b"pdf", "application/pdf", "b.pdf", "job-b"))
+    await asyncio.sleep(0.05)
+    release.set()
+    first, second = await asyncio.gather(leader, follower)
+
+    assert second["document_name"] == "b.pdf"
+    assert _stages(broker, "job-a") == ["form_parser_done", "accuracy_done"]
+    assert _stages(broker, "job-b") == ["accuracy_done"]
+
+
+def test_failed_extraction_emits_failed_stage(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    broker = _local_broker()
+
+    async def failed_extract(*args, **kwargs):
+        return {"extraction_status": "failed", "error": "processor unavailable"}
+
+    monkeypatch.setattr(routes, "progress_broker", broker)
+    monkeypatch.setattr(routes, "_extract", failed_extract)
+    app = FastAPI()
+    app.include_router(routes.router)
+
+    response = TestClient(app).post(
+        "/extract?job_id=job-f",
+        files={"file": ("a.pdf", b"%PDF", "application/pdf")}
+    )
+
+    assert response.status_code == 200
+    events = broker._history["job-f"]
+    assert [e["stage"] for e in events] == ["uploaded", "failed"]
+    assert events[-1]["error"] == "processor unavailable"
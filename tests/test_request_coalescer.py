@@ -0,0 +1,173 @@
+"""
+Tests for request coalescing (api/request_coalescer.py)
+"""
+import asyncio
+
+import fakeredis
+import pytest
+
+from api.request_coalescer import (
+    LOCK_PREFIX,
+    LeaderFailed,
+    RequestCoalescer,
+    build_request_key,
+    result_key,
+)
+
+
+def _coalescer(redis=None, **kwargs):
+    kwargs.setdefault("poll_interval", 0.01)
+    kwargs.setdefault("secret", "test-secret")
+    factory = (lambda: redis) if redis is not None else None
+    return RequestCoalescer(redis_factory=factory, **kwargs)
+
+
+class _Extraction:
+    """Counts calls and blocks until released"""
+
+    def __init__(self, result=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.result = result or {"extraction_status": "complete", "text": "Borrower: A. Sharma"}
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return dict(self.result)
+
+
+def test_build_request_key_depends_on_content_and_options():
+    key = build_request_key(b"pdf", "application/pdf", pages=None)
+    assert key == build_request_key(b"pdf", "application/pdf", pages=None)
+    assert key != build_request_key(b"pdf", "application/pdf", pages="1-2")
+    assert key != build_request_key(b"pdf2", "application/pdf", pages=None)
+
+
+@pytest.mark.asyncio
+async def test_in_process_followers_share_one_run_but_get_own_copy():
+    coalescer = _coalescer()
+    extraction = _Extraction()
+
+    leader = asyncio.ensure_future(coalescer.run("k", extraction))
+    follower = asyncio.ensure_future(coalescer.run("k", extraction))
+    await asyncio.sleep(0)
+    extraction.release.set()
+    (first, first_shared), (second, second_shared) = await asyncio.gather(leader, follower)
+
+    assert extraction.calls == 1
+    assert (first_shared, second_shared) == (False, True)
+    assert first == second
+    first["document_name"] = "leader.pdf"
+    assert "document_name" not in second
+
+
+@pytest.mark.asyncio
+async def test_request_after_leader_finished_runs_again():
+    redis = fakeredis.aioredis.FakeRedis()
+    coalescer = _coalescer(redis)
+    extraction = _Extraction()
+    extraction.release.set()
+
+    await coalescer.run("k", extraction)
+    result, shared = await coalescer.run("k", extraction)
+
+    assert extraction.calls == 2
+    assert shared is False
+    assert result["extraction_status"] == "complete"
+
+
+@pytest.mark.asyncio
+async def test_remote_follower_reads_encrypted_result():
+    redis = fakeredis.aioredis.FakeRedis()
+    leader_replica = _coalescer(redis)
+    follower_replica = _coalescer(redis)
+    extraction = _Extraction()
+    follower_extraction = _Extraction()
+
+    leader = asyncio.ensure_future(leader_replica.run("k", extraction))
+    while not await redis.exists(LOCK_PREFIX + "k"):
+        await asyncio.sleep(0.01)
+    token = (await redis.get(LOCK_PREFIX + "k")).decode()
+    follower = asyncio.ensure_future(follower_replica.run("k", follower_extraction))
+    await asyncio.sleep(0.05)
+    extraction.release.set()
+
+    leader_result, _ = await leader
+    follower_result, shared = await follower
+
+    assert shared is True
+    assert follower_extraction.calls == 0
+    assert follower_result == leader_result
+    envelope = await redis.get(result_key(LOCK_PREFIX + "k", token))
+    assert envelope is not None
+    assert b"Sharma" not in envelope
+
+
+async def _follow_remote_leader(redis, leader_extraction, follower_extraction, **kwargs):
+    """Run leader_extraction on one replica and a duplicate on another while it holds the lock"""
+    leader_replica = _coalescer(redis, **kwargs)
+    follower_replica = _coalescer(redis, **kwargs)
+
+    leader = asyncio.ensure_future(leader_replica.run("k", leader_extraction))
+    while not await redis.exists(LOCK_PREFIX + "k"):
+        await asyncio.sleep(0.01)
+    token = (await redis.get(LOCK_PREFIX + "k")).decode()
+    follower = asyncio.ensure_future(follower_replica.run("k", follower_extraction))
+    await asyncio.sleep(0.05)
+    leader_extraction.release.set()
+    return leader, follower, token
+
+
+@pytest.mark.asyncio
+async def test_remote_follower_raises_leaders_failure():
+    redis = fakeredis.aioredis.FakeRedis()
+    failed = _Extraction({"extraction_status": "failed", "error": "quota exceeded"})
+    duplicate = _Extraction()
+
+    leader, follower, token = await _follow_remote_leader(redis, failed, duplicate, error_ttl=5)
+
+    leader_result, _ = await leader
+    with pytest.raises(LeaderFailed, match="quota exceeded"):
+        await follower
+    assert leader_result["extraction_status"] == "failed"
+    assert duplicate.calls == 0
+    key = result_key(LOCK_PREFIX + "k", token)
+    assert b"quota" not in await redis.get(key)
+    assert 0 < await redis.pttl(key) <= 5000
+
+
+@pytest.mark.asyncio
+async def test_remote_follower_raises_when_leader_raises():
+    class Crashing(_Extraction):
+        async def __call__(self):
+            await super().__call__()
+            raise RuntimeError("processor unavailable")
+
+    redis = fakeredis.aioredis.FakeRedis()
+    crashing = Crashing()
+    duplicate = _Extraction()
+
+    leader, follower, _ = await _follow_remote_leader(redis, crashing, duplicate)
+
+    with pytest.raises(RuntimeError):
+        await leader
+    with pytest.raises(LeaderFailed, match="processor unavailable"):
+        await follower
+    assert duplicate.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_runs_locally_when_redis_is_down():
+    class DownRedis:
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("down")
+
+    coalescer = _coalescer(DownRedis())
+    extraction = _Extraction()
+    extraction.release.set()
+
+    result, shared = await coalescer.run("k", extraction)
+
+    assert shared is False
+    assert extraction.calls == 1
+    assert result["extraction_status"] == "complete"
@@ -0,0 +1,88 @@
+"""
+Tests for building results without an OCR engine (processing/complete_document_extractor.py)
+"""
+import json
+
+import pytest
+from google.cloud import documentai_v1 as documentai
+
+from config import Config
+from ocr.ocr_engine import build_document
+from processing.complete_document_extractor import result_builder
+
+TEXT = "Loan Amount: Rs. 5,00,000\nRate of Interest: 10.50% p.a.\nTenure: 60 months\n"
+
+
+def test_result_builder_needs_no_engine():
+    builder = result_builder()
+
+    assert builder.engine is None
+    result = builder.build_result(None, documentai.Document(text=TEXT), "letter.pdf")
+
+    assert result["document_name"] == "letter.pdf"
+    assert result["loan_fields"]["principal_amount"]["value"] == 500000.0
+    assert result["loan_fields"]["interest_rate"]["value"] == 10.5
+    json.dumps(result)
+
+
+def test_routed_results_record_route_and_engine_per_page(monkeypatch):
+    monkeypatch.setattr(Config, "OCR_ROUTE_LOCAL_BACKEND", "tesseract")
+    document = documentai.Document(text=TEXT, pages=[{"page_number": 1}, {"page_number": 2}, {"page_number": 3}])
+    routes = {1: "text_layer", 2: "local", 3: "remote", 4: "blank"}
+
+    result = result_builder().build_result(None, document, "letter.pdf", [1, 2, 3], engine="documentai", page_routes=routes)
+
+    assert result["extraction_method"] == "page_routed"
+    assert result["page_routing"]["pages"] == {
+        "1": {"route": "text_layer", "engine": "text_layer"},
+        "2": {"route": "local", "engine": "tesseract"},
+        "3": {"route": "remote", "engine": "documentai"},
+        "4": {"route": "blank", "engine": None},
+    }
+
+
+def test_unrouted_results_name_the_engine():
+    builder = result_builder()
+
+    documentai_result = builder.build_result(None, documentai.Document(text=TEXT), "letter.pdf", engine="documentai")
+    tesseract_result = builder.build_result(None, documentai.Document(text=TEXT), "letter.pdf", engine="tesseract")
+
+    assert documentai_result["extraction_method"] == "dual_processor_complete"
+    assert tesseract_result["extraction_method"] == "tesseract_ocr"
+
+
+def block(text: str, confidence: float, top: int):
+    words = [{"text": word, "confidence": confidence, "box": [100 + 80 * index, top, 70, 30]} for index, word in enumerate(text.split())]
+    box = [100, top, 80 * len(words), 30]
+    return {"box": box, "paragraphs": [{"box": box, "lines": [{"box": box, "words": words}]}]}
+
+
+def test_refinements_replace_blocks_where_they_were_read():
+    # The same misreading twice; only the second block is re-read
+    document = build_document([{"width": 1000, "height": 1000, "blocks": [
+        block("EMI Rs. 10,747", 0.95, 100),
+        block("Stamp Duty Rs. 5,0O0", 0.6, 200),
+        block("Processing Fee Rs. 5,0O0", 0.6, 300),
+        block("Stamp Duty Rs. 5,0O0", 0.6, 400),
+    ]}])
+    refinements = [{"page": 1, "block": 3, "text": "Stamp Duty Rs. 500", "confidence": 0.93}]
+
+    result = result_builder().build_result(None, document, "letter.pdf", refinements=refinements)
+
+    assert result["complete_text"]["ocr_text"] == (
+        "EMI Rs. 10,747\n\n"
+        "Stamp Duty Rs. 5,0O0\n\n"
+        "Processing Fee Rs. 5,0O0\n\n"
+        "Stamp Duty Rs. 500\n\n"
+    )
+    assert result["complete_text"]["merged_text"] == result["complete_text"]["ocr_text"]
+    blocks = [element["text"] for element in result["all_text_elements"] if element["type"] == "block"]
+    assert blocks == ["EMI Rs. 10,747\n\n", "Stamp Duty Rs. 5,0O0\n\n", "Processing Fee Rs. 5,0O0\n\n", "Stamp Duty Rs. 500"]
+    page = result["pages"][0]
+    assert page["blocks"][1]["text"] == "Stamp Duty Rs. 5,0O0\n\n"
+    assert page["blocks"][3] == {
+        "text": "Stamp Duty Rs. 500", "confidence": 0.93, "previous_confidence": pytest.approx(0.6), "refined": True
+    }
+    merged = result["complete_text"]["merged_text"]
+    assert any(number["value"] == "500" and number["position"] == merged.rindex("500") for number in result["all_numbers"])
+    assert result["refinement"] == {"blocks_refined": 1, "pages": [1]}
@@ -0,0 +1,149 @@
+"""
+Tests for repayment schedule extraction (extraction/schedule_extractor.py)
+"""
+import json
+
+import numpy as np
+
+from extraction.schedule_extractor import check_consistency, extract_schedules, map_columns, parse_numbers
+
+HEADER = ["No.", "Due Date", "EMI", "Principal", "Interest", "Closing Balance"]
+
+
+def amortization(rows, principal=100000.0, monthly_rate=0.01, emi=8885.0):
+    """Schedule rows as cell texts: period, date, EMI, principal, interest, balance"""
+    balance = principal
+    table = []
+    for period in range(1, rows + 1):
+        interest = round(balance * monthly_rate)
+        repaid = emi - interest
+        balance -= repaid
+        month = (period - 1) % 12 + 1
+        table.append([
+            str(period), f"05/{month:02d}/{2024 + (period - 1) // 12}",
+            f"{emi:,.2f}", f"{repaid:,.2f}", f"{interest:,.2f}", f"{balance:,.2f}"
+        ])
+    return table
+
+
+def table(page, table_id, rows, header=True):
+    cells = [[{"text": text} for text in row] for row in rows]
+    return {
+        "page": page,
+        "table_id": table_id,
+        "header_rows": [[{"text": text} for text in HEADER]] if header else [],
+        "body_rows": cells
+    }
+
+
+def test_schedule_becomes_consistent_columns():
+    rows = amortization(6)
+
+    schedules = extract_schedules([table(1, 1, rows)])
+
+    assert len(schedules) == 1
+    schedule = schedules[0]
+    assert schedule.rows == 6
+    assert list(schedule.columns) == ["period", "date", "emi", "principal", "interest", "balance"]
+    assert schedule.columns["period"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert schedule.columns["date"][0] == np.datetime64("2024-01-05")
+    assert schedule.columns["interest"][0] == 1000.0
+    assert schedule.issues == []
+    assert schedule.to_dict()["consistent"] is True
+    json.dumps(schedule.to_dict())
+
+
+def test_continuation_tables_on_following_pages_are_stitched():
+    rows = amortization(10)
+    tables = [table(1, 1, rows[:4]), table(2, 1, rows[4:], header=False)]
+
+    schedule = extract_schedules(tables)[0]
+
+    assert schedule.rows == 10
+    assert schedule.pages.tolist() == [1] * 4 + [2] * 6
+    assert schedule.tables == [{"page": 1, "table_id": 1}, {"page": 2, "table_id": 1}]
+    assert schedule.issues == []
+
+
+def test_unrelated_table_does_not_continue_a_schedule():
+    rows = amortization(4)
+    fees = {"page": 2, "table_id": 1, "header_rows": [], "body_rows": [
+        [{"text": "Processing Fee"}, {"text": "Rs. 5,000"}],
+    ]}
+
+    schedules = extract_schedules([table(1, 1, rows), fees])
+
+    assert [schedule.rows for schedule in schedules] == [4]
+
+
+def test_misread_balance_is_blamed_on_its_cell():
+    rows = amortization(6)
+    # An OCR misread in one closing balance (a digit off by 5,000)
+    balance = float(rows[2][5].replace(",", ""))
+    rows[2][5] = f"{balance + 5000:,.2f}"
+
+    schedule = extract_schedules([table(1, 1, rows)])[0]
+
+    assert [(issue["row"], issue["check"], issue["suspect"]) for issue in schedule.issues] == [(2, "balance", "balance")]
+    assert schedule.issues[0]["period"] == 3
+    assert schedule.issues[0]["page"] == 1
+    assert np.flatnonzero(schedule.flags).tolist() == [2]
+
+
+def test_misread_principal_breaks_both_identities():
+    rows = amortization(6)
+    principal = float(rows[3][3].replace(",", ""))
+    rows[3][3] = f"{principal + 900:,.2f}"
+
+    schedule = extract_schedules([table(1, 1, rows)])[0]
+
+    assert {(issue["check"], issue["suspect"]) for issue in schedule.issues} == {
+        ("balance", "principal"), ("emi", "principal")
+    }
+    assert np.flatnonzero(schedule.flags).tolist() == [3]
+
+
+def test_total_rows_become_totals():
+    rows = amortization(4)
+    emi_total = sum(float(row[2].replace(",", "")) for row in rows)
+    rows.append(["Total", "", f"{emi_total:,.2f}", "", "", ""])
+
+    schedule = extract_schedules([table(1, 1, rows)])[0]
+
+    assert schedule.rows == 4
+    assert schedule.totals == {"emi": emi_total}
+
+
+def test_short_or_unheaded_tables_are_not_schedules():
+    rows = amortization(2)
+
+    assert extract_schedules([table(1, 1, rows)]) == []
+    assert extract_schedules([table(1, 1, amortization(6), header=False)]) == []
+    assert extract_schedules([]) == []
+
+
+def test_map_columns_prefers_the_most_specific_label():
+    mapping = map_columns(["Sr. No.", "EMI Amount", "Principal Outstanding", "Interest"])
+
+    assert mapping == {"period": 0, "emi": 1, "balance": 2, "interest": 3}
+
+
+def test_parse_numbers():
+    values = parse_numbers(np.array(["1,23,456.78", "Rs. 500", "(12.50)", "-"], dtype=object))
+
+    assert values[:3].tolist() == [123456.78, 500.0, -12.5]
+    assert np.isnan(values[3])
+
+
+def test_check_consistency_ignores_unreadable_cells():
+    columns = {
+        "emi": np.array([100.0, 100.0]),
+        "principal": np.array([60.0, np.nan]),
+        "interest": np.array([40.0, 41.0]),
+        "balance": np.array([940.0, 880.0]),
+    }
+
+    flags, issues = check_consistency(columns)
+
+    assert not flags.any()
+    assert issues == []
@@ -0,0 +1,116 @@
+"""
+Tests for local ruled-table detection (ocr/table_extractor.py) and the page
+tables build_document makes from it
+"""
+from PIL import Image, ImageDraw
+
+from ocr.layout_analyzer import layout_words
+from ocr.ocr_engine import build_document
+from ocr.table_extractor import cell_words, detect_tables, scale_table
+from processing.complete_document_extractor import result_builder
+
+# A 3 x 3 grid in pixels
+COLUMNS = [100, 400, 700, 1000]
+ROWS = [200, 260, 320, 380]
+
+
+def grid_image(merge_header=False, columns=COLUMNS, rows=ROWS):
+    """White page with ruled grid; merge_header leaves out the first header separator"""
+    image = Image.new("L", (1200, 600), 255)
+    draw = ImageDraw.Draw(image)
+    for y in rows:
+        draw.line([(columns[0], y), (columns[-1], y)], fill=0, width=3)
+    for index, x in enumerate(columns):
+        top = rows[1] if merge_header and index == 1 else rows[0]
+        draw.line([(x, top), (x, rows[-1])], fill=0, width=3)
+    return image
+
+
+def word(text, left, top, width=60, height=20, confidence=0.9):
+    return {"text": text, "confidence": confidence, "box": [left, top, width, height]}
+
+
+def test_detects_grid_with_header_row():
+    tables = detect_tables(grid_image())
+
+    assert len(tables) == 1
+    table = tables[0]
+    assert table["header_rows"] == 1
+    assert len(table["cells"]) == 9
+    assert all(cell["row_span"] == cell["col_span"] == 1 for cell in table["cells"])
+    left, top, width, height = table["cells"][4]["box"]
+    assert (table["cells"][4]["row"], table["cells"][4]["col"]) == (1, 1)
+    assert abs(left - COLUMNS[1]) <= 3 and abs(top - ROWS[1]) <= 3
+    assert abs(width - 300) <= 3 and abs(height - 60) <= 3
+
+
+def test_missing_separator_merges_cells():
+    table = detect_tables(grid_image(merge_header=True))[0]
+
+    header = [cell for cell in table["cells"] if cell["row"] == 0]
+    assert [(cell["col"], cell["col_span"]) for cell in header] == [(0, 2), (2, 1)]
+
+
+def test_lone_box_is_not_a_table():
+    image = Image.new("L", (800, 600), 255)
+    ImageDraw.Draw(image).rectangle([100, 100, 700, 500], outline=0, width=3)
+
+    assert detect_tables(image) == []
+
+
+def test_words_go_to_the_cell_holding_their_center():
+    table = detect_tables(grid_image())[0]
+    words = [
+        word("Month", 120, 220),
+        word("EMI", 420, 220),
+        word("1", 120, 280),
+        # Starts left of the column rule but its center is in column 1
+        word("10,747", 380, 280, width=70),
+        word("outside", 100, 500),
+    ]
+
+    assigned = cell_words(table, words)
+
+    assert assigned[0] == [0]
+    assert assigned[1] == [1]
+    assert assigned[3] == [2]
+    assert assigned[4] == [3]
+    assert sum(len(indices) for indices in assigned) == 4
+
+
+def test_scale_table_maps_pixels_to_points():
+    table = detect_tables(grid_image())[0]
+
+    scaled = scale_table(table, 0.5)
+
+    assert scaled["header_rows"] == table["header_rows"]
+    assert scaled["box"] == [round(value * 0.5) for value in table["box"]]
+    assert [cell["row"] for cell in scaled["cells"]] == [cell["row"] for cell in table["cells"]]
+    assert table["cells"][0]["box"][0] > scaled["cells"][0]["box"][0]
+
+
+def test_build_document_tables_read_back_as_result_tables():
+    image = grid_image(merge_header=True)
+    words = [
+        word("Charges", 120, 220, width=120),
+        word("Amount", 720, 220),
+        word("Processing", 120, 280, width=100),
+        word("Fee", 230, 280, width=40),
+        word("2%", 420, 280, width=30),
+        word("Rs.", 720, 280, width=30),
+        word("5,000", 760, 280),
+    ]
+    page = {
+        "width": image.width,
+        "height": image.height,
+        "blocks": layout_words(words, image.width),
+        "tables": detect_tables(image)
+    }
+
+    result = result_builder().build_result(None, build_document([page]), "table.png")
+
+    table = result["all_tables"][0]
+    assert [cell["text"].strip() for cell in table["header_rows"][0]] == ["Charges", "Amount"]
+    assert [cell["text"].strip() for cell in table["body_rows"][0]] == ["Processing Fee", "2%", "Rs. 5,000"]
+    assert table["nested_structures"][0]["type"] == "merged_header_cell"
+    assert table["nested_structures"][0]["col_span"] == 2
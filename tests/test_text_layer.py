@@ -0,0 +1,242 @@
+"""
+Tests for reading digital PDF pages from their text layer (ocr/mixed_content_handler.py)
+"""
+import io
+
+import pdf2image
+import pytest
+from google.cloud import documentai_v1 as documentai
+from PIL import Image, ImageDraw
+from PyPDF2 import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+
+from config import Config
+from ocr.mixed_content_handler import PageRouter, split_pages
+from processing.complete_document_extractor import result_builder
+from processing.page_selection import PageSelectionError
+
+WIDTH, HEIGHT = 612, 792
+# Fee table rulings in PDF points (bottom-left origin)
+COLUMNS = [72, 300, 500]
+ROWS = [500, 480, 460, 440]
+LINES = [
+    "SANCTION LETTER",
+    "Loan Amount: Rs. 5,00,000",
+    "Rate of Interest: 10.50% p.a.",
+    "Tenure: 60 months",
+    "Processing Fee: Rs. 5,000",
+]
+FEE_ROWS = [("Fee Type", "Amount"), ("Documentation Charges", "Rs. 2,000"), ("Stamp Duty", "Rs. 500")]
+
+
+def sanction_letter() -> bytes:
+    """A digital sanction letter with label/value lines and a ruled fee table"""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(WIDTH, HEIGHT))
+    pdf.setFont("Helvetica", 11)
+    for index, line in enumerate(LINES):
+        pdf.drawString(72, 720 - index * 20, line)
+    pdf.grid(COLUMNS, ROWS)
+    for row, (label, amount) in enumerate(FEE_ROWS):
+        pdf.drawString(COLUMNS[0] + 4, ROWS[row] - 14, label)
+        pdf.drawString(COLUMNS[1] + 4, ROWS[row] - 14, amount)
+    pdf.save()
+    return buffer.getvalue()
+
+
+def render_rulings(content, dpi, first_page, last_page, grayscale):
+    """Stand-in for poppler: the letter's rulings at the requested resolution"""
+    scale = dpi / 72
+    image = Image.new("L", (int(WIDTH * scale), int(HEIGHT * scale)), 255)
+    draw = ImageDraw.Draw(image)
+    for x in COLUMNS:
+        draw.line([(x * scale, (HEIGHT - ROWS[0]) * scale), (x * scale, (HEIGHT - ROWS[-1]) * scale)], fill=0, width=2)
+    for y in ROWS:
+        draw.line([(COLUMNS[0] * scale, (HEIGHT - y) * scale), (COLUMNS[-1] * scale, (HEIGHT - y) * scale)], fill=0, width=2)
+    return [image] * (last_page - first_page + 1)
+
+
+def no_renderer(*args, **kwargs):
+    raise RuntimeError("poppler not installed")
+
+
+@pytest.fixture
+def detect_tables(monkeypatch):
+    monkeypatch.setattr(Config, "OCR_DETECT_TABLES", True)
+
+
+class FakeRemote:
+    """Remote engine returning a Form Parser and an OCR document per selection"""
+
+    name = "documentai"
+
+    def __init__(self):
+        self.calls = []
+
+    def process_document(self, file_content, mime_type, pages=None, notify=None):
+        self.calls.append(pages)
+        return scanned_schedule(tables=True), scanned_schedule(tables=False), pages
+
+
+def scanned_schedule(tables: bool) -> documentai.Document:
+    """One page with a block and, from the Form Parser, an EMI table"""
+    text = "Repayment Schedule\nMonth EMI\n1 10,747\n"
+
+    def layout(start, end):
+        return {"text_anchor": {"text_segments": [{"start_index": start, "end_index": end}]}, "confidence": 0.9}
+
+    def row(*spans):
+        return {"cells": [{"layout": layout(start, end), "row_span": 1, "col_span": 1} for start, end in spans]}
+
+    page = {
+        "page_number": 1,
+        "dimension": {"width": 1700, "height": 2200, "unit": "pixels"},
+        "blocks": [{"layout": layout(0, 19)}, {"layout": layout(19, len(text))}],
+        "lines": [{"layout": layout(0, 19)}, {"layout": layout(19, 29)}, {"layout": layout(29, len(text))}],
+    }
+    if tables:
+        page["tables"] = [{"header_rows": [row((19, 24), (25, 28))], "body_rows": [row((29, 30), (31, 37))]}]
+    return documentai.Document(text=text, pages=[page])
+
+
+def mixed_letter() -> bytes:
+    """The digital sanction letter followed by a page with no text layer"""
+    letter = PdfReader(io.BytesIO(sanction_letter()))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(WIDTH, HEIGHT))
+    pdf.rect(72, 72, 400, 600)
+    pdf.save()
+    writer = PdfWriter()
+    writer.add_page(letter.pages[0])
+    writer.add_page(PdfReader(io.BytesIO(buffer.getvalue())).pages[0])
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_text_layer_pages_get_tables_and_form_fields(monkeypatch, detect_tables):
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", render_rulings)
+    split = split_pages(sanction_letter())
+
+    assert split.text_pages == [1]
+    page = split.document.pages[0]
+    assert len(page.tables) == 1
+    assert len(page.tables[0].header_rows) == 1
+    assert len(page.tables[0].body_rows) == 2
+    assert len(page.form_fields) == 4
+
+    result = result_builder().build_result(split.document, None, "letter.pdf", split.text_pages)
+
+    table = result["all_tables"][0]
+    assert [cell["text"] for cell in table["header_rows"][0]] == ["Fee Type", "Amount"]
+    assert [[cell["text"] for cell in row] for row in table["body_rows"]] == [
+        ["Documentation Charges", "Rs. 2,000"],
+        ["Stamp Duty", "Rs. 500"],
+    ]
+    assert ("Processing Fee:", "Rs. 5,000") in [
+        (field["field_name"], field["field_value"]) for field in result["all_form_fields"]
+    ]
+    assert result["processing_fee"] == 5000.0
+    assert {"processing_fee", "documentation_charges", "stamp_duty"} <= set(result["fees"])
+
+
+def test_text_layer_survives_without_a_renderer(monkeypatch, detect_tables):
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", no_renderer)
+    split = split_pages(sanction_letter())
+
+    result = result_builder().build_result(split.document, None, "letter.pdf", split.text_pages)
+
+    assert split.text_pages == [1]
+    assert result["all_tables"] == []
+    assert result["processing_fee"] == 5000.0
+    assert result["loan_fields"]["principal_amount"]["value"] == 500000.0
+
+
+def test_text_layer_lines_keep_their_positions():
+    split = split_pages(sanction_letter())
+
+    assert split.text_pages == [1]
+    assert split.scan_pages == []
+    assert split.document.text.splitlines()[:len(LINES)] == LINES
+    page = split.document.pages[0]
+    tops = [line.layout.bounding_poly.normalized_vertices[0].y for line in page.lines[:len(LINES)]]
+    assert tops == sorted(tops)
+    assert tops[1] - tops[0] == pytest.approx(20 / HEIGHT, abs=0.01)
+
+
+def test_only_pages_without_a_text_layer_need_ocr():
+    split = split_pages(mixed_letter())
+
+    assert split.text_pages == [1]
+    assert split.scan_pages == [2]
+    assert len(split.document.pages) == 1
+
+
+def test_selection_past_the_end_is_rejected():
+    with pytest.raises(PageSelectionError):
+        split_pages(mixed_letter(), [2, 3])
+
+
+def test_key_value_letter_keeps_labels_with_their_values(monkeypatch, detect_tables):
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", no_renderer)
+    pairs = [
+        ("Loan Amount", "Rs. 5,00,000"),
+        ("Rate of Interest", "10.50% p.a."),
+        ("Tenure", "60 months"),
+        ("EMI", "Rs. 10,747"),
+        ("Processing Fee", "Rs. 5,000"),
+    ]
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(WIDTH, HEIGHT))
+    pdf.setFont("Helvetica", 11)
+    for index, (label, value) in enumerate(pairs):
+        pdf.drawString(72, 700 - index * 20, label)
+        pdf.drawString(300, 700 - index * 20, value)
+    pdf.save()
+
+    split = split_pages(buffer.getvalue())
+    result = result_builder().build_result(split.document, None, "letter.pdf", split.text_pages)
+
+    assert split.document.text.startswith("Loan Amount Rs. 5,00,000\nRate of Interest 10.50% p.a.\n")
+    assert [(field["field_name"], field["field_value"]) for field in result["all_form_fields"]] == pairs
+    fields = {name: field["value"] for name, field in result["loan_fields"].items() if isinstance(field, dict)}
+    assert fields["principal_amount"] == 500000.0
+    assert fields["interest_rate"] == 10.5
+    assert fields["tenure_months"] == 60.0
+    assert fields["emi_amount"] == 10747.0
+    assert result["processing_fee"] == 5000.0
+
+
+def test_routed_pages_are_extracted_once(monkeypatch, detect_tables):
+    monkeypatch.setattr(pdf2image, "convert_from_bytes", render_rulings)
+    monkeypatch.setattr(Config, "TEXT_LAYER_ENABLED", True)
+    monkeypatch.setattr(Config, "OCR_ROUTING_ENABLED", False)
+    remote = FakeRemote()
+
+    form_doc, ocr_doc, page_numbers, routes = PageRouter(remote).route(mixed_letter())
+    result = result_builder().build_result(form_doc, ocr_doc, "letter.pdf", page_numbers, page_routes=routes)
+
+    assert remote.calls == [[2]]
+    assert routes == {1: "text_layer", 2: "remote"}
+    assert page_numbers == [1, 2]
+    assert [page.page_number for page in ocr_doc.pages] == [2]
+    assert "SANCTION LETTER" not in result["complete_text"]["ocr_text"]
+
+    assert [(table["page"], table["source"]) for table in result["all_tables"]] == [(1, "form_parser"), (2, "form_parser")]
+    elements = {}
+    for element in result["all_text_elements"]:
+        key = (element["page"], element["source"], element["type"])
+        elements[key] = elements.get(key, 0) + 1
+    text_page = form_doc.pages[0]
+    assert elements == {
+        (1, "form_parser", "block"): len(text_page.blocks),
+        (1, "form_parser", "paragraph"): len(text_page.paragraphs),
+        (1, "form_parser", "line"): len(text_page.lines),
+        (2, "form_parser", "block"): 2,
+        (2, "form_parser", "line"): 3,
+        (2, "ocr", "block"): 2,
+        (2, "ocr", "line"): 3,
+    }
+    assert [page["page_number"] for page in result["pages"]] == [1, 2]
+    assert len(result["all_form_fields"]) == 4
+    assert [fee["amount"] for fee in result["all_fees"] if fee["fee_type"] == "processing_fee"] == [5000.0]
@@ -0,0 +1,203 @@
+"""
+Tests for the document worker (worker/processor.py)
+"""
+import os
+import signal
+import socket
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from worker import cli, processor
+from worker.job_queue import InMemoryQueue, RedisQueue
+
+
+class FlakyRedis(fakeredis.FakeRedis):
+    """Refuses the first pings, as while Redis is still starting"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.pings = 0
+
+    def ping(self, **kwargs):
+        self.pings += 1
+        if self.pings <= self.failures:
+            raise ConnectionError("Connection refused")
+        return super().ping(**kwargs)
+
+
+def test_default_queue_retries_redis_with_backoff(monkeypatch):
+    redis = FlakyRedis(failures=2)
+    monkeypatch.setattr("worker.job_queue.get_redis", lambda: redis)
+    sleeps = []
+
+    job_queue = processor._default_queue("redis", attempts=5, backoff=0.5, sleep=sleeps.append)
+
+    assert isinstance(job_queue, RedisQueue)
+    assert sleeps == [0.5, 1.0]
+
+
+def test_default_queue_fails_when_redis_never_answers(monkeypatch):
+    redis = FlakyRedis(failures=100)
+    monkeypatch.setattr("worker.job_queue.get_redis", lambda: redis)
+    sleeps = []
+
+    with pytest.raises(RuntimeError, match="after 3 attempts"):
+        processor._default_queue("redis", attempts=3, backoff=1, sleep=sleeps.append)
+    assert redis.pings == 3
+    assert sleeps == [1, 2]
+
+
+def test_in_memory_queue_only_when_configured(monkeypatch):
+    monkeypatch.setattr(processor.Config, "WORKER_QUEUE_BACKEND", "memory")
+
+    assert isinstance(processor._default_queue(), InMemoryQueue)
+    with pytest.raises(ValueError):
+        processor._default_queue("sqs")
+
+
+def test_default_queue_uses_redis_when_it_answers(monkeypatch):
+    monkeypatch.setattr("worker.job_queue.get_redis", lambda: fakeredis.FakeRedis())
+
+    assert isinstance(processor._default_queue(), RedisQueue)
+
+
+class BlockingHandler:
+    """Handles jobs, holding each one until it is released"""
+
+    def __init__(self):
+        self.started = []
+        self.release = {}
+
+    def __call__(self, job):
+        self.release.setdefault(job["job_id"], threading.Event())
+        self.started.append(job["job_id"])
+        assert self.release[job["job_id"]].wait(5)
+        return job["job_id"]
+
+    def finish(self, job_id):
+        self.release.setdefault(job_id, threading.Event()).set()
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def quick_worker(monkeypatch):
+    monkeypatch.setattr(processor.Config, "WORKER_POLL_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(processor.Config, "WORKER_SHUTDOWN_TIMEOUT_SECONDS", 5)
+    monkeypatch.setattr(processor.Config, "WORKER_METRICS_PORT", 0)
+
+
+def drained_scenario(worker, job_queue, handler, drain, resume):
+    """Drain with one job in flight, check it finishes and the next waits, then resume"""
+    job_queue.push({"job_id": "a", "document_id": "a"})
+    wait_until(lambda: handler.started == ["a"])
+
+    drain()
+    wait_until(lambda: worker.draining)
+    # A fetcher already waiting in pop() returns within one poll timeout
+    time.sleep(0.2)
+    job_queue.push({"job_id": "b", "document_id": "b"})
+    handler.finish("a")
+    wait_until(lambda: worker.stats["succeeded"] == 1)
+    time.sleep(0.3)
+
+    assert handler.started == ["a"]
+    assert job_queue.stats()["lanes"]["standard"]["depth"] == 1
+    assert worker.status()["state"] == "drained"
+
+    resume()
+    handler.finish("b")
+    wait_until(lambda: worker.stats["succeeded"] == 2)
+    assert handler.started == ["a", "b"]
+    assert worker.status()["state"] == "running"
+
+
+def test_drain_finishes_in_flight_jobs_and_resume_takes_new_ones(quick_worker):
+    job_queue = InMemoryQueue()
+    handler = BlockingHandler()
+    worker = processor.DocumentWorker(job_queue=job_queue, handler=handler, concurrency=2)
+    thread = threading.Thread(target=worker.start, kwargs={"install_signal_handlers": False})
+    thread.start()
+    try:
+        drained_scenario(worker, job_queue, handler, worker.drain, worker.resume)
+    finally:
+        worker.stop()
+        thread.join(10)
+    assert not thread.is_alive()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="no SIGUSR1")
+def test_sigusr1_drains_the_worker(quick_worker):
+    job_queue = InMemoryQueue()
+    handler = BlockingHandler()
+    worker = processor.DocumentWorker(job_queue=job_queue, handler=handler, concurrency=2)
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1)}
+    errors = []
+
+    def scenario():
+        try:
+            drained_scenario(worker, job_queue, handler, lambda: os.kill(os.getpid(), signal.SIGUSR1), worker.resume)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            worker.stop()
+
+    controller = threading.Thread(target=scenario)
+    controller.start()
+    try:
+        # Signal handlers can only be installed and run on the main thread
+        worker.start()
+    finally:
+        controller.join(10)
+        for signum, handler_function in previous.items():
+            signal.signal(signum, handler_function)
+    if errors:
+        raise errors[0]
+
+
+def test_cli_drains_and_resumes_through_the_status_endpoint(quick_worker, monkeypatch, capsys):
+    port = free_port()
+    monkeypatch.setattr(processor.Config, "WORKER_METRICS_PORT", port)
+    url = f"http://127.0.0.1:{port}"
+    job_queue = InMemoryQueue()
+    handler = BlockingHandler()
+    worker = processor.DocumentWorker(job_queue=job_queue, handler=handler, concurrency=2)
+    thread = threading.Thread(target=worker.start, kwargs={"install_signal_handlers": False})
+    thread.start()
+    try:
+        wait_until(lambda: worker._status_server is not None)
+        drained_scenario(
+            worker, job_queue, handler,
+            lambda: cli.main(["drain", "--worker", url]),
+            lambda: cli.main(["resume", "--worker", url])
+        )
+    finally:
+        worker.stop()
+        thread.join(10)
+
+    output = capsys.readouterr().out.splitlines()
+    assert output[0] == f"{url}: draining (1 in flight)"
+    assert output[1].startswith(f"{url}: running")
+    assert cli.main(["drain", "--worker", "http://127.0.0.1:1"]) == 1
+
+
+def test_estimate_replicas():
+    assert cli.estimate_replicas(backlog=100, service_time=6.0, slots=2, target_seconds=60) == 5
+    assert cli.estimate_replicas(backlog=1, service_time=6.0, slots=2, target_seconds=60) == 1
+    assert cli.estimate_replicas(backlog=0, service_time=6.0, slots=2, target_seconds=60) == 0
+    assert cli.estimate_replicas(backlog=10, service_time=None, slots=2, target_seconds=60) is None
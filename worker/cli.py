@@ -0,0 +1,158 @@
+"""
+Worker command line: queue status, autoscaling estimate and drain control
+
+Usage:
+    python -m worker.cli status [--worker http://worker:9100 ...] [--target-seconds 300] [--json]
+    python -m worker.cli drain --worker http://worker:9100 [...]
+    python -m worker.cli resume --worker http://worker:9100 [...]
+
+status reads the queue from Redis and, for each --worker, its /status
+endpoint. The replica estimate is backlog x service time / (slots x target
+drain seconds), using the mean service time reported by the workers.
+"""
+import argparse
+import json
+import math
+import sys
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from config import Config
+from worker.job_queue import LANES, RedisQueue
+
+
+def _call(url: str, path: str, method: str = "GET") -> Dict[str, Any]:
+    request = urllib.request.Request(url.rstrip("/") + path, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def _worker_statuses(urls: List[str]) -> List[Dict[str, Any]]:
+    statuses = []
+    for url in urls:
+        try:
+            statuses.append({"url": url, **_call(url, "/status")})
+        except Exception as e:
+            statuses.append({"url": url, "state": "unreachable", "error": str(e)})
+    return statuses
+
+
+def estimate_replicas(
+    backlog: int,
+    service_time: Optional[float],
+    slots: int,
+    target_seconds: float
+) -> Optional[int]:
+    """
+    Replicas needed to finish the backlog within target_seconds
+
+    Args:
+        backlog: Waiting plus in-flight jobs
+        service_time: Seconds per job on one slot
+        slots: Job slots per replica
+        target_seconds: Desired drain time
+
+    Returns:
+        Replica count (at least 1 when there is a backlog), or None without
+        a service time
+    """
+    if service_time is None:
+        return None
+    if backlog == 0:
+        return 0
+    return max(1, math.ceil(backlog * service_time / (max(1, slots) * target_seconds)))
+
+
+def status(args) -> Dict[str, Any]:
+    """Queue state, worker states and replica estimate"""
+    queue_stats = RedisQueue(name=args.queue).stats()
+    workers = _worker_statuses(args.worker)
+    reporting = [worker for worker in workers if worker.get("service_time_seconds") is not None]
+
+    service_time = args.service_time
+    if service_time is None and reporting:
+        service_time = sum(worker["service_time_seconds"] for worker in reporting) / len(reporting)
+    slots = reporting[0]["concurrency"] if reporting else Config.WORKER_CONCURRENCY
+    waiting = sum(lane["depth"] for lane in queue_stats["lanes"].values())
+    backlog = waiting + queue_stats["leased"]
+
+    return {
+        "queue": queue_stats,
+        "workers": workers,
+        "backlog": backlog,
+        "service_time_seconds": round(service_time, 3) if service_time is not None else None,
+        "target_seconds": args.target_seconds,
+        "replicas_needed": estimate_replicas(backlog, service_time, slots, args.target_seconds)
+    }
+
+
+def _print_status(report: Dict[str, Any]):
+    queue_stats = report["queue"]
+    print(f"{'lane':<12} {'depth':>8} {'oldest (s)':>12}")
+    for lane in LANES:
+        stats = queue_stats["lanes"][lane]
+        print(f"{lane:<12} {stats['depth']:>8} {stats['oldest_age_seconds']:>12.1f}")
+    print(
+        f"leased: {queue_stats['leased']}  delayed: {queue_stats['delayed']}  "
+        f"dead: {queue_stats['dead']}"
+    )
+
+    for worker in report["workers"]:
+        service_time = worker.get("service_time_seconds")
+        print(
+            f"worker {worker['url']}: {worker['state']}"
+            + (f", in flight {worker['in_flight']}/{worker['concurrency']}" if "in_flight" in worker else "")
+            + (f", service time {service_time:.2f}s" if service_time is not None else "")
+            + (f" ({worker['error']})" if "error" in worker else "")
+        )
+
+    if report["replicas_needed"] is None:
+        print(f"backlog: {report['backlog']} jobs (no service time yet, pass --service-time or --worker)")
+    else:
+        print(
+            f"backlog: {report['backlog']} jobs x {report['service_time_seconds']:.2f}s "
+            f"-> {report['replicas_needed']} replicas to drain within {report['target_seconds']:.0f}s"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Document worker status and drain control")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    status_parser = commands.add_parser("status", help="Queue depth, worker state and replica estimate")
+    status_parser.add_argument("--queue", default=Config.WORKER_QUEUE, help="Queue name")
+    status_parser.add_argument("--worker", action="append", default=[], help="Worker status URL (repeatable)")
+    status_parser.add_argument("--target-seconds", type=float, default=300.0, help="Desired backlog drain time")
+    status_parser.add_argument("--service-time", type=float, help="Seconds per job (default: reported by workers)")
+    status_parser.add_argument("--json", action="store_true", help="Print JSON")
+
+    for command in ("drain", "resume"):
+        command_parser = commands.add_parser(
+            command,
+            help="Stop taking new jobs and finish in-flight ones" if command == "drain" else "Take new jobs again"
+        )
+        command_parser.add_argument("--worker", action="append", required=True, help="Worker status URL (repeatable)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        report = status(args)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_status(report)
+        return 0
+
+    failed = False
+    for url in args.worker:
+        try:
+            state = _call(url, f"/{args.command}", method="POST")
+            print(f"{url}: {state['state']} ({state['in_flight']} in flight)")
+        except Exception as e:
+            print(f"{url}: {str(e)}", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,754 @@
+"""
+Job queues consumed by the document worker
+
+Jobs are JSON objects pushed by producers (API, backfill scripts) and leased
+by worker slots. A popped job stays owned by its slot only while the lease
+is extended by heartbeats; if the worker dies, the lease expires and the
+reaper puts the job back on the queue within seconds. Failed jobs are
+retried with exponential backoff up to max_attempts, then moved to a
+dead-letter list instead of spending processor calls on them forever.
+
+Waiting jobs are split into priority lanes (interactive, standard, bulk).
+Lanes share the workers by weight (stride scheduling), tenants inside a lane
+are served by weighted round-robin, and a lane whose oldest job waited
+longer than its cap is served next regardless of weights, so a bulk
+backfill can neither starve nor be starved by interactive uploads.
+
+RedisQueue is used in deployments; InMemoryQueue implements the same
+semantics for local runs and tests.
+"""
+import heapq
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from storage.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Lanes in priority order (starvation promotion is checked in this order)
+LANES = ("interactive", "standard", "bulk")
+DEFAULT_LANE = "standard"
+DEFAULT_TENANT = "default"
+
+# Job fields added by the queue, stripped before a job is stored again
+LEASE_FIELDS = ("_lease", "attempt", "wait_seconds", "promoted")
+
+
+def parse_weights(spec: str, default: Dict[str, float] = None) -> Dict[str, float]:
+    """
+    Parse "name:value,name:value" settings
+
+    Args:
+        spec: Setting string
+        default: Values for names missing from spec
+
+    Returns:
+        name -> value
+    """
+    values = dict(default or {})
+    for item in (spec or "").split(","):
+        name, sep, value = item.strip().rpartition(":")
+        if not sep or not name:
+            continue
+        try:
+            values[name] = float(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid weight '{item}'")
+    return values
+
+
+def make_job(
+    document_id: str,
+    priority: str = DEFAULT_LANE,
+    tenant: str = DEFAULT_TENANT,
+    **fields: Any
+) -> Dict[str, Any]:
+    """
+    Build a job payload
+
+    Args:
+        document_id: Document to process
+        priority: Lane - interactive, standard or bulk
+        tenant: Tenant the job is scheduled fairly for
+        **fields: Extra job fields (object_key, filename, mime_type, pages, ...)
+
+    Returns:
+        Job dict with a unique job_id
+    """
+    return {
+        "job_id": uuid.uuid4().hex,
+        "document_id": document_id,
+        "priority": priority,
+        "tenant": tenant,
+        **fields
+    }
+
+
+def decode_job(raw) -> Dict[str, Any]:
+    """Decode a queued payload; a bare string is treated as a document id"""
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    try:
+        job = json.loads(raw)
+    except ValueError:
+        job = None
+    if not isinstance(job, dict):
+        return make_job(str(raw))
+    return job
+
+
+def job_route(job: Dict[str, Any]) -> Tuple[str, str]:
+    """Lane and tenant of a job"""
+    lane = job.get("priority")
+    if lane not in LANES:
+        lane = DEFAULT_LANE
+    return lane, str(job.get("tenant") or DEFAULT_TENANT)
+
+
+def retry_delay(attempt: int, base: float = None, cap: float = 300.0) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt"""
+    base = Config.WORKER_RETRY_BACKOFF_SECONDS if base is None else base
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _stored(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key not in LEASE_FIELDS}
+
+
+class PermanentJobError(Exception):
+    """Raised by handlers for failures that retrying cannot fix"""
+
+
+class _SchedulingPolicy:
+    """Lane weights, lane wait caps and tenant weights"""
+
+    def __init__(
+        self,
+        lane_weights: Dict[str, float] = None,
+        lane_max_wait: Dict[str, float] = None,
+        tenant_weights: Dict[str, float] = None
+    ):
+        self.lane_weights = lane_weights or parse_weights(
+            Config.WORKER_LANE_WEIGHTS, {lane: 1.0 for lane in LANES}
+        )
+        self.lane_max_wait = lane_max_wait or parse_weights(
+            Config.WORKER_LANE_MAX_WAIT_SECONDS, {lane: 3600.0 for lane in LANES}
+        )
+        self.tenant_weights = tenant_weights or parse_weights(Config.WORKER_TENANT_WEIGHTS)
+
+    def lanes(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": lane,
+                "weight": max(self.lane_weights.get(lane, 1.0), 0.001),
+                "max_wait": self.lane_max_wait.get(lane, 3600.0)
+            }
+            for lane in LANES
+        ]
+
+    def tenant_credit(self, tenant: str) -> int:
+        return max(1, int(self.tenant_weights.get(tenant, 1)))
+
+
+class _Lane:
+    """Waiting jobs of one lane, per tenant"""
+
+    def __init__(self):
+        self.ring: Deque[str] = deque()
+        self.tenants: Dict[str, Deque[str]] = {}
+        self.credit: Dict[str, int] = {}
+        # job_id -> (tenant, enqueued_at), oldest first
+        self.age: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+
+class InMemoryQueue:
+    """
+    Process-local leased job queue with priority lanes
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: float = None,
+        max_attempts: int = None,
+        lane_weights: Dict[str, float] = None,
+        lane_max_wait: Dict[str, float] = None,
+        tenant_weights: Dict[str, float] = None
+    ):
+        """
+        Initialize queue
+
+        Args:
+            visibility_timeout: Seconds a lease lasts without a heartbeat
+            max_attempts: Attempts before a job is dead-lettered
+            lane_weights: Share of workers per lane (default: WORKER_LANE_WEIGHTS)
+            lane_max_wait: Max seconds a lane's oldest job waits (default: WORKER_LANE_MAX_WAIT_SECONDS)
+            tenant_weights: Round-robin weight per tenant (default: WORKER_TENANT_WEIGHTS)
+        """
+        self.visibility_timeout = visibility_timeout or Config.WORKER_VISIBILITY_TIMEOUT_SECONDS
+        self.max_attempts = max_attempts or Config.WORKER_MAX_ATTEMPTS
+        self.policy = _SchedulingPolicy(lane_weights, lane_max_wait, tenant_weights)
+        self._cond = threading.Condition()
+        self._lanes = {lane: _Lane() for lane in LANES}
+        self._pass = {lane: 0.0 for lane in LANES}
+        self._vtime = 0.0
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._attempts: Dict[str, int] = {}
+        # job_id -> (token, deadline)
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._delayed: List[Tuple[float, str]] = []
+        self._dead: List[Dict[str, Any]] = []
+
+    def push(self, job: Dict[str, Any]):
+        """Add a job to the tail of its lane and tenant queue"""
+        with self._cond:
+            self._jobs[job["job_id"]] = _stored(job)
+            self._enqueue(job["job_id"], time.time())
+            self._cond.notify()
+
+    def pop(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next job by lane weight, tenant fairness and wait caps
+
+        Returns:
+            Job with "attempt", "wait_seconds" and a lease token, or None if
+            the queue stayed empty
+        """
+        with self._cond:
+            picked = self._dequeue(time.time())
+            if picked is None:
+                self._cond.wait(timeout)
+                picked = self._dequeue(time.time())
+            if picked is None:
+                return None
+            job_id, waited, promoted = picked
+            token = uuid.uuid4().hex
+            self._attempts[job_id] = self._attempts.get(job_id, 0) + 1
+            self._leases[job_id] = (token, time.time() + self.visibility_timeout)
+            return {
+                **self._jobs[job_id],
+                "attempt": self._attempts[job_id],
+                "wait_seconds": waited,
+                "promoted": promoted,
+                "_lease": token
+            }
+
+    def extend(self, jobs: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Extend leases of running jobs
+
+        Returns:
+            Ids of jobs whose lease was lost
+        """
+        lost = []
+        deadline = time.time() + self.visibility_timeout
+        with self._cond:
+            for job in jobs:
+                lease = self._leases.get(job["job_id"])
+                if lease and lease[0] == job["_lease"]:
+                    self._leases[job["job_id"]] = (lease[0], deadline)
+                else:
+                    lost.append(job["job_id"])
+        return lost
+
+    def ack(self, job: Dict[str, Any]) -> bool:
+        """Complete a job, returning False if its lease was lost"""
+        job_id = job["job_id"]
+        with self._cond:
+            if not self._owns(job):
+                return False
+            del self._leases[job_id]
+            self._jobs.pop(job_id, None)
+            self._attempts.pop(job_id, None)
+            return True
+
+    def fail(self, job: Dict[str, Any], error: str, permanent: bool = False) -> str:
+        """
+        Record a failed attempt
+
+        Returns:
+            "retry", "dead", or "lost" if the lease was lost
+        """
+        job_id = job["job_id"]
+        with self._cond:
+            if not self._owns(job):
+                return "lost"
+            del self._leases[job_id]
+            if permanent or job["attempt"] >= self.max_attempts:
+                self._bury(job_id, error)
+                return "dead"
+            heapq.heappush(self._delayed, (time.time() + retry_delay(job["attempt"]), job_id))
+            return "retry"
+
+    def reap(self) -> Dict[str, int]:
+        """Requeue expired leases and due retries"""
+        now = time.time()
+        counts = {"expired": 0, "retried": 0, "dead": 0}
+        with self._cond:
+            for job_id, (_, deadline) in list(self._leases.items()):
+                if deadline > now:
+                    continue
+                del self._leases[job_id]
+                if self._attempts.get(job_id, 0) >= self.max_attempts:
+                    self._bury(job_id, "lease expired")
+                    counts["dead"] += 1
+                else:
+                    self._enqueue(job_id, now)
+                    counts["expired"] += 1
+            while self._delayed and self._delayed[0][0] <= now:
+                self._enqueue(heapq.heappop(self._delayed)[1], now)
+                counts["retried"] += 1
+            if counts["expired"] or counts["retried"]:
+                self._cond.notify_all()
+        return counts
+
+    def size(self) -> int:
+        """Number of jobs waiting to run"""
+        with self._cond:
+            return sum(len(lane.age) for lane in self._lanes.values())
+
+    def lane_sizes(self) -> Dict[str, int]:
+        """Number of waiting jobs per lane"""
+        with self._cond:
+            return {name: len(lane.age) for name, lane in self._lanes.items()}
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent dead-lettered jobs"""
+        with self._cond:
+            return list(reversed(self._dead[-limit:]))
+
+    def stats(self) -> Dict[str, Any]:
+        """Backlog per lane, leased, delayed and dead-lettered job counts"""
+        now = time.time()
+        with self._cond:
+            lanes = {}
+            for name, lane in self._lanes.items():
+                oldest = next(iter(lane.age.values()))[1] if lane.age else None
+                lanes[name] = {
+                    "depth": len(lane.age),
+                    "oldest_age_seconds": round(now - oldest, 3) if oldest is not None else 0.0
+                }
+            return {
+                "lanes": lanes,
+                "leased": len(self._leases),
+                "delayed": len(self._delayed),
+                "dead": len(self._dead)
+            }
+
+    def _enqueue(self, job_id: str, now: float):
+        name, tenant = job_route(self._jobs[job_id])
+        lane = self._lanes[name]
+        queue = lane.tenants.get(tenant)
+        if not queue:
+            queue = lane.tenants[tenant] = deque()
+            lane.ring.append(tenant)
+        queue.append(job_id)
+        lane.age[job_id] = (tenant, now)
+
+    def _dequeue(self, now: float) -> Optional[Tuple[str, float, bool]]:
+        chosen = chosen_pass = None
+        overdue_id = None
+        for spec in self.policy.lanes():
+            lane = self._lanes[spec["name"]]
+            if not lane.age:
+                continue
+            lane_pass = max(self._pass[spec["name"]], self._vtime)
+            oldest_id, (_, enqueued) = next(iter(lane.age.items()))
+            if now - enqueued > spec["max_wait"]:
+                chosen, chosen_pass, overdue_id = spec, lane_pass, oldest_id
+                break
+            if chosen is None or lane_pass < chosen_pass:
+                chosen, chosen_pass = spec, lane_pass
+        if chosen is None:
+            return None
+
+        lane = self._lanes[chosen["name"]]
+        if overdue_id is not None:
+            job_id = overdue_id
+            tenant = lane.age[job_id][0]
+            lane.tenants[tenant].remove(job_id)
+        else:
+            tenant = lane.ring[0]
+            job_id = lane.tenants[tenant].popleft()
+
+        if not lane.tenants[tenant]:
+            del lane.tenants[tenant]
+            lane.ring.remove(tenant)
+            lane.credit.pop(tenant, None)
+        elif overdue_id is None:
+            credit = lane.credit.get(tenant, self.policy.tenant_credit(tenant)) - 1
+            if credit <= 0:
+                lane.ring.rotate(-1)
+                lane.credit.pop(tenant, None)
+            else:
+                lane.credit[tenant] = credit
+
+        _, enqueued = lane.age.pop(job_id)
+        self._pass[chosen["name"]] = chosen_pass + 1.0 / chosen["weight"]
+        self._vtime = chosen_pass
+        return job_id, now - enqueued, overdue_id is not None
+
+    def _owns(self, job: Dict[str, Any]) -> bool:
+        lease = self._leases.get(job["job_id"])
+        return bool(lease) and lease[0] == job.get("_lease")
+
+    def _bury(self, job_id: str, error: str):
+        self._dead.append({
+            "job": self._jobs.pop(job_id, {"job_id": job_id}),
+            "error": error,
+            "attempts": self._attempts.pop(job_id, 0),
+            "failed_at": time.time()
+        })
+
+
+# Shared by all scripts. Keys are derived from the queue name passed as
+# ARGV[1], so the queue needs a single Redis instance (not Redis Cluster).
+_LUA_PRELUDE = """
+local prefix = ARGV[1]
+local function k(...)
+    return prefix .. ':' .. table.concat({...}, ':')
+end
+local function enqueue(id, now)
+    local lane, tenant = 'standard', 'default'
+    local route = redis.call('HGET', k('route'), id)
+    if route then
+        local sep = string.find(route, '|', 1, true)
+        lane, tenant = string.sub(route, 1, sep - 1), string.sub(route, sep + 1)
+    end
+    if redis.call('RPUSH', k(lane, 't', tenant), id) == 1 then
+        redis.call('RPUSH', k(lane, 'tenants'), tenant)
+    end
+    redis.call('ZADD', k(lane, 'age'), now, id)
+    redis.call('LPUSH', k('signal'), '1')
+    redis.call('LTRIM', k('signal'), 0, 999)
+end
+"""
+
+# ARGV: prefix, job id, payload, lane, tenant, now
+_PUSH_SCRIPT = _LUA_PRELUDE + """
+redis.call('HSET', k('jobs'), ARGV[2], ARGV[3])
+redis.call('HSET', k('route'), ARGV[2], ARGV[4] .. '|' .. ARGV[5])
+enqueue(ARGV[2], ARGV[6])
+return 1
+"""
+
+# Pick the next job and lease it.
+# ARGV: prefix, now, lanes json, tenant weights json, lease token, lease deadline
+_DEQUEUE_SCRIPT = _LUA_PRELUDE + """
+local now = tonumber(ARGV[2])
+local lanes = cjson.decode(ARGV[3])
+local tenant_weights = cjson.decode(ARGV[4])
+local vtime = tonumber(redis.call('HGET', k('sched'), 'vtime') or '0')
+
+local chosen, chosen_pass, id
+local promoted = 0
+for _, lane in ipairs(lanes) do
+    local oldest = redis.call('ZRANGE', k(lane.name, 'age'), 0, 0, 'WITHSCORES')
+    if oldest[1] then
+        local pass = math.max(tonumber(redis.call('HGET', k('sched'), 'pass:' .. lane.name) or '0'), vtime)
+        if now - tonumber(oldest[2]) > lane.max_wait then
+            chosen, chosen_pass, id, promoted = lane, pass, oldest[1], 1
+            break
+        end
+        if chosen == nil or pass < chosen_pass then
+            chosen, chosen_pass = lane, pass
+        end
+    end
+end
+if chosen == nil then
+    return false
+end
+
+local ring = k(chosen.name, 'tenants')
+local credits = k(chosen.name, 'credit')
+local tenant
+if promoted == 1 then
+    local route = redis.call('HGET', k('route'), id) or 'standard|default'
+    tenant = string.sub(route, string.find(route, '|', 1, true) + 1)
+    redis.call('LREM', k(chosen.name, 't', tenant), 1, id)
+else
+    tenant = redis.call('LINDEX', ring, 0)
+    id = redis.call('LPOP', k(chosen.name, 't', tenant))
+    if not id then
+        redis.call('LPOP', ring)
+        return false
+    end
+end
+
+if redis.call('LLEN', k(chosen.name, 't', tenant)) == 0 then
+    redis.call('LREM', ring, 0, tenant)
+    redis.call('HDEL', credits, tenant)
+elseif promoted == 0 then
+    local credit = tonumber(redis.call('HGET', credits, tenant) or math.max(1, math.floor(tenant_weights[tenant] or 1))) - 1
+    if credit <= 0 then
+        redis.call('LPOP', ring)
+        redis.call('RPUSH', ring, tenant)
+        redis.call('HDEL', credits, tenant)
+    else
+        redis.call('HSET', credits, tenant, credit)
+    end
+end
+
+local enqueued = tonumber(redis.call('ZSCORE', k(chosen.name, 'age'), id) or now)
+redis.call('ZREM', k(chosen.name, 'age'), id)
+redis.call('HSET', k('sched'), 'pass:' .. chosen.name, chosen_pass + 1 / chosen.weight)
+redis.call('HSET', k('sched'), 'vtime', chosen_pass)
+
+local attempt = redis.call('HINCRBY', k('attempts'), id, 1)
+redis.call('HSET', k('owners'), id, ARGV[5])
+redis.call('ZADD', k('leases'), ARGV[6], id)
+return {id, redis.call('HGET', k('jobs'), id) or id, attempt, tostring(now - enqueued), promoted}
+"""
+
+# Extend a lease still held by the caller. ARGV: prefix, job id, token, deadline
+_EXTEND_SCRIPT = _LUA_PRELUDE + """
+if redis.call('HGET', k('owners'), ARGV[2]) == ARGV[3] then
+    redis.call('ZADD', k('leases'), 'XX', ARGV[4], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Finish a leased job: "ack" drops it, "retry" schedules it on the delayed
+# set, "dead" moves it to the dead-letter list.
+# ARGV: prefix, job id, token, mode, retry time, dead-letter entry
+_FINISH_SCRIPT = _LUA_PRELUDE + """
+local id = ARGV[2]
+if redis.call('HGET', k('owners'), id) ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', k('leases'), id)
+redis.call('HDEL', k('owners'), id)
+if ARGV[4] == 'retry' then
+    redis.call('ZADD', k('delayed'), ARGV[5], id)
+else
+    if ARGV[4] == 'dead' then
+        redis.call('LPUSH', k('dead'), ARGV[6])
+    end
+    redis.call('HDEL', k('jobs'), id)
+    redis.call('HDEL', k('attempts'), id)
+    redis.call('HDEL', k('route'), id)
+end
+return 1
+"""
+
+# Requeue jobs whose lease expired (dead-lettering those out of attempts)
+# and due retries. ARGV: prefix, now, max attempts
+_REAP_SCRIPT = _LUA_PRELUDE + """
+local now = tonumber(ARGV[2])
+local expired, retried, dead = 0, 0, 0
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', k('leases'), '-inf', ARGV[2], 'LIMIT', 0, 100)) do
+    redis.call('ZREM', k('leases'), id)
+    redis.call('HDEL', k('owners'), id)
+    local attempts = tonumber(redis.call('HGET', k('attempts'), id) or '0')
+    if attempts >= tonumber(ARGV[3]) then
+        local payload = redis.call('HGET', k('jobs'), id) or id
+        local ok, job = pcall(cjson.decode, payload)
+        if not ok then job = payload end
+        redis.call('LPUSH', k('dead'), cjson.encode({job = job, error = 'lease expired', attempts = attempts, failed_at = now}))
+        redis.call('HDEL', k('jobs'), id)
+        redis.call('HDEL', k('attempts'), id)
+        redis.call('HDEL', k('route'), id)
+        dead = dead + 1
+    else
+        enqueue(id, ARGV[2])
+        expired = expired + 1
+    end
+end
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', k('delayed'), '-inf', ARGV[2], 'LIMIT', 0, 100)) do
+    redis.call('ZREM', k('delayed'), id)
+    enqueue(id, ARGV[2])
+    retried = retried + 1
+end
+return {expired, retried, dead}
+"""
+
+
+class RedisQueue:
+    """
+    Reliable Redis job queue with leases and priority lanes
+
+    Keys (prefix = queue name):
+        <name>:<lane>:t:<tenant>  list of waiting job ids of a tenant
+        <name>:<lane>:tenants     round-robin ring of tenants with waiting jobs
+        <name>:<lane>:credit      hash tenant -> remaining weighted turns
+        <name>:<lane>:age         zset job id -> enqueue time
+        <name>:sched              hash of lane pass values (stride scheduling)
+        <name>:signal             list pushed once per enqueue to wake idle slots
+        <name>:leases             zset job id -> lease deadline
+        <name>:delayed            zset job id -> retry time
+        <name>:jobs               hash job id -> payload
+        <name>:route              hash job id -> "lane|tenant"
+        <name>:attempts           hash job id -> attempts so far
+        <name>:owners             hash job id -> lease token
+        <name>:dead               list of dead-lettered jobs
+    """
+
+    def __init__(
+        self,
+        name: str = Config.WORKER_QUEUE,
+        client=None,
+        visibility_timeout: float = None,
+        max_attempts: int = None,
+        lane_weights: Dict[str, float] = None,
+        lane_max_wait: Dict[str, float] = None,
+        tenant_weights: Dict[str, float] = None
+    ):
+        """
+        Initialize queue
+
+        Args:
+            name: Queue name (key prefix)
+            client: Redis client (default: shared pooled client)
+            visibility_timeout: Seconds a lease lasts without a heartbeat
+            max_attempts: Attempts before a job is dead-lettered
+            lane_weights: Share of workers per lane (default: WORKER_LANE_WEIGHTS)
+            lane_max_wait: Max seconds a lane's oldest job waits (default: WORKER_LANE_MAX_WAIT_SECONDS)
+            tenant_weights: Round-robin weight per tenant (default: WORKER_TENANT_WEIGHTS)
+        """
+        self.name = name
+        self.client = client or get_redis()
+        if self.client is None:
+            raise RuntimeError("redis package is not installed")
+        self.visibility_timeout = visibility_timeout or Config.WORKER_VISIBILITY_TIMEOUT_SECONDS
+        self.max_attempts = max_attempts or Config.WORKER_MAX_ATTEMPTS
+        policy = _SchedulingPolicy(lane_weights, lane_max_wait, tenant_weights)
+        self._lanes_arg = json.dumps(policy.lanes())
+        self._tenant_weights_arg = json.dumps(policy.tenant_weights)
+
+        self._push = self.client.register_script(_PUSH_SCRIPT)
+        self._dequeue = self.client.register_script(_DEQUEUE_SCRIPT)
+        self._extend = self.client.register_script(_EXTEND_SCRIPT)
+        self._finish = self.client.register_script(_FINISH_SCRIPT)
+        self._reap = self.client.register_script(_REAP_SCRIPT)
+
+    def push(self, job: Dict[str, Any]):
+        """Add a job to the tail of its lane and tenant queue"""
+        lane, tenant = job_route(job)
+        self._push(args=[self.name, job["job_id"], json.dumps(_stored(job)), lane, tenant, time.time()])
+
+    def pop(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next job by lane weight, tenant fairness and wait caps,
+        blocking up to timeout seconds
+
+        Returns:
+            Job with "attempt", "wait_seconds" and a lease token, or None if
+            the queue stayed empty
+        """
+        job = self._lease_next()
+        if job is None:
+            # Whole seconds for older servers, and below the socket timeout
+            timeout = min(timeout, Config.REDIS_SOCKET_TIMEOUT_SECONDS - 1)
+            self.client.blpop([f"{self.name}:signal"], timeout=max(1, int(timeout)))
+            job = self._lease_next()
+        return job
+
+    def extend(self, jobs: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Extend leases of running jobs
+
+        Returns:
+            Ids of jobs whose lease was lost
+        """
+        lost = []
+        deadline = time.time() + self.visibility_timeout
+        for job in jobs:
+            if not self._extend(args=[self.name, job["job_id"], job["_lease"], deadline]):
+                lost.append(job["job_id"])
+        return lost
+
+    def ack(self, job: Dict[str, Any]) -> bool:
+        """Complete a job, returning False if its lease was lost"""
+        return bool(self._finish_job(job, "ack"))
+
+    def fail(self, job: Dict[str, Any], error: str, permanent: bool = False) -> str:
+        """
+        Record a failed attempt
+
+        Returns:
+            "retry", "dead", or "lost" if the lease was lost
+        """
+        if permanent or job["attempt"] >= self.max_attempts:
+            entry = json.dumps({
+                "job": _stored(job),
+                "error": error,
+                "attempts": job["attempt"],
+                "failed_at": time.time()
+            })
+            return "dead" if self._finish_job(job, "dead", entry=entry) else "lost"
+        retry_at = time.time() + retry_delay(job["attempt"])
+        return "retry" if self._finish_job(job, "retry", retry_at=retry_at) else "lost"
+
+    def reap(self) -> Dict[str, int]:
+        """Requeue expired leases and due retries"""
+        expired, retried, dead = self._reap(args=[self.name, time.time(), self.max_attempts])
+        return {"expired": int(expired), "retried": int(retried), "dead": int(dead)}
+
+    def size(self) -> int:
+        """Number of jobs waiting to run"""
+        return sum(self.lane_sizes().values())
+
+    def lane_sizes(self) -> Dict[str, int]:
+        """Number of waiting jobs per lane"""
+        pipe = self.client.pipeline(transaction=False)
+        for lane in LANES:
+            pipe.zcard(f"{self.name}:{lane}:age")
+        return dict(zip(LANES, pipe.execute()))
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent dead-lettered jobs"""
+        return [json.loads(entry) for entry in self.client.lrange(f"{self.name}:dead", 0, limit - 1)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Backlog per lane, leased, delayed and dead-lettered job counts"""
+        pipe = self.client.pipeline(transaction=False)
+        for lane in LANES:
+            pipe.zcard(f"{self.name}:{lane}:age")
+            pipe.zrange(f"{self.name}:{lane}:age", 0, 0, withscores=True)
+        pipe.zcard(f"{self.name}:leases")
+        pipe.zcard(f"{self.name}:delayed")
+        pipe.llen(f"{self.name}:dead")
+        replies = pipe.execute()
+        now = time.time()
+
+        lanes = {}
+        for index, lane in enumerate(LANES):
+            depth, oldest = replies[2 * index], replies[2 * index + 1]
+            lanes[lane] = {
+                "depth": int(depth),
+                "oldest_age_seconds": round(max(0.0, now - float(oldest[0][1])), 3) if oldest else 0.0
+            }
+        leased, delayed, dead = replies[-3:]
+        return {"lanes": lanes, "leased": int(leased), "delayed": int(delayed), "dead": int(dead)}
+
+    def _lease_next(self) -> Optional[Dict[str, Any]]:
+        token = uuid.uuid4().hex
+        picked = self._dequeue(args=[
+            self.name,
+            time.time(),
+            self._lanes_arg,
+            self._tenant_weights_arg,
+            token,
+            time.time() + self.visibility_timeout
+        ])
+        if not picked:
+            return None
+        job_id, payload, attempt, waited, promoted = picked
+        job = decode_job(payload)
+        job["job_id"] = job_id.decode("utf-8") if isinstance(job_id, bytes) else job_id
+        job["attempt"] = int(attempt)
+        job["wait_seconds"] = float(waited)
+        job["promoted"] = bool(promoted)
+        job["_lease"] = token
+        return job
+
+    def _finish_job(self, job: Dict[str, Any], mode: str, retry_at: float = 0, entry: str = ""):
+        return self._finish(args=[self.name, job["job_id"], job["_lease"], mode, retry_at, entry])
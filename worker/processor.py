@@ -1,10 +1,22 @@
 """
 Worker processor for background document processing tasks
 """
+import json
+import multiprocessing
 import os
+import queue
+import signal
+import threading
 import time
 import logging
-from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+from metrics import CONTENT_TYPE, counter, gauge, histogram, render
+from worker.job_queue import LANES, InMemoryQueue, PermanentJobError, RedisQueue, job_route
+from worker.stages import JobStages, stages_for, timed_build
 
 # Configure logging
 logging.basicConfig(
@@ -13,41 +25,584 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tells a stage thread to exit once the stages before it are done
+_STOP = object()
+
+WORKER_JOB_SECONDS = histogram(
+    "worker_job_seconds",
+    "Wall time of worker jobs",
+    ["outcome"]
+)
+WORKER_JOBS = counter(
+    "worker_jobs_total",
+    "Worker jobs finished",
+    ["outcome"]
+)
+WORKER_BUSY_SLOTS = gauge(
+    "worker_busy_slots",
+    "Worker slots currently running a job"
+)
+WORKER_JOB_WAIT_SECONDS = histogram(
+    "worker_job_wait_seconds",
+    "Time jobs waited in the queue before a slot picked them up",
+    ["lane"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 1800.0, 3600.0)
+)
+WORKER_STARVATION_PROMOTIONS = counter(
+    "worker_starvation_promotions_total",
+    "Jobs picked ahead of lane weights because their lane exceeded its max wait",
+    ["lane"]
+)
+WORKER_REAPED = counter(
+    "worker_reaped_total",
+    "Jobs moved by the lease reaper (expired lease, due retry, dead-lettered)",
+    ["reason"]
+)
+
+WORKER_STAGE_SECONDS = histogram(
+    "worker_stage_seconds",
+    "Time spent in each job stage (fetch, extract, build, persist)",
+    ["stage"]
+)
+WORKER_QUEUE_DEPTH = gauge(
+    "worker_queue_depth",
+    "Jobs waiting in the queue per lane (refreshed on scrape)",
+    ["lane"]
+)
+WORKER_QUEUE_OLDEST_AGE = gauge(
+    "worker_queue_oldest_age_seconds",
+    "Age of the oldest waiting job per lane (refreshed on scrape)",
+    ["lane"]
+)
+WORKER_QUEUE_LEASED = gauge(
+    "worker_queue_leased_jobs",
+    "Jobs currently leased by any worker (refreshed on scrape)"
+)
+WORKER_IN_FLIGHT = gauge(
+    "worker_in_flight_jobs",
+    "Jobs leased by this worker, in any stage"
+)
+WORKER_SERVICE_TIME = gauge(
+    "worker_service_time_seconds",
+    "Moving average (EWMA) of per-job time spent in stages on this worker"
+)
+WORKER_DRAINING = gauge(
+    "worker_draining",
+    "1 while the worker has stopped taking new jobs"
+)
+
+_STAGE_SECONDS = {
+    stage: WORKER_STAGE_SECONDS.labels(stage)
+    for stage in ("fetch", "extract", "build", "persist")
+}
+_JOB_SUCCESS_SECONDS = WORKER_JOB_SECONDS.labels("success")
+_JOB_FAILURE_SECONDS = WORKER_JOB_SECONDS.labels("failure")
+_JOBS_SUCCEEDED = WORKER_JOBS.labels("success")
+_JOBS_RETRIED = WORKER_JOBS.labels("retry")
+_JOBS_DEAD = WORKER_JOBS.labels("dead")
+_JOBS_LOST = WORKER_JOBS.labels("lease_lost")
+
+
+def _default_queue(
+    backend: str = None,
+    attempts: int = None,
+    backoff: float = None,
+    sleep: Callable[[float], None] = time.sleep
+):
+    """
+    Queue selected by WORKER_QUEUE_BACKEND
+
+    The Redis queue waits for Redis to answer a ping, retrying with
+    exponential backoff (Redis may still be starting), and fails when it
+    never does. The in-memory queue is only used when configured.
+
+    Args:
+        backend: "redis" or "memory" (default: WORKER_QUEUE_BACKEND)
+        attempts: Pings before giving up (default: WORKER_REDIS_CONNECT_ATTEMPTS)
+        backoff: Seconds before the first retry, doubled up to 30 (default: WORKER_REDIS_CONNECT_BACKOFF_SECONDS)
+        sleep: Sleep function (for tests)
+
+    Returns:
+        Job queue
+
+    Raises:
+        RuntimeError: Redis did not answer within the attempts
+        ValueError: Unknown backend
+    """
+    backend = (backend or Config.WORKER_QUEUE_BACKEND).lower()
+    if backend == "memory":
+        logger.warning("Using in-memory job queue: jobs are local to this process and lost on exit")
+        return InMemoryQueue()
+    if backend != "redis":
+        raise ValueError(f"Unknown WORKER_QUEUE_BACKEND: {backend!r} (expected 'redis' or 'memory')")
+
+    attempts = max(1, attempts or Config.WORKER_REDIS_CONNECT_ATTEMPTS)
+    delay = Config.WORKER_REDIS_CONNECT_BACKOFF_SECONDS if backoff is None else backoff
+    for attempt in range(1, attempts + 1):
+        try:
+            queue = RedisQueue()
+            # The client connects lazily; make sure Redis is actually there
+            queue.client.ping()
+            return queue
+        except Exception as e:
+            if attempt == attempts:
+                raise RuntimeError(f"Redis queue unavailable after {attempts} attempts: {str(e)}") from e
+            logger.warning(f"Redis queue unavailable (attempt {attempt}/{attempts}), retrying in {delay:.1f}s: {str(e)}")
+            sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+
+def _build_pool(processes: int) -> ProcessPoolExecutor:
+    """Process pool for the build stage; forkserver keeps children free of worker threads"""
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count(), mp_context=context)
+
 
 class DocumentWorker:
-    """Background worker for processing documents"""
-    
-    def __init__(self):
+    """
+    Background worker for processing documents
+
+    Jobs flow through a pipeline of bounded stages so downloads, processor
+    calls, result building and uploads of different jobs overlap:
+
+        fetch threads -> extract slots -> build (process pool) -> upload threads
+
+    Only the upload threads ack, so a lease covers a job through every stage.
+    """
+
+    def __init__(
+        self,
+        job_queue=None,
+        handler: Optional[Callable[[Dict[str, Any]], Any]] = None,
+        concurrency: Optional[int] = None,
+        stages: Optional[JobStages] = None
+    ):
+        """
+        Initialize worker
+
+        Args:
+            job_queue: Leased job queue (default: WORKER_QUEUE on WORKER_QUEUE_BACKEND)
+            handler: Single-function job handler, run in the extract slots
+            concurrency: Parallel extract slots (default: WORKER_CONCURRENCY)
+            stages: Job stages (default: complete document extraction, or
+                the handler when given)
+        """
         self.running = False
-        self.concurrency = int(os.getenv('WORKER_CONCURRENCY', '2'))
+        self.concurrency = concurrency or Config.WORKER_CONCURRENCY
+        self.queue = job_queue if job_queue is not None else _default_queue()
+        self.stages = stages or stages_for(handler)
+
+        self._fetchers: List[threading.Thread] = []
+        self._slots: List[threading.Thread] = []
+        self._uploaders: List[threading.Thread] = []
+        self._maintenance: Optional[threading.Thread] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._status_server: Optional[ThreadingHTTPServer] = None
+        # Bounded hand-offs: a slow stage backs up the ones before it
+        self._fetched: queue.Queue = queue.Queue(maxsize=Config.WORKER_PREFETCH)
+        self._built: queue.Queue = queue.Queue(maxsize=max(Config.WORKER_PREFETCH, self.concurrency))
+        # job_id -> leased job anywhere in the pipeline
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        # job_id -> seconds spent in stages so far (excludes hand-off waits)
+        self._work_seconds: Dict[str, float] = {}
+        self._stop_requested = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.stats = {"succeeded": 0, "failed": 0, "retried": 0, "dead": 0, "busy": 0}
+        # Drain mode: stop dequeuing but keep running (and reporting)
+        self.draining = False
+        # EWMA of per-job stage time; None until a job finishes
+        self.service_time: Optional[float] = None
         logger.info(f"Worker initialized with concurrency: {self.concurrency}")
-    
-    def start(self):
-        """Start the worker process"""
+
+    def start(self, install_signal_handlers: bool = True):
+        """
+        Run the job pipeline until stopped, then drain in-flight jobs
+
+        Args:
+            install_signal_handlers: Stop gracefully on SIGTERM/SIGINT
+        """
         self.running = True
+        self._stop_requested.clear()
+        if install_signal_handlers and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._handle_signal)
+            signal.signal(signal.SIGINT, self._handle_signal)
+            if hasattr(signal, "SIGUSR1"):
+                signal.signal(signal.SIGUSR1, self._handle_drain_signal)
+
+        if self.stages.build_in_process:
+            self._pool = _build_pool(Config.WORKER_BUILD_PROCESSES)
+
+        self._uploaders = self._spawn(self._run_uploader, "worker-upload", Config.WORKER_UPLOAD_THREADS)
+        self._slots = self._spawn(self._run_slot, "worker-slot", self.concurrency)
+        self._fetchers = self._spawn(self._run_fetcher, "worker-fetch", Config.WORKER_FETCH_THREADS)
+        self._maintenance = threading.Thread(target=self._run_maintenance, name="worker-maintenance", daemon=True)
+        self._maintenance.start()
+        if Config.WORKER_METRICS_PORT:
+            self._start_status_server(Config.WORKER_METRICS_PORT)
         logger.info("Worker started")
-        
+
         try:
-            while self.running:
-                # TODO: Implement actual job processing from Redis queue
-                # For now, just keep the worker alive
-                logger.debug("Worker heartbeat")
-                time.sleep(10)
+            # Wake up regularly so signals are handled promptly
+            while not self._stop_requested.wait(1.0):
+                pass
         except KeyboardInterrupt:
             logger.info("Worker interrupted")
         finally:
             self.stop()
-    
+            self._drain()
+
     def stop(self):
-        """Stop the worker process"""
+        """Stop taking new jobs; jobs already fetched still run to completion"""
         self.running = False
-        logger.info("Worker stopped")
-    
-    def process_document(self, document_id: str):
-        """Process a single document"""
-        logger.info(f"Processing document: {document_id}")
-        # TODO: Implement actual document processing
-        pass
+        self._stop_requested.set()
+
+    def drain(self):
+        """Stop dequeuing and let in-flight jobs finish, without exiting"""
+        if not self.draining:
+            logger.info(f"Draining: {len(self._in_flight)} in-flight jobs, no new jobs taken")
+        self.draining = True
+        WORKER_DRAINING.set(1)
+
+    def resume(self):
+        """Leave drain mode and take new jobs again"""
+        if self.draining:
+            logger.info("Resuming job intake")
+        self.draining = False
+        WORKER_DRAINING.set(0)
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"Received signal {signum}, draining in-flight jobs")
+        self.stop()
+
+    def _handle_drain_signal(self, signum, frame):
+        self.drain()
+
+    def _spawn(self, target: Callable[[], None], name: str, count: int) -> List[threading.Thread]:
+        threads = [
+            threading.Thread(target=target, name=f"{name}-{index}", daemon=True)
+            for index in range(max(1, count))
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _threads(self) -> List[threading.Thread]:
+        return self._fetchers + self._slots + self._uploaders
+
+    def _drain(self):
+        """Finish in-flight jobs stage by stage, up to WORKER_SHUTDOWN_TIMEOUT_SECONDS"""
+        deadline = time.monotonic() + Config.WORKER_SHUTDOWN_TIMEOUT_SECONDS
+
+        def join(threads: List[threading.Thread]):
+            for thread in threads:
+                thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+        join(self._fetchers)
+        # Each stop marker queues behind the jobs handed over before it
+        for stage_queue, threads in ((self._fetched, self._slots), (self._built, self._uploaders)):
+            for _ in threads:
+                self._hand_over(stage_queue, _STOP, deadline)
+            join(threads)
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._status_server is not None:
+            self._status_server.shutdown()
+            self._status_server.server_close()
+        # Heartbeats stop with the last stage thread; unfinished leases then expire
+        if self._maintenance is not None:
+            self._maintenance.join(timeout=5)
+
+        busy = [thread.name for thread in self._threads() if thread.is_alive()]
+        if busy:
+            logger.warning(f"Shutdown timeout reached with busy stages: {', '.join(busy)}")
+        logger.info(
+            f"Worker stopped ({self.stats['succeeded']} succeeded, {self.stats['failed']} failed)"
+        )
+
+    def _hand_over(self, stage_queue: queue.Queue, item: Any, deadline: Optional[float] = None):
+        """Put into a bounded stage queue, giving up at the shutdown deadline"""
+        while True:
+            try:
+                stage_queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+
+    def _run_fetcher(self):
+        """Pop jobs and download their input until the worker stops"""
+        backoff = 1.0
+        while self.running:
+            if self.draining:
+                self._stop_requested.wait(Config.WORKER_POLL_TIMEOUT_SECONDS)
+                continue
+            try:
+                job = self.queue.pop(Config.WORKER_POLL_TIMEOUT_SECONDS)
+                backoff = 1.0
+            except Exception as e:
+                logger.error(f"Queue error: {str(e)}")
+                self._stop_requested.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            # A job popped while stopping is still run, otherwise it would be lost
+            if job is None:
+                continue
+            started = self._begin(job)
+            try:
+                fetched = self._timed("fetch", self.stages.fetch, job)
+            except Exception as e:
+                self._finish(job, started, e)
+                continue
+            self._hand_over(self._fetched, (job, started, fetched))
+
+    def _run_slot(self):
+        """Run the extract stage and hand the build over to the process pool"""
+        while True:
+            item = self._fetched.get()
+            if item is _STOP:
+                return
+            job, started, fetched = item
+            with self._stats_lock:
+                self.stats["busy"] += 1
+            WORKER_BUSY_SLOTS.inc()
+            try:
+                extracted = self._timed("extract", self.stages.extract, job, fetched)
+                if self._pool is not None:
+                    built = self._pool.submit(timed_build, self.stages, job, extracted)
+                else:
+                    built = self._timed("build", self.stages.build, job, extracted)
+            except Exception as e:
+                self._finish(job, started, e)
+                continue
+            finally:
+                WORKER_BUSY_SLOTS.dec()
+                with self._stats_lock:
+                    self.stats["busy"] -= 1
+            self._hand_over(self._built, (job, started, built))
+
+    def _run_uploader(self):
+        """Wait for built results, persist them and ack their jobs"""
+        while True:
+            item = self._built.get()
+            if item is _STOP:
+                return
+            job, started, built = item
+            try:
+                if isinstance(built, Future):
+                    built, seconds = built.result()
+                    self._add_work("build", job, seconds)
+                self._timed("persist", self.stages.persist, job, built)
+            except Exception as e:
+                self._finish(job, started, e)
+                continue
+            self._finish(job, started)
+
+    def _timed(self, stage: str, function: Callable[..., Any], job: Dict[str, Any], *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return function(job, *args)
+        finally:
+            self._add_work(stage, job, time.perf_counter() - started)
+
+    def _add_work(self, stage: str, job: Dict[str, Any], seconds: float):
+        _STAGE_SECONDS[stage].observe(seconds)
+        with self._stats_lock:
+            self._work_seconds[job["job_id"]] = self._work_seconds.get(job["job_id"], 0.0) + seconds
+
+    def _run_maintenance(self):
+        """Extend leases of in-flight jobs and requeue abandoned ones"""
+        last_heartbeat = last_reap = 0.0
+        while self.running or any(thread.is_alive() for thread in self._threads()):
+            now = time.monotonic()
+            try:
+                if now - last_heartbeat >= Config.WORKER_HEARTBEAT_SECONDS:
+                    last_heartbeat = now
+                    with self._stats_lock:
+                        running = list(self._in_flight.values())
+                    for job_id in self.queue.extend(running):
+                        logger.warning(f"Lease lost for running job {job_id}, it may run twice")
+                if self.running and now - last_reap >= Config.WORKER_REAP_INTERVAL_SECONDS:
+                    last_reap = now
+                    counts = self.queue.reap()
+                    for reason in ("expired", "retried", "dead"):
+                        if counts.get(reason):
+                            WORKER_REAPED.labels(reason).inc(counts[reason])
+                    if counts.get("expired") or counts.get("dead"):
+                        logger.warning(
+                            f"Reaped abandoned jobs: {counts['expired']} requeued, {counts['dead']} dead-lettered"
+                        )
+            except Exception as e:
+                logger.error(f"Lease maintenance error: {str(e)}")
+            time.sleep(0.5)
+
+    def _begin(self, job: Dict[str, Any]) -> float:
+        """Track a freshly leased job, returning its start time"""
+        with self._stats_lock:
+            self._in_flight[job["job_id"]] = job
+        WORKER_IN_FLIGHT.inc()
+        lane, _ = job_route(job)
+        WORKER_JOB_WAIT_SECONDS.labels(lane).observe(job.get("wait_seconds", 0.0))
+        if job.get("promoted"):
+            WORKER_STARVATION_PROMOTIONS.labels(lane).inc()
+        return time.perf_counter()
+
+    def _finish(self, job: Dict[str, Any], started: float, error: Optional[Exception] = None):
+        """Ack or fail a job that left the pipeline, with outcome accounting"""
+        job_id = job["job_id"]
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            work = self._work_seconds.pop(job_id, elapsed)
+            if self.service_time is None:
+                self.service_time = work
+            else:
+                self.service_time = 0.8 * self.service_time + 0.2 * work
+        WORKER_SERVICE_TIME.set(self.service_time)
+        try:
+            if error is None:
+                _JOB_SUCCESS_SECONDS.observe(elapsed)
+                if self.queue.ack(job):
+                    _JOBS_SUCCEEDED.inc()
+                    self._track("succeeded", 1)
+                else:
+                    _JOBS_LOST.inc()
+                    logger.warning(f"Job {job_id} finished after its lease was lost")
+                logger.info(f"Job {job_id} ({job.get('document_id')}) done in {elapsed:.2f}s")
+                return
+
+            _JOB_FAILURE_SECONDS.observe(elapsed)
+            outcome = self.queue.fail(job, str(error), permanent=isinstance(error, PermanentJobError))
+            if outcome == "retry":
+                _JOBS_RETRIED.inc()
+                self._track("retried", 1)
+            elif outcome == "dead":
+                _JOBS_DEAD.inc()
+                self._track("dead", 1)
+            else:
+                _JOBS_LOST.inc()
+            self._track("failed", 1)
+            logger.error(
+                f"Job {job_id} ({job.get('document_id')}) attempt {job.get('attempt')} "
+                f"failed after {elapsed:.2f}s ({outcome}): {str(error)}"
+            )
+        except Exception as e:
+            logger.error(f"Could not settle job {job_id}, its lease will expire: {str(e)}")
+        finally:
+            with self._stats_lock:
+                self._in_flight.pop(job_id, None)
+            WORKER_IN_FLIGHT.dec()
+
+    def _track(self, key: str, amount: int):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Worker and queue state for monitoring and autoscaling
+
+        backlog_seconds estimates how long this worker alone would need for
+        the waiting and in-flight jobs (jobs x service time / slots); an
+        autoscaler divides it by a target drain time to get replicas.
+        """
+        with self._stats_lock:
+            in_flight = len(self._in_flight)
+            service_time = self.service_time
+            stats = dict(self.stats)
+
+        if not self.running:
+            state = "stopped"
+        elif self.draining:
+            state = "drained" if in_flight == 0 else "draining"
+        else:
+            state = "running"
+
+        status = {
+            "state": state,
+            "concurrency": self.concurrency,
+            "in_flight": in_flight,
+            "service_time_seconds": round(service_time, 3) if service_time is not None else None,
+            "jobs": stats
+        }
+        try:
+            queue_stats = self.queue.stats()
+        except Exception as e:
+            logger.error(f"Queue stats error: {str(e)}")
+            return {**status, "queue": None, "backlog_seconds": None}
+
+        for lane in LANES:
+            WORKER_QUEUE_DEPTH.labels(lane).set(queue_stats["lanes"][lane]["depth"])
+            WORKER_QUEUE_OLDEST_AGE.labels(lane).set(queue_stats["lanes"][lane]["oldest_age_seconds"])
+        WORKER_QUEUE_LEASED.set(queue_stats["leased"])
+
+        backlog = sum(lane["depth"] for lane in queue_stats["lanes"].values()) + in_flight
+        status["queue"] = queue_stats
+        status["backlog_seconds"] = (
+            round(backlog * service_time / self.concurrency, 1) if service_time is not None else None
+        )
+        return status
+
+    def _start_status_server(self, port: int):
+        """Serve /metrics, /status and POST /drain, /resume on a background thread"""
+        worker = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    worker.status()
+                    self._reply(200, render(), CONTENT_TYPE)
+                elif self.path == "/status":
+                    self._reply(200, json.dumps(worker.status()), "application/json")
+                else:
+                    self._reply(404, json.dumps({"error": "not found"}), "application/json")
+
+            def do_POST(self):
+                if self.path == "/drain":
+                    worker.drain()
+                elif self.path == "/resume":
+                    worker.resume()
+                else:
+                    self._reply(404, json.dumps({"error": "not found"}), "application/json")
+                    return
+                self._reply(200, json.dumps(worker.status()), "application/json")
+
+            def _reply(self, code: int, body, content_type: str):
+                payload = body if isinstance(body, bytes) else body.encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Status request: {format % args}")
+
+        try:
+            self._status_server = ThreadingHTTPServer(("0.0.0.0", port), StatusHandler)
+        except OSError as e:
+            logger.error(f"Could not serve worker metrics on port {port}: {str(e)}")
+            return
+        self._status_server.daemon_threads = True
+        threading.Thread(
+            target=self._status_server.serve_forever,
+            name="worker-status",
+            daemon=True
+        ).start()
+        logger.info(f"Worker metrics and status on port {port}")
+
+    def process_document(self, job: Dict[str, Any]) -> Any:
+        """
+        Run all stages of a single job in the calling thread
+
+        Args:
+            job: Job with document_id and optional object_key, filename,
+                mime_type, pages ("1-3,7") and output_key
+
+        Returns:
+            Result of the persist stage (object key of the uploaded result)
+        """
+        return self.stages.run(job)
 
 
 def main():
@@ -0,0 +1,223 @@
+"""
+Stages of a worker job
+
+A job goes through fetch (download input), extract (OCR engine calls),
+build (CPU-bound result building, masking and JSON encoding) and persist
+(upload the result). DocumentWorker runs each stage on its own bounded pool
+so network and CPU work of different jobs overlap; build can run in a
+process pool, so stage objects and their build inputs must be picklable.
+"""
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+from worker.job_queue import PermanentJobError
+
+logger = logging.getLogger(__name__)
+
+# Per-process clients (never pickled with the stage objects)
+_extractor = None
+_builder = None
+
+
+class JobStages:
+    """
+    Stage functions of a job; the defaults pass data through unchanged
+    """
+
+    # Run build in the worker's process pool instead of a thread
+    build_in_process = False
+
+    def fetch(self, job: Dict[str, Any]) -> Any:
+        """Download job input (I/O bound)"""
+        return None
+
+    def extract(self, job: Dict[str, Any], fetched: Any) -> Any:
+        """Run OCR (network or process-pool bound)"""
+        return fetched
+
+    def build(self, job: Dict[str, Any], extracted: Any) -> Any:
+        """Build the output (CPU bound)"""
+        return extracted
+
+    def persist(self, job: Dict[str, Any], built: Any) -> Any:
+        """Store the output (I/O bound)"""
+        return built
+
+    def run(self, job: Dict[str, Any]) -> Any:
+        """Run all stages in sequence"""
+        return self.persist(job, self.build(job, self.extract(job, self.fetch(job))))
+
+
+class HandlerStages(JobStages):
+    """
+    Single-function jobs: the handler runs as the extract stage
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Any]):
+        self.handler = handler
+
+    def extract(self, job: Dict[str, Any], fetched: Any) -> Any:
+        return self.handler(job)
+
+
+def _get_extractor():
+    global _extractor
+    if _extractor is None:
+        from processing.complete_document_extractor import CompleteDocumentExtractor
+        _extractor = CompleteDocumentExtractor()
+    return _extractor
+
+
+def _get_builder():
+    global _builder
+    if _builder is None:
+        from processing.complete_document_extractor import result_builder
+        _builder = result_builder()
+    return _builder
+
+
+class DocumentStages(JobStages):
+    """
+    Complete extraction of a stored document into a masked result JSON
+    """
+
+    build_in_process = True
+
+    def fetch(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Download the document
+
+        Returns:
+            Document content with filename, MIME type and page selection
+        """
+        from api.document_ingestion import guess_mime_type
+        from processing.page_selection import (
+            PageSelectionError,
+            check_page_selection,
+            count_pages,
+            parse_page_ranges,
+        )
+        from storage.object_storage import get_s3_client
+
+        document_id = job["document_id"]
+        object_key = job.get("object_key") or f"{Config.WORKER_INPUT_PREFIX}{document_id}"
+        filename = job.get("filename") or os.path.basename(object_key)
+
+        try:
+            pages = parse_page_ranges(job.get("pages"))
+        except ValueError as e:
+            raise PermanentJobError(f"Invalid pages: {str(e)}")
+
+        s3 = get_s3_client()
+        try:
+            response = s3.get_object(Bucket=Config.S3_BUCKET_NAME, Key=object_key)
+        except s3.exceptions.NoSuchKey:
+            raise PermanentJobError(f"Document not found: {object_key}")
+
+        content = response["Body"].read()
+        mime_type = job.get("mime_type") or guess_mime_type(filename)
+        if pages:
+            total = count_pages(content, mime_type)
+            try:
+                if total is not None:
+                    check_page_selection(pages, total)
+            except PageSelectionError as e:
+                raise PermanentJobError(f"Invalid pages: {str(e)}")
+
+        return {
+            "content": content,
+            "filename": filename,
+            "mime_type": mime_type,
+            "pages": pages
+        }
+
+    def extract(self, job: Dict[str, Any], fetched: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run the OCR engine (Document AI Form Parser and OCR by default)
+
+        Returns:
+            Serialized processor documents plus what build needs
+        """
+        from google.cloud import documentai_v1 as documentai
+
+        extractor = _get_extractor()
+        form_doc, ocr_doc, page_numbers, page_routes, (read_content, read_type) = extractor.process_document(
+            fetched["content"],
+            fetched["mime_type"],
+            fetched["pages"]
+        )
+        if form_doc is None and ocr_doc is None:
+            raise RuntimeError("Both processors failed")
+        # Crops come from the image the blocks were read on
+        refinements = extractor.refine_regions(
+            read_content, read_type, form_doc, ocr_doc, page_numbers
+        )
+
+        return {
+            "form_doc": documentai.Document.serialize(form_doc) if form_doc is not None else None,
+            "ocr_doc": documentai.Document.serialize(ocr_doc) if ocr_doc is not None else None,
+            "page_numbers": page_numbers,
+            "pages": fetched["pages"],
+            "filename": fetched["filename"],
+            "engine": extractor.engine.name,
+            "page_routes": page_routes,
+            "refinements": refinements
+        }
+
+    def build(self, job: Dict[str, Any], extracted: Dict[str, Any]) -> bytes:
+        """
+        Build, mask and encode the complete result
+
+        Returns:
+            Result JSON bytes
+        """
+        from google.cloud import documentai_v1 as documentai
+        from security.data_masking import mask_sensitive_data
+
+        form_doc = extracted["form_doc"]
+        ocr_doc = extracted["ocr_doc"]
+        result = _get_builder().build_result(
+            documentai.Document.deserialize(form_doc) if form_doc is not None else None,
+            documentai.Document.deserialize(ocr_doc) if ocr_doc is not None else None,
+            extracted["filename"],
+            extracted["page_numbers"],
+            extracted["pages"],
+            engine=extracted["engine"],
+            page_routes=extracted["page_routes"],
+            refinements=extracted["refinements"]
+        )
+        return json.dumps(mask_sensitive_data(result), ensure_ascii=False).encode("utf-8")
+
+    def persist(self, job: Dict[str, Any], built: bytes) -> str:
+        """
+        Upload the result JSON
+
+        Returns:
+            Object key of the result
+        """
+        from storage.object_storage import get_s3_client
+
+        output_key = job.get("output_key") or f"{Config.WORKER_OUTPUT_PREFIX}{job['document_id']}.json"
+        get_s3_client().put_object(
+            Bucket=Config.S3_BUCKET_NAME,
+            Key=output_key,
+            Body=built,
+            ContentType="application/json"
+        )
+        return output_key
+
+
+def timed_build(stages: JobStages, job: Dict[str, Any], extracted: Any) -> tuple:
+    """Run the build stage, returning (output, seconds); used in pool processes"""
+    started = time.perf_counter()
+    built = stages.build(job, extracted)
+    return built, time.perf_counter() - started
+
+
+def stages_for(handler: Optional[Callable[[Dict[str, Any]], Any]]) -> JobStages:
+    """Stages for a plain handler, or complete document extraction"""
+    return HandlerStages(handler) if handler is not None else DocumentStages()